@@ -0,0 +1,201 @@
+"""
+Time to render the description of a learning material from its blocks against the
+size of the material, comparing the previous renderer (which built the description
+by repeated string concatenation) with the current one (which joins the lines once)
+and with a cached render, where the blocks are only fingerprinted to check that the
+cached description is still current.
+
+CPython usually extends a string being concatenated in place, so the previous
+renderer is only quadratic when it cannot (e.g. on other interpreters); the speedup
+is that of the cached render over the previous renderer.
+
+The materials are random mixes of headings, paragraphs with styled runs, code blocks
+and lists nested up to three levels deep, as written in the editor.
+
+Usage (from the sensai-ai directory):
+    python experimental/benchmarks/block_descriptions.py
+"""
+
+import argparse
+import random
+import statistics
+import time
+import utils  # noqa: F401 (makes the backend importable)
+
+from api.db.utils import construct_description_from_blocks
+from api.db.block_description_cache import BlockDescriptionCache
+
+WORDS = "the learner writes a function that returns the sum of all even numbers in a list".split()
+
+
+def legacy_construct_description_from_blocks(blocks, nesting_level=0):
+    if not blocks:
+        return ""
+
+    description = ""
+    indent = "    " * nesting_level
+
+    for block in blocks:
+        block_type = block.get("type", "")
+        content = block.get("content", [])
+        children = block.get("children", [])
+
+        if block_type == "paragraph":
+            if isinstance(content, list):
+                paragraph_text = ""
+                for text_obj in content:
+                    if isinstance(text_obj, dict) and "text" in text_obj:
+                        paragraph_text += text_obj["text"]
+                if paragraph_text:
+                    description += f"{indent}{paragraph_text}\n"
+
+        elif block_type == "heading":
+            level = block.get("props", {}).get("level", 1)
+            if isinstance(content, list):
+                heading_text = ""
+                for text_obj in content:
+                    if isinstance(text_obj, dict) and "text" in text_obj:
+                        heading_text += text_obj["text"]
+                if heading_text:
+                    description += f"{indent}{'#' * level} {heading_text}\n"
+
+        elif block_type == "codeBlock":
+            language = block.get("props", {}).get("language", "")
+            if isinstance(content, list):
+                code_text = ""
+                for text_obj in content:
+                    if isinstance(text_obj, dict) and "text" in text_obj:
+                        code_text += text_obj["text"]
+                if code_text:
+                    description += (
+                        f"{indent}```{language}\n{indent}{code_text}\n{indent}```\n"
+                    )
+
+        elif block_type in ["numberedListItem", "checkListItem", "bulletListItem"]:
+            if isinstance(content, list):
+                item_text = ""
+                for text_obj in content:
+                    if isinstance(text_obj, dict) and "text" in text_obj:
+                        item_text += text_obj["text"]
+                if item_text:
+                    if block_type == "numberedListItem":
+                        marker = "1. "
+                    elif block_type == "checkListItem":
+                        marker = "- [ ] "
+                    elif block_type == "bulletListItem":
+                        marker = "- "
+
+                    description += f"{indent}{marker}{item_text}\n"
+
+        if children:
+            description += legacy_construct_description_from_blocks(
+                children, nesting_level + 1
+            )
+
+    return description
+
+
+def make_text(rng: random.Random, num_runs: int):
+    """Runs of text as the editor stores them, split wherever the styles change."""
+    return [
+        {
+            "type": "text",
+            "text": " ".join(rng.choices(WORDS, k=rng.randint(3, 12))) + " ",
+            "styles": {"bold": True} if rng.random() < 0.2 else {},
+        }
+        for _ in range(num_runs)
+    ]
+
+
+def make_block(rng: random.Random, depth: int = 0):
+    kind = rng.random()
+
+    if kind < 0.1:
+        return {
+            "type": "heading",
+            "props": {"level": rng.randint(1, 3)},
+            "content": make_text(rng, 1),
+            "children": [],
+        }
+
+    if kind < 0.2:
+        return {
+            "type": "codeBlock",
+            "props": {"language": "python"},
+            "content": [
+                {
+                    "type": "text",
+                    "text": "\n".join(
+                        f"x_{line} = sum(n for n in range({line}) if n % 2 == 0)"
+                        for line in range(rng.randint(5, 30))
+                    ),
+                    "styles": {},
+                }
+            ],
+            "children": [],
+        }
+
+    if kind < 0.5:
+        return {
+            "type": rng.choice(["bulletListItem", "numberedListItem", "checkListItem"]),
+            "props": {},
+            "content": make_text(rng, rng.randint(1, 3)),
+            "children": (
+                [make_block(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+                if depth < 3
+                else []
+            ),
+        }
+
+    return {
+        "type": "paragraph",
+        "props": {},
+        "content": make_text(rng, rng.randint(1, 8)),
+        "children": [],
+    }
+
+
+def time_sync(fn, *args, repeat: int) -> float:
+    """Median wall clock time of `fn(*args)` in milliseconds."""
+    fn(*args)  # warm up
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start_time) * 1000)
+
+    return statistics.median(timings)
+
+
+def main(repeat: int):
+    print(
+        f"{'blocks':>7} {'chars':>9} {'legacy (ms)':>12} {'join (ms)':>10} {'cached (ms)':>12} {'speedup':>8}"
+    )
+
+    for num_blocks in [10, 100, 1000, 5000]:
+        rng = random.Random(num_blocks)
+        blocks = [make_block(rng) for _ in range(num_blocks)]
+
+        description = construct_description_from_blocks(blocks)
+        assert description == legacy_construct_description_from_blocks(blocks)
+
+        cache = BlockDescriptionCache()
+
+        legacy_ms = time_sync(
+            legacy_construct_description_from_blocks, blocks, repeat=repeat
+        )
+        join_ms = time_sync(construct_description_from_blocks, blocks, repeat=repeat)
+        cached_ms = time_sync(cache.get_description, blocks, "task_1", repeat=repeat)
+
+        print(
+            f"{num_blocks:>7} {len(description):>9} {legacy_ms:>12.3f} {join_ms:>10.3f} {cached_ms:>12.3f} {legacy_ms / cached_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    main(args.repeat)
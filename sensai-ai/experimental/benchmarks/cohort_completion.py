@@ -0,0 +1,257 @@
+"""
+Latency of get_cohort_completion against the number of learners and questions in
+a cohort, compared with the previous implementation which looped over every
+user, task and question in Python to build nested dicts. The current
+implementation is timed both for the completion counts the metrics route reads
+and for materialising the nested dicts of every learner.
+
+Usage (from the sensai-ai directory):
+    python experimental/benchmarks/cohort_completion.py
+"""
+
+import asyncio
+import argparse
+import random
+from collections import defaultdict
+from utils import temporary_database, time_async
+
+from api.config import (
+    task_completions_table_name,
+    tasks_table_name,
+    questions_table_name,
+    course_tasks_table_name,
+    course_cohorts_table_name,
+)
+from api.models import TaskType, TaskStatus
+from api.utils.db import execute_db_operation, execute_many_db_operation
+from api.db.analytics import get_cohort_completion
+
+
+async def legacy_get_cohort_completion(
+    cohort_id: int, user_ids: list, course_id: int = None
+):
+    results = defaultdict(dict)
+
+    completed_tasks = await execute_db_operation(
+        f"""
+        SELECT user_id, task_id
+        FROM {task_completions_table_name}
+        WHERE user_id in ({','.join(map(str, user_ids))}) AND task_id IS NOT NULL
+        """,
+        fetch_all=True,
+    )
+    completed_task_ids_for_user = defaultdict(set)
+    for user_id, task_id in completed_tasks:
+        completed_task_ids_for_user[user_id].add(task_id)
+
+    completed_questions = await execute_db_operation(
+        f"""
+        SELECT user_id, question_id
+        FROM {task_completions_table_name}
+        WHERE user_id in ({','.join(map(str, user_ids))}) AND question_id IS NOT NULL
+        """,
+        fetch_all=True,
+    )
+    completed_question_ids_for_user = defaultdict(set)
+    for user_id, question_id in completed_questions:
+        completed_question_ids_for_user[user_id].add(question_id)
+
+    learning_material_tasks = await execute_db_operation(
+        f"""
+        SELECT DISTINCT t.id
+        FROM {tasks_table_name} t
+        JOIN {course_tasks_table_name} ct ON t.id = ct.task_id
+        JOIN {course_cohorts_table_name} cc ON ct.course_id = cc.course_id
+        WHERE cc.cohort_id = ? AND t.deleted_at IS NULL AND t.type = '{TaskType.LEARNING_MATERIAL}' AND t.status = '{TaskStatus.PUBLISHED}' AND t.scheduled_publish_at IS NULL
+        """,
+        (cohort_id,),
+        fetch_all=True,
+    )
+
+    for user_id in user_ids:
+        for task in learning_material_tasks:
+            results[user_id][task[0]] = {
+                "is_complete": task[0] in completed_task_ids_for_user[user_id]
+            }
+
+    quiz_exam_questions = await execute_db_operation(
+        f"""
+        SELECT DISTINCT t.id as task_id, q.id as question_id
+        FROM {tasks_table_name} t
+        JOIN {course_tasks_table_name} ct ON t.id = ct.task_id
+        JOIN {course_cohorts_table_name} cc ON ct.course_id = cc.course_id
+        LEFT JOIN {questions_table_name} q ON t.id = q.task_id AND q.deleted_at IS NULL
+        WHERE cc.cohort_id = ? AND t.deleted_at IS NULL AND t.type = '{TaskType.QUIZ}' AND t.status = '{TaskStatus.PUBLISHED}' AND t.scheduled_publish_at IS NULL
+        ORDER BY t.id, q.position ASC
+        """,
+        (cohort_id,),
+        fetch_all=True,
+    )
+
+    quiz_exam_tasks = defaultdict(list)
+    for task_id, question_id in quiz_exam_questions:
+        quiz_exam_tasks[task_id].append(question_id)
+
+    for user_id in user_ids:
+        for task_id in quiz_exam_tasks:
+            is_task_complete = True
+            question_completions = []
+
+            for question_id in quiz_exam_tasks[task_id]:
+                is_question_complete = (
+                    question_id in completed_question_ids_for_user[user_id]
+                )
+                question_completions.append(
+                    {"question_id": question_id, "is_complete": is_question_complete}
+                )
+                if not is_question_complete:
+                    is_task_complete = False
+
+            results[user_id][task_id] = {
+                "is_complete": is_task_complete,
+                "questions": question_completions,
+            }
+
+    return results
+
+
+async def get_num_completed(cohort_id: int, user_ids: list):
+    completion = await get_cohort_completion(cohort_id, user_ids)
+    return completion.get_num_completed()
+
+
+async def get_all_dicts(cohort_id: int, user_ids: list):
+    completion = await get_cohort_completion(cohort_id, user_ids)
+    return dict(completion)
+
+
+async def seed(
+    num_learners: int, num_learning_material: int, num_quizzes: int, questions: int
+):
+    """
+    Create a cohort with one course of `num_learning_material` learning material
+    tasks and `num_quizzes` quizzes of `questions` questions each, where every
+    learner has completed a random half of the tasks and questions.
+    """
+    rng = random.Random(0)
+
+    org_id = await execute_db_operation(
+        "INSERT INTO organizations (slug, name) VALUES ('org', 'Org')",
+        get_last_row_id=True,
+    )
+    cohort_id = await execute_db_operation(
+        "INSERT INTO cohorts (name, org_id) VALUES ('Cohort', ?)",
+        (org_id,),
+        get_last_row_id=True,
+    )
+    course_id = await execute_db_operation(
+        "INSERT INTO courses (org_id, name) VALUES (?, 'Course')",
+        (org_id,),
+        get_last_row_id=True,
+    )
+    await execute_db_operation(
+        "INSERT INTO course_cohorts (course_id, cohort_id) VALUES (?, ?)",
+        (course_id, cohort_id),
+    )
+
+    await execute_many_db_operation(
+        "INSERT INTO users (email) VALUES (?)",
+        [(f"learner{index}@example.com",) for index in range(num_learners)],
+    )
+    user_ids = [
+        row[0]
+        for row in await execute_db_operation(
+            "SELECT id FROM users ORDER BY id", fetch_all=True
+        )
+    ]
+
+    await execute_many_db_operation(
+        "INSERT INTO tasks (org_id, type, title, status) VALUES (?, ?, 'Task', 'published')",
+        [(org_id, str(TaskType.LEARNING_MATERIAL))] * num_learning_material
+        + [(org_id, str(TaskType.QUIZ))] * num_quizzes,
+    )
+    tasks = await execute_db_operation(
+        "SELECT id, type FROM tasks ORDER BY id", fetch_all=True
+    )
+    await execute_many_db_operation(
+        "INSERT INTO course_tasks (task_id, course_id, ordering) VALUES (?, ?, ?)",
+        [(task_id, course_id, index) for index, (task_id, _) in enumerate(tasks)],
+    )
+
+    learning_material_task_ids = [
+        task_id for task_id, type in tasks if type == str(TaskType.LEARNING_MATERIAL)
+    ]
+    await execute_many_db_operation(
+        """INSERT INTO questions (task_id, type, input_type, response_type, position, is_feedback_shown, title)
+        VALUES (?, 'objective', 'text', 'chat', ?, 1, 'Question')""",
+        [
+            (task_id, position)
+            for task_id, type in tasks
+            if type == str(TaskType.QUIZ)
+            for position in range(questions)
+        ],
+    )
+    question_ids = [
+        row[0]
+        for row in await execute_db_operation(
+            "SELECT id FROM questions", fetch_all=True
+        )
+    ]
+
+    completions = []
+    for user_id in user_ids:
+        for task_id in learning_material_task_ids:
+            if rng.random() < 0.5:
+                completions.append((user_id, task_id, None))
+        for question_id in question_ids:
+            if rng.random() < 0.5:
+                completions.append((user_id, None, question_id))
+
+    await execute_many_db_operation(
+        "INSERT INTO task_completions (user_id, task_id, question_id) VALUES (?, ?, ?)",
+        completions,
+    )
+
+    return cohort_id, user_ids
+
+
+async def main(repeat: int):
+    print(
+        f"{'learners':>9} {'questions':>10} {'legacy (ms)':>12} {'counts (ms)':>12} {'dicts (ms)':>11} {'speedup':>8}"
+    )
+
+    for num_learners, num_learning_material, num_quizzes, questions in [
+        (50, 10, 10, 5),
+        (200, 20, 20, 5),
+        (500, 20, 30, 5),
+        (2000, 20, 30, 10),
+    ]:
+        async with temporary_database():
+            cohort_id, user_ids = await seed(
+                num_learners, num_learning_material, num_quizzes, questions
+            )
+
+            legacy_result = await legacy_get_cohort_completion(cohort_id, user_ids)
+            assert await get_all_dicts(cohort_id, user_ids) == dict(legacy_result)
+
+            legacy_ms = await time_async(
+                legacy_get_cohort_completion, cohort_id, user_ids, repeat=repeat
+            )
+            counts_ms = await time_async(
+                get_num_completed, cohort_id, user_ids, repeat=repeat
+            )
+            dicts_ms = await time_async(
+                get_all_dicts, cohort_id, user_ids, repeat=repeat
+            )
+
+        print(
+            f"{num_learners:>9} {num_quizzes * questions:>10} {legacy_ms:>12.2f} {counts_ms:>12.2f} {dicts_ms:>11.2f} {legacy_ms / counts_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.repeat))
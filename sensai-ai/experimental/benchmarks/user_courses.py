@@ -0,0 +1,178 @@
+"""
+Latency of get_user_courses against the number of cohorts and courses a user has
+access to, compared with the previous implementation which ran one query per
+cohort, per admin organization and per course.
+
+Usage (from the sensai-ai directory):
+    python experimental/benchmarks/user_courses.py
+"""
+
+import asyncio
+import argparse
+from utils import temporary_database, time_async
+
+from api.config import (
+    courses_table_name,
+    organizations_table_name,
+    group_role_learner,
+)
+from api.utils.db import (
+    execute_db_operation,
+    execute_many_db_operation,
+    get_new_db_connection,
+)
+from api.db.course import (
+    get_user_courses,
+    get_courses_for_cohort,
+    get_all_courses_for_org,
+    convert_course_db_to_dict,
+)
+from api.db.user import get_user_cohorts, get_user_organizations
+
+
+async def legacy_get_user_courses(user_id: int):
+    async with get_new_db_connection() as conn:
+        cursor = await conn.cursor()
+
+        user_cohorts = await get_user_cohorts(user_id)
+
+        course_roles = {}
+        course_to_cohort = {}
+
+        for cohort in user_cohorts:
+            cohort_id = cohort["id"]
+            user_role_in_cohort = cohort.get("role")
+
+            cohort_courses = await get_courses_for_cohort(cohort_id)
+            for course in cohort_courses:
+                course_id = course["id"]
+                course_to_cohort[course_id] = cohort_id
+
+                if course_id not in course_roles or course_roles[course_id] not in [
+                    "admin",
+                    "owner",
+                ]:
+                    course_roles[course_id] = user_role_in_cohort
+
+        user_orgs = await get_user_organizations(user_id)
+        admin_owner_org_ids = [
+            org["id"] for org in user_orgs if org["role"] in ["admin", "owner"]
+        ]
+
+        for org_id in admin_owner_org_ids:
+            org_courses = await get_all_courses_for_org(org_id)
+            for course in org_courses:
+                course_roles[course["id"]] = "admin"
+
+        if not course_roles:
+            return []
+
+        courses = []
+        for course_id, role in course_roles.items():
+            await cursor.execute(
+                f"SELECT c.id, c.name, o.id, o.name, o.slug FROM {courses_table_name} c JOIN {organizations_table_name} o ON c.org_id = o.id WHERE c.id = ?",
+                (course_id,),
+            )
+            course_row = await cursor.fetchone()
+            if course_row:
+                course_dict = convert_course_db_to_dict(course_row)
+                course_dict["role"] = role
+
+                if role == group_role_learner:
+                    course_dict["cohort_id"] = course_to_cohort[course_id]
+
+                courses.append(course_dict)
+
+        return courses
+
+
+async def seed(num_cohorts: int, courses_per_cohort: int, num_admin_orgs: int) -> int:
+    """Create a user who is a learner in `num_cohorts` cohorts and an admin of `num_admin_orgs` orgs."""
+    user_id = await execute_db_operation(
+        "INSERT INTO users (email) VALUES ('benchmark@example.com')",
+        get_last_row_id=True,
+    )
+
+    learner_org_id = await execute_db_operation(
+        "INSERT INTO organizations (slug, name) VALUES ('learner-org', 'Learner Org')",
+        get_last_row_id=True,
+    )
+
+    for cohort_index in range(num_cohorts):
+        cohort_id = await execute_db_operation(
+            "INSERT INTO cohorts (name, org_id) VALUES (?, ?)",
+            (f"Cohort {cohort_index}", learner_org_id),
+            get_last_row_id=True,
+        )
+        await execute_db_operation(
+            "INSERT INTO user_cohorts (user_id, cohort_id, role) VALUES (?, ?, ?)",
+            (user_id, cohort_id, group_role_learner),
+        )
+
+        course_ids = []
+        for course_index in range(courses_per_cohort):
+            course_ids.append(
+                await execute_db_operation(
+                    "INSERT INTO courses (org_id, name) VALUES (?, ?)",
+                    (learner_org_id, f"Course {cohort_index}-{course_index}"),
+                    get_last_row_id=True,
+                )
+            )
+
+        await execute_many_db_operation(
+            "INSERT INTO course_cohorts (course_id, cohort_id) VALUES (?, ?)",
+            [(course_id, cohort_id) for course_id in course_ids],
+        )
+
+    for org_index in range(num_admin_orgs):
+        org_id = await execute_db_operation(
+            "INSERT INTO organizations (slug, name) VALUES (?, ?)",
+            (f"admin-org-{org_index}", f"Admin Org {org_index}"),
+            get_last_row_id=True,
+        )
+        await execute_db_operation(
+            "INSERT INTO user_organizations (user_id, org_id, role) VALUES (?, ?, 'admin')",
+            (user_id, org_id),
+        )
+        await execute_many_db_operation(
+            "INSERT INTO courses (org_id, name) VALUES (?, ?)",
+            [(org_id, f"Admin Course {org_index}-{index}") for index in range(5)],
+        )
+
+    return user_id
+
+
+async def main(repeat: int):
+    print(
+        f"{'cohorts':>8} {'courses':>8} {'legacy (ms)':>12} {'current (ms)':>13} {'speedup':>8}"
+    )
+
+    for num_cohorts, courses_per_cohort, num_admin_orgs in [
+        (1, 1, 0),
+        (5, 2, 1),
+        (10, 5, 2),
+        (25, 5, 5),
+        (50, 10, 10),
+    ]:
+        async with temporary_database():
+            user_id = await seed(num_cohorts, courses_per_cohort, num_admin_orgs)
+
+            legacy_result = await legacy_get_user_courses(user_id)
+            assert await get_user_courses(user_id) == legacy_result
+
+            legacy_ms = await time_async(
+                legacy_get_user_courses, user_id, repeat=repeat
+            )
+            current_ms = await time_async(get_user_courses, user_id, repeat=repeat)
+
+        print(
+            f"{num_cohorts:>8} {len(legacy_result):>8} {legacy_ms:>12.2f} {current_ms:>13.2f} {legacy_ms / current_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import tempfile
+import statistics
+from contextlib import asynccontextmanager
+
+# make the backend importable when the benchmarks are run from the repo root
+src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+if src_dir not in sys.path:
+    sys.path.insert(0, os.path.abspath(src_dir))
+
+
+@asynccontextmanager
+async def temporary_database():
+    """
+    Point the backend at a freshly initialised database in a temporary directory
+    for the duration of the block.
+    """
+    import api.db
+    import api.utils.db
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "db.sqlite")
+
+        original_pool = api.utils.db.db_pool
+        original_db_path = api.db.sqlite_db_path
+
+        api.utils.db.db_pool = api.utils.db.DBConnectionPool(db_path)
+        api.utils.db.sqlite_db_path = db_path
+        api.db.sqlite_db_path = db_path
+
+        try:
+            await api.db.init_db()
+            yield api.utils.db.db_pool
+        finally:
+            await api.utils.db.db_pool.close()
+            api.utils.db.db_pool = original_pool
+            api.utils.db.sqlite_db_path = original_db_path
+            api.db.sqlite_db_path = original_db_path
+
+
+async def time_async(fn, *args, repeat: int = 20) -> float:
+    """Median wall clock time of `await fn(*args)` in milliseconds."""
+    await fn(*args)  # warm up
+
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        await fn(*args)
+        timings.append((time.perf_counter() - start_time) * 1000)
+
+    return statistics.median(timings)
@@ -21,8 +21,128 @@ if not exists(log_dir):
 
 
 sqlite_db_path = f"{data_root_dir}/db.sqlite"
+leaderboard_snapshot_path = f"{data_root_dir}/leaderboards.json"
 log_file_path = f"{log_dir}/backend.log"
 
+# SQLite only allows a single writer at a time, so the connection pool keeps
+# exactly one writer connection and a bounded number of read-only connections
+sqlite_max_read_connections = 8
+# upper bound on the number of queued writes committed together in one transaction
+sqlite_max_write_batch_size = 100
+# every queued write waits while the writer connection is leased, so a lease held
+# longer than this is logged (and counted in /health/db)
+sqlite_writer_lease_warning_seconds = 5
+sqlite_connection_pragmas = [
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -64000;",  # 64 MB page cache per connection
+    "PRAGMA mmap_size = 268435456;",  # 256 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA busy_timeout = 5000;",
+]
+# statements slower than this are sampled for /health/db/queries
+sqlite_slow_query_threshold_ms = 200
+sqlite_slow_query_sample_size = 100
+# distinct query fingerprints kept in /health/db/queries, least recently run evicted first
+sqlite_query_stats_max_fingerprints = 1000
+
+# number of published course trees kept in memory for learners
+course_tree_cache_max_size = 500
+
+# OpenAI clients are cached per API key and all share one HTTP connection pool
+openai_max_clients = 32
+openai_max_connections = 100
+openai_max_keepalive_connections = 20
+openai_keepalive_expiry = 120  # seconds an idle connection is kept open
+openai_http2 = True
+
+# routing decisions (reasoning vs general model) are cached per question / task
+routing_decision_cache_max_size = 10000
+# decide the model for every question as soon as a quiz is saved
+precompute_routing_decisions_on_publish = True
+
+# blocking S3 / filesystem calls run on a bounded thread pool of this size
+storage_max_workers = 16
+storage_stream_chunk_size = 1024 * 1024  # bytes
+
+# LLM calls for generating courses run in a sliding window of at most this many at
+# once, which shrinks when the provider rate limits or slows down and grows back after
+llm_max_concurrency = 50
+llm_min_concurrency = 2
+# calls of a single org in flight at once, so that one org cannot take every slot
+llm_org_max_concurrency = 25
+# a call that takes longer than this many seconds shrinks the window by one
+llm_latency_target = 180
+
+# generation jobs are leased from the job queue for this many seconds, and the lease
+# of a running job is renewed every job_heartbeat_interval seconds
+job_lease_seconds = 300
+job_heartbeat_interval = 60
+# a failed job is retried after an exponential backoff up to this many attempts
+job_max_attempts = 3
+job_retry_base_delay = 30
+job_retry_max_delay = 1800
+# jobs run by a worker at once; the LLM limiter can lower this while it backs off
+job_worker_concurrency = 50
+# seconds between checks for new jobs when nothing wakes up the worker
+job_poll_interval = 5
+# completed and failed jobs are kept in the queue for this many days
+job_retention_days = 7
+# course structures are generated before the tasks of any course
+course_structure_job_priority = 1
+task_generation_job_priority = 0
+
+# updates of a course being generated are queued for each of its viewers up to this
+# many messages (more than the updates sent in one batch while a course structure is
+# streamed in); past that, its queued progress updates are dropped first and then the
+# viewer is disconnected
+websocket_send_queue_size = 1000
+# a viewer that takes longer than this many seconds to receive a message is disconnected
+websocket_send_timeout = 10
+# with the sqlite event bus, websocket updates are passed between processes through a
+# table that every API process polls this often (in seconds), reading up to
+# websocket_event_batch_size updates at a time
+websocket_event_poll_interval = 0.2
+websocket_event_batch_size = 500
+# updates are deleted from the table after this many seconds
+websocket_event_retention_seconds = 600
+
+# base64 payloads of learners' audio answers are cached up to this many bytes in total
+audio_payload_cache_max_bytes = 256 * 1024 * 1024
+# number of audio files fetched at once when building an audio chat history
+audio_fetch_concurrency = 8
+
+# Google's signing certs are refetched once the max-age in their Cache-Control header
+# runs out, or after this many seconds if the response has no max-age
+google_certs_default_max_age = 300
+# verified Google ID tokens are remembered until they expire
+google_verified_token_cache_max_size = 10000
+
+# number of cohort leaderboards kept in memory and updated as learners make progress
+leaderboard_max_cohorts = 200
+
+# org-wide chat history is read (and streamed) this many messages at a time
+chat_history_page_size = 1000
+chat_history_max_page_size = 10000
+
+# learners' conversations on quiz questions kept in memory, formatted for the prompt
+conversation_cache_max_size = 5000
+
+# the conversation history sent to the AI is kept within this many tokens by
+# replacing all but its most recent turns with a rolling summary
+chat_context_token_budget = 8000
+chat_context_verbatim_turns = 4
+# turns that drop out of the recent window are summarized this many at a time
+chat_context_summary_batch_turns = 3
+chat_context_summary_max_tokens = 1024
+conversation_summary_cache_max_size = 5000
+# only the most recent answers of an audio conversation are sent as audio
+chat_context_audio_turns = 2
+
+# system prompt and task details of the AI's chat prompt, built once per question
+prompt_prefix_cache_max_size = 5000
+# rendered descriptions of questions, answers and learning material
+block_description_cache_max_size = 10000
+
 chat_history_table_name = "chat_history"
 tasks_table_name = "tasks"
 questions_table_name = "questions"
@@ -54,6 +174,9 @@ course_generation_jobs_table_name = "course_generation_jobs"
 task_generation_jobs_table_name = "task_generation_jobs"
 org_api_keys_table_name = "org_api_keys"
 code_drafts_table_name = "code_drafts"
+user_daily_activity_table_name = "user_daily_activity"
+job_queue_table_name = "job_queue"
+websocket_events_table_name = "websocket_events"
 
 UPLOAD_FOLDER_NAME = "uploads"
 
@@ -0,0 +1,260 @@
+import importlib.util
+import math
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from pydantic import BaseModel, Field
+from api.config import (
+    openai_plan_to_model_name,
+    chat_context_token_budget,
+    chat_context_verbatim_turns,
+    chat_context_summary_batch_turns,
+    chat_context_summary_max_tokens,
+    conversation_summary_cache_max_size,
+)
+from api.llm import run_llm_with_instructor
+from api.model_router import get_content_hash
+from api.settings import settings
+from api.utils.logging import logger
+
+# fallback estimate when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+# role and separators around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+# 16 kHz 16-bit mono audio is roughly 10 tokens a second
+AUDIO_BYTES_PER_TOKEN = 3200
+
+# stands in for answers older than the ones that are still sent as audio
+AUDIO_RESPONSE_PLACEHOLDER = "(audio response; see the feedback that follows)"
+
+
+class SummaryOutput(BaseModel):
+    summary: str = Field(
+        description="The updated summary of the conversation so far, written as brief notes"
+    )
+
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a student and an AI tutor about a single task, so that the tutor can keep helping the student without seeing the older messages.\n\nYou will receive:\n- The summary of the conversation so far (empty at the start)\n- The messages that came after it\n\nReturn the updated summary. Keep every detail the tutor needs to continue: the approaches and answers the student has tried, what was right and wrong in each, the hints and questions the tutor has already given, scores from any scorecards and anything the student is still stuck on. Never drop details from the previous summary unless a later message supersedes them. Be crisp and write brief notes, not prose."""
+
+_encoding = None
+_encoding_loaded = False
+
+
+def get_encoding():
+    global _encoding, _encoding_loaded
+
+    if not _encoding_loaded:
+        _encoding_loaded = True
+
+        if importlib.util.find_spec("tiktoken") is not None:
+            import tiktoken
+
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as exception:
+                logger.warning(f"Could not load tiktoken encoding: {exception}")
+
+    return _encoding
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = get_encoding()
+
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: Dict) -> int:
+    content = message["content"]
+
+    if isinstance(content, str):
+        return count_text_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    for part in content:
+        if part["type"] == "input_audio":
+            # base64 is 4 characters for every 3 bytes
+            tokens += len(part["input_audio"]["data"]) * 3 // 4 // AUDIO_BYTES_PER_TOKEN
+        else:
+            tokens += count_text_tokens(part["text"])
+
+    return tokens
+
+
+def count_tokens(messages: List[Dict]) -> int:
+    return sum(count_message_tokens(message) for message in messages)
+
+
+def get_text_content(message: Dict) -> str:
+    if isinstance(message["content"], str):
+        return message["content"]
+
+    return "\n".join(
+        (AUDIO_RESPONSE_PLACEHOLDER if part["type"] == "input_audio" else part["text"])
+        for part in message["content"]
+    )
+
+
+def get_transcript(messages: List[Dict]) -> str:
+    return "\n\n".join(
+        f"{'Student' if message['role'] == 'user' else 'Tutor'}:\n{get_text_content(message)}"
+        for message in messages
+    )
+
+
+class ConversationSummaryCache:
+    """
+    Rolling summaries of the older part of learners' conversations, keyed by chat
+    session. Each summary remembers how many messages it covers and their hash, so
+    it is only extended with the messages that have since dropped out of the recent
+    window, and it is ignored (and rebuilt) once the messages it covered change.
+    """
+
+    def __init__(self, max_size: int = conversation_summary_cache_max_size):
+        self.max_size = max_size
+        self._summaries: OrderedDict[str, Tuple[int, str, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, messages: List[Dict]) -> Tuple[int, str]:
+        """
+        Return the number of leading `messages` already summarized and their summary,
+        or (0, "") if nothing is cached for them.
+        """
+        entry = self._summaries.get(key)
+
+        if (
+            entry is None
+            or entry[0] > len(messages)
+            or entry[1] != get_content_hash(get_transcript(messages[: entry[0]]))
+        ):
+            self.misses += 1
+            return 0, ""
+
+        self.hits += 1
+        self._summaries.move_to_end(key)
+        return entry[0], entry[2]
+
+    def set(self, key: str, messages: List[Dict], summary: str):
+        self._summaries[key] = (
+            len(messages),
+            get_content_hash(get_transcript(messages)),
+            summary,
+        )
+        self._summaries.move_to_end(key)
+
+        while len(self._summaries) > self.max_size:
+            self._summaries.popitem(last=False)
+
+    def clear(self):
+        self._summaries.clear()
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._summaries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+conversation_summaries = ConversationSummaryCache()
+
+
+async def summarize_messages(summary: str, messages: List[Dict]) -> str:
+    output = await run_llm_with_instructor(
+        api_key=settings.openai_api_key,
+        model=openai_plan_to_model_name["text-mini"],
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"""Summary so far:\n```\n{summary}\n```\n\nNew messages:\n```\n{get_transcript(messages)}\n```""",
+            },
+        ],
+        response_model=SummaryOutput,
+        max_completion_tokens=chat_context_summary_max_tokens,
+    )
+
+    return output.summary
+
+
+def get_summary_message(summary: str) -> Dict:
+    return {
+        "role": "user",
+        "content": f"""Summary of the earlier conversation with the student:\n```\n{summary}\n```""",
+    }
+
+
+async def build_chat_context(
+    chat_history: List[Dict],
+    session_id: str,
+    token_budget: int = chat_context_token_budget,
+) -> Tuple[List[Dict], Dict]:
+    """
+    Fit the conversation history sent to the AI within `token_budget` tokens. A
+    history over the budget keeps its last few turns as they are (fewer if even
+    those are over the budget) and replaces everything before them with a rolling
+    summary, which is extended every few turns rather than rebuilt.
+
+    Returns the messages to send and the token counts before and after, to be
+    added to the trace metadata.
+    """
+    message_tokens = [count_message_tokens(message) for message in chat_history]
+    tokens_before = sum(message_tokens)
+
+    if tokens_before <= token_budget:
+        return chat_history, {
+            "context_tokens_before": tokens_before,
+            "context_tokens_after": tokens_before,
+            "context_summarized_messages": 0,
+        }
+
+    # a turn is a learner's message and the AI's response to it
+    num_recent = min(len(chat_history), 2 * chat_context_verbatim_turns)
+    while num_recent > 2 and sum(message_tokens[-num_recent:]) > token_budget:
+        num_recent -= 2
+
+    num_summarized, summary = conversation_summaries.get(session_id, chat_history)
+    # never send a message both in the summary and as it is
+    split = max(len(chat_history) - num_recent, num_summarized)
+
+    if split - num_summarized < 2 * chat_context_summary_batch_turns and (
+        sum(message_tokens[num_summarized:]) + count_text_tokens(summary)
+        <= token_budget
+    ):
+        # not worth summarizing yet, so keep the few messages since the summary too
+        split = num_summarized
+    elif split > num_summarized:
+        try:
+            summary = await summarize_messages(
+                summary, chat_history[num_summarized:split]
+            )
+            conversation_summaries.set(session_id, chat_history[:split], summary)
+        except Exception as exception:
+            # send the recent messages alone rather than fail the response
+            logger.error(f"Error summarizing conversation {session_id}: {exception}")
+            summary = ""
+
+    context = chat_history[split:]
+    if summary:
+        context = [get_summary_message(summary)] + context
+
+    return context, {
+        "context_tokens_before": tokens_before,
+        "context_tokens_after": count_tokens(context),
+        "context_summarized_messages": split if summary else 0,
+    }
+
+
+def get_prompt_cache_metadata(usage: Dict) -> Dict:
+    """Trace metadata on how many of the prompt's tokens the provider had cached."""
+    if not usage.get("prompt_tokens"):
+        return {}
+
+    return {
+        "prompt_tokens": usage["prompt_tokens"],
+        "cached_prompt_tokens": usage["cached_tokens"],
+        "cached_token_ratio": round(usage["cached_tokens"] / usage["prompt_tokens"], 4),
+    }
@@ -0,0 +1,234 @@
+import asyncio
+import random
+from typing import Dict, List, Tuple
+from api.db.course import add_generated_course_items
+from api.models import TaskType
+from api.websockets import get_manager
+from api.utils.logging import logger
+
+MODULE_COLORS = [
+    "#2d3748",  # Slate blue
+    "#433c4c",  # Deep purple
+    "#4a5568",  # Cool gray
+    "#312e51",  # Indigo
+    "#364135",  # Forest green
+    "#4c393a",  # Burgundy
+    "#334155",  # Navy blue
+    "#553c2d",  # Rust brown
+    "#37303f",  # Plum
+    "#3c4b64",  # Steel blue
+    "#463c46",  # Mauve
+    "#3c322d",  # Coffee
+]
+
+
+class CourseStructureWriter:
+    """
+    Adds the modules and draft tasks of a course structure to the course while the
+    structure streams in from the AI.
+
+    `update` is called with every partial structure and only diffs it against what
+    has been seen so far, without waiting on anything, so reading the stream is
+    never held up by the database. A module is added once its concepts start (by
+    when its name is complete) and a task once it has a valid type. A single
+    background task adds everything seen since its last write in one transaction
+    and then sends the websocket events for the batch together, so a slow write
+    only makes the next batch bigger.
+
+    Use as an async context manager; leaving it waits for the remaining items to
+    be added and raises if any write failed. Everything added is recorded in the
+    course generation job `job_uuid`, if given, for a retry of the job to remove.
+    """
+
+    def __init__(self, course_id: int, job_uuid: str = None):
+        self.course_id = course_id
+        self.job_uuid = job_uuid
+        # ids of the modules and tasks added so far, keyed by their position in
+        # the structure: module index and (module, concept, task) indices
+        self.module_ids: Dict[int, int] = {}
+        self.task_ids: Dict[Tuple[int, int, int], int] = {}
+        self.num_batches = 0
+        self._seen_modules = set()
+        self._seen_tasks = set()
+        # modules and concepts before this (module, concept) position are complete
+        self._position = (0, 0)
+        self._pending_modules: List[Tuple[int, Dict]] = []
+        self._pending_tasks: List[Tuple[Tuple[int, int, int], Dict]] = []
+        self._has_pending = None
+        self._closed = False
+        self._writer = None
+        self._error = None
+
+    async def __aenter__(self):
+        self._has_pending = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_batches())
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self._closed = True
+        self._has_pending.set()
+        await self._writer
+
+        if self._error is not None and exc_type is None:
+            raise self._error
+
+    def update(self, modules: List) -> None:
+        """Queue the modules and tasks of the partial structure not seen before."""
+        if self._error is not None:
+            # stop reading the stream as nothing more can be added
+            raise self._error
+
+        start_module, start_concept = self._position
+
+        for module_index in range(start_module, len(modules)):
+            module = modules[module_index]
+            if not module or not module.name or not module.concepts:
+                continue
+
+            if module_index not in self._seen_modules:
+                self._seen_modules.add(module_index)
+                self._pending_modules.append(
+                    (
+                        module_index,
+                        {"name": module.name, "color": random.choice(MODULE_COLORS)},
+                    )
+                )
+
+            first_concept = start_concept if module_index == start_module else 0
+            for concept_index in range(first_concept, len(module.concepts)):
+                concept = module.concepts[concept_index]
+                if not concept or not concept.tasks:
+                    continue
+
+                self._position = (module_index, concept_index)
+
+                for task_index, task in enumerate(concept.tasks):
+                    key = (module_index, concept_index, task_index)
+
+                    if (
+                        key in self._seen_tasks
+                        or not task
+                        or not task.name
+                        or not task.type
+                        or task.type not in [TaskType.LEARNING_MATERIAL, TaskType.QUIZ]
+                    ):
+                        continue
+
+                    self._seen_tasks.add(key)
+                    self._pending_tasks.append(
+                        (key, {"name": task.name, "type": task.type})
+                    )
+
+        if self._pending_modules or self._pending_tasks:
+            self._has_pending.set()
+
+    async def _write_batches(self):
+        while True:
+            await self._has_pending.wait()
+            self._has_pending.clear()
+
+            if self._pending_modules or self._pending_tasks:
+                modules, self._pending_modules = self._pending_modules, []
+                tasks, self._pending_tasks = self._pending_tasks, []
+
+                try:
+                    await self._write_batch(modules, tasks)
+                except Exception as exception:
+                    logger.error(
+                        f"Error adding the generated structure of course {self.course_id}: {exception}"
+                    )
+                    self._error = exception
+                    return
+
+            if self._closed and not (self._pending_modules or self._pending_tasks):
+                return
+
+    async def _write_batch(
+        self,
+        modules: List[Tuple[int, Dict]],
+        tasks: List[Tuple[Tuple[int, int, int], Dict]],
+    ):
+        batch_module_indices = {
+            module_index: position for position, (module_index, _) in enumerate(modules)
+        }
+
+        task_rows = []
+        for (module_index, _, _), task in tasks:
+            if module_index in self.module_ids:
+                task_rows.append(
+                    {**task, "milestone_id": self.module_ids[module_index]}
+                )
+            else:
+                task_rows.append(
+                    {**task, "module_index": batch_module_indices[module_index]}
+                )
+
+        module_rows, added_task_rows = await add_generated_course_items(
+            self.course_id,
+            [module for _, module in modules],
+            task_rows,
+            self.job_uuid,
+        )
+        self.num_batches += 1
+
+        events = []
+
+        for (module_index, module), (module_id, ordering) in zip(modules, module_rows):
+            self.module_ids[module_index] = module_id
+            events.append(
+                {
+                    "event": "module_created",
+                    "module": {
+                        "id": module_id,
+                        "name": module["name"],
+                        "color": module["color"],
+                        "ordering": ordering,
+                    },
+                }
+            )
+
+        for (key, task), (task_id, ordering) in zip(tasks, added_task_rows):
+            self.task_ids[key] = task_id
+            events.append(
+                {
+                    "event": "task_created",
+                    "task": {
+                        "id": task_id,
+                        "module_id": self.module_ids[key[0]],
+                        "ordering": ordering,
+                        "type": str(task["type"]),
+                        "name": task["name"],
+                    },
+                }
+            )
+
+        await get_manager().send_item_updates(self.course_id, events)
+
+    def add_ids(self, structure: Dict) -> Dict:
+        """
+        Set the ids of the modules and tasks added for the final structure, dropping
+        the ones that were never added (e.g. tasks of an unknown type).
+        """
+        modules = []
+
+        for module_index, module in enumerate(structure["modules"]):
+            if module_index not in self.module_ids:
+                continue
+
+            module["id"] = self.module_ids[module_index]
+
+            for concept_index, concept in enumerate(module["concepts"]):
+                tasks = []
+
+                for task_index, task in enumerate(concept["tasks"]):
+                    key = (module_index, concept_index, task_index)
+                    if key in self.task_ids:
+                        task["id"] = self.task_ids[key]
+                        tasks.append(task)
+
+                concept["tasks"] = tasks
+
+            modules.append(module)
+
+        structure["modules"] = modules
+        return structure
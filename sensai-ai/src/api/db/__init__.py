@@ -27,7 +27,12 @@ from api.config import (
     task_generation_jobs_table_name,
     org_api_keys_table_name,
     code_drafts_table_name,
+    user_daily_activity_table_name,
+    job_queue_table_name,
+    websocket_events_table_name,
 )
+from api.db.activity import backfill_user_daily_activity
+from api.db.job_queue import enqueue_started_generation_jobs
 
 
 async def create_organizations_table(cursor):
@@ -366,6 +371,15 @@ async def create_chat_history_table(cursor):
         f"""CREATE INDEX idx_chat_history_question_id ON {chat_history_table_name} (question_id)"""
     )
 
+    await create_chat_history_conversation_index(cursor)
+
+
+async def create_chat_history_conversation_index(cursor):
+    # for reading a learner's conversation on a question after a given message
+    await cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_chat_history_question_id_user_id_id ON {chat_history_table_name} (question_id, user_id, id)"""
+    )
+
 
 async def create_task_completion_table(cursor):
     await cursor.execute(
@@ -462,6 +476,78 @@ async def create_code_drafts_table(cursor):
     )
 
 
+async def create_user_daily_activity_table(cursor):
+    await cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {user_daily_activity_table_name} (
+                user_id INTEGER NOT NULL,
+                cohort_id INTEGER NOT NULL,
+                ist_date TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                completion_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, cohort_id, ist_date),
+                FOREIGN KEY (user_id) REFERENCES {users_table_name}(id) ON DELETE CASCADE
+            )"""
+    )
+
+    # for cohort-wide streaks and leaderboards over a date range
+    await cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_user_daily_activity_cohort_id_ist_date ON {user_daily_activity_table_name} (cohort_id, ist_date)"""
+    )
+
+
+async def create_job_queue_table(cursor):
+    await cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {job_queue_table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                job_uuid TEXT NOT NULL,
+                org_id INTEGER,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                lease_owner TEXT,
+                lease_expires_at DATETIME,
+                last_error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )"""
+    )
+
+    # for leasing the next jobs to run
+    await cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_job_queue_status_priority ON {job_queue_table_name} (status, priority, id)"""
+    )
+
+    # for counting the jobs each org already has running
+    await cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_job_queue_org_id_status ON {job_queue_table_name} (org_id, status)"""
+    )
+
+    await cursor.execute(
+        f"""CREATE INDEX IF NOT EXISTS idx_job_queue_job_uuid ON {job_queue_table_name} (job_uuid)"""
+    )
+
+
+async def create_websocket_events_table(cursor):
+    # websocket updates (with their course_id) and cache invalidations (without one,
+    # but with the bus that published them as origin) passed between processes by
+    # the sqlite event bus; they are only kept for a few minutes, so the table stays
+    # small enough to go without an index on created_at
+    await cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {websocket_events_table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER,
+                payload TEXT NOT NULL,
+                coalesce_key TEXT,
+                droppable BOOLEAN NOT NULL DEFAULT 0,
+                origin TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )"""
+    )
+
+
 async def init_db():
     # Ensure the database folder exists
     db_folder = os.path.dirname(sqlite_db_path)
@@ -483,7 +569,29 @@ async def init_db():
             if not await check_table_exists(code_drafts_table_name, cursor):
                 await create_code_drafts_table(cursor)
 
+            await create_chat_history_conversation_index(cursor)
+
+            needs_activity_backfill = not await check_table_exists(
+                user_daily_activity_table_name, cursor
+            )
+            if needs_activity_backfill:
+                await create_user_daily_activity_table(cursor)
+
+            if not await check_table_exists(job_queue_table_name, cursor):
+                await create_job_queue_table(cursor)
+                # generation jobs used to be resumed on startup, so queue the
+                # interrupted ones to be picked up by the workers instead
+                await enqueue_started_generation_jobs(cursor)
+
+            if not await check_table_exists(websocket_events_table_name, cursor):
+                await create_websocket_events_table(cursor)
+
+            if needs_activity_backfill:
+                # joins the transaction of the connection held here
+                await backfill_user_daily_activity()
+
             await conn.commit()
+
             return
 
         try:
@@ -525,6 +633,12 @@ async def init_db():
 
             await create_code_drafts_table(cursor)
 
+            await create_user_daily_activity_table(cursor)
+
+            await create_job_queue_table(cursor)
+
+            await create_websocket_events_table(cursor)
+
             await conn.commit()
 
         except Exception as exception:
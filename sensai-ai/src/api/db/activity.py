@@ -0,0 +1,188 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, Tuple
+from api.config import (
+    user_daily_activity_table_name,
+    chat_history_table_name,
+    task_completions_table_name,
+    questions_table_name,
+    course_tasks_table_name,
+    course_cohorts_table_name,
+)
+from api.utils.db import execute_write_transaction
+
+# rows with this cohort id hold a user's activity across all cohorts (and outside of
+# any cohort), so that totals do not double count tasks shared between cohorts
+ALL_COHORTS = 0
+
+# dates are stored in IST as that is when a learner's day starts and ends
+IST_DATE = "DATE(datetime({}, '+5 hours', '+30 minutes'))"
+
+
+async def record_user_activity(
+    cursor,
+    user_id: int,
+    task_id: int = None,
+    question_id: int = None,
+    created_at: datetime = None,
+    message_count: int = 0,
+    completion_count: int = 0,
+):
+    """
+    Add to the user's activity on the IST date of `created_at` (now if not given)
+    for every cohort the task (or the question's task) is part of. Meant to be run
+    in the same transaction as the write that the activity comes from.
+
+    Returns the (cohort id, IST date) rows that were added to.
+    """
+    await cursor.execute(
+        f"""
+        INSERT INTO {user_daily_activity_table_name} (user_id, cohort_id, ist_date, message_count, completion_count)
+        SELECT ?, cohort_id, {IST_DATE.format("COALESCE(?, CURRENT_TIMESTAMP)")}, ?, ?
+        FROM (
+            SELECT {ALL_COHORTS} AS cohort_id
+            UNION
+            SELECT cc.cohort_id
+            FROM {course_tasks_table_name} ct
+            JOIN {course_cohorts_table_name} cc ON cc.course_id = ct.course_id
+            WHERE ct.task_id = COALESCE(?, (SELECT task_id FROM {questions_table_name} WHERE id = ?))
+        )
+        WHERE true
+        ON CONFLICT (user_id, cohort_id, ist_date) DO UPDATE SET
+            message_count = message_count + excluded.message_count,
+            completion_count = completion_count + excluded.completion_count
+        RETURNING cohort_id, ist_date
+        """,
+        (
+            user_id,
+            created_at,
+            message_count,
+            completion_count,
+            task_id,
+            question_id,
+        ),
+    )
+
+    return await cursor.fetchall()
+
+
+async def rebuild_user_activity(
+    cursor,
+    user_id: int = None,
+    ist_dates: Iterable[str] = None,
+    cohort_ids: Iterable[int] = None,
+):
+    """
+    Recompute the activity rollup from the chat history and task completions, for
+    the given IST dates of a user, for the given cohorts or, if neither is given,
+    for everyone. Meant to be run in the same transaction as the deletes (or the
+    changes to the courses of the cohorts) that the rollup has to catch up with.
+    """
+    chat_date = IST_DATE.format("ch.created_at")
+    completion_date = IST_DATE.format("tc.created_at")
+    cohort_filter = all_cohorts_filter = "true"
+
+    if cohort_ids is not None:
+        cohort_ids_query = "(SELECT value FROM json_each(:cohort_ids))"
+        chat_filter = completion_filter = "true"
+        cohort_filter = f"cc.cohort_id IN {cohort_ids_query}"
+        # activity across all cohorts does not depend on the courses of any of them
+        all_cohorts_filter = "false"
+        params = {"cohort_ids": json.dumps(list(cohort_ids))}
+
+        await cursor.execute(
+            f"DELETE FROM {user_daily_activity_table_name} WHERE cohort_id IN {cohort_ids_query}",
+            params,
+        )
+    elif user_id is None:
+        chat_filter = completion_filter = "true"
+        params = {}
+
+        await cursor.execute(f"DELETE FROM {user_daily_activity_table_name}")
+    else:
+        ist_dates_query = "(SELECT value FROM json_each(:ist_dates))"
+        chat_filter = f"ch.user_id = :user_id AND {chat_date} IN {ist_dates_query}"
+        completion_filter = (
+            f"tc.user_id = :user_id AND {completion_date} IN {ist_dates_query}"
+        )
+        params = {"user_id": user_id, "ist_dates": json.dumps(list(ist_dates))}
+
+        await cursor.execute(
+            f"DELETE FROM {user_daily_activity_table_name} WHERE user_id = :user_id AND ist_date IN {ist_dates_query}",
+            params,
+        )
+
+    await cursor.execute(
+        f"""
+        WITH chat_cohorts AS (
+            SELECT DISTINCT ch.id, ch.user_id, ch.role, ch.created_at, cc.cohort_id
+            FROM {chat_history_table_name} ch
+            JOIN {questions_table_name} q ON q.id = ch.question_id
+            JOIN {course_tasks_table_name} ct ON ct.task_id = q.task_id
+            JOIN {course_cohorts_table_name} cc ON cc.course_id = ct.course_id
+            WHERE {chat_filter} AND {cohort_filter}
+        ),
+        completion_cohorts AS (
+            SELECT DISTINCT tc.id, tc.user_id, tc.created_at, cc.cohort_id
+            FROM {task_completions_table_name} tc
+            LEFT JOIN {questions_table_name} q ON q.id = tc.question_id
+            JOIN {course_tasks_table_name} ct ON ct.task_id = COALESCE(tc.task_id, q.task_id)
+            JOIN {course_cohorts_table_name} cc ON cc.course_id = ct.course_id
+            WHERE {completion_filter} AND {cohort_filter}
+        ),
+        activity AS (
+            SELECT ch.user_id, ch.cohort_id, {chat_date} AS ist_date, ch.role = 'user' AS message_count, 0 AS completion_count
+            FROM chat_cohorts ch
+            UNION ALL
+            SELECT ch.user_id, {ALL_COHORTS}, {chat_date}, ch.role = 'user', 0
+            FROM {chat_history_table_name} ch
+            WHERE {chat_filter} AND {all_cohorts_filter}
+            UNION ALL
+            SELECT tc.user_id, tc.cohort_id, {completion_date}, 0, 1
+            FROM completion_cohorts tc
+            UNION ALL
+            SELECT tc.user_id, {ALL_COHORTS}, {completion_date}, 0, 1
+            FROM {task_completions_table_name} tc
+            WHERE {completion_filter} AND {all_cohorts_filter}
+        )
+        INSERT INTO {user_daily_activity_table_name} (user_id, cohort_id, ist_date, message_count, completion_count)
+        SELECT user_id, cohort_id, ist_date, SUM(message_count), SUM(completion_count)
+        FROM activity
+        GROUP BY user_id, cohort_id, ist_date
+        """,
+        params,
+    )
+
+
+async def delete_chat_messages(cursor, condition: str, params: Tuple) -> List[int]:
+    """
+    Delete the chat messages matching `condition` and take them out of the activity
+    rollup, in the same transaction. Returns the ids of the users they belonged to.
+    """
+    await cursor.execute(
+        f"SELECT DISTINCT user_id, {IST_DATE.format('created_at')} FROM {chat_history_table_name} WHERE {condition}",
+        params,
+    )
+
+    ist_dates_by_user = defaultdict(list)
+    for user_id, ist_date in await cursor.fetchall():
+        ist_dates_by_user[user_id].append(ist_date)
+
+    await cursor.execute(
+        f"DELETE FROM {chat_history_table_name} WHERE {condition}", params
+    )
+
+    for user_id, ist_dates in ist_dates_by_user.items():
+        await rebuild_user_activity(cursor, user_id, ist_dates)
+
+    return list(ist_dates_by_user)
+
+
+async def backfill_user_daily_activity():
+    """
+    Rebuild the activity rollup from the full chat history and task completions.
+    Only needed once when the rollup is first created, as the rollup of a cohort is
+    rebuilt whenever courses are added to or removed from it.
+    """
+    await execute_write_transaction(rebuild_user_activity)
@@ -1,5 +1,10 @@
-from typing import Dict, List, Optional
+import asyncio
+import itertools
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
 from collections import defaultdict
+from collections.abc import Mapping
+import numpy as np
 from api.utils.db import execute_db_operation
 from api.config import (
     chat_history_table_name,
@@ -11,9 +16,13 @@ from api.config import (
     course_cohorts_table_name,
     users_table_name,
     user_cohorts_table_name,
+    user_daily_activity_table_name,
 )
 from api.models import LeaderboardViewType, TaskType, TaskStatus
 from api.db.user import get_user_streak_from_usage_dates
+from api.db.course import get_published_course_tree
+from api.db.course_tree_cache import course_tree_cache
+from api.db.leaderboard import CohortLeaderboard, leaderboards
 
 
 async def get_usage_summary_by_organization(
@@ -64,144 +73,219 @@ async def get_usage_summary_by_organization(
     ]
 
 
-async def get_cohort_completion(
-    cohort_id: int, user_ids: List[int], course_id: int = None
-):
-    """
-    Retrieves completion data for a user in a specific cohort.
+def get_positions(ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Position of each of `values` in `ids` (which need not be sorted), or -1 where missing."""
+    if not len(ids) or not len(values):
+        return np.full(len(values), -1)
 
-    Args:
-        cohort_id: The ID of the cohort
-        user_ids: The IDs of the users
-        course_id: The ID of the course (optional, if not provided, all courses in the cohort will be considered)
+    order = np.argsort(ids, kind="stable")
+    positions = np.minimum(np.searchsorted(ids, values, sorter=order), len(ids) - 1)
+    positions = order[positions]
 
-    Returns:
-        A dictionary mapping task IDs to their completion status:
+    return np.where(ids[positions] == values, positions, -1)
+
+
+class CohortCompletion(Mapping):
+    """
+    Task completion of a set of users, held as boolean (users x tasks) and
+    (users x questions) matrices in the order of `user_ids` and `task_ids`.
+
+    Counts can be read straight off the matrices with `get_num_completed`. It is
+    also a mapping from user id to the per-task dict that `get_cohort_completion`
+    has always returned, which is only built for the users it is asked for:
         {
             task_id: {
                 "is_complete": bool,
                 "questions": [{"question_id": int, "is_complete": bool}]
             }
         }
+    where "questions" is only present for quizzes.
     """
-    results = defaultdict(dict)
 
-    # user_in_cohort = await is_user_in_cohort(user_id, cohort_id)
-    # if not user_in_cohort:
-    #     results[user_id] = {}
-    #     continue
+    def __init__(
+        self,
+        user_ids: List[int],
+        task_rows: List[Tuple[int, str, int | None]],
+        completion_rows: List[Tuple[int, int, int]],
+    ):
+        """
+        `task_rows` are (task id, task type, question id) rows with quiz questions in
+        order and the question id None for learning material (and for quizzes
+        without questions). `completion_rows` are (user id, task id, question id)
+        rows from task_completions with -1 in place of NULLs.
+        """
+        self.user_ids = list(user_ids)
 
-    # Get completed tasks for the users from task_completions_table
-    completed_tasks = await execute_db_operation(
-        f"""
-        SELECT user_id, task_id 
-        FROM {task_completions_table_name}
-        WHERE user_id in ({','.join(map(str, user_ids))}) AND task_id IS NOT NULL
-        """,
-        fetch_all=True,
-    )
-    completed_task_ids_for_user = defaultdict(set)
-    for user_id, task_id in completed_tasks:
-        completed_task_ids_for_user[user_id].add(task_id)
+        learning_material_task_ids = []
+        self.quiz_task_ids = []
+        self.question_ids = []
+        quiz_starts = []
 
-    # Get completed questions for the users from task_completions_table
-    completed_questions = await execute_db_operation(
-        f"""
-        SELECT user_id, question_id 
-        FROM {task_completions_table_name}
-        WHERE user_id in ({','.join(map(str, user_ids))}) AND question_id IS NOT NULL
-        """,
-        fetch_all=True,
-    )
-    completed_question_ids_for_user = defaultdict(set)
-    for user_id, question_id in completed_questions:
-        completed_question_ids_for_user[user_id].add(question_id)
+        for task_id, task_type, question_id in task_rows:
+            if task_type == str(TaskType.LEARNING_MATERIAL):
+                learning_material_task_ids.append(task_id)
+                continue
 
-    # Get all tasks for the cohort
-    # Get learning material tasks
-    query = f"""
-        SELECT DISTINCT t.id
-        FROM {tasks_table_name} t
-        JOIN {course_tasks_table_name} ct ON t.id = ct.task_id
-        JOIN {course_cohorts_table_name} cc ON ct.course_id = cc.course_id
-        WHERE cc.cohort_id = ? AND t.deleted_at IS NULL AND t.type = '{TaskType.LEARNING_MATERIAL}' AND t.status = '{TaskStatus.PUBLISHED}' AND t.scheduled_publish_at IS NULL
-        """
-    params = (cohort_id,)
+            if not self.quiz_task_ids or self.quiz_task_ids[-1] != task_id:
+                self.quiz_task_ids.append(task_id)
+                quiz_starts.append(len(self.question_ids))
 
-    if course_id is not None:
-        query += " AND ct.course_id = ?"
-        params += (course_id,)
+            self.question_ids.append(question_id)
 
-    learning_material_tasks = await execute_db_operation(
-        query,
-        params,
-        fetch_all=True,
-    )
+        self.task_ids = learning_material_task_ids + self.quiz_task_ids
+
+        completions = np.fromiter(
+            itertools.chain.from_iterable(completion_rows),
+            dtype=np.int64,
+            count=len(completion_rows) * 3,
+        ).reshape(-1, 3)
+        user_positions = get_positions(np.array(self.user_ids), completions[:, 0])
+
+        completed_learning_material = np.zeros(
+            (len(self.user_ids), len(learning_material_task_ids)), dtype=bool
+        )
+        task_positions = get_positions(
+            np.array(learning_material_task_ids), completions[:, 1]
+        )
+        found = (user_positions >= 0) & (task_positions >= 0)
+        completed_learning_material[user_positions[found], task_positions[found]] = True
+
+        # quizzes without questions have a None question that is never completed
+        question_ids = np.array(
+            [-1 if id is None else id for id in self.question_ids], dtype=np.int64
+        )
+        self.question_matrix = np.zeros(
+            (len(self.user_ids), len(question_ids)), dtype=bool
+        )
+        question_positions = get_positions(question_ids, completions[:, 2])
+        found = (
+            (user_positions >= 0) & (question_positions >= 0) & (completions[:, 2] >= 0)
+        )
+        self.question_matrix[user_positions[found], question_positions[found]] = True
+
+        # a quiz is complete when all of its (contiguous) questions are
+        completed_quizzes = (
+            np.logical_and.reduceat(self.question_matrix, quiz_starts, axis=1)
+            if quiz_starts
+            else np.zeros((len(self.user_ids), 0), dtype=bool)
+        )
+        self._quiz_starts = quiz_starts + [len(self.question_ids)]
 
-    for user_id in user_ids:
-        for task in learning_material_tasks:
-            # For learning material, check if it's in the completed tasks list
-            results[user_id][task[0]] = {
-                "is_complete": task[0] in completed_task_ids_for_user[user_id]
+        self.task_matrix = np.hstack([completed_learning_material, completed_quizzes])
+        self._user_positions = {
+            user_id: index for index, user_id in enumerate(self.user_ids)
+        }
+        self._user_completions: Dict[int, Dict] = {}
+
+    @property
+    def num_tasks(self) -> int:
+        return len(self.task_ids)
+
+    def get_num_completed(self, task_ids: Iterable[int] = None) -> np.ndarray:
+        """Number of tasks (of `task_ids` if given) completed by each user."""
+        if task_ids is None:
+            return self.task_matrix.sum(axis=1)
+
+        return self.task_matrix[:, np.isin(self.task_ids, list(task_ids))].sum(axis=1)
+
+    def _build_user_completion(self, user_position: int) -> Dict:
+        completed_tasks = self.task_matrix[user_position].tolist()
+        completed_questions = self.question_matrix[user_position].tolist()
+        num_learning_material_tasks = self.num_tasks - len(self.quiz_task_ids)
+
+        completion = {
+            task_id: {"is_complete": is_complete}
+            for task_id, is_complete in zip(
+                self.task_ids[:num_learning_material_tasks], completed_tasks
+            )
+        }
+
+        for index, task_id in enumerate(self.quiz_task_ids):
+            start, end = self._quiz_starts[index], self._quiz_starts[index + 1]
+            completion[task_id] = {
+                "is_complete": completed_tasks[num_learning_material_tasks + index],
+                "questions": [
+                    {"question_id": question_id, "is_complete": is_complete}
+                    for question_id, is_complete in zip(
+                        self.question_ids[start:end], completed_questions[start:end]
+                    )
+                ],
             }
 
-    # Get quiz and exam task questions
+        return completion
+
+    def __getitem__(self, user_id: int) -> Dict:
+        # like the defaultdict this used to be, users without any tasks get {}
+        if user_id not in self._user_positions or not self.num_tasks:
+            return {}
+
+        if user_id not in self._user_completions:
+            self._user_completions[user_id] = self._build_user_completion(
+                self._user_positions[user_id]
+            )
+
+        return self._user_completions[user_id]
+
+    def __contains__(self, user_id) -> bool:
+        return self.num_tasks > 0 and user_id in self._user_positions
+
+    def __iter__(self):
+        return iter(self.user_ids if self.num_tasks else [])
+
+    def __len__(self) -> int:
+        return len(self.user_ids) if self.num_tasks else 0
+
+
+async def get_cohort_completion(
+    cohort_id: int, user_ids: List[int], course_id: int = None
+) -> CohortCompletion:
+    """
+    Retrieves completion data for users in a specific cohort.
+
+    Args:
+        cohort_id: The ID of the cohort
+        user_ids: The IDs of the users
+        course_id: The ID of the course (optional, if not provided, all courses in the cohort will be considered)
+
+    Returns:
+        A `CohortCompletion`, which maps each user ID to their completion status for
+        every published learning material and quiz of the cohort.
+    """
+    # Get the published learning material and quiz tasks of the cohort, with the
+    # questions of every quiz in order
     query = f"""
-        SELECT DISTINCT t.id as task_id, q.id as question_id
+        SELECT DISTINCT t.id, t.type, q.id, q.position
         FROM {tasks_table_name} t
         JOIN {course_tasks_table_name} ct ON t.id = ct.task_id
         JOIN {course_cohorts_table_name} cc ON ct.course_id = cc.course_id
-        LEFT JOIN {questions_table_name} q ON t.id = q.task_id AND q.deleted_at IS NULL
-        WHERE cc.cohort_id = ? AND t.deleted_at IS NULL AND t.type = '{TaskType.QUIZ}' AND t.status = '{TaskStatus.PUBLISHED}' AND t.scheduled_publish_at IS NULL{
-            " AND ct.course_id = ?" if course_id else ""
-        } 
-        ORDER BY t.id, q.position ASC
+        LEFT JOIN {questions_table_name} q ON t.type = '{TaskType.QUIZ}' AND t.id = q.task_id AND q.deleted_at IS NULL
+        WHERE cc.cohort_id = ? AND t.deleted_at IS NULL AND t.type IN ('{TaskType.LEARNING_MATERIAL}', '{TaskType.QUIZ}') AND t.status = '{TaskStatus.PUBLISHED}' AND t.scheduled_publish_at IS NULL{
+            " AND ct.course_id = ?" if course_id is not None else ""
+        }
+        ORDER BY t.type = '{TaskType.QUIZ}', t.id, q.position ASC
         """
     params = (cohort_id,)
 
     if course_id is not None:
         params += (course_id,)
 
-    quiz_exam_questions = await execute_db_operation(
-        query,
-        params,
+    task_rows = await execute_db_operation(query, params, fetch_all=True)
+
+    if not task_rows or not user_ids:
+        return CohortCompletion(user_ids, [], [])
+
+    # Get the completed tasks and questions of the users in a single scan
+    completion_rows = await execute_db_operation(
+        f"""
+        SELECT user_id, COALESCE(task_id, -1), COALESCE(question_id, -1)
+        FROM {task_completions_table_name}
+        WHERE user_id IN ({','.join(['?' for _ in user_ids])})
+        """,
+        tuple(user_ids),
         fetch_all=True,
     )
 
-    # Group questions by task_id
-    quiz_exam_tasks = defaultdict(list)
-    for row in quiz_exam_questions:
-        task_id = row[0]
-        question_id = row[1]
-
-        quiz_exam_tasks[task_id].append(question_id)
-
-    for user_id in user_ids:
-        for task_id in quiz_exam_tasks:
-            is_task_complete = True
-            question_completions = []
-
-            for question_id in quiz_exam_tasks[task_id]:
-                is_question_complete = (
-                    question_id in completed_question_ids_for_user[user_id]
-                )
-
-                question_completions.append(
-                    {
-                        "question_id": question_id,
-                        "is_complete": is_question_complete,
-                    }
-                )
-
-                if not is_question_complete:
-                    is_task_complete = False
-
-            results[user_id][task_id] = {
-                "is_complete": is_task_complete,
-                "questions": question_completions,
-            }
-
-    return results
+    return CohortCompletion(user_ids, [row[:3] for row in task_rows], completion_rows)
 
 
 async def get_cohort_course_attempt_data(cohort_learner_ids: List[int], course_id: int):
@@ -287,11 +371,11 @@ async def get_cohort_streaks(
     # Build date filter based on duration
     date_filter = ""
     if view == LeaderboardViewType.WEEKLY:
-        date_filter = "AND DATE(datetime(timestamp, '+5 hours', '+30 minutes')) > DATE('now', 'weekday 0', '-7 days')"
+        date_filter = "AND a.ist_date > DATE('now', 'weekday 0', '-7 days')"
     elif view == LeaderboardViewType.MONTHLY:
-        date_filter = "AND strftime('%Y-%m', datetime(timestamp, '+5 hours', '+30 minutes')) = strftime('%Y-%m', 'now')"
+        date_filter = "AND strftime('%Y-%m', a.ist_date) = strftime('%Y-%m', 'now')"
 
-    # Get all user interactions, ordered by user and timestamp
+    # Get the days each learner of the cohort was active on
     usage_per_user = await execute_db_operation(
         f"""
     SELECT 
@@ -300,36 +384,17 @@ async def get_cohort_streaks(
         u.first_name,
         u.middle_name,
         u.last_name,
-        GROUP_CONCAT(t.created_at) as created_ats
+        GROUP_CONCAT(a.ist_date) as ist_dates
     FROM {users_table_name} u
-    LEFT JOIN (
-        -- Chat history interactions
-        SELECT user_id, MAX(datetime(created_at, '+5 hours', '+30 minutes')) as created_at
-        FROM {chat_history_table_name}
-        WHERE 1=1 {date_filter} AND question_id IN (SELECT id FROM {questions_table_name} WHERE task_id IN (SELECT task_id FROM {course_tasks_table_name} WHERE course_id IN (SELECT course_id FROM {course_cohorts_table_name} WHERE cohort_id = ?)))
-        GROUP BY user_id, DATE(datetime(created_at, '+5 hours', '+30 minutes'))
-        
-        UNION
-        
-        -- Task completions
-        SELECT user_id, MAX(datetime(created_at, '+5 hours', '+30 minutes')) as created_at
-        FROM {task_completions_table_name}
-        WHERE 1=1 {date_filter} AND task_id IN (
-            SELECT task_id FROM {course_tasks_table_name} 
-            WHERE course_id IN (SELECT course_id FROM {course_cohorts_table_name} WHERE cohort_id = ?)
-        )
-        GROUP BY user_id, DATE(datetime(created_at, '+5 hours', '+30 minutes'))
-        
-        ORDER BY created_at DESC, user_id
-    ) t ON u.id = t.user_id
+    LEFT JOIN {user_daily_activity_table_name} a
+        ON a.user_id = u.id AND a.cohort_id = ? {date_filter}
     WHERE u.id IN (
         -- Users who are in the cohort as learners
         SELECT user_id FROM {user_cohorts_table_name} WHERE cohort_id = ? and role = 'learner'
-       
     )
     GROUP BY u.id, u.email, u.first_name, u.middle_name, u.last_name
     """,
-        (cohort_id, cohort_id, cohort_id),
+        (cohort_id, cohort_id),
         fetch_all=True,
     )
 
@@ -365,3 +430,168 @@ async def get_cohort_streaks(
         )
 
     return streaks
+
+
+async def build_cohort_leaderboard(cohort_id: int) -> CohortLeaderboard:
+    """
+    Leaderboard of the cohort's learners over the published tasks of its courses.
+    A board restored from a snapshot is reused if the cohort has not changed since,
+    otherwise every completion and active day of the learners is replayed into it.
+    """
+    learners = await execute_db_operation(
+        f"""
+        SELECT u.id, u.email, u.first_name, u.middle_name, u.last_name
+        FROM {users_table_name} u
+        JOIN {user_cohorts_table_name} uc ON uc.user_id = u.id
+        WHERE uc.cohort_id = ? AND uc.role = 'learner'
+        ORDER BY u.id
+        """,
+        (cohort_id,),
+        fetch_all=True,
+    )
+    learners = {
+        row[0]: {
+            "id": row[0],
+            "email": row[1],
+            "first_name": row[2],
+            "middle_name": row[3],
+            "last_name": row[4],
+        }
+        for row in learners
+    }
+
+    course_ids = await execute_db_operation(
+        f"SELECT course_id FROM {course_cohorts_table_name} WHERE cohort_id = ?",
+        (cohort_id,),
+        fetch_all=True,
+    )
+    course_ids = [row[0] for row in course_ids]
+
+    # the versions are read first so that a course changing while its tree is read
+    # makes the board stale right away
+    course_versions = {
+        course_id: course_tree_cache.get_version(course_id) for course_id in course_ids
+    }
+    courses = await asyncio.gather(
+        *[get_published_course_tree(course_id) for course_id in course_ids]
+    )
+
+    learning_material_task_ids = set()
+    quiz_task_ids = set()
+    for course in courses:
+        if not course:
+            continue
+
+        for milestone in course["milestones"]:
+            for task in milestone["tasks"]:
+                if task["type"] == str(TaskType.LEARNING_MATERIAL):
+                    learning_material_task_ids.add(task["id"])
+                elif task["type"] == str(TaskType.QUIZ):
+                    quiz_task_ids.add(task["id"])
+
+    quiz_question_ids = {task_id: [] for task_id in quiz_task_ids}
+    if quiz_task_ids:
+        questions = await execute_db_operation(
+            f"""
+            SELECT task_id, id FROM {questions_table_name}
+            WHERE task_id IN ({','.join(map(str, quiz_task_ids))}) AND deleted_at IS NULL
+            """,
+            fetch_all=True,
+        )
+        for task_id, question_id in questions:
+            quiz_question_ids[task_id].append(question_id)
+
+    board = leaderboards.pop_restored(cohort_id)
+    if (
+        board is not None
+        and set(board.learners) == set(learners)
+        and board.learning_material_task_ids == learning_material_task_ids
+        and board.quiz_question_ids
+        == {task_id: set(ids) for task_id, ids in quiz_question_ids.items()}
+    ):
+        board.learners = learners
+        board.course_versions = course_versions
+        return board
+
+    board = CohortLeaderboard(
+        learners, learning_material_task_ids, quiz_question_ids, course_versions
+    )
+
+    if not learners:
+        return board
+
+    completions = await execute_db_operation(
+        f"""
+        SELECT tc.user_id, tc.task_id, tc.question_id
+        FROM {task_completions_table_name} tc
+        JOIN {user_cohorts_table_name} uc ON uc.user_id = tc.user_id
+        WHERE uc.cohort_id = ? AND uc.role = 'learner'
+        """,
+        (cohort_id,),
+        fetch_all=True,
+    )
+    for user_id, task_id, question_id in completions:
+        board.record_completion(user_id, task_id, question_id)
+
+    activity = await execute_db_operation(
+        f"""
+        SELECT user_id, ist_date FROM {user_daily_activity_table_name}
+        WHERE cohort_id = ?
+        ORDER BY user_id, ist_date
+        """,
+        (cohort_id,),
+        fetch_all=True,
+    )
+    for user_id, ist_date in activity:
+        board.record_activity(user_id, date.fromisoformat(ist_date))
+
+    return board
+
+
+# builds in progress, so that concurrent requests for the same cohort share one build
+_pending_builds: Dict[int, asyncio.Future] = {}
+
+
+async def get_cohort_leaderboard(
+    cohort_id: int, view: LeaderboardViewType = LeaderboardViewType.ALL_TIME
+) -> Dict:
+    """
+    Learners of the cohort ranked by their streak in the `view` window and then by
+    the number of tasks they have completed, served from `leaderboards`.
+    """
+    board = leaderboards.get(cohort_id)
+
+    if board is None and cohort_id in _pending_builds:
+        board = await asyncio.shield(_pending_builds[cohort_id])
+
+    if board is None:
+        future = asyncio.get_running_loop().create_future()
+        _pending_builds[cohort_id] = future
+        version = leaderboards.start_build(cohort_id)
+
+        try:
+            board = await build_cohort_leaderboard(cohort_id)
+        except Exception as exception:
+            future.set_exception(exception)
+            # mark the exception as retrieved in case no one else is waiting on it
+            future.exception()
+            raise
+        else:
+            leaderboards.set(cohort_id, version, board)
+            future.set_result(board)
+        finally:
+            if not future.done():
+                future.cancel()
+
+            leaderboards.finish_build(cohort_id)
+            del _pending_builds[cohort_id]
+
+    if not board.learners:
+        return {}
+
+    return {
+        "stats": board.get_rankings(view),
+        "metadata": {
+            "num_tasks": board.num_tasks,
+        },
+    }
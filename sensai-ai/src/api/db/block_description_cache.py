@@ -0,0 +1,104 @@
+import hashlib
+import json
+import marshal
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+from api.config import block_description_cache_max_size
+from api.db.utils import construct_description_from_blocks
+
+
+def get_blocks_hash(blocks: List[Dict]) -> str:
+    try:
+        # several times faster than serializing to JSON (which costs more than
+        # rendering); equal blocks may marshal differently if their strings are shared
+        # differently, which only costs an extra render
+        data = marshal.dumps(blocks)
+    except ValueError:
+        # blocks built in code may hold values marshal does not support, like enums
+        data = json.dumps(blocks, sort_keys=True, default=str).encode("utf-8")
+
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlockDescriptionCache:
+    """
+    In-process cache of the descriptions rendered from blocks (a question, its
+    answer or a learning material), keyed by what the blocks belong to. Each entry
+    remembers the hash of the blocks it was rendered from, so editing them makes
+    the entry stale without any explicit invalidation.
+    """
+
+    def __init__(self, max_size: int = block_description_cache_max_size):
+        self.max_size = max_size
+        self._descriptions: OrderedDict[str, Tuple[str, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_description(self, blocks: List[Dict], key: str | None = None) -> str:
+        """
+        The description of the blocks, rendered only if they have changed since it
+        was last cached under `key` (by content hash for blocks without an owner,
+        like previews).
+        """
+        if not blocks:
+            return ""
+
+        content_hash = get_blocks_hash(blocks)
+
+        if key is None:
+            key = f"preview_{content_hash}"
+
+        return self._get_or_render(
+            key, content_hash, lambda: construct_description_from_blocks(blocks)
+        )
+
+    def get_description_from_json(self, blocks_json: str | None, key: str) -> str:
+        """
+        The description of blocks as stored in the database, where the stored JSON
+        identifies the version of the blocks, so they are only parsed to be rendered.
+        """
+        if not blocks_json:
+            return ""
+
+        content_hash = hashlib.sha256(blocks_json.encode("utf-8")).hexdigest()
+
+        return self._get_or_render(
+            key,
+            content_hash,
+            lambda: construct_description_from_blocks(json.loads(blocks_json)),
+        )
+
+    def _get_or_render(
+        self, key: str, content_hash: str, render: Callable[[], str]
+    ) -> str:
+        entry = self._descriptions.get(key)
+
+        if entry is not None and entry[0] == content_hash:
+            self.hits += 1
+            self._descriptions.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+
+        description = render()
+        self._descriptions[key] = (content_hash, description)
+        self._descriptions.move_to_end(key)
+
+        while len(self._descriptions) > self.max_size:
+            self._descriptions.popitem(last=False)
+
+        return description
+
+    def clear(self):
+        self._descriptions.clear()
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._descriptions),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+block_descriptions = BlockDescriptionCache()
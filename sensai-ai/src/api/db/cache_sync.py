@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import json
+from types import GeneratorType
+from typing import Dict, List
+from api.utils.logging import logger
+
+
+class CacheSync:
+    """
+    Keeps the in-process caches of every process sharing the database (API processes
+    and job workers) in step. Each cache is registered under a name, and the methods
+    that change what it holds (invalidations and leaderboard events) are marked with
+    `shared`: a call is applied in this process right away, then published on the
+    event bus so that every other process replays it on its own copy of the cache.
+    Calls made from within a shared method, or while replaying, are not published
+    again.
+
+    Shared methods are synchronous, so calls are queued and published by a task of
+    their own; nothing is queued until a bus that reaches other processes is
+    connected, which keeps a single process deployment free of any overhead.
+    """
+
+    def __init__(self):
+        self._caches: Dict[str, object] = {}
+        self._names: Dict[int, str] = {}
+        self._bus = None
+        self._pending: List[str] = []
+        self._publisher = None
+        self._depth = 0
+        self.replayed = 0
+        self.errors = 0
+
+    def register(self, name: str, cache):
+        self._caches[name] = cache
+        self._names[id(cache)] = name
+
+    def connect(self, bus):
+        """Replay the calls received on the bus and, if it reaches other processes, publish ours."""
+        bus.subscribe_cache_events(self.replay)
+
+        if bus.between_processes:
+            self._bus = bus
+
+    def call(self, cache, method, args, kwargs):
+        # generators can only be read once, by the method or when publishing the call
+        args = [list(arg) if isinstance(arg, GeneratorType) else arg for arg in args]
+
+        name = self._names.get(id(cache))
+        if self._depth == 0 and name is not None and self._bus is not None:
+            # sets and dict views are published as lists, which every method accepts
+            self._pending.append(
+                json.dumps([name, method.__name__, args, kwargs], default=list)
+            )
+            self._start_publisher()
+
+        self._depth += 1
+        try:
+            return method(cache, *args, **kwargs)
+        finally:
+            self._depth -= 1
+
+    def _start_publisher(self):
+        if self._publisher is not None and not self._publisher.done():
+            return
+
+        try:
+            self._publisher = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            # called outside the event loop; published along with the next call
+            pass
+
+    async def flush(self):
+        """Publish the queued calls, e.g. before a process exits."""
+        while self._pending:
+            events, self._pending = self._pending, []
+            await self._bus.publish_cache_events(events)
+
+    def replay(self, events: List[str]):
+        """Apply the calls published by another process."""
+        for event in events:
+            name, method, args, kwargs = json.loads(event)
+            cache = self._caches.get(name)
+
+            if cache is None:
+                continue
+
+            self._depth += 1
+            try:
+                getattr(cache, method)(*args, **kwargs)
+                self.replayed += 1
+            except Exception as exception:
+                self.errors += 1
+                logger.error(f"Error replaying {name}.{method}: {exception}")
+            finally:
+                self._depth -= 1
+
+    def get_metrics(self) -> Dict:
+        return {
+            "pending": len(self._pending),
+            "replayed": self.replayed,
+            "errors": self.errors,
+        }
+
+
+cache_sync = CacheSync()
+
+
+def shared(method):
+    """Mark a cache method whose calls every process should replay."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return cache_sync.call(self, method, args, kwargs)
+
+    return wrapper
@@ -1,15 +1,26 @@
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, List, Tuple
 from datetime import datetime
-from api.utils.db import get_new_db_connection, execute_db_operation
+from api.utils.db import (
+    execute_db_operation,
+    execute_write_transaction,
+)
 from api.config import (
     chat_history_table_name,
     questions_table_name,
     tasks_table_name,
     users_table_name,
     task_completions_table_name,
+    chat_history_page_size,
 )
 from api.models import StoreMessageRequest, ChatMessage, TaskType
 from api.db.task import get_basic_task_details
+from api.db.activity import (
+    record_user_activity,
+    rebuild_user_activity,
+    delete_chat_messages,
+)
+from api.db.leaderboard import leaderboards
+from api.db.conversation_cache import conversations
 
 
 async def store_messages(
@@ -18,10 +29,10 @@ async def store_messages(
     question_id: int,
     is_complete: bool,
 ):
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
+    async def insert_messages(cursor):
         new_row_ids = []
+        activity = []
+        completion_cohort_ids = []
 
         for message in messages:
             # Insert the new message
@@ -43,6 +54,14 @@ async def store_messages(
             new_row_id = cursor.lastrowid
             new_row_ids.append(new_row_id)
 
+            activity += await record_user_activity(
+                cursor,
+                user_id,
+                question_id=question_id,
+                created_at=message.created_at,
+                message_count=int(message.role == "user"),
+            )
+
         if is_complete:
             await cursor.execute(
                 f"""
@@ -52,7 +71,25 @@ async def store_messages(
                 (user_id, question_id),
             )
 
-        await conn.commit()
+            # only count the completion the first time the question is completed
+            if cursor.rowcount > 0:
+                completion_activity = await record_user_activity(
+                    cursor, user_id, question_id=question_id, completion_count=1
+                )
+                activity += completion_activity
+                completion_cohort_ids = [row[0] for row in completion_activity]
+
+        return new_row_ids, activity, completion_cohort_ids
+
+    new_row_ids, activity, completion_cohort_ids = await execute_write_transaction(
+        insert_messages
+    )
+
+    # keep the leaderboards in sync now that the messages are committed
+    leaderboards.record_activity(user_id, activity)
+    leaderboards.record_completion(
+        user_id, completion_cohort_ids, question_id=question_id
+    )
 
     # Fetch the newly inserted row
     new_rows = await execute_db_operation(
@@ -78,34 +115,74 @@ async def store_messages(
     ]
 
 
-async def get_all_chat_history(org_id: int):
-    chat_history = await execute_db_operation(
-        f"""
+def get_org_chat_history_query() -> str:
+    """Up to `limit` messages of an org (`org_id`) stored after `after_id`, in the order they were stored."""
+    return f"""
         SELECT message.id, message.created_at, user.id AS user_id, user.email AS user_email, message.question_id, task.id AS task_id, message.role, message.content, message.response_type
         FROM {chat_history_table_name} message
         INNER JOIN {questions_table_name} question ON message.question_id = question.id
         INNER JOIN {tasks_table_name} task ON question.task_id = task.id
         INNER JOIN {users_table_name} user ON message.user_id = user.id 
-        WHERE task.deleted_at IS NULL AND task.org_id = ?
-        ORDER BY message.created_at ASC
-        """,
-        (org_id,),
+        WHERE task.deleted_at IS NULL AND task.org_id = ? AND message.id > ?
+        ORDER BY message.id ASC LIMIT ?
+        """
+
+
+def convert_org_chat_message_to_dict(row: Tuple) -> Dict:
+    return {
+        "id": row[0],
+        "created_at": row[1],
+        "user_id": row[2],
+        "user_email": row[3],
+        "question_id": row[4],
+        "task_id": row[5],
+        "role": row[6],
+        "content": row[7],
+        "response_type": row[8],
+    }
+
+
+async def get_chat_history_page(
+    org_id: int, after_id: int = None, limit: int = chat_history_page_size
+) -> List[Dict]:
+    """
+    Up to `limit` messages of the org, starting after the message with id
+    `after_id`. Pass the id of the last message of a page as `after_id` to get
+    the next one.
+    """
+    chat_history = await execute_db_operation(
+        get_org_chat_history_query(),
+        (org_id, after_id or 0, limit),
         fetch_all=True,
     )
 
+    return [convert_org_chat_message_to_dict(row) for row in chat_history]
+
+
+async def iter_all_chat_history(
+    org_id: int, after_id: int = None, batch_size: int = chat_history_page_size
+) -> AsyncIterator[List[Dict]]:
+    """
+    Every message of the org after `after_id`, in pages of up to `batch_size` read
+    as the caller consumes them, so that only one page is in memory at a time
+    however large the org is. Each page is its own keyset query, so no pooled
+    connection is held while the caller sends a page on, however slowly.
+    """
+    while True:
+        batch = await get_chat_history_page(org_id, after_id, batch_size)
+
+        if batch:
+            yield batch
+
+        if len(batch) < batch_size:
+            return
+
+        after_id = batch[-1]["id"]
+
+
+async def get_all_chat_history(org_id: int) -> List[Dict]:
     return [
-        {
-            "id": row[0],
-            "created_at": row[1],
-            "user_id": row[2],
-            "user_email": row[3],
-            "question_id": row[4],
-            "task_id": row[5],
-            "role": row[6],
-            "content": row[7],
-            "response_type": row[8],
-        }
-        for row in chat_history
+        message async for batch in iter_all_chat_history(org_id) for message in batch
     ]
 
 
@@ -122,13 +199,13 @@ def convert_chat_message_to_dict(message: Tuple) -> ChatMessage:
 
 
 async def get_question_chat_history_for_user(
-    question_id: int, user_id: int
+    question_id: int, user_id: int, after_id: int | None = None
 ) -> List[ChatMessage]:
     chat_history = await execute_db_operation(
         f"""
-    SELECT id, created_at, user_id, question_id, role, content, response_type FROM {chat_history_table_name} WHERE question_id = ? AND user_id = ?
+    SELECT id, created_at, user_id, question_id, role, content, response_type FROM {chat_history_table_name} WHERE question_id = ? AND user_id = ? AND id > ? ORDER BY id ASC
     """,
-        (question_id, user_id),
+        (question_id, user_id, after_id or 0),
         fetch_all=True,
     )
 
@@ -136,7 +213,7 @@ async def get_question_chat_history_for_user(
 
 
 async def get_task_chat_history_for_user(
-    task_id: int, user_id: int
+    task_id: int, user_id: int, after_id: int | None = None
 ) -> List[ChatMessage]:
     task = await get_basic_task_details(task_id)
 
@@ -152,12 +229,13 @@ async def get_task_chat_history_for_user(
         JOIN {questions_table_name} q ON ch.question_id = q.id
         WHERE q.task_id = ? 
         AND ch.user_id = ?
+        AND ch.id > ?
         ORDER BY ch.created_at ASC
     """
 
     chat_history = await execute_db_operation(
         query,
-        (task_id, user_id),
+        (task_id, user_id, after_id or 0),
         fetch_all=True,
     )
 
@@ -165,10 +243,14 @@ async def get_task_chat_history_for_user(
 
 
 async def delete_message(message_id: int):
-    await execute_db_operation(
-        f"DELETE FROM {chat_history_table_name} WHERE id = ?", (message_id,)
+    user_ids = await execute_write_transaction(
+        lambda cursor: delete_chat_messages(cursor, "id = ?", (message_id,))
     )
 
+    conversations.invalidate_all()
+    for user_id in user_ids:
+        leaderboards.invalidate_user(user_id)
+
 
 async def update_message_timestamp(message_id: int, new_timestamp: datetime):
     await execute_db_operation(
@@ -178,11 +260,22 @@ async def update_message_timestamp(message_id: int, new_timestamp: datetime):
 
 
 async def delete_user_chat_history_for_task(question_id: int, user_id: int):
-    await execute_db_operation(
-        f"DELETE FROM {chat_history_table_name} WHERE question_id = ? AND user_id = ?",
-        (question_id, user_id),
+    await execute_write_transaction(
+        lambda cursor: delete_chat_messages(
+            cursor, "question_id = ? AND user_id = ?", (question_id, user_id)
+        )
     )
 
+    conversations.invalidate(user_id, question_id)
+    leaderboards.invalidate_user(user_id)
+
 
 async def delete_all_chat_history():
-    await execute_db_operation(f"DELETE FROM {chat_history_table_name}")
+    async def delete_all(cursor):
+        await cursor.execute(f"DELETE FROM {chat_history_table_name}")
+        await rebuild_user_activity(cursor)
+
+    await execute_write_transaction(delete_all)
+
+    conversations.invalidate_all()
+    leaderboards.invalidate_all()
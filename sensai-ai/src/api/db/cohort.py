@@ -16,13 +16,38 @@ from api.config import (
 )
 from api.utils.db import (
     execute_db_operation,
-    execute_many_db_operation,
     execute_multiple_db_operations,
+    execute_write_transaction,
     get_new_db_connection,
 )
+from api.db.activity import rebuild_user_activity
 from api.db.user import insert_or_return_user
 from api.db.course import get_course
-from api.slack import send_slack_notification_for_learner_added_to_cohort
+from api.db.leaderboard import leaderboards
+from api.slack import (
+    send_slack_notification_for_new_user,
+    send_slack_notification_for_learner_added_to_cohort,
+)
+
+
+async def update_course_cohorts(
+    query: str, params_list: List[Tuple], cohort_ids: List[int]
+):
+    """
+    Add or remove courses of cohorts with `query`. Activity is assigned to cohorts
+    through their courses when it is recorded, so the activity rollup of the cohorts
+    is rebuilt in the same transaction.
+    """
+    if not params_list:
+        return
+
+    async def update(cursor):
+        await cursor.executemany(query, params_list)
+        await rebuild_user_activity(cursor, cohort_ids=cohort_ids)
+
+    await execute_write_transaction(update)
+
+    leaderboards.invalidate_cohorts(cohort_ids)
 
 
 async def add_courses_to_cohort(
@@ -46,11 +71,12 @@ async def add_courses_to_cohort(
             )
         )
 
-    await execute_many_db_operation(
+    await update_course_cohorts(
         f"""INSERT INTO {course_cohorts_table_name} 
             (course_id, cohort_id, is_drip_enabled, frequency_value, frequency_unit, publish_at) 
             VALUES (?, ?, ?, ?, ?, ?)""",
         values,
+        [cohort_id],
     )
 
 
@@ -75,25 +101,28 @@ async def add_course_to_cohorts(
             )
         )
 
-    await execute_many_db_operation(
+    await update_course_cohorts(
         f"""INSERT INTO {course_cohorts_table_name} 
             (course_id, cohort_id, is_drip_enabled, frequency_value, frequency_unit, publish_at) 
             VALUES (?, ?, ?, ?, ?, ?)""",
         values,
+        cohort_ids,
     )
 
 
 async def remove_course_from_cohorts(course_id: int, cohort_ids: List[int]):
-    await execute_many_db_operation(
+    await update_course_cohorts(
         f"DELETE FROM {course_cohorts_table_name} WHERE course_id = ? AND cohort_id = ?",
         [(course_id, cohort_id) for cohort_id in cohort_ids],
+        cohort_ids,
     )
 
 
 async def remove_courses_from_cohort(cohort_id: int, course_ids: List[int]):
-    await execute_many_db_operation(
+    await update_course_cohorts(
         f"DELETE FROM {course_cohorts_table_name} WHERE cohort_id = ? AND course_id = ?",
         [(cohort_id, course_id) for course_id in course_ids],
+        [cohort_id],
     )
 
 
@@ -130,6 +159,8 @@ async def delete_cohort(cohort_id: int):
         ]
     )
 
+    leaderboards.invalidate_cohort(cohort_id)
+
 
 def drop_cohorts_table():
     execute_db_operation(f"DROP TABLE IF EXISTS {cohorts_table_name}")
@@ -206,15 +237,17 @@ async def add_members_to_cohort(
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
 
-        users_to_add = []
+        users_to_add, new_users = [], []
 
         for email in emails:
             # Get or create user
-            user = await insert_or_return_user(
+            user, is_new_user = await insert_or_return_user(
                 cursor,
                 email,
             )
             users_to_add.append(user)
+            if is_new_user:
+                new_users.append(user)
 
         await cursor.execute(
             f"""
@@ -228,11 +261,6 @@ async def add_members_to_cohort(
         if user_exists:
             raise Exception("User already exists in cohort")
 
-        for user in users_to_add:
-            await send_slack_notification_for_learner_added_to_cohort(
-                user, org_slug, org_id, cohort[0], cohort_id
-            )
-
         # Add users to cohort
         await cursor.executemany(
             f"""
@@ -244,6 +272,17 @@ async def add_members_to_cohort(
 
         await conn.commit()
 
+    leaderboards.invalidate_cohort(cohort_id)
+
+    # only once the writer is released, as every other write waits on it
+    for user in new_users:
+        await send_slack_notification_for_new_user(user)
+
+    for user in users_to_add:
+        await send_slack_notification_for_learner_added_to_cohort(
+            user, org_slug, org_id, cohort[0], cohort_id
+        )
+
 
 async def remove_members_from_cohort(cohort_id: int, member_ids: List[int]):
     members_in_cohort = await execute_db_operation(
@@ -271,6 +310,8 @@ async def remove_members_from_cohort(cohort_id: int, member_ids: List[int]):
         ]
     )
 
+    leaderboards.invalidate_cohort(cohort_id)
+
 
 async def get_cohorts_for_org(org_id: int) -> List[Dict]:
     """Get all cohorts that belong to an organization"""
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from api.config import conversation_cache_max_size
+from api.db.cache_sync import cache_sync, shared
+
+
+class ConversationCache:
+    """
+    In-process cache of learners' conversations on quiz questions, keyed by (user id,
+    question id), with every message already formatted for the AI's prompt. Messages
+    are only ever appended to a conversation, so a cached conversation is brought up
+    to date by fetching the messages after the last id it holds instead of all of
+    them. Deleting messages invalidates the conversations they belonged to in every
+    process; a global version stamp makes sure a conversation read before that is
+    never stored.
+    """
+
+    def __init__(self, max_size: int = conversation_cache_max_size):
+        self.max_size = max_size
+        self._version = 0
+        self._conversations: OrderedDict[
+            Tuple[int, int], Tuple[int, List[Dict]]
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_version(self) -> int:
+        return self._version
+
+    def get(self, user_id: int, question_id: int) -> Tuple[int, List[Dict]]:
+        """
+        Return the id of the last cached message of the conversation (0 if nothing is
+        cached) and the cached messages, which must not be modified.
+        """
+        entry = self._conversations.get((user_id, question_id))
+
+        if entry is None:
+            self.misses += 1
+            return 0, []
+
+        self.hits += 1
+        self._conversations.move_to_end((user_id, question_id))
+        return entry[0], list(entry[1])
+
+    def extend(
+        self,
+        user_id: int,
+        question_id: int,
+        version: int,
+        after_id: int,
+        messages: List[Dict],
+    ):
+        """
+        Append the messages (each with its "id") that were read after `after_id` at
+        `version` (as returned by `get` and `get_version` before reading).
+        """
+        if version != self._version:
+            # invalidated while the messages were being read
+            return
+
+        key = (user_id, question_id)
+        last_id, cached_messages = self._conversations.pop(key, (0, []))
+
+        if last_id < after_id:
+            # evicted while the messages were being read, so the start is missing
+            return
+
+        # skip messages that a concurrent request has already added
+        messages = [message for message in messages if message["id"] > last_id]
+        if messages:
+            cached_messages = cached_messages + messages
+            last_id = messages[-1]["id"]
+
+        self._conversations[key] = (last_id, cached_messages)
+
+        while len(self._conversations) > self.max_size:
+            self._conversations.popitem(last=False)
+
+    @shared
+    def invalidate(self, user_id: int, question_id: int):
+        self._version += 1
+        self._conversations.pop((user_id, question_id), None)
+
+    @shared
+    def invalidate_all(self):
+        self._version += 1
+        self._conversations.clear()
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._conversations),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+conversations = ConversationCache()
+cache_sync.register("conversations", conversations)
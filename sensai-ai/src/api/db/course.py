@@ -20,29 +20,37 @@ from api.config import (
     uncategorized_milestone_name,
     task_generation_jobs_table_name,
     organizations_table_name,
+    user_cohorts_table_name,
+    user_organizations_table_name,
     group_role_learner,
+    job_queue_table_name,
+    course_structure_job_priority,
 )
 from api.db.task import (
-    get_task,
     create_draft_task_for_course,
+    convert_question_db_to_dict,
     update_learning_material_task,
     update_draft_quiz,
-    get_scorecard,
     create_scorecard,
 )
 from api.db.utils import EnumEncoder, get_org_id_for_course
+from api.db.activity import rebuild_user_activity
+from api.db.course_tree_cache import course_tree_cache
+from api.db.leaderboard import leaderboards
+from api.db.job_queue import enqueue_job, notify_job_enqueued
 from api.utils.db import (
     execute_db_operation,
     get_new_db_connection,
+    execute_write_transaction,
     execute_multiple_db_operations,
     execute_many_db_operation,
     deserialise_list_from_str,
 )
-from api.db.user import get_user_cohorts, get_user_organizations
 from api.db.org import get_org_by_id
 from api.slack import send_slack_notification_for_new_course
 from api.models import (
     GenerateCourseJobStatus,
+    JobKind,
     TaskType,
     TaskStatus,
     ScorecardStatus,
@@ -158,7 +166,7 @@ async def get_courses_for_cohort(
         return courses
 
     for index, course in enumerate(courses):
-        course_details = await get_course(course["id"])
+        course_details = await get_published_course_tree(course["id"])
         course_details = await calculate_milestone_unlock_dates(
             course_details, course["drip_config"], joined_at
         )
@@ -167,6 +175,45 @@ async def get_courses_for_cohort(
     return courses
 
 
+async def get_published_course_tree(course_id: int) -> Dict:
+    """
+    Course tree with only the published tasks, as shown to learners. Served from
+    `course_tree_cache` when possible; the tree is read with unpublished tasks as well
+    so that publishing any of them invalidates the cached tree.
+    """
+    course = course_tree_cache.get(course_id)
+
+    if course is not None:
+        return course
+
+    version = course_tree_cache.get_version(course_id)
+
+    course = await get_course(course_id, only_published=False)
+
+    if not course:
+        return course
+
+    task_ids = []
+    for milestone in course["milestones"]:
+        task_ids.extend(task["id"] for task in milestone["tasks"])
+        milestone["tasks"] = [
+            task
+            for task in milestone["tasks"]
+            if task["status"] == str(TaskStatus.PUBLISHED)
+            and task["scheduled_publish_at"] is None
+        ]
+
+    course_tree_cache.set(
+        course_id,
+        version,
+        course,
+        task_ids,
+        [milestone["id"] for milestone in course["milestones"]],
+    )
+
+    return course
+
+
 async def store_course_generation_request(course_id: int, job_details: Dict) -> str:
     job_uuid = str(uuid4())
 
@@ -183,30 +230,54 @@ async def store_course_generation_request(course_id: int, job_details: Dict) ->
             ),
         )
 
+        await enqueue_job(
+            cursor,
+            JobKind.COURSE_STRUCTURE,
+            job_uuid,
+            course_id,
+            course_structure_job_priority,
+        )
+
         await conn.commit()
 
+    notify_job_enqueued()
+
     return job_uuid
 
 
 async def get_course_generation_job_details(job_uuid: str) -> Dict:
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
+    job = await execute_db_operation(
+        f"SELECT job_details FROM {course_generation_jobs_table_name} WHERE uuid = ?",
+        (job_uuid,),
+        fetch_one=True,
+    )
 
-        await cursor.execute(
-            f"SELECT job_details FROM {course_generation_jobs_table_name} WHERE uuid = ?",
-            (job_uuid,),
-        )
+    if job is None:
+        raise ValueError("Job not found")
+
+    return json.loads(job[0])
 
-        job = await cursor.fetchone()
 
-        if job is None:
-            raise ValueError("Job not found")
+async def get_course_generation_job(job_uuid: str) -> Dict | None:
+    job = await execute_db_operation(
+        f"SELECT uuid, course_id, status, job_details FROM {course_generation_jobs_table_name} WHERE uuid = ?",
+        (job_uuid,),
+        fetch_one=True,
+    )
 
-        return json.loads(job[0])
+    if job is None:
+        return None
+
+    return {
+        "uuid": job[0],
+        "course_id": job[1],
+        "status": job[2],
+        "job_details": json.loads(job[3]),
+    }
 
 
 async def duplicate_course_to_org(course_id: int, org_id: int):
-    course = await get_course(course_id)
+    course = await get_course_with_task_details(course_id, include_scorecards=True)
 
     new_course_id = await create_course(course["name"], org_id)
 
@@ -215,9 +286,7 @@ async def duplicate_course_to_org(course_id: int, org_id: int):
             new_course_id, milestone["name"], milestone["color"]
         )
 
-        for task in milestone["tasks"]:
-            task_details = await get_task(task["id"])
-
+        for task_details in milestone["tasks"]:
             new_task_id, _ = await create_draft_task_for_course(
                 task_details["title"],
                 task_details["type"],
@@ -243,10 +312,7 @@ async def duplicate_course_to_org(course_id: int, org_id: int):
 
                         # Check if we've already duplicated this scorecard
                         if original_scorecard_id not in scorecard_mapping:
-                            # Get the original scorecard
-                            original_scorecard = await get_scorecard(
-                                original_scorecard_id
-                            )
+                            original_scorecard = question["scorecard"]
 
                             # Create new scorecard for the new org
                             new_scorecard = await create_scorecard(
@@ -283,12 +349,16 @@ async def update_course_generation_job_status_and_details(
         cursor = await conn.cursor()
 
         await cursor.execute(
-            f"UPDATE {course_generation_jobs_table_name} SET status = ?, job_details = ? WHERE uuid = ?",
+            f"UPDATE {course_generation_jobs_table_name} SET status = ?, job_details = ? WHERE uuid = ? RETURNING course_id",
             (str(status), json.dumps(details, cls=EnumEncoder), job_uuid),
         )
+        job = await cursor.fetchone()
 
         await conn.commit()
 
+    if job:
+        course_tree_cache.invalidate_course(job[0])
+
 
 async def update_course_generation_job_status(
     job_uuid: str, status: GenerateCourseJobStatus
@@ -297,30 +367,15 @@ async def update_course_generation_job_status(
         cursor = await conn.cursor()
 
         await cursor.execute(
-            f"UPDATE {course_generation_jobs_table_name} SET status = ? WHERE uuid = ?",
+            f"UPDATE {course_generation_jobs_table_name} SET status = ? WHERE uuid = ? RETURNING course_id",
             (str(status), job_uuid),
         )
+        job = await cursor.fetchone()
 
         await conn.commit()
 
-
-async def get_all_pending_course_structure_generation_jobs() -> List[Dict]:
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
-        await cursor.execute(
-            f"SELECT uuid, course_id, job_details FROM {course_generation_jobs_table_name} WHERE status = ?",
-            (str(GenerateCourseJobStatus.STARTED),),
-        )
-
-        return [
-            {
-                "uuid": row[0],
-                "course_id": row[1],
-                "job_details": json.loads(row[2]),
-            }
-            for row in await cursor.fetchall()
-        ]
+    if job:
+        course_tree_cache.invalidate_course(job[0])
 
 
 async def add_course_modules(course_id: int, modules: List[Dict]):
@@ -515,8 +570,14 @@ async def get_all_courses_for_org(org_id: int):
 
 
 async def delete_course(course_id: int):
-    await execute_multiple_db_operations(
-        [
+    async def delete(cursor):
+        await cursor.execute(
+            f"SELECT cohort_id FROM {course_cohorts_table_name} WHERE course_id = ?",
+            (course_id,),
+        )
+        cohort_ids = [row[0] for row in await cursor.fetchall()]
+
+        for command, params in [
             (
                 f"DELETE FROM {course_cohorts_table_name} WHERE course_id = ?",
                 (course_id,),
@@ -529,6 +590,14 @@ async def delete_course(course_id: int):
                 f"DELETE FROM {course_milestones_table_name} WHERE course_id = ?",
                 (course_id,),
             ),
+            (
+                f"""DELETE FROM {job_queue_table_name} WHERE job_uuid IN (
+                    SELECT uuid FROM {course_generation_jobs_table_name} WHERE course_id = ?
+                    UNION ALL
+                    SELECT uuid FROM {task_generation_jobs_table_name} WHERE course_id = ?
+                )""",
+                (course_id, course_id),
+            ),
             (
                 f"DELETE FROM {course_generation_jobs_table_name} WHERE course_id = ?",
                 (course_id,),
@@ -538,8 +607,19 @@ async def delete_course(course_id: int):
                 (course_id,),
             ),
             (f"DELETE FROM {courses_table_name} WHERE id = ?", (course_id,)),
-        ]
-    )
+        ]:
+            await cursor.execute(command, params)
+
+        if cohort_ids:
+            # the activity on the course no longer counts towards its cohorts
+            await rebuild_user_activity(cursor, cohort_ids=cohort_ids)
+
+        return cohort_ids
+
+    cohort_ids = await execute_write_transaction(delete)
+
+    course_tree_cache.invalidate_course(course_id)
+    leaderboards.invalidate_cohorts(cohort_ids)
 
 
 def delete_all_courses_for_org(org_id: int):
@@ -581,6 +661,8 @@ async def swap_milestone_ordering_for_course(
         params_list=update_params,
     )
 
+    course_tree_cache.invalidate_course(course_id)
+
 
 async def swap_task_ordering_for_course(course_id: int, task_1_id: int, task_2_id: int):
     # First, check if both tasks exist for the course
@@ -610,6 +692,8 @@ async def swap_task_ordering_for_course(course_id: int, task_1_id: int, task_2_i
         params_list=update_params,
     )
 
+    course_tree_cache.invalidate_course(course_id)
+
 
 async def create_course(name: str, org_id: int) -> int:
     org = await get_org_by_id(org_id)
@@ -742,12 +826,97 @@ async def get_course(course_id: int, only_published: bool = True) -> Dict:
     return course_dict
 
 
+async def get_course_with_task_details(
+    course_id: int, only_published: bool = True, include_scorecards: bool = False
+) -> Dict:
+    """
+    Load a course along with the blocks of every learning material and the questions
+    of every quiz in it. Uses a fixed number of queries irrespective of how many
+    tasks the course has, instead of one `get_task` per task.
+    """
+    course = await get_course(course_id, only_published)
+
+    if not course:
+        return None
+
+    learning_materials = await execute_db_operation(
+        f"""SELECT t.id, t.blocks
+            FROM {course_tasks_table_name} ct
+            JOIN {tasks_table_name} t ON ct.task_id = t.id
+            WHERE ct.course_id = ? AND t.type = '{TaskType.LEARNING_MATERIAL}' AND t.deleted_at IS NULL""",
+        (course_id,),
+        fetch_all=True,
+    )
+
+    blocks_by_task_id = {
+        task_id: json.loads(blocks) if blocks else []
+        for task_id, blocks in learning_materials
+    }
+
+    questions = await execute_db_operation(
+        f"""SELECT q.task_id, q.id, q.type, q.blocks, q.answer, q.input_type, q.response_type, qs.scorecard_id, q.context, q.coding_language, q.max_attempts, q.is_feedback_shown, q.title
+            FROM {course_tasks_table_name} ct
+            JOIN {questions_table_name} q ON ct.task_id = q.task_id
+            LEFT JOIN {question_scorecards_table_name} qs ON q.id = qs.question_id
+            WHERE ct.course_id = ?
+            ORDER BY q.task_id, q.position ASC""",
+        (course_id,),
+        fetch_all=True,
+    )
+
+    questions_by_task_id = defaultdict(list)
+    for question in questions:
+        questions_by_task_id[question[0]].append(
+            convert_question_db_to_dict(question[1:])
+        )
+
+    if include_scorecards:
+        scorecards = await execute_db_operation(
+            f"""SELECT DISTINCT s.id, s.title, s.criteria, s.status
+                FROM {course_tasks_table_name} ct
+                JOIN {questions_table_name} q ON ct.task_id = q.task_id
+                JOIN {question_scorecards_table_name} qs ON q.id = qs.question_id
+                JOIN {scorecards_table_name} s ON qs.scorecard_id = s.id
+                WHERE ct.course_id = ?""",
+            (course_id,),
+            fetch_all=True,
+        )
+
+        scorecards_by_id = {
+            scorecard[0]: {
+                "id": scorecard[0],
+                "title": scorecard[1],
+                "criteria": json.loads(scorecard[2]),
+                "status": scorecard[3],
+            }
+            for scorecard in scorecards
+        }
+
+        for task_questions in questions_by_task_id.values():
+            for question in task_questions:
+                if question["scorecard_id"] is not None:
+                    question["scorecard"] = scorecards_by_id.get(
+                        question["scorecard_id"]
+                    )
+
+    for milestone in course["milestones"]:
+        for task in milestone["tasks"]:
+            if task["type"] == TaskType.LEARNING_MATERIAL:
+                task["blocks"] = blocks_by_task_id.get(task["id"], [])
+            else:
+                task["questions"] = questions_by_task_id.get(task["id"], [])
+
+    return course
+
+
 async def update_course_name(course_id: int, name: str):
     await execute_db_operation(
         f"UPDATE {courses_table_name} SET name = ? WHERE id = ?",
         (name, course_id),
     )
 
+    course_tree_cache.invalidate_course(course_id)
+
 
 async def check_and_insert_missing_course_milestones(
     course_tasks_to_add: List[Tuple[int, int, int]],
@@ -791,6 +960,8 @@ async def check_and_insert_missing_course_milestones(
                     (course_id, milestone_id, max_ordering + 1),
                 )
 
+                course_tree_cache.invalidate_course(course_id)
+
 
 async def add_tasks_to_courses(course_tasks_to_add: List[Tuple[int, int, int]]):
     await check_and_insert_missing_course_milestones(course_tasks_to_add)
@@ -825,6 +996,8 @@ async def add_tasks_to_courses(course_tasks_to_add: List[Tuple[int, int, int]]):
 
         await conn.commit()
 
+    course_tree_cache.invalidate_courses(course_to_tasks.keys())
+
 
 async def remove_tasks_from_courses(course_tasks_to_remove: List[Tuple[int, int]]):
     await execute_many_db_operation(
@@ -832,6 +1005,10 @@ async def remove_tasks_from_courses(course_tasks_to_remove: List[Tuple[int, int]
         params_list=course_tasks_to_remove,
     )
 
+    course_tree_cache.invalidate_courses(
+        course_id for _, course_id in course_tasks_to_remove
+    )
+
 
 async def update_task_orders(task_orders: List[Tuple[int, int]]):
     await execute_many_db_operation(
@@ -839,16 +1016,16 @@ async def update_task_orders(task_orders: List[Tuple[int, int]]):
         params_list=task_orders,
     )
 
+    # orders are keyed by course_tasks row ids, which the cache does not track
+    course_tree_cache.invalidate_all()
+
 
 async def add_milestone_to_course(
     course_id: int, milestone_name: str, milestone_color: str
 ) -> Tuple[int, int]:
     org_id = await get_org_id_for_course(course_id)
 
-    # Wrap the entire operation in a transaction
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
+    async def insert_milestone(cursor):
         # Get the max ordering value for this course
         await cursor.execute(
             f"INSERT INTO {milestones_table_name} (name, color, org_id) VALUES (?, ?, ?)",
@@ -871,10 +1048,175 @@ async def add_milestone_to_course(
             (course_id, milestone_id, next_order),
         )
 
-        await conn.commit()
-
         return milestone_id, next_order
 
+    # Wrap the entire operation in a transaction
+    milestone_id, next_order = await execute_write_transaction(insert_milestone)
+
+    course_tree_cache.invalidate_course(course_id)
+
+    return milestone_id, next_order
+
+
+async def add_generated_course_items(
+    course_id: int, modules: List[Dict], tasks: List[Dict], job_uuid: str = None
+) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Add a batch of the modules and draft tasks of a course being generated in a
+    single transaction, returning the (id, ordering) of each module and task.
+
+    Each module has a "name" and "color". Each task has a "name", a "type" and
+    either the "milestone_id" of a module added before or the "module_index" of
+    its module in `modules`. Modules are added at the end of the course and tasks
+    at the end of their module, in the order given.
+
+    The ids of what is added are recorded in the details of the course generation
+    job `job_uuid`, if given, so that a retry of the job can remove them first
+    (see `remove_generated_course_items`).
+    """
+    org_id = await get_org_id_for_course(course_id)
+
+    async def insert_items(cursor):
+        await cursor.execute(
+            f"SELECT COALESCE(MAX(ordering), -1) FROM {course_milestones_table_name} WHERE course_id = ?",
+            (course_id,),
+        )
+        next_module_ordering = (await cursor.fetchone())[0] + 1
+
+        module_rows = []
+        for module in modules:
+            await cursor.execute(
+                f"INSERT INTO {milestones_table_name} (name, color, org_id) VALUES (?, ?, ?)",
+                (module["name"], module["color"], org_id),
+            )
+            module_rows.append((cursor.lastrowid, next_module_ordering))
+            next_module_ordering += 1
+
+        await cursor.executemany(
+            f"INSERT INTO {course_milestones_table_name} (course_id, milestone_id, ordering) VALUES (?, ?, ?)",
+            [(course_id, module_id, ordering) for module_id, ordering in module_rows],
+        )
+
+        # the next ordering of each module and the number of tasks shown before it
+        next_task_orderings = {module_id: (0, 0) for module_id, _ in module_rows}
+
+        task_rows = []
+        course_task_rows = []
+        for task in tasks:
+            if "module_index" in task:
+                milestone_id = module_rows[task["module_index"]][0]
+            else:
+                milestone_id = task["milestone_id"]
+
+            if milestone_id not in next_task_orderings:
+                await cursor.execute(
+                    f"""SELECT COALESCE(MAX(ct.ordering), -1), COUNT(t.id)
+                    FROM {course_tasks_table_name} ct
+                    LEFT JOIN {tasks_table_name} t ON ct.task_id = t.id AND t.deleted_at IS NULL
+                    WHERE ct.course_id = ? AND ct.milestone_id = ?""",
+                    (course_id, milestone_id),
+                )
+                max_ordering, num_visible = await cursor.fetchone()
+                next_task_orderings[milestone_id] = (max_ordering + 1, num_visible)
+
+            ordering, visible_ordering = next_task_orderings[milestone_id]
+            next_task_orderings[milestone_id] = (ordering + 1, visible_ordering + 1)
+
+            await cursor.execute(
+                f"INSERT INTO {tasks_table_name} (org_id, type, title, status) VALUES (?, ?, ?, ?)",
+                (org_id, str(task["type"]), task["name"], str(TaskStatus.DRAFT)),
+            )
+            task_rows.append((cursor.lastrowid, visible_ordering))
+            course_task_rows.append(
+                (course_id, cursor.lastrowid, milestone_id, ordering)
+            )
+
+        await cursor.executemany(
+            f"INSERT INTO {course_tasks_table_name} (course_id, task_id, milestone_id, ordering) VALUES (?, ?, ?, ?)",
+            course_task_rows,
+        )
+
+        if job_uuid is not None:
+            await cursor.execute(
+                f"SELECT job_details FROM {course_generation_jobs_table_name} WHERE uuid = ?",
+                (job_uuid,),
+            )
+            job_details = json.loads((await cursor.fetchone())[0])
+
+            job_details["generated_module_ids"] = job_details.get(
+                "generated_module_ids", []
+            ) + [module_id for module_id, _ in module_rows]
+            job_details["generated_task_ids"] = job_details.get(
+                "generated_task_ids", []
+            ) + [task_id for task_id, _ in task_rows]
+
+            await cursor.execute(
+                f"UPDATE {course_generation_jobs_table_name} SET job_details = ? WHERE uuid = ?",
+                (json.dumps(job_details), job_uuid),
+            )
+
+        return module_rows, task_rows
+
+    module_rows, task_rows = await execute_write_transaction(insert_items)
+
+    course_tree_cache.invalidate_course(course_id)
+
+    return module_rows, task_rows
+
+
+async def remove_generated_course_items(job_uuid: str) -> Dict:
+    """
+    Remove the modules and draft tasks that an earlier attempt of a course
+    generation job added to its course, so that the structure can be generated
+    again from scratch. Returns the details of the job without their ids.
+    """
+
+    async def remove_items(cursor):
+        await cursor.execute(
+            f"SELECT course_id, job_details FROM {course_generation_jobs_table_name} WHERE uuid = ?",
+            (job_uuid,),
+        )
+        course_id, job_details = await cursor.fetchone()
+        job_details = json.loads(job_details)
+
+        module_ids = job_details.pop("generated_module_ids", [])
+        task_ids = job_details.pop("generated_task_ids", [])
+
+        if task_ids:
+            task_placeholders = ",".join(["?"] * len(task_ids))
+            await cursor.execute(
+                f"DELETE FROM {course_tasks_table_name} WHERE course_id = ? AND task_id IN ({task_placeholders})",
+                (course_id, *task_ids),
+            )
+            await cursor.execute(
+                f"UPDATE {tasks_table_name} SET deleted_at = ? WHERE id IN ({task_placeholders}) AND deleted_at IS NULL",
+                (datetime.now(), *task_ids),
+            )
+
+        if module_ids:
+            module_placeholders = ",".join(["?"] * len(module_ids))
+            await cursor.execute(
+                f"DELETE FROM {course_milestones_table_name} WHERE course_id = ? AND milestone_id IN ({module_placeholders})",
+                (course_id, *module_ids),
+            )
+            await cursor.execute(
+                f"DELETE FROM {milestones_table_name} WHERE id IN ({module_placeholders})",
+                module_ids,
+            )
+
+        await cursor.execute(
+            f"UPDATE {course_generation_jobs_table_name} SET job_details = ? WHERE uuid = ?",
+            (json.dumps(job_details), job_uuid),
+        )
+
+        return course_id, job_details
+
+    course_id, job_details = await execute_write_transaction(remove_items)
+
+    course_tree_cache.invalidate_course(course_id)
+
+    return job_details
+
 
 async def update_milestone_orders(milestone_orders: List[Tuple[int, int]]):
     await execute_many_db_operation(
@@ -882,6 +1224,9 @@ async def update_milestone_orders(milestone_orders: List[Tuple[int, int]]):
         params_list=milestone_orders,
     )
 
+    # orders are keyed by course_milestones row ids, which the cache does not track
+    course_tree_cache.invalidate_all()
+
 
 async def get_user_courses(user_id: int) -> List[Dict]:
     """
@@ -895,67 +1240,52 @@ async def get_user_courses(user_id: int) -> List[Dict]:
     Returns:
         List of course dictionaries with their details and user's role
     """
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
+    # Resolve every (course, role) pair the user has access to in one query: the
+    # courses of each cohort the user is a member of, followed by every course in the
+    # organizations where the user is an admin or owner
+    rows = await execute_db_operation(
+        f"""
+        SELECT c.id, c.name, o.id, o.name, o.slug, access.role, access.cohort_id
+        FROM (
+            SELECT cc.course_id, uc.role, uc.cohort_id, 0 AS source, uc.id AS membership_order, cc.id AS course_order
+            FROM {user_cohorts_table_name} uc
+            JOIN {cohorts_table_name} ch ON ch.id = uc.cohort_id
+            JOIN {course_cohorts_table_name} cc ON cc.cohort_id = uc.cohort_id
+            WHERE uc.user_id = ?
+            UNION ALL
+            SELECT oc.id, 'admin', NULL, 1, -uo.id, -oc.id
+            FROM {user_organizations_table_name} uo
+            JOIN {courses_table_name} oc ON oc.org_id = uo.org_id
+            WHERE uo.user_id = ? AND uo.role IN ('admin', 'owner')
+        ) access
+        JOIN {courses_table_name} c ON c.id = access.course_id
+        JOIN {organizations_table_name} o ON c.org_id = o.id
+        ORDER BY access.source, access.membership_order, access.course_order
+        """,
+        (user_id, user_id),
+        fetch_all=True,
+    )
 
-        # Get all courses where the user is a learner or mentor through cohorts
-        user_cohorts = await get_user_cohorts(user_id)
-
-        # Dictionary to track user's role in each course
-        course_roles = {}
-        course_to_cohort = {}
-
-        # Add courses from user's cohorts with their roles
-        for cohort in user_cohorts:
-            cohort_id = cohort["id"]
-            user_role_in_cohort = cohort.get("role")  # Get user's role in this cohort
-
-            cohort_courses = await get_courses_for_cohort(cohort_id)
-            for course in cohort_courses:
-                course_id = course["id"]
-                course_to_cohort[course_id] = cohort_id
-
-                # Only update role if not already an admin/owner
-                if course_id not in course_roles or course_roles[course_id] not in [
-                    "admin",
-                    "owner",
-                ]:
-                    course_roles[course_id] = user_role_in_cohort
-
-        # Get organizations where the user is an admin or owner
-        user_orgs = await get_user_organizations(user_id)
-        admin_owner_org_ids = [
-            org["id"] for org in user_orgs if org["role"] in ["admin", "owner"]
-        ]
+    courses = {}
 
-        # Add all courses from organizations where user is admin or owner
-        for org_id in admin_owner_org_ids:
-            org_courses = await get_all_courses_for_org(org_id)
-            for course in org_courses:
-                course_id = course["id"]
-                # Admin/owner role takes precedence
-                course_roles[course_id] = "admin"
-
-        # If no courses found, return empty list
-        if not course_roles:
-            return []
-
-        # Fetch detailed information for all course IDs
-        courses = []
-        for course_id, role in course_roles.items():
-            # Fetch course from DB including org_id
-            await cursor.execute(
-                f"SELECT c.id, c.name, o.id, o.name, o.slug FROM {courses_table_name} c JOIN {organizations_table_name} o ON c.org_id = o.id WHERE c.id = ?",
-                (course_id,),
-            )
-            course_row = await cursor.fetchone()
-            if course_row:
-                course_dict = convert_course_db_to_dict(course_row)
-                course_dict["role"] = role  # Add user's role to the course dictionary
+    for row in rows:
+        course_id, role, cohort_id = row[0], row[5], row[6]
 
-                if role == group_role_learner:
-                    course_dict["cohort_id"] = course_to_cohort[course_id]
+        if course_id not in courses:
+            courses[course_id] = convert_course_db_to_dict(row[:5])
 
-                courses.append(course_dict)
+        course_dict = courses[course_id]
 
-        return courses
+        if role == "admin":
+            # Admin/owner role takes precedence
+            course_dict["role"] = "admin"
+            course_dict.pop("cohort_id", None)
+        elif course_dict.get("role") not in ["admin", "owner"]:
+            course_dict["role"] = role
+
+            if role == group_role_learner:
+                course_dict["cohort_id"] = cohort_id
+            else:
+                course_dict.pop("cohort_id", None)
+
+    return list(courses.values())
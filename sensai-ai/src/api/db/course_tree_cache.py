@@ -0,0 +1,141 @@
+import copy
+from collections import OrderedDict
+from typing import Dict, Iterable, Set, Tuple
+from api.config import course_tree_cache_max_size
+from api.db.cache_sync import cache_sync, shared
+
+
+class CourseTreeCache:
+    """
+    In-process cache of the published course trees shown to learners, keyed by course
+    id. Every course has a version stamp that is bumped whenever something the tree
+    depends on changes, so a tree that was being built while it was invalidated is
+    never served. Trees are invalidated by course, by task or by milestone id; the
+    latter two are resolved through the ids recorded when each tree was cached, in
+    every process that the invalidation is replayed in.
+    """
+
+    def __init__(self, max_size: int = course_tree_cache_max_size):
+        self.max_size = max_size
+        self._global_version = 0
+        self._course_versions: Dict[int, int] = {}
+        self._trees: OrderedDict[int, Tuple[Tuple[int, int], Dict]] = OrderedDict()
+        self._course_task_ids: Dict[int, Set[int]] = {}
+        self._course_milestone_ids: Dict[int, Set[int]] = {}
+        self._task_to_courses: Dict[int, Set[int]] = {}
+        self._milestone_to_courses: Dict[int, Set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_version(self, course_id: int) -> Tuple[int, int]:
+        return (self._global_version, self._course_versions.get(course_id, 0))
+
+    def is_current(self, course_id: int, version: Tuple[int, int]) -> bool:
+        """Whether nothing in the course has changed since `version`."""
+        return version == self.get_version(course_id)
+
+    def get(self, course_id: int) -> Dict | None:
+        """Return a copy of the cached tree for the course, if it is still current."""
+        entry = self._trees.get(course_id)
+
+        if entry is None or entry[0] != self.get_version(course_id):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._trees.move_to_end(course_id)
+
+        # callers decorate the tree (e.g. with unlock dates) so never hand out the original
+        return copy.deepcopy(entry[1])
+
+    def set(
+        self,
+        course_id: int,
+        version: Tuple[int, int],
+        tree: Dict,
+        task_ids: Iterable[int],
+        milestone_ids: Iterable[int],
+    ):
+        """
+        Cache the tree for a course, built from data read at `version` (as returned by
+        `get_version` before reading). `task_ids` and `milestone_ids` should cover
+        everything in the course, published or not, that can change the tree.
+        """
+        if version != self.get_version(course_id):
+            # invalidated while it was being built
+            return
+
+        self._remove(course_id)
+
+        self._trees[course_id] = (version, copy.deepcopy(tree))
+        self._course_task_ids[course_id] = set(task_ids)
+        self._course_milestone_ids[course_id] = set(milestone_ids)
+
+        for task_id in self._course_task_ids[course_id]:
+            self._task_to_courses.setdefault(task_id, set()).add(course_id)
+
+        for milestone_id in self._course_milestone_ids[course_id]:
+            self._milestone_to_courses.setdefault(milestone_id, set()).add(course_id)
+
+        while len(self._trees) > self.max_size:
+            self._remove(next(iter(self._trees)))
+
+    def _remove(self, course_id: int):
+        if self._trees.pop(course_id, None) is None:
+            return
+
+        for ids, index in (
+            (self._course_task_ids.pop(course_id), self._task_to_courses),
+            (self._course_milestone_ids.pop(course_id), self._milestone_to_courses),
+        ):
+            for key in ids:
+                index[key].discard(course_id)
+                if not index[key]:
+                    del index[key]
+
+    @shared
+    def invalidate_course(self, course_id: int):
+        self._course_versions[course_id] = self._course_versions.get(course_id, 0) + 1
+        self._remove(course_id)
+
+    @shared
+    def invalidate_courses(self, course_ids: Iterable[int]):
+        for course_id in set(course_ids):
+            self.invalidate_course(course_id)
+
+    @shared
+    def invalidate_tasks(self, task_ids: Iterable[int]):
+        course_ids = set()
+        for task_id in task_ids:
+            course_ids |= self._task_to_courses.get(task_id, set())
+
+        self.invalidate_courses(course_ids)
+
+    @shared
+    def invalidate_task(self, task_id: int):
+        self.invalidate_tasks([task_id])
+
+    @shared
+    def invalidate_milestone(self, milestone_id: int):
+        self.invalidate_courses(self._milestone_to_courses.get(milestone_id, set()))
+
+    @shared
+    def invalidate_all(self):
+        self._global_version += 1
+        self._trees.clear()
+        self._course_task_ids.clear()
+        self._course_milestone_ids.clear()
+        self._task_to_courses.clear()
+        self._milestone_to_courses.clear()
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._trees),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+course_tree_cache = CourseTreeCache()
+cache_sync.register("course_tree", course_tree_cache)
@@ -0,0 +1,279 @@
+from typing import Callable, Dict, List
+from api.config import (
+    job_queue_table_name,
+    courses_table_name,
+    course_generation_jobs_table_name,
+    task_generation_jobs_table_name,
+    job_lease_seconds,
+    job_max_attempts,
+    job_retention_days,
+    llm_org_max_concurrency,
+    course_structure_job_priority,
+    task_generation_job_priority,
+)
+from api.models import (
+    JobKind,
+    JobStatus,
+    GenerateCourseJobStatus,
+    GenerateTaskJobStatus,
+)
+from api.utils.db import execute_db_operation
+from api.utils.logging import logger
+
+JOB_COLUMNS = "id, kind, job_uuid, org_id, priority, attempts, max_attempts"
+
+# called whenever jobs are queued by this process, so that a worker running in it
+# picks them up right away instead of on its next poll
+_enqueue_listeners: List[Callable[[], None]] = []
+
+
+def add_enqueue_listener(listener: Callable[[], None]):
+    _enqueue_listeners.append(listener)
+
+
+def remove_enqueue_listener(listener: Callable[[], None]):
+    if listener in _enqueue_listeners:
+        _enqueue_listeners.remove(listener)
+
+
+def notify_job_enqueued():
+    for listener in _enqueue_listeners:
+        try:
+            listener()
+        except Exception as exception:
+            logger.error(f"Error notifying job queue listener: {exception}")
+
+
+def convert_job_db_to_dict(job: tuple) -> Dict:
+    return {
+        "id": job[0],
+        "kind": job[1],
+        "job_uuid": job[2],
+        "org_id": job[3],
+        "priority": job[4],
+        "attempts": job[5],
+        "max_attempts": job[6],
+    }
+
+
+async def enqueue_job(
+    cursor, kind: JobKind, job_uuid: str, course_id: int, priority: int
+):
+    """
+    Queue a job on the transaction of `cursor`, so that the job is queued if and only
+    if the row it runs from is stored. Call `notify_job_enqueued` once committed.
+    """
+    await cursor.execute(
+        f"""INSERT INTO {job_queue_table_name} (kind, job_uuid, org_id, priority, status, max_attempts)
+        SELECT ?, ?, org_id, ?, ?, ? FROM {courses_table_name} WHERE id = ?""",
+        (
+            str(kind),
+            job_uuid,
+            priority,
+            str(JobStatus.QUEUED),
+            job_max_attempts,
+            course_id,
+        ),
+    )
+
+
+async def enqueue_started_generation_jobs(cursor):
+    """Queue the generation jobs that were still running when the queue was created."""
+    for kind, jobs_table_name, status, priority in [
+        (
+            JobKind.COURSE_STRUCTURE,
+            course_generation_jobs_table_name,
+            GenerateCourseJobStatus.STARTED,
+            course_structure_job_priority,
+        ),
+        (
+            JobKind.TASK,
+            task_generation_jobs_table_name,
+            GenerateTaskJobStatus.STARTED,
+            task_generation_job_priority,
+        ),
+    ]:
+        await cursor.execute(
+            f"""INSERT INTO {job_queue_table_name} (kind, job_uuid, org_id, priority, status, max_attempts)
+            SELECT ?, jobs.uuid, c.org_id, ?, ?, ?
+            FROM {jobs_table_name} jobs
+            JOIN {courses_table_name} c ON c.id = jobs.course_id
+            WHERE jobs.status = ?
+            ORDER BY jobs.id""",
+            (
+                str(kind),
+                priority,
+                str(JobStatus.QUEUED),
+                job_max_attempts,
+                str(status),
+            ),
+        )
+
+
+async def lease_jobs(
+    worker_id: str,
+    limit: int,
+    lease_seconds: int = job_lease_seconds,
+    org_max_running: int = llm_org_max_concurrency,
+) -> List[Dict]:
+    """
+    Lease up to `limit` jobs for the worker in one statement, so that no two workers
+    can lease the same job. Jobs are due once queued and past their backoff, or once
+    the worker that leased them stopped renewing the lease. Each lease uses up one
+    attempt.
+
+    Higher priority jobs go first, and jobs of the same priority are taken in turn
+    from each org (oldest first within an org), with no org ever running more than
+    `org_max_running` jobs at once, so that one org's large course does not hold up
+    everyone else's.
+    """
+    jobs = await execute_db_operation(
+        f"""UPDATE {job_queue_table_name}
+        SET status = ?, lease_owner = ?, lease_expires_at = datetime('now', ?),
+            attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT
+                    id,
+                    priority,
+                    ROW_NUMBER() OVER (PARTITION BY org_id ORDER BY priority DESC, id) + (
+                        SELECT COUNT(*) FROM {job_queue_table_name} running
+                        WHERE running.org_id IS due.org_id AND running.status = ?
+                        AND running.lease_expires_at > datetime('now')
+                    ) AS org_position
+                FROM {job_queue_table_name} due
+                WHERE (
+                    (status = ? AND available_at <= datetime('now'))
+                    OR (status = ? AND lease_expires_at <= datetime('now'))
+                )
+                AND attempts < max_attempts
+            )
+            WHERE org_position <= ?
+            ORDER BY priority DESC, org_position, id
+            LIMIT ?
+        )
+        RETURNING {JOB_COLUMNS}""",
+        (
+            str(JobStatus.LEASED),
+            worker_id,
+            f"+{lease_seconds} seconds",
+            str(JobStatus.LEASED),
+            str(JobStatus.QUEUED),
+            str(JobStatus.LEASED),
+            org_max_running,
+            limit,
+        ),
+        fetch_all=True,
+    )
+
+    return sorted(
+        [convert_job_db_to_dict(job) for job in jobs],
+        key=lambda job: (-job["priority"], job["id"]),
+    )
+
+
+async def renew_job_lease(
+    job_id: int, worker_id: str, lease_seconds: int = job_lease_seconds
+) -> bool:
+    """Extend the worker's lease on the job, returning False if it has lost it."""
+    job = await execute_db_operation(
+        f"""UPDATE {job_queue_table_name}
+        SET lease_expires_at = datetime('now', ?), updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND lease_owner = ? AND status = ?
+        RETURNING id""",
+        (f"+{lease_seconds} seconds", job_id, worker_id, str(JobStatus.LEASED)),
+        fetch_one=True,
+    )
+
+    return job is not None
+
+
+async def complete_job(job_id: int, worker_id: str):
+    await execute_db_operation(
+        f"""UPDATE {job_queue_table_name}
+        SET status = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND lease_owner = ? AND status = ?""",
+        (str(JobStatus.COMPLETED), job_id, worker_id, str(JobStatus.LEASED)),
+    )
+
+
+async def fail_job(job_id: int, worker_id: str, error: str, retry_delay: float) -> bool:
+    """
+    Record a failed attempt of the job, queueing it to be retried after `retry_delay`
+    seconds if it has attempts left. Returns whether the job will run again, which
+    is also the case if another worker has since taken over its lease.
+    """
+    job = await execute_db_operation(
+        f"""UPDATE {job_queue_table_name}
+        SET status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,
+            available_at = datetime('now', ?), lease_owner = NULL, lease_expires_at = NULL,
+            last_error = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND lease_owner = ? AND status = ?
+        RETURNING status""",
+        (
+            str(JobStatus.QUEUED),
+            str(JobStatus.FAILED),
+            f"+{int(retry_delay)} seconds",
+            error,
+            job_id,
+            worker_id,
+            str(JobStatus.LEASED),
+        ),
+        fetch_one=True,
+    )
+
+    return job is None or job[0] == str(JobStatus.QUEUED)
+
+
+async def release_job(job_id: int, worker_id: str):
+    """Hand the job back to the queue without using up an attempt, e.g. on shutdown."""
+    await execute_db_operation(
+        f"""UPDATE {job_queue_table_name}
+        SET status = ?, attempts = MAX(attempts - 1, 0), available_at = CURRENT_TIMESTAMP,
+            lease_owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND lease_owner = ? AND status = ?""",
+        (str(JobStatus.QUEUED), job_id, worker_id, str(JobStatus.LEASED)),
+    )
+
+
+async def fail_expired_jobs() -> List[Dict]:
+    """
+    Mark the jobs whose lease ran out on their last attempt as failed (their worker
+    died or kept timing out), returning them.
+    """
+    jobs = await execute_db_operation(
+        f"""UPDATE {job_queue_table_name}
+        SET status = ?, lease_owner = NULL, lease_expires_at = NULL,
+            last_error = 'lease expired', updated_at = CURRENT_TIMESTAMP
+        WHERE status = ? AND lease_expires_at <= datetime('now') AND attempts >= max_attempts
+        RETURNING {JOB_COLUMNS}""",
+        (str(JobStatus.FAILED), str(JobStatus.LEASED)),
+        fetch_all=True,
+    )
+
+    return [convert_job_db_to_dict(job) for job in jobs]
+
+
+async def delete_finished_jobs(retention_days: int = job_retention_days):
+    await execute_db_operation(
+        f"""DELETE FROM {job_queue_table_name}
+        WHERE status IN (?, ?) AND updated_at < datetime('now', ?)""",
+        (
+            str(JobStatus.COMPLETED),
+            str(JobStatus.FAILED),
+            f"-{retention_days} days",
+        ),
+    )
+
+
+async def get_job_queue_metrics() -> Dict:
+    rows = await execute_db_operation(
+        f"""SELECT kind, status, COUNT(*) FROM {job_queue_table_name} GROUP BY kind, status""",
+        fetch_all=True,
+    )
+
+    metrics = {str(kind): {str(status): 0 for status in JobStatus} for kind in JobKind}
+    for kind, status, count in rows:
+        metrics.setdefault(kind, {})[status] = count
+
+    return metrics
@@ -0,0 +1,429 @@
+import bisect
+import contextlib
+import json
+import os
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+from api.config import leaderboard_max_cohorts
+from api.db.cache_sync import cache_sync, shared
+from api.db.course_tree_cache import course_tree_cache
+from api.models import LeaderboardViewType
+from api.utils.logging import logger
+
+ist_timezone = timezone(timedelta(hours=5, minutes=30))
+
+
+def get_ist_today() -> date:
+    return datetime.now(ist_timezone).date()
+
+
+def get_window_start(view: LeaderboardViewType, today: date) -> date | None:
+    """First day counted towards streaks for the view (weeks start on Monday)."""
+    if view == LeaderboardViewType.WEEKLY:
+        return today - timedelta(days=today.weekday())
+    if view == LeaderboardViewType.MONTHLY:
+        return today.replace(day=1)
+    return None
+
+
+class CohortLeaderboard:
+    """
+    Streaks and task completions of every learner of a cohort, kept up to date from
+    activity and completion events so that rankings never rescan history.
+
+    A learner's streak is stored as the first and last day of their latest run of
+    consecutive active days, which is enough to get the current streak for any
+    window. Completions are stored as sets so that replaying an event is harmless.
+    Rankings are kept sorted per view and only re-sorted from scratch when the day
+    changes, since that is when streaks lapse.
+    """
+
+    def __init__(
+        self,
+        learners: Dict[int, Dict],
+        learning_material_task_ids: Iterable[int],
+        quiz_question_ids: Dict[int, List[int]],
+        course_versions: Dict[int, Tuple[int, int]],
+    ):
+        self.learners = learners
+        self.learning_material_task_ids = set(learning_material_task_ids)
+        self.quiz_question_ids = {
+            task_id: set(question_ids)
+            for task_id, question_ids in quiz_question_ids.items()
+        }
+        self.question_to_task = {
+            question_id: task_id
+            for task_id, question_ids in self.quiz_question_ids.items()
+            for question_id in question_ids
+        }
+        self.course_versions = course_versions
+        self.streaks: Dict[int, Tuple[date, date]] = {}
+        self.completed_task_ids: Dict[int, Set[int]] = {
+            user_id: set() for user_id in learners
+        }
+        self.completed_question_ids: Dict[int, Set[int]] = {
+            user_id: set() for user_id in learners
+        }
+        self._ranked_on: date | None = None
+        self._rankings: Dict[str, List[Tuple]] = {}
+        self._ranking_keys: Dict[str, Dict[int, Tuple]] = {}
+
+    @property
+    def num_tasks(self) -> int:
+        return len(self.learning_material_task_ids) + len(self.quiz_question_ids)
+
+    def is_current(self) -> bool:
+        """Whether none of the cohort's courses have changed since the board was built."""
+        return all(
+            course_tree_cache.is_current(course_id, version)
+            for course_id, version in self.course_versions.items()
+        )
+
+    def record_activity(self, user_id: int, ist_date: date):
+        if user_id not in self.learners:
+            return
+
+        streak = self.streaks.get(user_id)
+
+        if streak is None or ist_date > streak[1] + timedelta(days=1):
+            streak = (ist_date, ist_date)
+        elif ist_date == streak[1] + timedelta(days=1):
+            streak = (streak[0], ist_date)
+        elif ist_date == streak[0] - timedelta(days=1):
+            streak = (ist_date, streak[1])
+        else:
+            # already part of the streak (or too old to change it)
+            return
+
+        self.streaks[user_id] = streak
+        self._update_ranking(user_id)
+
+    def record_completion(
+        self, user_id: int, task_id: int = None, question_id: int = None
+    ):
+        if user_id not in self.learners:
+            return
+
+        completed_task_ids = self.completed_task_ids[user_id]
+        num_completed = len(completed_task_ids)
+
+        if task_id in self.learning_material_task_ids:
+            completed_task_ids.add(task_id)
+
+        if question_id in self.question_to_task:
+            self.completed_question_ids[user_id].add(question_id)
+            quiz_id = self.question_to_task[question_id]
+
+            if self.quiz_question_ids[quiz_id] <= self.completed_question_ids[user_id]:
+                completed_task_ids.add(quiz_id)
+
+        if len(completed_task_ids) != num_completed:
+            self._update_ranking(user_id)
+
+    def get_streak_count(
+        self, user_id: int, view: LeaderboardViewType, today: date
+    ) -> int:
+        streak = self.streaks.get(user_id)
+
+        if streak is None or streak[1] < today - timedelta(days=1):
+            # the learner was not active today or yesterday, so the streak is broken
+            return 0
+
+        start = streak[0]
+        window_start = get_window_start(view, today)
+        if window_start is not None and window_start > start:
+            start = window_start
+
+        return max((streak[1] - start).days + 1, 0)
+
+    def _get_ranking_key(self, user_id: int, view: LeaderboardViewType, today: date):
+        # highest streak first, then most tasks completed; ties keep the learners' order
+        return (
+            -self.get_streak_count(user_id, view, today),
+            -len(self.completed_task_ids[user_id]),
+            user_id,
+        )
+
+    def _update_ranking(self, user_id: int):
+        if self._ranked_on is None:
+            return
+
+        for view_name, ranking in self._rankings.items():
+            view = LeaderboardViewType(view_name)
+            keys = self._ranking_keys[view_name]
+
+            old_key = keys[user_id]
+            del ranking[bisect.bisect_left(ranking, old_key)]
+
+            keys[user_id] = self._get_ranking_key(user_id, view, self._ranked_on)
+            bisect.insort(ranking, keys[user_id])
+
+    def get_rankings(self, view: LeaderboardViewType, today: date = None) -> List[Dict]:
+        today = today or get_ist_today()
+
+        if self._ranked_on != today:
+            self._ranked_on = today
+            self._rankings.clear()
+            self._ranking_keys.clear()
+
+        view_name = str(view)
+
+        if view_name not in self._rankings:
+            keys = {
+                user_id: self._get_ranking_key(user_id, view, today)
+                for user_id in self.learners
+            }
+            self._ranking_keys[view_name] = keys
+            self._rankings[view_name] = sorted(keys.values())
+
+        return [
+            {
+                "user": self.learners[user_id],
+                "streak_count": -streak_key,
+                "tasks_completed": -tasks_key,
+            }
+            for streak_key, tasks_key, user_id in self._rankings[view_name]
+        ]
+
+    def dump(self) -> Dict:
+        return {
+            "learners": [self.learners[user_id] for user_id in self.learners],
+            "learning_material_task_ids": sorted(self.learning_material_task_ids),
+            "quiz_question_ids": {
+                task_id: sorted(question_ids)
+                for task_id, question_ids in self.quiz_question_ids.items()
+            },
+            "streaks": {
+                user_id: [start.isoformat(), end.isoformat()]
+                for user_id, (start, end) in self.streaks.items()
+            },
+            "completed_task_ids": {
+                user_id: sorted(task_ids)
+                for user_id, task_ids in self.completed_task_ids.items()
+                if task_ids
+            },
+            "completed_question_ids": {
+                user_id: sorted(question_ids)
+                for user_id, question_ids in self.completed_question_ids.items()
+                if question_ids
+            },
+        }
+
+    @classmethod
+    def load(cls, data: Dict) -> "CohortLeaderboard":
+        """
+        Restore a dumped board. Its course versions are unknown until it has been
+        checked against the cohort's courses, so it is not current until then.
+        """
+        board = cls(
+            {learner["id"]: learner for learner in data["learners"]},
+            data["learning_material_task_ids"],
+            {
+                int(task_id): question_ids
+                for task_id, question_ids in data["quiz_question_ids"].items()
+            },
+            {},
+        )
+
+        for user_id, (start, end) in data["streaks"].items():
+            board.streaks[int(user_id)] = (
+                date.fromisoformat(start),
+                date.fromisoformat(end),
+            )
+
+        for user_id, task_ids in data["completed_task_ids"].items():
+            board.completed_task_ids[int(user_id)].update(task_ids)
+
+        for user_id, question_ids in data["completed_question_ids"].items():
+            board.completed_question_ids[int(user_id)].update(question_ids)
+
+        return board
+
+
+class LeaderboardCache:
+    """
+    Leaderboards of the most recently viewed cohorts. Events are applied to the
+    boards that are loaded, and buffered for boards that are being built so that
+    nothing that happens while a board is read from the database is lost. Events
+    and invalidations are replayed in every process, so that the boards of each
+    stay in step with the activity of the learners whichever process records it.
+    """
+
+    def __init__(self, max_size: int = leaderboard_max_cohorts):
+        self.max_size = max_size
+        self._versions: Dict[int, int] = {}
+        self._boards: OrderedDict[int, CohortLeaderboard] = OrderedDict()
+        # boards restored from a snapshot that have not been checked yet
+        self._restored: Dict[int, CohortLeaderboard] = {}
+        self._pending_events: Dict[int, List[Tuple]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_version(self, cohort_id: int) -> int:
+        return self._versions.get(cohort_id, 0)
+
+    def get(self, cohort_id: int) -> CohortLeaderboard | None:
+        board = self._boards.get(cohort_id)
+
+        if board is None or not board.is_current():
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._boards.move_to_end(cohort_id)
+        return board
+
+    def pop_restored(self, cohort_id: int) -> CohortLeaderboard | None:
+        return self._restored.pop(cohort_id, None)
+
+    def start_build(self, cohort_id: int) -> int:
+        """Start buffering events for the cohort; returns the version to `set` the board at."""
+        self._pending_events.setdefault(cohort_id, [])
+        return self.get_version(cohort_id)
+
+    def finish_build(self, cohort_id: int):
+        self._pending_events.pop(cohort_id, None)
+
+    def set(self, cohort_id: int, version: int, board: CohortLeaderboard):
+        """
+        Store a board built since `start_build` returned `version`, after replaying
+        the events that arrived while it was being built.
+        """
+        for event, args in self._pending_events.pop(cohort_id, []):
+            getattr(board, event)(*args)
+
+        if version != self.get_version(cohort_id):
+            # invalidated while it was being built
+            return
+
+        self._boards[cohort_id] = board
+        self._boards.move_to_end(cohort_id)
+
+        while len(self._boards) > self.max_size:
+            self._boards.popitem(last=False)
+
+    def _dispatch(self, cohort_id: int, event: str, *args):
+        if cohort_id in self._pending_events:
+            self._pending_events[cohort_id].append((event, args))
+
+        for boards in (self._boards, self._restored):
+            if cohort_id in boards:
+                getattr(boards[cohort_id], event)(*args)
+
+    @shared
+    def record_activity(self, user_id: int, activity: Iterable[Tuple[int, str]]):
+        """`activity` has the (cohort id, IST date) rows the user was active on."""
+        for cohort_id, ist_date in activity:
+            self._dispatch(
+                cohort_id, "record_activity", user_id, date.fromisoformat(ist_date)
+            )
+
+    @shared
+    def record_completion(
+        self,
+        user_id: int,
+        cohort_ids: Iterable[int],
+        task_id: int = None,
+        question_id: int = None,
+    ):
+        for cohort_id in set(cohort_ids):
+            self._dispatch(
+                cohort_id, "record_completion", user_id, task_id, question_id
+            )
+
+    @shared
+    def invalidate_cohort(self, cohort_id: int):
+        self._versions[cohort_id] = self.get_version(cohort_id) + 1
+        self._boards.pop(cohort_id, None)
+        self._restored.pop(cohort_id, None)
+
+    @shared
+    def invalidate_cohorts(self, cohort_ids: Iterable[int]):
+        for cohort_id in set(cohort_ids):
+            self.invalidate_cohort(cohort_id)
+
+    @shared
+    def invalidate_user(self, user_id: int):
+        """Drop the boards the user is a learner in, e.g. after their name changes."""
+        self.invalidate_cohorts(
+            [
+                cohort_id
+                for boards in (self._boards, self._restored)
+                for cohort_id, board in boards.items()
+                if user_id in board.learners
+            ]
+        )
+
+    @shared
+    def invalidate_all(self):
+        self.invalidate_cohorts(
+            list(self._boards)
+            + list(self._restored)
+            + list(self._versions)
+            + list(self._pending_events)
+        )
+
+    def save_snapshot(self, path: str):
+        """
+        Write the loaded boards to `path` so that they survive a restart. The file is
+        written under a name of this process' own first and then moved in place, so
+        that processes shutting down together never interleave their writes.
+        """
+        boards = {**self._restored, **self._boards}
+        process_path = f"{path}.{os.getpid()}"
+
+        try:
+            with open(process_path, "w") as f:
+                json.dump(
+                    {cohort_id: board.dump() for cohort_id, board in boards.items()},
+                    f,
+                )
+
+            os.replace(process_path, path)
+        except Exception as exception:
+            logger.error(f"Failed to save leaderboard snapshot: {exception}")
+
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(process_path)
+
+    def load_snapshot(self, path: str):
+        """
+        Restore the boards saved by `save_snapshot`. The file is removed once read
+        as it no longer reflects the database as soon as new events come in, so a
+        snapshot is only ever used after a clean shutdown. When several processes
+        start together, the first one to move the file to a name of its own is the
+        only one to restore it and the others start without it.
+        """
+        process_path = f"{path}.{os.getpid()}"
+
+        try:
+            os.rename(path, process_path)
+        except FileNotFoundError:
+            return
+
+        try:
+            with open(process_path) as f:
+                snapshot = json.load(f)
+
+            for cohort_id, data in snapshot.items():
+                self._restored[int(cohort_id)] = CohortLeaderboard.load(data)
+        except Exception as exception:
+            logger.error(f"Failed to load leaderboard snapshot: {exception}")
+            self._restored.clear()
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(process_path)
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._boards),
+            "max_size": self.max_size,
+            "restored": len(self._restored),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+leaderboards = LeaderboardCache()
+cache_sync.register("leaderboards", leaderboards)
@@ -1,5 +1,6 @@
 from typing import Dict, Tuple
 from api.utils.db import execute_db_operation, execute_multiple_db_operations
+from api.db.course_tree_cache import course_tree_cache
 from api.config import (
     milestones_table_name,
     course_tasks_table_name,
@@ -42,6 +43,8 @@ async def update_milestone(milestone_id: int, name: str):
         (name, milestone_id),
     )
 
+    course_tree_cache.invalidate_milestone(milestone_id)
+
 
 async def delete_milestone(milestone_id: int):
     await execute_multiple_db_operations(
@@ -58,6 +61,8 @@ async def delete_milestone(milestone_id: int):
         ]
     )
 
+    course_tree_cache.invalidate_milestone(milestone_id)
+
 
 async def get_user_metrics_for_all_milestones(user_id: int, course_id: int):
     # Get milestones with tasks
@@ -14,25 +14,25 @@ from api.config import (
 )
 from api.db.user import get_user_by_id, insert_or_return_user
 from api.slack import (
+    send_slack_notification_for_new_user,
     send_slack_notification_for_new_org,
     send_slack_notification_for_member_added_to_org,
 )
 
 
 async def get_all_orgs() -> List[Dict]:
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
-        await cursor.execute(f"SELECT id, name, slug FROM {organizations_table_name}")
+    rows = await execute_db_operation(
+        f"SELECT id, name, slug FROM {organizations_table_name}", fetch_all=True
+    )
 
-        return [
-            {
-                "id": row[0],
-                "name": row[1],
-                "slug": row[2],
-            }
-            for row in await cursor.fetchall()
-        ]
+    return [
+        {
+            "id": row[0],
+            "name": row[1],
+            "slug": row[2],
+        }
+        for row in rows
+    ]
 
 
 def generate_api_key(org_id: int):
@@ -221,14 +221,14 @@ async def add_users_to_org_by_email(
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
 
-        user_ids = []
+        users, new_users = [], []
         for email in emails:
-            user = await insert_or_return_user(cursor, email)
-            user_ids.append(user["id"])
+            user, is_new_user = await insert_or_return_user(cursor, email)
+            users.append(user)
+            if is_new_user:
+                new_users.append(user)
 
-            await send_slack_notification_for_member_added_to_org(
-                user, org["slug"], org_id
-            )
+        user_ids = [user["id"] for user in users]
 
         # Check if any of the users are already in the organization
         placeholders = ", ".join(["?" for _ in user_ids])
@@ -253,6 +253,15 @@ async def add_users_to_org_by_email(
         )
         await conn.commit()
 
+    # only once the writer is released, as every other write waits on it
+    for user in new_users:
+        await send_slack_notification_for_new_user(user)
+
+    for user in users:
+        await send_slack_notification_for_member_added_to_org(
+            user, org["slug"], org_id
+        )
+
 
 async def remove_members_from_org(org_id: int, user_ids: List[int]):
     query = f"DELETE FROM {user_organizations_table_name} WHERE org_id = ? AND user_id IN ({', '.join(map(str, user_ids))})"
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple
+from api.config import prompt_prefix_cache_max_size
+from api.db.cache_sync import cache_sync, shared
+
+
+class PromptPrefixCache:
+    """
+    In-process cache of the static start of the AI's chat prompt (system prompt, task
+    details and reference material) keyed by question or task id. Each entry
+    remembers the hash of the question or task it was built from, so editing it
+    makes the entry stale without any explicit invalidation; entries that include
+    linked learning material are dropped when that material is updated, in every
+    process.
+
+    Since the prefix is built once per version, it is byte-identical across turns
+    and learners, which is what lets the provider cache it.
+    """
+
+    def __init__(self, max_size: int = prompt_prefix_cache_max_size):
+        self.max_size = max_size
+        self._prefixes: OrderedDict[
+            str, Tuple[str, List[Dict], Set[int]]
+        ] = OrderedDict()
+        self._task_to_keys: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, content_hash: str) -> List[Dict] | None:
+        entry = self._prefixes.get(key)
+
+        if entry is None or entry[0] != content_hash:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._prefixes.move_to_end(key)
+        return entry[1]
+
+    def set(
+        self,
+        key: str,
+        content_hash: str,
+        prefix: List[Dict],
+        linked_task_ids: Iterable[int] = (),
+    ):
+        self._remove(key)
+
+        self._prefixes[key] = (content_hash, prefix, set(linked_task_ids))
+        for task_id in self._prefixes[key][2]:
+            self._task_to_keys.setdefault(task_id, set()).add(key)
+
+        while len(self._prefixes) > self.max_size:
+            self._remove(next(iter(self._prefixes)))
+
+    def _remove(self, key: str):
+        entry = self._prefixes.pop(key, None)
+        if entry is None:
+            return
+
+        for task_id in entry[2]:
+            self._task_to_keys[task_id].discard(key)
+            if not self._task_to_keys[task_id]:
+                del self._task_to_keys[task_id]
+
+    @shared
+    def invalidate_task(self, task_id: int):
+        """Drop the prefixes that include the task as linked learning material."""
+        for key in list(self._task_to_keys.get(task_id, ())):
+            self._remove(key)
+
+    @shared
+    def invalidate_all(self):
+        self._prefixes.clear()
+        self._task_to_keys.clear()
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._prefixes),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+prompt_prefixes = PromptPrefixCache()
+cache_sync.register("prompt_prefixes", prompt_prefixes)
@@ -16,10 +16,12 @@ from api.config import (
     course_cohorts_table_name,
     task_completions_table_name,
     task_generation_jobs_table_name,
+    task_generation_job_priority,
 )
 from api.utils.db import (
     get_new_db_connection,
     execute_db_operation,
+    execute_write_transaction,
     serialise_list_to_str,
 )
 from api.models import (
@@ -31,8 +33,16 @@ from api.models import (
     GenerateTaskJobStatus,
     TaskAIResponseType,
     BaseScorecard,
+    JobKind,
 )
 from api.db.utils import convert_blocks_to_right_format
+from api.db.course_tree_cache import course_tree_cache
+from api.db.activity import record_user_activity, delete_chat_messages
+from api.db.leaderboard import leaderboards
+from api.db.conversation_cache import conversations
+from api.db.job_queue import enqueue_job, notify_job_enqueued
+from api.db.prompt_prefix_cache import prompt_prefixes
+from api.db.block_description_cache import block_descriptions
 
 
 async def create_draft_task_for_course(
@@ -44,9 +54,7 @@ async def create_draft_task_for_course(
 ) -> Tuple[int, int]:
     org_id = await get_org_id_for_course(course_id)
 
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
+    async def insert_task(cursor):
         query = f"INSERT INTO {tasks_table_name} (org_id, type, title, status) VALUES (?, ?, ?, ?)"
 
         await cursor.execute(
@@ -81,24 +89,28 @@ async def create_draft_task_for_course(
             (course_id, task_id, milestone_id, insert_ordering),
         )
 
-        await conn.commit()
+        return task_id, insert_ordering
 
-        # Compute the "visible" ordering (i.e., the index among non-deleted tasks)
-        visible_ordering_row = await execute_db_operation(
-            f"""
-            SELECT COUNT(*) FROM {course_tasks_table_name} ct
-            INNER JOIN {tasks_table_name} t ON ct.task_id = t.id
-            WHERE ct.course_id = ? AND ct.milestone_id = ? AND ct.ordering < ? AND t.deleted_at IS NULL
-            """,
-            (course_id, milestone_id, insert_ordering),
-            fetch_one=True,
-        )
+    task_id, insert_ordering = await execute_write_transaction(insert_task)
 
-        visible_ordering = (
-            visible_ordering_row[0] if visible_ordering_row else insert_ordering
-        )
+    course_tree_cache.invalidate_course(course_id)
+
+    # Compute the "visible" ordering (i.e., the index among non-deleted tasks)
+    visible_ordering_row = await execute_db_operation(
+        f"""
+        SELECT COUNT(*) FROM {course_tasks_table_name} ct
+        INNER JOIN {tasks_table_name} t ON ct.task_id = t.id
+        WHERE ct.course_id = ? AND ct.milestone_id = ? AND ct.ordering < ? AND t.deleted_at IS NULL
+        """,
+        (course_id, milestone_id, insert_ordering),
+        fetch_one=True,
+    )
+
+    visible_ordering = (
+        visible_ordering_row[0] if visible_ordering_row else insert_ordering
+    )
 
-        return task_id, visible_ordering
+    return task_id, visible_ordering
 
 
 async def get_all_learning_material_tasks_for_course(course_id: int):
@@ -247,6 +259,34 @@ async def get_task(task_id: int):
     return task_data
 
 
+async def get_learning_material_descriptions(task_ids: List[int]) -> Dict[int, str]:
+    """
+    Descriptions of the learning material tasks with the given ids (skipping deleted
+    ones), read in a single query and rendered from their blocks only once per version
+    of each task.
+    """
+    if not task_ids:
+        return {}
+
+    placeholders = ", ".join(["?" for _ in task_ids])
+
+    tasks = await execute_db_operation(
+        f"""
+        SELECT id, blocks FROM {tasks_table_name}
+        WHERE id IN ({placeholders}) AND type = ? AND deleted_at IS NULL
+        """,
+        (*task_ids, str(TaskType.LEARNING_MATERIAL)),
+        fetch_all=True,
+    )
+
+    return {
+        task_id: block_descriptions.get_description_from_json(
+            blocks, f"learning_material_{task_id}"
+        )
+        for task_id, blocks in tasks
+    }
+
+
 async def get_task_metadata(task_id: int) -> Dict:
     result = await execute_db_operation(
         f"""
@@ -332,7 +372,10 @@ async def update_learning_material_task(
 
         await conn.commit()
 
-        return await get_task(task_id)
+    course_tree_cache.invalidate_task(task_id)
+    prompt_prefixes.invalidate_task(task_id)
+
+    return await get_task(task_id)
 
 
 async def update_draft_quiz(
@@ -354,10 +397,7 @@ async def update_draft_quiz(
 
     scorecard_uuid_to_id = {}
 
-    # Execute all operations in a single transaction
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
+    async def replace_questions(cursor):
         await cursor.execute(
             f"DELETE FROM {question_scorecards_table_name} WHERE question_id IN (SELECT id FROM {questions_table_name} WHERE task_id = ?)",
             (task_id,),
@@ -438,9 +478,12 @@ async def update_draft_quiz(
             (str(status), title, scheduled_publish_at, task_id),
         )
 
-        await conn.commit()
+    # Execute all operations in a single transaction
+    await execute_write_transaction(replace_questions)
+
+    course_tree_cache.invalidate_task(task_id)
 
-        return await get_task(task_id)
+    return await get_task(task_id)
 
 
 async def update_published_quiz(
@@ -528,7 +571,9 @@ async def update_published_quiz(
 
         await conn.commit()
 
-        return await get_task(task_id)
+    course_tree_cache.invalidate_task(task_id)
+
+    return await get_task(task_id)
 
 
 async def duplicate_task(task_id: int, course_id: int, milestone_id: int) -> int:
@@ -599,6 +644,9 @@ async def delete_task(task_id: int):
         (datetime.now(), task_id),
     )
 
+    course_tree_cache.invalidate_task(task_id)
+    prompt_prefixes.invalidate_task(task_id)
+
 
 async def delete_tasks(task_ids: List[int]):
     task_ids_as_str = serialise_list_to_str(map(str, task_ids))
@@ -610,6 +658,10 @@ async def delete_tasks(task_ids: List[int]):
         (datetime.now(),),
     )
 
+    course_tree_cache.invalidate_tasks(task_ids)
+    for task_id in task_ids:
+        prompt_prefixes.invalidate_task(task_id)
+
 
 async def get_solved_tasks_for_user(
     user_id: int,
@@ -661,29 +713,48 @@ async def get_solved_tasks_for_user(
 
 
 async def mark_task_completed(task_id: int, user_id: int):
-    # Update task completion table using INSERT OR IGNORE to handle duplicates gracefully
-    await execute_db_operation(
-        f"""
-        INSERT OR IGNORE INTO {task_completions_table_name} (user_id, task_id)
-        VALUES (?, ?)
-        """,
-        (user_id, task_id),
+    async def insert_completion(cursor):
+        # Update task completion table using INSERT OR IGNORE to handle duplicates gracefully
+        await cursor.execute(
+            f"""
+            INSERT OR IGNORE INTO {task_completions_table_name} (user_id, task_id)
+            VALUES (?, ?)
+            """,
+            (user_id, task_id),
+        )
+
+        if cursor.rowcount == 0:
+            return []
+
+        return await record_user_activity(
+            cursor, user_id, task_id=task_id, completion_count=1
+        )
+
+    activity = await execute_write_transaction(insert_completion)
+
+    leaderboards.record_activity(user_id, activity)
+    leaderboards.record_completion(
+        user_id, [row[0] for row in activity], task_id=task_id
     )
 
 
 async def delete_completion_history_for_task(
     task_id: int, question_id: int, user_id: int
 ):
-    if task_id is not None:
-        await execute_db_operation(
-            f"DELETE FROM {chat_history_table_name} WHERE task_id = ? AND user_id = ?",
-            (task_id, user_id),
+    async def delete_history(cursor):
+        if task_id is not None:
+            await delete_chat_messages(
+                cursor, "task_id = ? AND user_id = ?", (task_id, user_id)
+            )
+
+        await delete_chat_messages(
+            cursor, "question_id = ? AND user_id = ?", (question_id, user_id)
         )
 
-    await execute_db_operation(
-        f"DELETE FROM {chat_history_table_name} WHERE question_id = ? AND user_id = ?",
-        (question_id, user_id),
-    )
+    await execute_write_transaction(delete_history)
+
+    conversations.invalidate(user_id, question_id)
+    leaderboards.invalidate_user(user_id)
 
 
 async def schedule_module_tasks(
@@ -710,6 +781,8 @@ async def schedule_module_tasks(
 
         await conn.commit()
 
+    course_tree_cache.invalidate_course(course_id)
+
 
 async def drop_task_generation_jobs_table():
     async with get_new_db_connection() as conn:
@@ -737,11 +810,36 @@ async def store_task_generation_request(
             ),
         )
 
+        await enqueue_job(
+            cursor, JobKind.TASK, job_uuid, course_id, task_generation_job_priority
+        )
+
         await conn.commit()
 
+    notify_job_enqueued()
+
     return job_uuid
 
 
+async def get_task_generation_job(job_uuid: str) -> Dict | None:
+    job = await execute_db_operation(
+        f"SELECT uuid, task_id, course_id, status, job_details FROM {task_generation_jobs_table_name} WHERE uuid = ?",
+        (job_uuid,),
+        fetch_one=True,
+    )
+
+    if job is None:
+        return None
+
+    return {
+        "uuid": job[0],
+        "task_id": job[1],
+        "course_id": job[2],
+        "status": job[3],
+        "job_details": json.loads(job[4]),
+    }
+
+
 async def update_task_generation_job_status(
     job_uuid: str, status: GenerateTaskJobStatus
 ):
@@ -749,50 +847,34 @@ async def update_task_generation_job_status(
         cursor = await conn.cursor()
 
         await cursor.execute(
-            f"UPDATE {task_generation_jobs_table_name} SET status = ? WHERE uuid = ?",
+            f"UPDATE {task_generation_jobs_table_name} SET status = ? WHERE uuid = ? RETURNING task_id",
             (str(status), job_uuid),
         )
+        job = await cursor.fetchone()
 
         await conn.commit()
 
-
-async def get_course_task_generation_jobs_status(course_id: int) -> List[str]:
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
-        await cursor.execute(
-            f"SELECT status FROM {task_generation_jobs_table_name} WHERE course_id = ?",
-            (course_id,),
-        )
-
-        statuses = [row[0] for row in await cursor.fetchall()]
-
-        return {
-            str(GenerateTaskJobStatus.COMPLETED): statuses.count(
-                str(GenerateTaskJobStatus.COMPLETED)
-            ),
-            str(GenerateTaskJobStatus.STARTED): statuses.count(
-                str(GenerateTaskJobStatus.STARTED)
-            ),
-        }
+    if job:
+        course_tree_cache.invalidate_task(job[0])
 
 
-async def get_all_pending_task_generation_jobs() -> List[Dict]:
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
+async def get_course_task_generation_jobs_status(course_id: int) -> List[str]:
+    rows = await execute_db_operation(
+        f"SELECT status FROM {task_generation_jobs_table_name} WHERE course_id = ?",
+        (course_id,),
+        fetch_all=True,
+    )
 
-        await cursor.execute(
-            f"SELECT uuid, job_details FROM {task_generation_jobs_table_name} WHERE status = ?",
-            (str(GenerateTaskJobStatus.STARTED),),
-        )
+    statuses = [row[0] for row in rows]
 
-        return [
-            {
-                "uuid": row[0],
-                "job_details": json.loads(row[1]),
-            }
-            for row in await cursor.fetchall()
-        ]
+    return {
+        str(GenerateTaskJobStatus.COMPLETED): statuses.count(
+            str(GenerateTaskJobStatus.COMPLETED)
+        ),
+        str(GenerateTaskJobStatus.STARTED): statuses.count(
+            str(GenerateTaskJobStatus.STARTED)
+        ),
+    }
 
 
 async def drop_task_completions_table():
@@ -867,6 +949,15 @@ async def undo_task_delete(task_id: int):
 
         await conn.commit()
 
+    # deleted tasks are not part of any cached tree, so look up the courses directly
+    course_ids = await execute_db_operation(
+        f"SELECT course_id FROM {course_tasks_table_name} WHERE task_id = ?",
+        (task_id,),
+        fetch_all=True,
+    )
+    course_tree_cache.invalidate_courses(row[0] for row in course_ids or [])
+    prompt_prefixes.invalidate_task(task_id)
+
 
 async def publish_scheduled_tasks():
     """Publish all tasks whose scheduled time has arrived"""
@@ -888,7 +979,11 @@ async def publish_scheduled_tasks():
         fetch_all=True,
     )
 
-    return [task[0] for task in tasks] if tasks else []
+    task_ids = [task[0] for task in tasks] if tasks else []
+
+    course_tree_cache.invalidate_tasks(task_ids)
+
+    return task_ids
 
 
 async def add_generated_learning_material(task_id: int, task_details: Dict):
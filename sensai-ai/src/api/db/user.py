@@ -7,16 +7,13 @@ from api.config import (
     organizations_table_name,
     group_role_learner,
     courses_table_name,
-    chat_history_table_name,
-    questions_table_name,
-    course_tasks_table_name,
-    course_cohorts_table_name,
-    task_completions_table_name,
     user_organizations_table_name,
+    user_daily_activity_table_name,
 )
-from api.slack import send_slack_notification_for_new_user
+from api.db.activity import ALL_COHORTS
+from api.db.leaderboard import leaderboards
 from api.models import UserCohort
-from api.utils import generate_random_color, get_date_from_str
+from api.utils import generate_random_color
 from api.utils.db import execute_db_operation, get_new_db_connection
 
 
@@ -26,6 +23,9 @@ async def update_user_email(email_1: str, email_2: str) -> None:
         (email_2, email_1),
     )
 
+    # emails are shown on leaderboards; this is rare enough to not look up the user
+    leaderboards.invalidate_all()
+
 
 async def get_user_organizations(user_id: int):
     user_organizations = await execute_db_operation(
@@ -101,7 +101,7 @@ async def insert_or_return_user(
     email: str,
     given_name: str = None,
     family_name: str = None,
-):
+) -> Tuple[Dict, bool]:
     """
     Inserts a new user or returns an existing user.
 
@@ -112,7 +112,8 @@ async def insert_or_return_user(
         cursor: An existing database cursor
 
     Returns:
-        A dictionary representing the user.
+        A dictionary representing the user, and whether it was just created (so
+        that callers can announce it once the transaction is committed).
 
     Raises:
         Any exception raised by the database operations.
@@ -148,7 +149,7 @@ async def insert_or_return_user(
                 user["default_dp_color"],
             )
 
-        return user
+        return user, False
 
     # create a new user
     color = generate_random_color()
@@ -167,10 +168,7 @@ async def insert_or_return_user(
 
     user = convert_user_db_to_dict(await cursor.fetchone())
 
-    # Send Slack notification for new user
-    await send_slack_notification_for_new_user(user)
-
-    return user
+    return user, True
 
 
 async def update_user(
@@ -186,6 +184,8 @@ async def update_user(
         (first_name, middle_name, last_name, default_dp_color, user_id),
     )
 
+    leaderboards.invalidate_user(int(user_id))
+
     user = await get_user_by_id(user_id)
     return user
 
@@ -243,77 +243,34 @@ async def get_user_cohorts(user_id: int) -> List[Dict]:
 
 
 async def get_user_active_in_last_n_days(user_id: int, n: int, cohort_id: int):
-    activity_per_day = await execute_db_operation(
+    active_days = await execute_db_operation(
         f"""
-    WITH chat_activity AS (
-        SELECT DATE(datetime(created_at, '+5 hours', '+30 minutes')) as activity_date, COUNT(*) as count
-        FROM {chat_history_table_name}
-        WHERE user_id = ? 
-        AND DATE(datetime(created_at, '+5 hours', '+30 minutes')) >= DATE(datetime('now', '+5 hours', '+30 minutes'), '-{n} days') 
-        AND question_id IN (
-            SELECT question_id 
-            FROM {questions_table_name} 
-            WHERE task_id IN (
-                SELECT task_id 
-                FROM {course_tasks_table_name} 
-                WHERE course_id IN (
-                    SELECT course_id 
-                    FROM {course_cohorts_table_name} 
-                    WHERE cohort_id = ?
-                )
-            )
-        )
-        GROUP BY activity_date
-    ),
-    task_activity AS (
-        SELECT DATE(datetime(created_at, '+5 hours', '+30 minutes')) as activity_date, COUNT(*) as count
-        FROM {task_completions_table_name}
-        WHERE user_id = ? 
-        AND DATE(datetime(created_at, '+5 hours', '+30 minutes')) >= DATE(datetime('now', '+5 hours', '+30 minutes'), '-{n} days')
-        AND task_id IN (
-            SELECT task_id 
-            FROM {course_tasks_table_name} 
-            WHERE course_id IN (
-                SELECT course_id 
-                FROM {course_cohorts_table_name} 
-                WHERE cohort_id = ?
-            )
-        )
-        GROUP BY activity_date
-    )
-    SELECT activity_date, count FROM chat_activity
-    UNION
-    SELECT activity_date, count FROM task_activity
-    ORDER BY activity_date
+    SELECT ist_date
+    FROM {user_daily_activity_table_name}
+    WHERE user_id = ? AND cohort_id = ?
+    AND ist_date >= DATE(datetime('now', '+5 hours', '+30 minutes'), '-{n} days')
+    AND (message_count > 0 OR completion_count > 0)
+    ORDER BY ist_date
     """,
-        (user_id, cohort_id, user_id, cohort_id),
+        (user_id, cohort_id),
         fetch_all=True,
     )
 
-    active_days = set()
-
-    for date, count in activity_per_day:
-        if count > 0:
-            active_days.add(date)
-
-    return list(active_days)
+    return [ist_date for ist_date, in active_days]
 
 
 async def get_user_activity_for_year(user_id: int, year: int):
-    # Get all chat messages for the user in the given year, grouped by day
+    # Get the number of messages sent by the user on each day of the given year
     activity_per_day = await execute_db_operation(
         f"""
-        SELECT 
-            strftime('%j', datetime(timestamp, '+5 hours', '+30 minutes')) as day_of_year,
-            COUNT(*) as message_count
-        FROM {chat_history_table_name}
-        WHERE user_id = ? 
-        AND strftime('%Y', datetime(timestamp, '+5 hours', '+30 minutes')) = ?
-        AND role = 'user'
-        GROUP BY day_of_year
-        ORDER BY day_of_year
+        SELECT strftime('%j', ist_date) as day_of_year, message_count
+        FROM {user_daily_activity_table_name}
+        WHERE user_id = ? AND cohort_id = ?
+        AND ist_date BETWEEN ? AND ?
+        AND message_count > 0
+        ORDER BY ist_date
         """,
-        (user_id, str(year)),
+        (user_id, ALL_COHORTS, f"{year}-01-01", f"{year}-12-31"),
         fetch_all=True,
     )
 
@@ -334,9 +291,15 @@ def get_user_streak_from_usage_dates(user_usage_dates: List[str]) -> int:
     today = datetime.now(timezone(timedelta(hours=5, minutes=30))).date()
     current_streak = []
 
+    # usage dates are in IST, either as dates or as datetimes
     user_usage_dates = sorted(
         list(
-            set([get_date_from_str(date_str, "IST") for date_str in user_usage_dates])
+            set(
+                [
+                    datetime.strptime(date_str[:10], "%Y-%m-%d").date()
+                    for date_str in user_usage_dates
+                ]
+            )
         ),
         reverse=True,
     )
@@ -362,24 +325,12 @@ def get_user_streak_from_usage_dates(user_usage_dates: List[str]) -> int:
 async def get_user_streak(user_id: int, cohort_id: int):
     user_usage_dates = await execute_db_operation(
         f"""
-    SELECT MAX(datetime(created_at, '+5 hours', '+30 minutes')) as created_at
-    FROM {chat_history_table_name}
-    WHERE user_id = ? AND question_id IN (SELECT id FROM {questions_table_name} WHERE task_id IN (SELECT task_id FROM {course_tasks_table_name} WHERE course_id IN (SELECT course_id FROM {course_cohorts_table_name} WHERE cohort_id = ?)))
-    GROUP BY DATE(datetime(created_at, '+5 hours', '+30 minutes'))
-    
-    UNION
-    
-    SELECT MAX(datetime(created_at, '+5 hours', '+30 minutes')) as created_at
-    FROM {task_completions_table_name}
-    WHERE user_id = ? AND task_id IN (
-        SELECT task_id FROM {course_tasks_table_name} 
-        WHERE course_id IN (SELECT course_id FROM {course_cohorts_table_name} WHERE cohort_id = ?)
-    )
-    GROUP BY DATE(datetime(created_at, '+5 hours', '+30 minutes'))
-    
-    ORDER BY created_at DESC
+    SELECT ist_date
+    FROM {user_daily_activity_table_name}
+    WHERE user_id = ? AND cohort_id = ?
+    ORDER BY ist_date DESC
     """,
-        (user_id, cohort_id, user_id, cohort_id),
+        (user_id, cohort_id),
         fetch_all=True,
     )
 
@@ -35,23 +35,20 @@ def convert_blocks_to_right_format(blocks: List[Dict]) -> List[Dict]:
     return blocks
 
 
-def construct_description_from_blocks(
-    blocks: List[Dict], nesting_level: int = 0
-) -> str:
-    """
-    Constructs a textual description from a tree of block data.
+# marker for each type of list item
+LIST_ITEM_MARKERS = {
+    "numberedListItem": "1. ",
+    "checkListItem": "- [ ] ",
+    "bulletListItem": "- ",
+}
 
-    Args:
-        blocks: A list of block dictionaries, potentially with nested children
-        nesting_level: The current nesting level (used for proper indentation)
 
-    Returns:
-        A formatted string representing the content of the blocks
+def add_description_lines(blocks: List[Dict], nesting_level: int, lines: List[str]):
+    """
+    Append the lines describing the blocks, and their children, to `lines`. Lines
+    are joined once at the end rather than concatenated as they are built, so that
+    rendering stays linear in the size of the document.
     """
-    if not blocks:
-        return ""
-
-    description = ""
     indent = "    " * nesting_level  # 4 spaces per nesting level
 
     for block in blocks:
@@ -59,61 +56,59 @@ def construct_description_from_blocks(
         content = block.get("content", [])
         children = block.get("children", [])
 
+        # Content is a list of text objects
+        text = (
+            "".join(
+                [
+                    text_obj["text"]
+                    for text_obj in content
+                    if isinstance(text_obj, dict) and "text" in text_obj
+                ]
+            )
+            if isinstance(content, list)
+            else ""
+        )
+
         # Process based on block type
-        if block_type == "paragraph":
-            # Content is a list of text objects
-            if isinstance(content, list):
-                paragraph_text = ""
-                for text_obj in content:
-                    if isinstance(text_obj, dict) and "text" in text_obj:
-                        paragraph_text += text_obj["text"]
-                if paragraph_text:
-                    description += f"{indent}{paragraph_text}\n"
+        if not text:
+            pass
+
+        elif block_type == "paragraph":
+            lines.append(f"{indent}{text}\n")
 
         elif block_type == "heading":
             level = block.get("props", {}).get("level", 1)
-            if isinstance(content, list):
-                heading_text = ""
-                for text_obj in content:
-                    if isinstance(text_obj, dict) and "text" in text_obj:
-                        heading_text += text_obj["text"]
-                if heading_text:
-                    # Headings are typically not indented, but we'll respect nesting for consistency
-                    description += f"{indent}{'#' * level} {heading_text}\n"
+            # Headings are typically not indented, but we'll respect nesting for consistency
+            lines.append(f"{indent}{'#' * level} {text}\n")
 
         elif block_type == "codeBlock":
             language = block.get("props", {}).get("language", "")
-            if isinstance(content, list):
-                code_text = ""
-                for text_obj in content:
-                    if isinstance(text_obj, dict) and "text" in text_obj:
-                        code_text += text_obj["text"]
-                if code_text:
-                    description += (
-                        f"{indent}```{language}\n{indent}{code_text}\n{indent}```\n"
-                    )
-
-        elif block_type in ["numberedListItem", "checkListItem", "bulletListItem"]:
-            if isinstance(content, list):
-                item_text = ""
-                for text_obj in content:
-                    if isinstance(text_obj, dict) and "text" in text_obj:
-                        item_text += text_obj["text"]
-                if item_text:
-                    # Use proper list marker based on parent list type
-                    if block_type == "numberedListItem":
-                        marker = "1. "
-                    elif block_type == "checkListItem":
-                        marker = "- [ ] "
-                    elif block_type == "bulletListItem":
-                        marker = "- "
-
-                    description += f"{indent}{marker}{item_text}\n"
+            lines.append(f"{indent}```{language}\n{indent}{text}\n{indent}```\n")
+
+        elif block_type in LIST_ITEM_MARKERS:
+            lines.append(f"{indent}{LIST_ITEM_MARKERS[block_type]}{text}\n")
 
         if children:
-            child_description = construct_description_from_blocks(
-                children, nesting_level + 1
-            )
-            description += child_description
+            add_description_lines(children, nesting_level + 1, lines)
+
+
+def construct_description_from_blocks(
+    blocks: List[Dict], nesting_level: int = 0
+) -> str:
+    """
+    Constructs a textual description from a tree of block data.
+
+    Args:
+        blocks: A list of block dictionaries, potentially with nested children
+        nesting_level: The current nesting level (used for proper indentation)
+
+    Returns:
+        A formatted string representing the content of the blocks
+    """
+    if not blocks:
+        return ""
+
+    lines = []
+    add_description_lines(blocks, nesting_level, lines)
 
-    return description
+    return "".join(lines)
@@ -0,0 +1,67 @@
+from typing import List, Optional, Tuple
+from api.config import (
+    websocket_events_table_name,
+    websocket_event_batch_size,
+    websocket_event_retention_seconds,
+)
+from api.utils.db import execute_db_operation, execute_many_db_operation
+
+
+async def add_websocket_events(
+    course_id: int, events: List[Tuple[str, Optional[str], bool]]
+):
+    """Add the (payload, coalesce_key, droppable) updates of a course, in order."""
+    await execute_many_db_operation(
+        f"""INSERT INTO {websocket_events_table_name} (course_id, payload, coalesce_key, droppable)
+        VALUES (?, ?, ?, ?)""",
+        [
+            (course_id, payload, coalesce_key, droppable)
+            for payload, coalesce_key, droppable in events
+        ],
+    )
+
+
+async def add_cache_events(events: List[str], origin: str):
+    """Add the cache invalidations published by the `origin` bus, in order."""
+    await execute_many_db_operation(
+        f"""INSERT INTO {websocket_events_table_name} (payload, origin) VALUES (?, ?)""",
+        [(payload, origin) for payload in events],
+    )
+
+
+async def get_last_websocket_event_id() -> int:
+    row = await execute_db_operation(
+        f"SELECT MAX(id) FROM {websocket_events_table_name}", fetch_one=True
+    )
+    return row[0] or 0
+
+
+async def get_websocket_events(
+    after_id: int, limit: int = websocket_event_batch_size
+) -> List[Tuple[int, Optional[int], str, Optional[str], bool, Optional[str]]]:
+    """
+    The (id, course_id, payload, coalesce_key, droppable, origin) events added after
+    the given one, oldest first; cache invalidations have no course_id. Events are
+    added by a single writer, so their ids are committed in order and none can show
+    up later behind the ones returned.
+    """
+    rows = await execute_db_operation(
+        f"""SELECT id, course_id, payload, coalesce_key, droppable, origin FROM {websocket_events_table_name}
+        WHERE id > ? ORDER BY id LIMIT ?""",
+        (after_id, limit),
+        fetch_all=True,
+    )
+
+    return [
+        (event_id, course_id, payload, coalesce_key, bool(droppable), origin)
+        for event_id, course_id, payload, coalesce_key, droppable, origin in rows
+    ]
+
+
+async def delete_websocket_events(
+    retention_seconds: int = websocket_event_retention_seconds,
+):
+    await execute_db_operation(
+        f"""DELETE FROM {websocket_events_table_name} WHERE created_at < datetime('now', ?)""",
+        (f"-{retention_seconds} seconds",),
+    )
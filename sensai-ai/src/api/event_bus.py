@@ -0,0 +1,241 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, NamedTuple, Optional
+from api.config import (
+    websocket_event_poll_interval,
+    websocket_event_batch_size,
+    websocket_event_retention_seconds,
+)
+from api.db.websocket_events import (
+    add_cache_events,
+    add_websocket_events,
+    get_last_websocket_event_id,
+    get_websocket_events,
+    delete_websocket_events,
+)
+from api.utils.logging import logger
+
+
+class Message(NamedTuple):
+    # JSON of the update, serialized once and shared by every viewer of the course
+    payload: str
+    # a queued message with the same key is replaced by this one
+    coalesce_key: Optional[str]
+    # progress updates can be dropped for a viewer that has fallen behind
+    droppable: bool
+
+
+class EventBus(ABC):
+    """
+    Carries websocket updates from the process that sends them (e.g. the one running
+    a generation job) to every process with viewers of the course. The connection
+    manager subscribes with the function that hands the updates of a course to the
+    viewers connected to its own process.
+
+    It also carries the cache invalidations of each process to the others, which
+    replay them on their own in-process caches (see `api.db.cache_sync`).
+    """
+
+    name = None
+    # whether anything published reaches other processes
+    between_processes = False
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[int, List[Message]], None]] = None
+        self._replay: Optional[Callable[[List[str]], None]] = None
+
+    def subscribe(self, deliver: Callable[[int, List[Message]], None]):
+        self._deliver = deliver
+
+    def subscribe_cache_events(self, replay: Callable[[List[str]], None]):
+        self._replay = replay
+
+    @abstractmethod
+    async def publish(self, course_id: int, messages: List[Message]):
+        """Send the updates of a course to its viewers in every process."""
+
+    @abstractmethod
+    async def publish_cache_events(self, events: List[str]):
+        """Send cache invalidations, already applied here, to the other processes."""
+
+    async def start(self):
+        """Start receiving updates sent by other processes."""
+
+    async def stop(self):
+        pass
+
+    def get_metrics(self) -> Dict:
+        return {"type": self.name}
+
+
+class InProcessEventBus(EventBus):
+    """Hands updates straight to the viewers of this process."""
+
+    name = "memory"
+
+    async def publish(self, course_id: int, messages: List[Message]):
+        if self._deliver is not None:
+            self._deliver(course_id, messages)
+
+    async def publish_cache_events(self, events: List[str]):
+        # there are no other processes to invalidate
+        pass
+
+
+class SQLiteEventBus(EventBus):
+    """
+    Passes updates between processes through the websocket events table. Publishing
+    adds the updates to the table, and every process that has started the bus polls
+    it for the updates added since its last poll, so a process only sending updates
+    (like a job worker) never needs to start it. Updates are only kept for a few
+    minutes since viewers that connect later load the course from the API anyway,
+    just like a process that starts later has nothing cached to invalidate.
+
+    Cache invalidations are skipped by the bus that published them, as they have
+    already been applied in its process.
+    """
+
+    name = "sqlite"
+    between_processes = True
+
+    def __init__(
+        self,
+        poll_interval: float = websocket_event_poll_interval,
+        batch_size: int = websocket_event_batch_size,
+        retention_seconds: int = websocket_event_retention_seconds,
+    ):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self.origin = uuid.uuid4().hex
+        self.last_event_id = None
+        self._poller = None
+        self._last_cleanup = None
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    async def publish(self, course_id: int, messages: List[Message]):
+        try:
+            await add_websocket_events(course_id, messages)
+            self.published += len(messages)
+        except Exception as exception:
+            # updates are best effort and must not fail the job that sends them
+            self.errors += 1
+            logger.error(
+                f"Error publishing websocket updates of course {course_id}: {exception}"
+            )
+
+    async def publish_cache_events(self, events: List[str]):
+        try:
+            await add_cache_events(events, self.origin)
+            self.published += len(events)
+        except Exception as exception:
+            # the other processes keep serving what they have cached until it is evicted
+            self.errors += 1
+            logger.error(f"Error publishing cache invalidations: {exception}")
+
+    async def start(self):
+        # only the updates sent from now on are of interest
+        self.last_event_id = await get_last_websocket_event_id()
+        self._poller = asyncio.create_task(self._poll_events())
+
+    async def stop(self):
+        if self._poller is None:
+            return
+
+        self._poller.cancel()
+        try:
+            await self._poller
+        except asyncio.CancelledError:
+            pass
+
+        self._poller = None
+
+    async def _poll_events(self):
+        while True:
+            try:
+                num_events = await self._poll()
+                await self._delete_old_events()
+            except Exception as exception:
+                self.errors += 1
+                num_events = 0
+                logger.error(f"Error polling websocket updates: {exception}")
+
+            # catch up without waiting when there are more updates than one poll reads
+            if num_events < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self) -> int:
+        events = await get_websocket_events(self.last_event_id, self.batch_size)
+        if not events:
+            return 0
+
+        self.last_event_id = events[-1][0]
+        self.received += len(events)
+
+        # hand over the consecutive updates of a course, or cache invalidations, together
+        course_id, batch = None, []
+        for _, event_course_id, payload, coalesce_key, droppable, origin in events:
+            if event_course_id is None and origin == self.origin:
+                continue
+
+            if event_course_id != course_id and batch:
+                self._hand_over(course_id, batch)
+                batch = []
+
+            course_id = event_course_id
+            batch.append(
+                payload
+                if course_id is None
+                else Message(payload, coalesce_key, droppable)
+            )
+
+        if batch:
+            self._hand_over(course_id, batch)
+
+        return len(events)
+
+    def _hand_over(self, course_id: Optional[int], batch: List):
+        if course_id is None:
+            if self._replay is not None:
+                self._replay(batch)
+        elif self._deliver is not None:
+            self._deliver(course_id, batch)
+
+    async def _delete_old_events(self):
+        now = asyncio.get_running_loop().time()
+        if (
+            self._last_cleanup is not None
+            and now - self._last_cleanup < self.retention_seconds
+        ):
+            return
+
+        self._last_cleanup = now
+        await delete_websocket_events(self.retention_seconds)
+
+    def get_metrics(self) -> Dict:
+        return {
+            "type": self.name,
+            "running": self._poller is not None,
+            "last_event_id": self.last_event_id,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+def get_event_bus(name: str) -> EventBus:
+    event_buses = {
+        InProcessEventBus.name: InProcessEventBus,
+        SQLiteEventBus.name: SQLiteEventBus,
+    }
+
+    if name not in event_buses:
+        raise ValueError(
+            f"Unknown websocket event bus: {name} (expected one of {', '.join(event_buses)})"
+        )
+
+    return event_buses[name]()
@@ -1,5 +1,9 @@
-from typing import Dict, List
+import asyncio
+import importlib.util
+from collections import OrderedDict
+from typing import Dict, List, Tuple
 import backoff
+import httpx
 import openai
 import instructor
 
@@ -7,6 +11,13 @@ from openai import OpenAI
 
 from pydantic import BaseModel
 
+from api.config import (
+    openai_max_clients,
+    openai_max_connections,
+    openai_max_keepalive_connections,
+    openai_keepalive_expiry,
+    openai_http2,
+)
 from api.utils.logging import logger
 
 # Test log message
@@ -26,6 +37,143 @@ def is_reasoning_model(model: str) -> bool:
     ]
 
 
+class OpenAIClientRegistry:
+    """
+    Long-lived AsyncOpenAI clients (and their instructor wrappers) keyed by API key.
+    Every client sends its requests through one shared httpx connection pool, so
+    connections (and their TLS sessions) are kept alive and reused across chat
+    turns, pipeline stages and organizations. The least recently used clients are
+    dropped once more than `max_clients` API keys are in use; dropping a client
+    leaves the shared pool open.
+    """
+
+    def __init__(self, max_clients: int = openai_max_clients):
+        self.max_clients = max_clients
+        self._clients: OrderedDict[
+            str, Tuple[openai.AsyncOpenAI, instructor.AsyncInstructor]
+        ] = OrderedDict()
+        self._http_client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+
+        if self._loop is not loop:
+            # connections can't be shared across event loops
+            self._clients.clear()
+            self._http_client = None
+            self._loop = loop
+
+        if self._http_client is None:
+            http2 = openai_http2 and importlib.util.find_spec("h2") is not None
+
+            if openai_http2 and not http2:
+                logger.warning("h2 is not installed, using HTTP/1.1 for OpenAI")
+
+            self._http_client = openai.DefaultAsyncHttpxClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=openai_max_connections,
+                    max_keepalive_connections=openai_max_keepalive_connections,
+                    keepalive_expiry=openai_keepalive_expiry,
+                ),
+            )
+
+        return self._http_client
+
+    def _get_clients(
+        self, api_key: str
+    ) -> Tuple[openai.AsyncOpenAI, instructor.AsyncInstructor]:
+        http_client = self._get_http_client()
+
+        clients = self._clients.get(api_key)
+
+        if clients is not None:
+            self._clients.move_to_end(api_key)
+            return clients
+
+        client = openai.AsyncOpenAI(api_key=api_key, http_client=http_client)
+        clients = (client, instructor.from_openai(client))
+        self._clients[api_key] = clients
+
+        while len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)
+
+        return clients
+
+    def get_openai_client(self, api_key: str) -> openai.AsyncOpenAI:
+        return self._get_clients(api_key)[0]
+
+    def get_instructor_client(self, api_key: str) -> instructor.AsyncInstructor:
+        return self._get_clients(api_key)[1]
+
+    def get_instructor_client_recording_usage(
+        self, api_key: str, usage: Dict
+    ) -> instructor.AsyncInstructor:
+        """
+        An instructor client on the shared OpenAI client that writes the token usage
+        of its completions into `usage` (for streams, once they have been read).
+        """
+        client = self.get_openai_client(api_key)
+
+        async def create(*args, **kwargs):
+            if not kwargs.get("stream"):
+                completion = await client.chat.completions.create(*args, **kwargs)
+                record_usage(usage, completion.usage)
+                return completion
+
+            kwargs["stream_options"] = {"include_usage": True}
+            return iter_stream_recording_usage(
+                await client.chat.completions.create(*args, **kwargs), usage
+            )
+
+        return instructor.AsyncInstructor(
+            client=client,
+            create=instructor.patch(create=create, mode=instructor.Mode.TOOLS),
+            mode=instructor.Mode.TOOLS,
+            provider=instructor.Provider.OPENAI,
+        )
+
+    def get_metrics(self) -> Dict:
+        return {
+            "clients": len(self._clients),
+            "max_clients": self.max_clients,
+        }
+
+    async def close(self):
+        http_client = self._http_client
+
+        self._clients.clear()
+        self._http_client = None
+        self._loop = None
+
+        if http_client is not None:
+            await http_client.aclose()
+
+
+openai_clients = OpenAIClientRegistry()
+
+
+def record_usage(usage: Dict, completion_usage):
+    if completion_usage is None:
+        return
+
+    prompt_tokens_details = completion_usage.prompt_tokens_details
+
+    usage["prompt_tokens"] = completion_usage.prompt_tokens
+    usage["cached_tokens"] = (
+        prompt_tokens_details.cached_tokens or 0 if prompt_tokens_details else 0
+    )
+    usage["completion_tokens"] = completion_usage.completion_tokens
+
+
+async def iter_stream_recording_usage(stream, usage: Dict):
+    # with include_usage, the last chunk has no choices and the usage of the request
+    async for chunk in stream:
+        record_usage(usage, chunk.usage)
+        yield chunk
+
+
 def validate_openai_api_key(openai_api_key: str) -> bool:
     client = OpenAI(api_key=openai_api_key)
     try:
@@ -48,7 +196,7 @@ async def run_llm_with_instructor(
     response_model: BaseModel,
     max_completion_tokens: int,
 ):
-    client = instructor.from_openai(openai.AsyncOpenAI(api_key=api_key))
+    client = openai_clients.get_instructor_client(api_key)
 
     model_kwargs = {}
 
@@ -72,9 +220,13 @@ async def stream_llm_with_instructor(
     messages: List,
     response_model: BaseModel,
     max_completion_tokens: int,
+    usage: Dict | None = None,
     **kwargs,
 ):
-    client = instructor.from_openai(openai.AsyncOpenAI(api_key=api_key))
+    if usage is None:
+        client = openai_clients.get_instructor_client(api_key)
+    else:
+        client = openai_clients.get_instructor_client_recording_usage(api_key, usage)
 
     model_kwargs = {}
 
@@ -6,7 +6,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 import os
 from os.path import exists
-from api.config import UPLOAD_FOLDER_NAME
+from api.config import UPLOAD_FOLDER_NAME, leaderboard_snapshot_path
 from api.routes import (
     auth,
     code,
@@ -22,12 +22,25 @@ from api.routes import (
     ai,
     scorecard,
 )
-from api.routes.ai import (
-    resume_pending_task_generation_jobs,
-    resume_pending_course_structure_generation_jobs,
-)
-from api.websockets import router as websocket_router
+from api.worker import JobWorker, get_job_handlers
+from api.websockets import router as websocket_router, get_manager
 from api.scheduler import scheduler
+from api.utils.db import db_pool
+from api.utils.query_stats import query_stats
+from api.utils.concurrency import llm_limiter
+from api.db.job_queue import get_job_queue_metrics
+from api.utils.storage import close_storage
+from api.db.cache_sync import cache_sync
+from api.db.course_tree_cache import course_tree_cache
+from api.db.conversation_cache import conversations
+from api.context_builder import conversation_summaries
+from api.db.prompt_prefix_cache import prompt_prefixes
+from api.db.block_description_cache import block_descriptions
+from api.llm import openai_clients
+from api.model_router import routing_decisions
+from api.utils.audio import audio_payloads
+from api.utils.google_auth import google_token_verifier
+from api.db.leaderboard import leaderboards
 from api.settings import settings
 import bugsnag
 from bugsnag.asgi import BugsnagMiddleware
@@ -40,12 +53,29 @@ async def lifespan(app: FastAPI):
     # Create the uploads directory if it doesn't exist
     os.makedirs(settings.local_upload_folder, exist_ok=True)
 
-    # Add recovery logic for interrupted tasks
-    asyncio.create_task(resume_pending_task_generation_jobs())
-    asyncio.create_task(resume_pending_course_structure_generation_jobs())
+    # Pick up the leaderboards saved on the last shutdown
+    leaderboards.load_snapshot(leaderboard_snapshot_path)
+
+    # Run the queued generation jobs, including the ones interrupted by the last
+    # shutdown, unless the workers run in a process of their own
+    job_worker = JobWorker(get_job_handlers()) if settings.run_job_worker else None
+    if job_worker:
+        asyncio.create_task(job_worker.run())
+
+    # Receive the generation updates sent by other processes for our viewers, and
+    # the cache invalidations of those processes
+    await get_manager().start()
 
     yield
     scheduler.shutdown()
+    if job_worker:
+        await job_worker.stop()
+    await cache_sync.flush()
+    await get_manager().stop()
+    leaderboards.save_snapshot(leaderboard_snapshot_path)
+    await openai_clients.close()
+    await close_storage()
+    await db_pool.close()
 
 
 if settings.bugsnag_api_key:
@@ -122,3 +152,45 @@ app.include_router(websocket_router, prefix="/ws", tags=["websockets"])
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/health/db")
+async def db_health_check():
+    return db_pool.get_metrics()
+
+
+@app.get("/health/db/queries")
+async def db_query_stats(limit: int = 50):
+    return query_stats.get_summary(limit)
+
+
+@app.get("/health/llm")
+async def llm_concurrency_check():
+    return llm_limiter.get_metrics()
+
+
+@app.get("/health/jobs")
+async def job_queue_health_check():
+    return await get_job_queue_metrics()
+
+
+@app.get("/health/websockets")
+async def websocket_health_check():
+    return get_manager().get_metrics()
+
+
+@app.get("/health/caches")
+async def cache_health_check():
+    return {
+        "course_tree": course_tree_cache.get_metrics(),
+        "openai_clients": openai_clients.get_metrics(),
+        "routing_decisions": routing_decisions.get_metrics(),
+        "audio_payloads": audio_payloads.get_metrics(),
+        "google_id_tokens": google_token_verifier.get_metrics(),
+        "leaderboards": leaderboards.get_metrics(),
+        "conversations": conversations.get_metrics(),
+        "conversation_summaries": conversation_summaries.get_metrics(),
+        "prompt_prefixes": prompt_prefixes.get_metrics(),
+        "block_descriptions": block_descriptions.get_metrics(),
+        "cache_sync": cache_sync.get_metrics(),
+    }
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Tuple
+from pydantic import BaseModel, Field
+from langchain_core.output_parsers import PydanticOutputParser
+from api.config import openai_plan_to_model_name, routing_decision_cache_max_size
+from api.db.task import get_scorecard
+from api.db.block_description_cache import block_descriptions
+from api.llm import run_llm_with_instructor
+from api.models import QuestionType
+from api.settings import settings
+from api.utils.logging import logger
+
+
+class RouterOutput(BaseModel):
+    use_reasoning_model: bool = Field(
+        description="Whether to use a reasoning model to evaluate the student's response"
+    )
+
+
+ROUTER_SYSTEM_PROMPT = f"""You are an intelligent routing agent that decides which type of language model should be used to evaluate students' responses to a given task. You will receive the details of the task.\n\nYou have two options:\n- Reasoning Model (e.g. o3): Best for complex tasks involving logical deduction, problem-solving, code generation, mathematics, research reasoning, multi-step analysis, or edge-case handling.\n- General-Purpose Model (e.g. gpt-4o): Best for everyday conversation, writing help, summaries, rephrasing, explanations, casual queries, grammar correction, and general knowledge Q&A.\n\nYour job is to classify which of the two options is best suited to evaluate the students' responses for the given task. If a task can be solved by a general purpose model, avoid using a reasoning model as it takes longer and costs more. At the same time, accuracy cannot be compromised.\n\n{PydanticOutputParser(pydantic_object=RouterOutput).get_format_instructions()}"""
+
+
+def construct_question_details(question: Dict, key: str | None = None) -> str:
+    """
+    Task description for a quiz question, including its solution or scoring
+    criteria. The question and solution are rendered from their blocks only once per
+    version of the question stored under `key`.
+    """
+    question_description = block_descriptions.get_description(
+        question["blocks"], f"{key}_blocks" if key else None
+    )
+    question_details = f"""Task:\n```\n{question_description}\n```"""
+
+    if question["type"] == QuestionType.OBJECTIVE:
+        answer_as_prompt = block_descriptions.get_description(
+            question["answer"], f"{key}_answer" if key else None
+        )
+        question_details += f"""\n\nReference Solution (never to be shared with the learner):\n```\n{answer_as_prompt}\n```"""
+    else:
+        scoring_criteria_as_prompt = ""
+
+        for criterion in question["scorecard"]["criteria"]:
+            scoring_criteria_as_prompt += f"""- **{criterion['name']}** [min: {criterion['min_score']}, max: {criterion['max_score']}, pass: {criterion.get('pass_score', criterion['max_score'])}]: {criterion['description']}\n"""
+
+        question_details += (
+            f"""\n\nScoring Criteria:\n```\n{scoring_criteria_as_prompt}\n```"""
+        )
+
+    return question_details
+
+
+def get_content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class RoutingDecisionCache:
+    """
+    Whether a task needs the reasoning model, keyed by question or task id (or by
+    content hash for previews, which have no id). Each entry remembers the hash of
+    the task details it was decided on, so editing a task makes its entry stale
+    without any explicit invalidation.
+    """
+
+    def __init__(self, max_size: int = routing_decision_cache_max_size):
+        self.max_size = max_size
+        self._decisions: OrderedDict[str, Tuple[str, bool]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, content_hash: str) -> bool | None:
+        entry = self._decisions.get(key)
+
+        if entry is None or entry[0] != content_hash:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._decisions.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, content_hash: str, use_reasoning_model: bool):
+        self._decisions[key] = (content_hash, use_reasoning_model)
+        self._decisions.move_to_end(key)
+
+        while len(self._decisions) > self.max_size:
+            self._decisions.popitem(last=False)
+
+    def clear(self):
+        self._decisions.clear()
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._decisions),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+routing_decisions = RoutingDecisionCache()
+
+
+async def should_use_reasoning_model(task_details: str, key: str | None = None) -> bool:
+    """
+    Ask the router model whether evaluating responses to the task needs the
+    reasoning model. The decision depends only on the task, so it is cached and
+    the router is only called again once the task details change.
+    """
+    content_hash = get_content_hash(task_details)
+
+    if key is None:
+        key = f"preview_{content_hash}"
+
+    use_reasoning_model = routing_decisions.get(key, content_hash)
+
+    if use_reasoning_model is not None:
+        return use_reasoning_model
+
+    router_output = await run_llm_with_instructor(
+        api_key=settings.openai_api_key,
+        model=openai_plan_to_model_name["router"],
+        messages=[
+            {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
+            {"role": "user", "content": task_details},
+        ],
+        response_model=RouterOutput,
+        max_completion_tokens=4096,
+    )
+
+    routing_decisions.set(key, content_hash, router_output.use_reasoning_model)
+
+    return router_output.use_reasoning_model
+
+
+async def precompute_routing_decisions(task: Dict):
+    """
+    Decide the model for every question of a quiz ahead of time (e.g. when it is
+    published) so that learners' chat requests never wait on the router.
+    """
+
+    async def precompute_for_question(question: Dict):
+        try:
+            if question["type"] != QuestionType.OBJECTIVE:
+                if question.get("scorecard_id") is None:
+                    return
+
+                question["scorecard"] = await get_scorecard(question["scorecard_id"])
+
+            key = f"question_{question['id']}"
+            await should_use_reasoning_model(
+                construct_question_details(question, key), key
+            )
+        except Exception as exception:
+            logger.error(
+                f"Error precomputing routing decision for question {question['id']}: {exception}"
+            )
+
+    await asyncio.gather(
+        *[precompute_for_question(dict(question)) for question in task["questions"]]
+    )
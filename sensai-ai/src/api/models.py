@@ -363,6 +363,40 @@ class GenerateTaskJobStatus(str, Enum):
         return False
 
 
+class JobKind(str, Enum):
+    COURSE_STRUCTURE = "course_structure"
+    TASK = "task"
+
+    def __str__(self):
+        return self.value
+
+    def __eq__(self, other):
+        if isinstance(other, str):
+            return self.value == other
+        elif isinstance(other, JobKind):
+            return self.value == other.value
+
+        return False
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    LEASED = "leased"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __str__(self):
+        return self.value
+
+    def __eq__(self, other):
+        if isinstance(other, str):
+            return self.value == other
+        elif isinstance(other, JobStatus):
+            return self.value == other.value
+
+        return False
+
+
 class MilestoneTask(Task):
     ordering: int
     num_questions: int | None
@@ -1,20 +1,22 @@
 from typing import Annotated, Dict, List, Optional, Tuple
-from fastapi import FastAPI, Body, Header, HTTPException, Depends
+from fastapi import FastAPI, Body, Header, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from api.config import chat_history_page_size, chat_history_max_page_size
 from api.models import (
     PublicAPIChatMessage,
     CourseWithMilestonesAndTaskDetails,
-    TaskType,
 )
 from api.db.chat import (
     get_all_chat_history as get_all_chat_history_from_db,
+    get_chat_history_page as get_chat_history_page_from_db,
+    iter_all_chat_history as iter_all_chat_history_from_db,
 )
 from api.db.course import (
-    get_course as get_course_from_db,
+    get_course_with_task_details as get_course_with_task_details_from_db,
     get_course_org_id,
 )
-from api.db.task import get_task as get_task_from_db
 from api.db.org import get_org_id_from_api_key
-
+from api.utils import iter_ndjson
 
 app = FastAPI()
 
@@ -45,9 +47,32 @@ async def validate_api_key(api_key: str, org_id: int) -> None:
 async def get_all_chat_history(
     org_id: int,
     api_key: str = Header(...),
+    after_id: int | None = None,
+    limit: int | None = Query(None, ge=1, le=chat_history_max_page_size),
+    stream: bool = False,
 ) -> List[PublicAPIChatMessage]:
+    """
+    Chat history of the org in the order it was stored. Large histories can be read
+    a page at a time by passing `limit` (and the id of the last message received as
+    `after_id`), or streamed as newline-delimited JSON with `stream=true`.
+    """
     # Validate the API key for the given org_id
     await validate_api_key(api_key=api_key, org_id=org_id)
+
+    if stream:
+        return StreamingResponse(
+            iter_ndjson(
+                iter_all_chat_history_from_db(org_id, after_id),
+                PublicAPIChatMessage,
+            ),
+            media_type="application/x-ndjson",
+        )
+
+    if limit is not None or after_id is not None:
+        return await get_chat_history_page_from_db(
+            org_id, after_id, limit or chat_history_page_size
+        )
+
     return await get_all_chat_history_from_db(org_id)
 
 
@@ -79,15 +104,4 @@ async def get_tasks_for_course(
     # Validate the API key for the given org_id
     await validate_api_key(api_key=api_key, org_id=org_id)
 
-    course = await get_course_from_db(course_id=course_id)
-
-    for milestone in course["milestones"]:
-        for task in milestone["tasks"]:
-            task_details = await get_task_from_db(task["id"])
-
-            if task["type"] == TaskType.LEARNING_MATERIAL:
-                task["blocks"] = task_details["blocks"]
-            else:
-                task["questions"] = task_details["questions"]
-
-    return course
+    return await get_course_with_task_details_from_db(course_id)
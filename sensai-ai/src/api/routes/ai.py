@@ -1,18 +1,13 @@
 from ast import List
-import os
 import tempfile
-import random
-from collections import defaultdict
-import asyncio
-from fastapi import APIRouter, HTTPException, Body, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Body
 from fastapi.responses import StreamingResponse
-from typing import List, Optional, Dict, Literal, AsyncGenerator
+from functools import lru_cache
+from typing import List, Optional, Dict, Literal, AsyncGenerator, Type
 import json
-import instructor
-import openai
 from pydantic import BaseModel, Field
 from langchain_core.output_parsers import PydanticOutputParser
-from api.config import openai_plan_to_model_name
+from api.config import openai_plan_to_model_name, chat_context_audio_turns
 from api.models import (
     TaskAIResponseType,
     AIChatRequest,
@@ -23,55 +18,61 @@ from api.models import (
     GenerateTaskJobStatus,
     QuestionType,
 )
-from api.llm import run_llm_with_instructor, stream_llm_with_instructor
+from api.llm import (
+    run_llm_with_instructor,
+    stream_llm_with_instructor,
+    openai_clients,
+)
 from api.settings import settings
-from api.utils.logging import logger
-from api.utils.concurrency import async_batch_gather
 from api.websockets import get_manager
 from api.db.task import (
     get_task_metadata,
     get_question,
     get_task,
+    get_learning_material_descriptions,
     get_scorecard,
-    create_draft_task_for_course,
     store_task_generation_request,
+    get_task_generation_job,
     update_task_generation_job_status,
     get_course_task_generation_jobs_status,
     add_generated_learning_material,
     add_generated_quiz,
-    get_all_pending_task_generation_jobs,
 )
 from api.db.course import (
     store_course_generation_request,
+    get_course_generation_job,
     get_course_generation_job_details,
     update_course_generation_job_status_and_details,
     update_course_generation_job_status,
-    get_all_pending_course_structure_generation_jobs,
-    add_milestone_to_course,
+    remove_generated_course_items,
 )
 from api.db.chat import get_question_chat_history_for_user
-from api.db.utils import construct_description_from_blocks
-from api.utils.s3 import (
-    download_file_from_s3_as_bytes,
-    get_media_upload_s3_key_from_uuid,
+from api.db.conversation_cache import conversations
+from api.model_router import (
+    construct_question_details,
+    should_use_reasoning_model,
+    get_content_hash,
+)
+from api.context_builder import (
+    build_chat_context,
+    count_tokens,
+    get_prompt_cache_metadata,
+    AUDIO_RESPONSE_PLACEHOLDER,
 )
-from api.utils.audio import prepare_audio_input_for_ai
+from api.db.prompt_prefix_cache import prompt_prefixes
+from api.course_structure_writer import CourseStructureWriter
+from api.db.block_description_cache import block_descriptions
+from api.utils.storage import get_storage
+from api.utils.audio import get_audio_payloads
 from api.settings import tracer
 from opentelemetry.trace import StatusCode, Status
 from openinference.instrumentation import using_attributes
+from openinference.semconv.trace import SpanAttributes
 
 router = APIRouter()
 
 
-def get_user_audio_message_for_chat_history(uuid: str) -> List[Dict]:
-    if settings.s3_folder_name:
-        audio_data = download_file_from_s3_as_bytes(
-            get_media_upload_s3_key_from_uuid(uuid, "wav")
-        )
-    else:
-        with open(os.path.join(settings.local_upload_folder, f"{uuid}.wav"), "rb") as f:
-            audio_data = f.read()
-
+def get_user_audio_message_for_chat_history(audio_payload: str) -> List[Dict]:
     return [
         {
             "type": "text",
@@ -80,7 +81,7 @@ def get_user_audio_message_for_chat_history(uuid: str) -> List[Dict]:
         {
             "type": "input_audio",
             "input_audio": {
-                "data": prepare_audio_input_for_ai(audio_data),
+                "data": audio_payload,
                 "format": "wav",
             },
         },
@@ -116,6 +117,209 @@ def get_user_message_for_chat_history(user_response: str) -> str:
     return f"""Student's Response:\n```\n{user_response}\n```"""
 
 
+async def get_question_chat_history_for_prompt(
+    question_id: int, user_id: int
+) -> List[Dict]:
+    """
+    The learner's conversation on the question, where every message also has its
+    text formatted for the prompt under "prompt". Only the messages newer than the
+    cached ones are fetched and formatted.
+    """
+    version = conversations.get_version()
+    after_id, chat_history = conversations.get(user_id, question_id)
+
+    new_messages = [
+        {
+            "id": message["id"],
+            "role": message["role"],
+            "content": message["content"],
+            "prompt": (
+                get_user_message_for_chat_history(message["content"])
+                if message["role"] == "user"
+                else get_ai_message_for_chat_history(message["content"])
+            ),
+        }
+        for message in await get_question_chat_history_for_user(
+            question_id, user_id, after_id
+        )
+    ]
+    conversations.extend(user_id, question_id, version, after_id, new_messages)
+
+    return chat_history + new_messages
+
+
+# the schema is derived from the model on every call, so build each model only once
+@lru_cache
+def get_chat_response_model(
+    task_type: str, question_type: str | None = None
+) -> Type[BaseModel]:
+    if task_type == TaskType.QUIZ:
+        if question_type == QuestionType.OBJECTIVE:
+
+            class Output(BaseModel):
+                analysis: str = Field(
+                    description="A detailed analysis of the student's response"
+                )
+                feedback: str = Field(
+                    description="Feedback on the student's response; add newline characters to the feedback to make it more readable where necessary"
+                )
+                is_correct: bool = Field(
+                    description="Whether the student's response correctly solves the original task that the student is supposed to solve. For this to be true, the original task needs to be completely solved and not just partially solved. Giving the right answer to one step of the task does not count as solving the entire task."
+                )
+
+        else:
+
+            class Feedback(BaseModel):
+                correct: Optional[str] = Field(
+                    description="What worked well in the student's response for this category based on the scoring criteria"
+                )
+                wrong: Optional[str] = Field(
+                    description="What needs improvement in the student's response for this category based on the scoring criteria"
+                )
+
+            class Row(BaseModel):
+                category: str = Field(
+                    description="Category from the scoring criteria for which the feedback is being provided"
+                )
+                feedback: Feedback = Field(
+                    description="Detailed feedback for the student's response for this category"
+                )
+                score: int = Field(
+                    description="Score given within the min/max range for this category based on the student's response - the score given should be in alignment with the feedback provided"
+                )
+                max_score: int = Field(
+                    description="Maximum score possible for this category as per the scoring criteria"
+                )
+                pass_score: int = Field(
+                    description="Pass score possible for this category as per the scoring criteria"
+                )
+
+            class Output(BaseModel):
+                feedback: str = Field(
+                    description="A single, comprehensive summary based on the scoring criteria"
+                )
+                scorecard: Optional[List[Row]] = Field(
+                    description="List of rows with one row for each category from scoring criteria; only include this in the response if the student's response is an answer to the task"
+                )
+
+    else:
+
+        class Output(BaseModel):
+            response: str = Field(
+                description="Response to the student's query; add proper formatting to the response to make it more readable where necessary"
+            )
+
+    return Output
+
+
+async def get_knowledge_base(question: Dict, key: str | None = None) -> str | None:
+    if not question["context"]:
+        return None
+
+    # top-level blocks render independently, so each part is rendered (and cached) on its own
+    knowledge_base = [
+        block_descriptions.get_description(
+            question["context"]["blocks"], f"{key}_context" if key else None
+        )
+    ]
+
+    linked_task_ids = [int(id) for id in question["context"]["linkedMaterialIds"] or []]
+    linked_descriptions = await get_learning_material_descriptions(linked_task_ids)
+
+    for task_id in linked_task_ids:
+        if task_id in linked_descriptions:
+            knowledge_base.append(linked_descriptions[task_id])
+
+    return "".join(knowledge_base)
+
+
+def get_chat_system_prompt(
+    task_type: TaskType,
+    question_type: QuestionType | None = None,
+    knowledge_base: str | None = None,
+) -> str:
+    format_instructions = PydanticOutputParser(
+        pydantic_object=get_chat_response_model(
+            str(task_type), str(question_type) if question_type else None
+        )
+    ).get_format_instructions()
+
+    if task_type == TaskType.QUIZ:
+        context_instructions = ""
+        if knowledge_base:
+            context_instructions = f"""\n\nMake sure to use only the information provided within ``` below for responding to the student while ignoring any other information that contradicts the information provided:\n\n```\n{knowledge_base}\n```"""
+
+        if question_type == QuestionType.OBJECTIVE:
+            return f"""You are a Socratic tutor who guides a student step-by-step as a coach would, encouraging them to arrive at the correct answer on their own without ever giving away the right answer to the student straight away.\n\nYou will receive:\n\n- Task description\n- Conversation history with the student\n- Task solution (for your reference only; do not reveal){context_instructions}\n\nYou need to evaluate the student's response for correctness and give your feedback that can be shared with the student.\n\n{format_instructions}\n\nGuidelines on assessing correctness of the student's answer:\n\n- Once the student has provided an answer that is correct with respect to the solution provided at the start, clearly acknowledge that they have got the correct answer and stop asking any more reflective questions. Your response should make them feel a sense of completion and accomplishment at a job well done.\n- If the question is one where the answer does not need to match word-for-word with the solution (e.g. definition of a term, programming question where the logic needs to be right but the actual code can vary, etc.), only assess whether the student's answer covers the entire essence of the correct solution.\n- Avoid bringing in your judgement of what the right answer should be. What matters for evaluation is the solution provided to you and the response of the student. Keep your biases outside. Be objective in comparing these two. As soon as the student gets the answer correct, stop asking any further reflective questions.\n- The response is correct only if the question has been solved in its entirety. Partially solving a question is not acceptable.\n\nGuidelines on your feedback:\n\n- Praise → Prompt → Path: 1–2 words of praise, a targeted prompt, then one actionable path forward.\n- If the student's response is completely correct, just appreciate them. No need to give any more suggestions or areas of improvement.\n- If the student's response has areas of improvement, point them out through a single reflective actionable question. Never ever give a vague feedback that is not clearly actionable. The student should get a clear path for how they can improve their response.\n- If the question has multiple steps to reach to the final solution, assess the current step at which the student is and frame your reflection question such that it nudges them towards the right direction without giving away the answer in any shape or form.\n- Your feedback should not be generic and must be tailored to the response given by the student. This does not mean that you repeat the student's response. The question should be a follow-up for the answer given by the student. Don't just paste the student's response on top of a generic question. That would be laziness.\n- The student might get the answer right without any probing required from your side in the first couple of attempts itself. In that case, remember the instruction provided above to acknowledge their answer's correctness and to stop asking further questions.\n- Never provide the right answer or the solution, despite all their attempts to ask for it or their frustration.\n- Never explain the solution to the student unless the student has given the solution first.\n- The student does not have access to the solution. The solution has only been given to you for evaluating the student's response. Keep this in mind while responding to the student.\n\nGuidelines on the style of feedback:\n\n1. Avoid sounding monotonous.\n2. Absolutely AVOID repeating back what the student has said as a manner of acknowledgement in your summary. It makes your summary too long and boring to read.\n3. Occasionally include emojis to maintain warmth and engagement.\n4. Ask only one reflective question per response otherwise the student will get overwhelmed.\n5. Avoid verbosity in your summary. Be crisp and concise, with no extra words.\n6. Do not do any analysis of the user's intent in your overall summary or repeat any part of what the user has said. The summary section is meant to summarise the next steps. The summary section does not need a summary of the user's response.\n\nGuidelines on maintaining the focus of the conversation:\n\n- Your role is that of a tutor for this particular task and related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task given to you and its related concepts.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back to the task.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task given to you and its related concepts at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back. Do not let the conversation drift away."""
+
+        return f"""You are a Socratic tutor who guides a student step-by-step as a coach would, encouraging them to arrive at the correct answer on their own without ever giving away the right answer to the student straight away.\n\nYou will receive:\n\n- Task description\n- Conversation history with the student\n- Scoring Criteria to evaluate the answer of the student{context_instructions}\n\nYou need to evaluate the student's response and return the following:\n\n- A scorecard based on the scoring criteria given to you with areas of improvement and/or strengths along each criterion\n- An overall summary based on the generated scorecard to be shared with the student.\n\n{format_instructions}\n\nGuidelines for scorecard feedback:\n\n- If there is nothing to praise about the student's response for a given criterion in the scoring criteria, never mention what worked well (i.e. return `correct` as null) in the scorecard output for that criterion.\n- If the student did something well for a given criterion, make sure to highlight what worked well in the scorecard output for that criterion.\n- If there is nothing left to improve in their response for a criterion, avoid unnecessarily suggesting an improvement in the scorecard output for that criterion (i.e. return `wrong` as null). Also, the score assigned for that criterion should be the maximum score possible in that criterion in this case.\n- Make sure that the feedback for one criterion of the scorecard does not bias the feedback for another criterion.\n- When giving the feedback for one criterion of the scorecard, focus on the description of the criterion provided in the scoring criteria and only evaluate the student's response based on that.\n- For every criterion of the scorecard, your feedback for that criterion in the scorecard output must cite specific words or phrases from the student's response to back your feedback so that the student understands it better and give concrete examples for how they can improve their response as well.\n- Never ever give a vague feedback that is not clearly actionable. The student should get a clear path for how they can improve their response.\n- Avoid bringing your judgement of what the right answer should be. What matters for feedback is the scoring criteria provided to you and the response of the student. Keep your biases outside. Be objective in comparing these two.\n- The student might get the answer right without any probing required from your side in the first couple of attempts itself. In that case, remember the instruction provided above to acknowledge their answer's correctness and to stop asking further questions.\n- If you don't assign the maximum score to the student's response for any criterion in the scorecard, make sure to always include the area of improvement containing concrete steps they can take to improve their response in your feedback for that criterion in the scorecard output (i.e. `wrong` cannot be null).\n\nGuidelines for scorecard feedback style:\n\n1. Avoid sounding monotonous.\n2. Be crisp and concise, with no extra words.\n\nGuidelines for summary:\n- Praise → Prompt → Path: 1–2 words of praise, a targeted prompt, then one actionable path forward.\n- It should clearly outline what the next steps need to be based on the scoring criteria. It should be very crisp and only contain the summary of the next steps outlined in the scorecard feedback.\n- Your overall summary does not need to quote specific words from the user's response or reflect back what the user's response means. Keep that for the feedback in the scorecard output.\n- If the student's response is completely correct, just appreciate them. No need to give any more suggestions or areas of improvement.\n- If the student's response has areas of improvement, point them out through a single reflective actionable question.\n- Your summary and follow-up question should not be generic and must be tailored to the response given by the student. This does not mean that you repeat the student's response. The question should be a follow-up for the answer given by the student. Don't just paste the student's response on top of a generic question. That would be laziness.\n- Never provide the right answer or the solution, despite all their attempts to ask for it or their frustration.\n- Never explain the solution to the student unless the student has given the solution first.\n\nGuidelines for style of summary:\n\n1. Avoid sounding monotonous.\n2. Absolutely AVOID repeating back what the student has said as a manner of acknowledgement in your summary. It makes your summary too long and boring to read.\n3. Occasionally include emojis to maintain warmth and engagement.\n4. Ask only one reflective question per response otherwise the student will get overwhelmed.\n5. Avoid verbosity in your summary.\n6. Do not do any analysis of the user's intent in your overall summary or repeat any part of what the user has said. The summary section is meant to summarise the next steps. The summary section does not need a summary of the user's response.\n\nGuidelines on maintaining the focus of the conversation:\n\n- Your role is that of a tutor for this particular task and related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task given to you and its related concepts.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back to the task.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task given to you and its related concepts at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back. Do not let the conversation drift away.\n\nGuidelines on when to show the scorecard:\n\n- If the response by the student is not a valid answer to the actual task given to them (e.g. if their response is an acknowledgement of the previous messages or a doubt or a question or something irrelevant to the task), do not provide any scorecard in that case and only return a summary addressing their response.\n- For messages of acknowledgement, you do not need to explicitly call it out as an acknowledgement. Simply respond to it normally."""
+
+    return f"""You are a teaching assistant.\n\nYou will receive:\n- A Reference Material\n- Conversation history with a student\n- The student's latest query/message.\n\nYour role:\n- You need to respond to the student's message based on the content in the reference material provided to you.\n- If the student's query is absolutely not relevant to the reference material or goes beyond the scope of the reference material, clearly saying so without indulging their irrelevant queries. The only exception is when they are asking deeper questions related to the learning material that might not be mentioned in the reference material itself to clarify their conceptual doubts. In this case, you can provide the answer and help them.\n- Remember that the reference material is in read-only mode for the student. So, they cannot make any changes to it.\n\n{format_instructions}\n\nGuidelines on your response style:\n- Be crisp, concise and to the point.\n- Vary your phrasing to avoid monotony; occasionally include emojis to maintain warmth and engagement.\n- Playfully redirect irrelevant responses back to the task without judgment.\n- If the task involves code, format code snippets or variable/function names with backticks (`example`).\n- If including HTML, wrap tags in backticks (`<html>`).\n- If your response includes rich text format like lists, font weights, tables, etc. always render them as markdown.\n- Avoid being unnecessarily verbose in your response.\n\nGuideline on maintaining focus:\n- Your role is that of a teaching assistant for this particular task and its related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task and its related concepts give to you.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task and its related concepts given to you at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back to the task and its related concepts. Do not let the conversation drift away."""
+
+
+async def get_quiz_prompt_prefix(question: Dict, key: str | None = None) -> List[Dict]:
+    """
+    The system prompt and the question's details (along with any linked learning
+    material), which start every chat prompt for the question so that the provider
+    can cache them across turns and learners. Built once per version of the question
+    and cached under `key` (by content hash for previews, which have no id).
+    """
+    content_hash = get_content_hash(json.dumps(question, sort_keys=True, default=str))
+
+    if key is None:
+        key = f"preview_{content_hash}"
+
+    prefix = prompt_prefixes.get(key, content_hash)
+    if prefix is not None:
+        return prefix
+
+    prefix = [
+        {
+            "role": "system",
+            "content": get_chat_system_prompt(
+                TaskType.QUIZ,
+                question["type"],
+                await get_knowledge_base(question, key),
+            ),
+        },
+        {"role": "user", "content": construct_question_details(question, key)},
+    ]
+
+    linked_task_ids = (
+        [int(id) for id in question["context"]["linkedMaterialIds"] or []]
+        if question["context"]
+        else []
+    )
+    prompt_prefixes.set(key, content_hash, prefix, linked_task_ids)
+
+    return prefix
+
+
+def get_learning_material_prompt_prefix(task: Dict) -> List[Dict]:
+    """The system prompt and the reference material, built once per version of the task."""
+    key = f"task_{task['id']}"
+    content_hash = get_content_hash(json.dumps(task["blocks"], sort_keys=True))
+
+    prefix = prompt_prefixes.get(key, content_hash)
+    if prefix is not None:
+        return prefix
+
+    reference_material = block_descriptions.get_description(task["blocks"], key)
+    prefix = [
+        {
+            "role": "system",
+            "content": get_chat_system_prompt(TaskType.LEARNING_MATERIAL),
+        },
+        {
+            "role": "user",
+            "content": f"""Reference Material:\n```\n{reference_material}\n```""",
+        },
+    ]
+    prompt_prefixes.set(key, content_hash, prefix)
+
+    return prefix
+
+
 @router.post("/chat")
 async def ai_response_for_question(request: AIChatRequest):
     metadata = {"task_id": request.task_id, "user_id": request.user_id}
@@ -166,8 +370,7 @@ async def ai_response_for_question(request: AIChatRequest):
 
         chat_history = request.chat_history
 
-        reference_material = construct_description_from_blocks(task["blocks"])
-        question_details = f"""Reference Material:\n```\n{reference_material}\n```"""
+        prompt_prefix = get_learning_material_prompt_prefix(task)
     else:
         metadata["type"] = "quiz"
 
@@ -178,13 +381,9 @@ async def ai_response_for_question(request: AIChatRequest):
 
             metadata["question_id"] = request.question_id
 
-            chat_history = await get_question_chat_history_for_user(
+            chat_history = await get_question_chat_history_for_prompt(
                 request.question_id, request.user_id
             )
-            chat_history = [
-                {"role": message["role"], "content": message["content"]}
-                for message in chat_history
-            ]
         else:
             question = request.question.model_dump()
             chat_history = request.chat_history
@@ -200,68 +399,95 @@ async def ai_response_for_question(request: AIChatRequest):
         metadata["question_input_type"] = question["input_type"]
         metadata["question_has_context"] = bool(question["context"])
 
-        question_description = construct_description_from_blocks(question["blocks"])
-        question_details = f"""Task:\n```\n{question_description}\n```"""
+        prompt_prefix = await get_quiz_prompt_prefix(
+            question,
+            f"question_{request.question_id}" if request.question_id else None,
+        )
+
+    # the task details close the cacheable prefix of the prompt
+    question_details = prompt_prefix[-1]["content"]
+    metadata["prompt_prefix_tokens"] = count_tokens(prompt_prefix)
 
     task_metadata = await get_task_metadata(request.task_id)
     if task_metadata:
         metadata.update(task_metadata)
 
-    for message in chat_history:
-        if message["role"] == "user":
-            if request.response_type == ChatResponseType.AUDIO:
-                message["content"] = get_user_audio_message_for_chat_history(
-                    message["content"]
-                )
-            else:
-                message["content"] = get_user_message_for_chat_history(
-                    message["content"]
+    if request.response_type == ChatResponseType.AUDIO:
+        # only the most recent answers are sent as audio; the older ones are left to
+        # the feedback they received
+        user_message_indices = [
+            index
+            for index, message in enumerate(chat_history)
+            if message["role"] == "user"
+        ]
+        audio_message_indices = set(
+            user_message_indices[
+                max(len(user_message_indices) - chat_context_audio_turns, 0) :
+            ]
+        )
+
+        # fetch the recordings at once instead of one by one
+        audio_uuids = [
+            chat_history[index]["content"] for index in sorted(audio_message_indices)
+        ] + [request.user_response]
+        audio_payloads = dict(zip(audio_uuids, await get_audio_payloads(audio_uuids)))
+
+    prompt_chat_history = []
+    for index, message in enumerate(chat_history):
+        if (
+            message["role"] == "user"
+            and request.response_type == ChatResponseType.AUDIO
+        ):
+            content = (
+                get_user_audio_message_for_chat_history(
+                    audio_payloads[message["content"]]
                 )
+                if index in audio_message_indices
+                else get_user_message_for_chat_history(AUDIO_RESPONSE_PLACEHOLDER)
+            )
+        elif "prompt" in message:
+            # already formatted when the message was first fetched
+            content = message["prompt"]
+        elif message["role"] == "user":
+            content = get_user_message_for_chat_history(message["content"])
         else:
+            content = message["content"]
             if request.task_type == TaskType.LEARNING_MATERIAL:
-                message["content"] = json.dumps({"feedback": message["content"]})
+                content = json.dumps({"feedback": content})
+
+            content = get_ai_message_for_chat_history(content)
+
+        prompt_chat_history.append({"role": message["role"], "content": content})
 
-            message["content"] = get_ai_message_for_chat_history(message["content"])
+    with using_attributes(
+        session_id=session_id,
+        user_id=str(request.user_id),
+        metadata={"stage": "context", **metadata},
+    ):
+        prompt_chat_history, context_metadata = await build_chat_context(
+            prompt_chat_history, session_id
+        )
+
+    # token counts before and after fitting the history within the budget
+    metadata.update(context_metadata)
 
     user_message = (
-        get_user_audio_message_for_chat_history(request.user_response)
+        get_user_audio_message_for_chat_history(audio_payloads[request.user_response])
         if request.response_type == ChatResponseType.AUDIO
         else get_user_message_for_chat_history(request.user_response)
     )
 
     user_message = {"role": "user", "content": user_message}
 
-    if request.task_type == TaskType.QUIZ:
-        if question["type"] == QuestionType.OBJECTIVE:
-            answer_as_prompt = construct_description_from_blocks(question["answer"])
-            question_details += f"""\n\nReference Solution (never to be shared with the learner):\n```\n{answer_as_prompt}\n```"""
-        else:
-            scoring_criteria_as_prompt = ""
-
-            for criterion in question["scorecard"]["criteria"]:
-                scoring_criteria_as_prompt += f"""- **{criterion['name']}** [min: {criterion['min_score']}, max: {criterion['max_score']}, pass: {criterion.get('pass_score', criterion['max_score'])}]: {criterion['description']}\n"""
-
-            question_details += (
-                f"""\n\nScoring Criteria:\n```\n{scoring_criteria_as_prompt}\n```"""
-            )
-
-    chat_history = (
-        chat_history
-        + [user_message]
-        + [
-            {
-                "role": "user",
-                "content": question_details,
-            }
-        ]
-    )
+    # everything that varies between turns goes after the static prefix
+    chat_history = prompt_chat_history + [user_message]
 
     # Define an async generator for streaming
     async def stream_response() -> AsyncGenerator[str, None]:
         with tracer.start_as_current_span(
             "ai_chat", openinference_span_kind="llm"
         ) as span:
-            span.set_input(chat_history)
+            span.set_input(prompt_prefix[1:] + chat_history)
 
             if request.task_type == TaskType.LEARNING_MATERIAL:
                 with using_attributes(
@@ -273,9 +499,11 @@ async def ai_response_for_question(request: AIChatRequest):
 
                     model = openai_plan_to_model_name["text-mini"]
 
-                    messages = [
-                        {"role": "system", "content": system_prompt}
-                    ] + chat_history
+                    messages = (
+                        [{"role": "system", "content": system_prompt}]
+                        + prompt_prefix[1:]
+                        + chat_history
+                    )
 
                     class Output(BaseModel):
                         rewritten_query: str = Field(
@@ -290,145 +518,42 @@ async def ai_response_for_question(request: AIChatRequest):
                         max_completion_tokens=8192,
                     )
 
-                    chat_history[-2]["content"] = get_user_message_for_chat_history(
+                    chat_history[-1]["content"] = get_user_message_for_chat_history(
                         pred.rewritten_query
                     )
 
             output_buffer = []
+            usage = {}
 
             try:
                 if request.response_type == ChatResponseType.AUDIO:
                     model = openai_plan_to_model_name["audio"]
                 else:
-
-                    class Output(BaseModel):
-                        use_reasoning_model: bool = Field(
-                            description="Whether to use a reasoning model to evaluate the student's response"
-                        )
-
-                    format_instructions = PydanticOutputParser(
-                        pydantic_object=Output
-                    ).get_format_instructions()
-
-                    system_prompt = f"""You are an intelligent routing agent that decides which type of language model should be used to evaluate a student's response to a given task. You will receive the details of a task, the conversation history with the student and the student's latest query/message.\n\nYou have two options:\n- Reasoning Model (e.g. o3): Best for complex tasks involving logical deduction, problem-solving, code generation, mathematics, research reasoning, multi-step analysis, or edge-case handling.\n- General-Purpose Model (e.g. gpt-4o): Best for everyday conversation, writing help, summaries, rephrasing, explanations, casual queries, grammar correction, and general knowledge Q&A.\n\nYour job is to classify which of the two options is best suited to evaluate the student's response for the given task. If a task can be solved by a general purpose model, avoid using a reasoning model as it takes longer and costs more. At the same time, accuracy cannot be compromised.\n\n{format_instructions}"""
-
-                    messages = [
-                        {
-                            "role": "system",
-                            "content": system_prompt,
-                        }
-                    ] + chat_history
+                    if request.task_type == TaskType.LEARNING_MATERIAL:
+                        routing_key = f"task_{request.task_id}"
+                    elif request.question_id:
+                        routing_key = f"question_{request.question_id}"
+                    else:
+                        # previews are cached by the hash of the question details
+                        routing_key = None
 
                     with using_attributes(
                         session_id=session_id,
                         user_id=str(request.user_id),
                         metadata={"stage": "router", **metadata},
                     ):
-                        router_output = await run_llm_with_instructor(
-                            api_key=settings.openai_api_key,
-                            model=openai_plan_to_model_name["router"],
-                            messages=messages,
-                            response_model=Output,
-                            max_completion_tokens=4096,
+                        use_reasoning_model = await should_use_reasoning_model(
+                            question_details, routing_key
                         )
 
-                    if router_output.use_reasoning_model:
+                    if use_reasoning_model:
                         model = openai_plan_to_model_name["reasoning"]
                     else:
                         model = openai_plan_to_model_name["text"]
 
                 # print(f"Using model: {model}")
 
-                if request.task_type == TaskType.QUIZ:
-                    if question["type"] == QuestionType.OBJECTIVE:
-
-                        class Output(BaseModel):
-                            analysis: str = Field(
-                                description="A detailed analysis of the student's response"
-                            )
-                            feedback: str = Field(
-                                description="Feedback on the student's response; add newline characters to the feedback to make it more readable where necessary"
-                            )
-                            is_correct: bool = Field(
-                                description="Whether the student's response correctly solves the original task that the student is supposed to solve. For this to be true, the original task needs to be completely solved and not just partially solved. Giving the right answer to one step of the task does not count as solving the entire task."
-                            )
-
-                    else:
-
-                        class Feedback(BaseModel):
-                            correct: Optional[str] = Field(
-                                description="What worked well in the student's response for this category based on the scoring criteria"
-                            )
-                            wrong: Optional[str] = Field(
-                                description="What needs improvement in the student's response for this category based on the scoring criteria"
-                            )
-
-                        class Row(BaseModel):
-                            category: str = Field(
-                                description="Category from the scoring criteria for which the feedback is being provided"
-                            )
-                            feedback: Feedback = Field(
-                                description="Detailed feedback for the student's response for this category"
-                            )
-                            score: int = Field(
-                                description="Score given within the min/max range for this category based on the student's response - the score given should be in alignment with the feedback provided"
-                            )
-                            max_score: int = Field(
-                                description="Maximum score possible for this category as per the scoring criteria"
-                            )
-                            pass_score: int = Field(
-                                description="Pass score possible for this category as per the scoring criteria"
-                            )
-
-                        class Output(BaseModel):
-                            feedback: str = Field(
-                                description="A single, comprehensive summary based on the scoring criteria"
-                            )
-                            scorecard: Optional[List[Row]] = Field(
-                                description="List of rows with one row for each category from scoring criteria; only include this in the response if the student's response is an answer to the task"
-                            )
-
-                else:
-
-                    class Output(BaseModel):
-                        response: str = Field(
-                            description="Response to the student's query; add proper formatting to the response to make it more readable where necessary"
-                        )
-
-                parser = PydanticOutputParser(pydantic_object=Output)
-                format_instructions = parser.get_format_instructions()
-
-                if request.task_type == TaskType.QUIZ:
-                    knowledge_base = None
-
-                    if question["context"]:
-                        linked_learning_material_ids = question["context"][
-                            "linkedMaterialIds"
-                        ]
-                        knowledge_blocks = question["context"]["blocks"]
-
-                        if linked_learning_material_ids:
-                            for id in linked_learning_material_ids:
-                                task = await get_task(int(id))
-                                if task:
-                                    knowledge_blocks += task["blocks"]
-
-                        knowledge_base = construct_description_from_blocks(
-                            knowledge_blocks
-                        )
-
-                    context_instructions = ""
-                    if knowledge_base:
-                        context_instructions = f"""\n\nMake sure to use only the information provided within ``` below for responding to the student while ignoring any other information that contradicts the information provided:\n\n```\n{knowledge_base}\n```"""
-
-                    if question["type"] == QuestionType.OBJECTIVE:
-                        system_prompt = f"""You are a Socratic tutor who guides a student step-by-step as a coach would, encouraging them to arrive at the correct answer on their own without ever giving away the right answer to the student straight away.\n\nYou will receive:\n\n- Task description\n- Conversation history with the student\n- Task solution (for your reference only; do not reveal){context_instructions}\n\nYou need to evaluate the student's response for correctness and give your feedback that can be shared with the student.\n\n{format_instructions}\n\nGuidelines on assessing correctness of the student's answer:\n\n- Once the student has provided an answer that is correct with respect to the solution provided at the start, clearly acknowledge that they have got the correct answer and stop asking any more reflective questions. Your response should make them feel a sense of completion and accomplishment at a job well done.\n- If the question is one where the answer does not need to match word-for-word with the solution (e.g. definition of a term, programming question where the logic needs to be right but the actual code can vary, etc.), only assess whether the student's answer covers the entire essence of the correct solution.\n- Avoid bringing in your judgement of what the right answer should be. What matters for evaluation is the solution provided to you and the response of the student. Keep your biases outside. Be objective in comparing these two. As soon as the student gets the answer correct, stop asking any further reflective questions.\n- The response is correct only if the question has been solved in its entirety. Partially solving a question is not acceptable.\n\nGuidelines on your feedback:\n\n- Praise → Prompt → Path: 1–2 words of praise, a targeted prompt, then one actionable path forward.\n- If the student's response is completely correct, just appreciate them. No need to give any more suggestions or areas of improvement.\n- If the student's response has areas of improvement, point them out through a single reflective actionable question. Never ever give a vague feedback that is not clearly actionable. The student should get a clear path for how they can improve their response.\n- If the question has multiple steps to reach to the final solution, assess the current step at which the student is and frame your reflection question such that it nudges them towards the right direction without giving away the answer in any shape or form.\n- Your feedback should not be generic and must be tailored to the response given by the student. This does not mean that you repeat the student's response. The question should be a follow-up for the answer given by the student. Don't just paste the student's response on top of a generic question. That would be laziness.\n- The student might get the answer right without any probing required from your side in the first couple of attempts itself. In that case, remember the instruction provided above to acknowledge their answer's correctness and to stop asking further questions.\n- Never provide the right answer or the solution, despite all their attempts to ask for it or their frustration.\n- Never explain the solution to the student unless the student has given the solution first.\n- The student does not have access to the solution. The solution has only been given to you for evaluating the student's response. Keep this in mind while responding to the student.\n\nGuidelines on the style of feedback:\n\n1. Avoid sounding monotonous.\n2. Absolutely AVOID repeating back what the student has said as a manner of acknowledgement in your summary. It makes your summary too long and boring to read.\n3. Occasionally include emojis to maintain warmth and engagement.\n4. Ask only one reflective question per response otherwise the student will get overwhelmed.\n5. Avoid verbosity in your summary. Be crisp and concise, with no extra words.\n6. Do not do any analysis of the user's intent in your overall summary or repeat any part of what the user has said. The summary section is meant to summarise the next steps. The summary section does not need a summary of the user's response.\n\nGuidelines on maintaining the focus of the conversation:\n\n- Your role is that of a tutor for this particular task and related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task given to you and its related concepts.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back to the task.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task given to you and its related concepts at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back. Do not let the conversation drift away."""
-                    else:
-                        system_prompt = f"""You are a Socratic tutor who guides a student step-by-step as a coach would, encouraging them to arrive at the correct answer on their own without ever giving away the right answer to the student straight away.\n\nYou will receive:\n\n- Task description\n- Conversation history with the student\n- Scoring Criteria to evaluate the answer of the student{context_instructions}\n\nYou need to evaluate the student's response and return the following:\n\n- A scorecard based on the scoring criteria given to you with areas of improvement and/or strengths along each criterion\n- An overall summary based on the generated scorecard to be shared with the student.\n\n{format_instructions}\n\nGuidelines for scorecard feedback:\n\n- If there is nothing to praise about the student's response for a given criterion in the scoring criteria, never mention what worked well (i.e. return `correct` as null) in the scorecard output for that criterion.\n- If the student did something well for a given criterion, make sure to highlight what worked well in the scorecard output for that criterion.\n- If there is nothing left to improve in their response for a criterion, avoid unnecessarily suggesting an improvement in the scorecard output for that criterion (i.e. return `wrong` as null). Also, the score assigned for that criterion should be the maximum score possible in that criterion in this case.\n- Make sure that the feedback for one criterion of the scorecard does not bias the feedback for another criterion.\n- When giving the feedback for one criterion of the scorecard, focus on the description of the criterion provided in the scoring criteria and only evaluate the student's response based on that.\n- For every criterion of the scorecard, your feedback for that criterion in the scorecard output must cite specific words or phrases from the student's response to back your feedback so that the student understands it better and give concrete examples for how they can improve their response as well.\n- Never ever give a vague feedback that is not clearly actionable. The student should get a clear path for how they can improve their response.\n- Avoid bringing your judgement of what the right answer should be. What matters for feedback is the scoring criteria provided to you and the response of the student. Keep your biases outside. Be objective in comparing these two.\n- The student might get the answer right without any probing required from your side in the first couple of attempts itself. In that case, remember the instruction provided above to acknowledge their answer's correctness and to stop asking further questions.\n- If you don't assign the maximum score to the student's response for any criterion in the scorecard, make sure to always include the area of improvement containing concrete steps they can take to improve their response in your feedback for that criterion in the scorecard output (i.e. `wrong` cannot be null).\n\nGuidelines for scorecard feedback style:\n\n1. Avoid sounding monotonous.\n2. Be crisp and concise, with no extra words.\n\nGuidelines for summary:\n- Praise → Prompt → Path: 1–2 words of praise, a targeted prompt, then one actionable path forward.\n- It should clearly outline what the next steps need to be based on the scoring criteria. It should be very crisp and only contain the summary of the next steps outlined in the scorecard feedback.\n- Your overall summary does not need to quote specific words from the user's response or reflect back what the user's response means. Keep that for the feedback in the scorecard output.\n- If the student's response is completely correct, just appreciate them. No need to give any more suggestions or areas of improvement.\n- If the student's response has areas of improvement, point them out through a single reflective actionable question.\n- Your summary and follow-up question should not be generic and must be tailored to the response given by the student. This does not mean that you repeat the student's response. The question should be a follow-up for the answer given by the student. Don't just paste the student's response on top of a generic question. That would be laziness.\n- Never provide the right answer or the solution, despite all their attempts to ask for it or their frustration.\n- Never explain the solution to the student unless the student has given the solution first.\n\nGuidelines for style of summary:\n\n1. Avoid sounding monotonous.\n2. Absolutely AVOID repeating back what the student has said as a manner of acknowledgement in your summary. It makes your summary too long and boring to read.\n3. Occasionally include emojis to maintain warmth and engagement.\n4. Ask only one reflective question per response otherwise the student will get overwhelmed.\n5. Avoid verbosity in your summary.\n6. Do not do any analysis of the user's intent in your overall summary or repeat any part of what the user has said. The summary section is meant to summarise the next steps. The summary section does not need a summary of the user's response.\n\nGuidelines on maintaining the focus of the conversation:\n\n- Your role is that of a tutor for this particular task and related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task given to you and its related concepts.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back to the task.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task given to you and its related concepts at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back. Do not let the conversation drift away.\n\nGuidelines on when to show the scorecard:\n\n- If the response by the student is not a valid answer to the actual task given to them (e.g. if their response is an acknowledgement of the previous messages or a doubt or a question or something irrelevant to the task), do not provide any scorecard in that case and only return a summary addressing their response.\n- For messages of acknowledgement, you do not need to explicitly call it out as an acknowledgement. Simply respond to it normally."""
-                else:
-                    system_prompt = f"""You are a teaching assistant.\n\nYou will receive:\n- A Reference Material\n- Conversation history with a student\n- The student's latest query/message.\n\nYour role:\n- You need to respond to the student's message based on the content in the reference material provided to you.\n- If the student's query is absolutely not relevant to the reference material or goes beyond the scope of the reference material, clearly saying so without indulging their irrelevant queries. The only exception is when they are asking deeper questions related to the learning material that might not be mentioned in the reference material itself to clarify their conceptual doubts. In this case, you can provide the answer and help them.\n- Remember that the reference material is in read-only mode for the student. So, they cannot make any changes to it.\n\n{format_instructions}\n\nGuidelines on your response style:\n- Be crisp, concise and to the point.\n- Vary your phrasing to avoid monotony; occasionally include emojis to maintain warmth and engagement.\n- Playfully redirect irrelevant responses back to the task without judgment.\n- If the task involves code, format code snippets or variable/function names with backticks (`example`).\n- If including HTML, wrap tags in backticks (`<html>`).\n- If your response includes rich text format like lists, font weights, tables, etc. always render them as markdown.\n- Avoid being unnecessarily verbose in your response.\n\nGuideline on maintaining focus:\n- Your role is that of a teaching assistant for this particular task and its related concepts only. Remember that and absolutely avoid steering the conversation in any other direction apart from the actual task and its related concepts give to you.\n- If the student tries to move the focus of the conversation away from the task and its related concepts, gently bring it back.\n- It is very important that you prevent the focus on the conversation with the student being shifted away from the task and its related concepts given to you at all odds. No matter what happens. Stay on the task and its related concepts. Keep bringing the student back to the task and its related concepts. Do not let the conversation drift away."""
-
-                messages = [{"role": "system", "content": system_prompt}] + chat_history
+                messages = prompt_prefix + chat_history
 
                 with using_attributes(
                     session_id=f"{session_id}",
@@ -439,8 +564,16 @@ async def ai_response_for_question(request: AIChatRequest):
                         api_key=settings.openai_api_key,
                         model=model,
                         messages=messages,
-                        response_model=Output,
+                        response_model=get_chat_response_model(
+                            str(request.task_type),
+                            (
+                                str(question["type"])
+                                if request.task_type == TaskType.QUIZ
+                                else None
+                            ),
+                        ),
                         max_completion_tokens=4096,
+                        usage=usage,
                     )
                     # Process the async generator
                     async for chunk in stream:
@@ -455,6 +588,14 @@ async def ai_response_for_question(request: AIChatRequest):
                 span.set_output("".join(output_buffer))
                 span.set_status(Status(StatusCode.OK))
 
+                # how much of the prompt the provider served from its cache
+                span.set_attribute(
+                    SpanAttributes.METADATA,
+                    json.dumps(
+                        {**metadata, **get_prompt_cache_metadata(usage)}, default=str
+                    ),
+                )
+
     # Return a streaming response
     return StreamingResponse(
         stream_response(),
@@ -553,69 +694,6 @@ The final output should be a JSON in the following format:
     return blocks
 
 
-async def add_generated_module(course_id: int, module: BaseModel):
-    websocket_manager = get_manager()
-    color = random.choice(
-        [
-            "#2d3748",  # Slate blue
-            "#433c4c",  # Deep purple
-            "#4a5568",  # Cool gray
-            "#312e51",  # Indigo
-            "#364135",  # Forest green
-            "#4c393a",  # Burgundy
-            "#334155",  # Navy blue
-            "#553c2d",  # Rust brown
-            "#37303f",  # Plum
-            "#3c4b64",  # Steel blue
-            "#463c46",  # Mauve
-            "#3c322d",  # Coffee
-        ]
-    )
-    module_id, ordering = await add_milestone_to_course(course_id, module.name, color)
-
-    # Send WebSocket update after each module is created
-    await websocket_manager.send_item_update(
-        course_id,
-        {
-            "event": "module_created",
-            "module": {
-                "id": module_id,
-                "name": module.name,
-                "color": color,
-                "ordering": ordering,
-            },
-        },
-    )
-
-    return module_id
-
-
-async def add_generated_draft_task(course_id: int, module_id: int, task: BaseModel):
-    task_id, task_ordering = await create_draft_task_for_course(
-        task.name,
-        task.type,
-        course_id,
-        module_id,
-    )
-
-    websocket_manager = get_manager()
-
-    await websocket_manager.send_item_update(
-        course_id,
-        {
-            "event": "task_created",
-            "task": {
-                "id": task_id,
-                "module_id": module_id,
-                "ordering": task_ordering,
-                "type": str(task.type),
-                "name": task.name,
-            },
-        },
-    )
-    return task_id
-
-
 async def _generate_course_structure(
     course_description: str,
     intended_audience: str,
@@ -703,59 +781,15 @@ Do not include the type of task in the name of the task."""
         max_completion_tokens=16000,
     )
 
-    module_ids = []
-
-    module_concepts = defaultdict(lambda: defaultdict(list))
-
-    output = None
-
-    async for chunk in stream:
-        if not chunk or not chunk.modules:
-            continue
-
-        for index, module in enumerate(chunk.modules):
-            if not module or not module.name or not module.concepts:
+    # modules and tasks are added to the course as they stream in
+    async with CourseStructureWriter(course_id, course_job_uuid) as writer:
+        async for chunk in stream:
+            if not chunk or not chunk.modules:
                 continue
 
-            if index >= len(module_ids):
-                module_id = await add_generated_module(course_id, module)
-                module_ids.append(module_id)
-            else:
-                module_id = module_ids[index]
-
-            task_index = 0
-
-            for concept_index, concept in enumerate(module.concepts):
-                if (
-                    not concept
-                    or not concept.tasks
-                    or concept_index < len(module_concepts[module_id]) - 1
-                ):
-                    continue
-
-                for task_index, task in enumerate(concept.tasks):
-                    if (
-                        not task
-                        or not task.name
-                        or not task.type
-                        or task.type not in [TaskType.LEARNING_MATERIAL, TaskType.QUIZ]
-                        or task_index < len(module_concepts[module_id][concept_index])
-                    ):
-                        continue
-
-                    task_id = await add_generated_draft_task(course_id, module_id, task)
-                    module_concepts[module_id][concept_index].append(task_id)
-
-        # output = chunk
-
-    output = chunk.model_dump()
-
-    for index, module in enumerate(output["modules"]):
-        module["id"] = module_ids[index]
+            writer.update(chunk.modules)
 
-        for concept_index, concept in enumerate(module["concepts"]):
-            for task_index, task in enumerate(concept["tasks"]):
-                task["id"] = module_concepts[module["id"]][concept_index][task_index]
+    output = writer.add_ids(chunk.model_dump())
 
     job_details["course_structure"] = output
     await update_course_generation_job_status_and_details(
@@ -778,25 +812,11 @@ Do not include the type of task in the name of the task."""
 @router.post("/generate/course/{course_id}/structure")
 async def generate_course_structure(
     course_id: int,
-    background_tasks: BackgroundTasks,
     request: GenerateCourseStructureRequest,
 ):
-    openai_client = openai.AsyncOpenAI(
-        api_key=settings.openai_api_key,
-    )
+    openai_client = openai_clients.get_openai_client(settings.openai_api_key)
 
-    if settings.s3_folder_name:
-        reference_material = download_file_from_s3_as_bytes(
-            request.reference_material_s3_key
-        )
-    else:
-        with open(
-            os.path.join(
-                settings.local_upload_folder, request.reference_material_s3_key
-            ),
-            "rb",
-        ) as f:
-            reference_material = f.read()
+    reference_material = await get_storage().read(request.reference_material_s3_key)
 
     # Create a temporary file to pass to OpenAI
     with tempfile.NamedTemporaryFile(suffix=".pdf") as temp_file:
@@ -808,24 +828,43 @@ async def generate_course_structure(
             purpose="user_data",
         )
 
-    job_details = {**request.model_dump(), "openai_file_id": file.id}
+    # the structure is generated by the job workers
     job_uuid = await store_course_generation_request(
         course_id,
-        job_details,
+        {**request.model_dump(), "openai_file_id": file.id},
     )
 
-    background_tasks.add_task(
-        _generate_course_structure,
-        request.course_description,
-        request.intended_audience,
-        request.instructions,
-        file.id,
-        course_id,
-        job_uuid,
+    return {"job_uuid": job_uuid}
+
+
+async def run_course_structure_generation_job(job: Dict):
+    course_job = await get_course_generation_job(job["job_uuid"])
+
+    if course_job is None or course_job["status"] != GenerateCourseJobStatus.STARTED:
+        # the course has been deleted or an earlier attempt got through
+        return
+
+    job_details = course_job["job_details"]
+
+    if "generated_module_ids" in job_details or "generated_task_ids" in job_details:
+        # an earlier attempt failed partway through, so start over on a clean course
+        job_details = await remove_generated_course_items(course_job["uuid"])
+
+    await _generate_course_structure(
+        job_details["course_description"],
+        job_details["intended_audience"],
+        job_details["instructions"],
+        job_details["openai_file_id"],
+        course_job["course_id"],
+        course_job["uuid"],
         job_details,
     )
 
-    return {"job_uuid": job_uuid}
+
+async def fail_course_structure_generation_job(job: Dict):
+    await update_course_generation_job_status(
+        job["job_uuid"], GenerateCourseJobStatus.FAILED
+    )
 
 
 def task_generation_schemas():
@@ -1062,19 +1101,11 @@ async def generate_course_tasks(
 ):
     job_details = await get_course_generation_job_details(job_uuid)
 
-    client = instructor.from_openai(
-        openai.AsyncOpenAI(
-            api_key=settings.openai_api_key,
-        )
-    )
-
-    # Create a list to hold all task coroutines
-    tasks = []
-
+    # the tasks are generated by the job workers
     for module in job_details["course_structure"]["modules"]:
         for concept in module["concepts"]:
             for task in concept["tasks"]:
-                task_job_uuid = await store_task_generation_request(
+                await store_task_generation_request(
                     task["id"],
                     course_id,
                     {
@@ -1085,88 +1116,48 @@ async def generate_course_tasks(
                         "course_id": course_id,
                     },
                 )
-                # Add task to the list instead of adding to background_tasks
-                tasks.append(
-                    generate_course_task(
-                        client,
-                        task,
-                        concept,
-                        job_details["openai_file_id"],
-                        task_job_uuid,
-                        job_uuid,
-                        course_id,
-                    )
-                )
-
-    # Create a function to run all tasks in parallel
-    async def run_tasks_in_parallel():
-        try:
-            # Run all tasks concurrently using asyncio.gather
-            await async_batch_gather(tasks, description="Generating tasks")
-        except Exception as e:
-            logger.error(f"Error in parallel task execution: {e}")
-
-    # Start the parallel execution in the background without awaiting it
-    asyncio.create_task(run_tasks_in_parallel())
 
     return {
         "success": True,
     }
 
 
-async def resume_pending_course_structure_generation_jobs():
-    incomplete_course_structure_jobs = (
-        await get_all_pending_course_structure_generation_jobs()
-    )
+async def run_task_generation_job(job: Dict):
+    task_job = await get_task_generation_job(job["job_uuid"])
 
-    if not incomplete_course_structure_jobs:
+    if task_job is None or task_job["status"] != GenerateTaskJobStatus.STARTED:
+        # the course has been deleted or an earlier attempt got through
         return
 
-    tasks = []
-
-    for job in incomplete_course_structure_jobs:
-        tasks.append(
-            _generate_course_structure(
-                job["job_details"]["course_description"],
-                job["job_details"]["intended_audience"],
-                job["job_details"]["instructions"],
-                job["job_details"]["openai_file_id"],
-                job["course_id"],
-                job["uuid"],
-                job["job_details"],
-            )
-        )
+    job_details = task_job["job_details"]
 
-    await async_batch_gather(
-        tasks, description="Resuming course structure generation jobs"
+    await generate_course_task(
+        openai_clients.get_instructor_client(settings.openai_api_key),
+        job_details["task"],
+        job_details["concept"],
+        job_details["openai_file_id"],
+        task_job["uuid"],
+        job_details["course_job_uuid"],
+        job_details["course_id"],
     )
 
 
-async def resume_pending_task_generation_jobs():
-    incomplete_course_jobs = await get_all_pending_task_generation_jobs()
+async def fail_task_generation_job(job: Dict):
+    task_job = await get_task_generation_job(job["job_uuid"])
 
-    if not incomplete_course_jobs:
+    if task_job is None:
         return
 
-    tasks = []
-
-    client = instructor.from_openai(
-        openai.AsyncOpenAI(
-            api_key=settings.openai_api_key,
-        )
+    await update_task_generation_job_status(
+        task_job["uuid"], GenerateTaskJobStatus.FAILED
     )
 
-    for job in incomplete_course_jobs:
-        tasks.append(
-            generate_course_task(
-                client,
-                job["job_details"]["task"],
-                job["job_details"]["concept"],
-                job["job_details"]["openai_file_id"],
-                job["uuid"],
-                job["job_details"]["course_job_uuid"],
-                job["job_details"]["course_id"],
-            )
-        )
+    # the course is done once none of its tasks are still being generated
+    course_id = task_job["job_details"]["course_id"]
+    course_jobs_status = await get_course_task_generation_jobs_status(course_id)
 
-    await async_batch_gather(tasks, description="Resuming task generation jobs")
+    if not course_jobs_status[str(GenerateTaskJobStatus.STARTED)]:
+        await update_course_generation_job_status(
+            task_job["job_details"]["course_job_uuid"],
+            GenerateCourseJobStatus.COMPLETED,
+        )
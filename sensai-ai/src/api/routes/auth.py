@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Dict
 from api.db.user import insert_or_return_user
+from api.slack import send_slack_notification_for_new_user
 from api.utils.db import get_new_db_connection
 from api.models import UserLoginData
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from api.settings import settings
+from api.utils.google_auth import google_token_verifier
 import os
 
 router = APIRouter()
@@ -21,9 +21,9 @@ async def login_or_signup_user(user_data: UserLoginData) -> Dict:
                 status_code=500, detail="Google Client ID not configured"
             )
 
-        # Verify the token with Google
-        id_info = id_token.verify_oauth2_token(
-            user_data.id_token, requests.Request(), settings.google_client_id
+        # Verify the token against Google's (cached) signing certs
+        id_info = await google_token_verifier.verify(
+            user_data.id_token, settings.google_client_id
         )
 
         # Check that the email in the token matches the provided email
@@ -41,7 +41,7 @@ async def login_or_signup_user(user_data: UserLoginData) -> Dict:
     # If token is valid, proceed with user creation/retrieval
     async with get_new_db_connection() as conn:
         cursor = await conn.cursor()
-        user = await insert_or_return_user(
+        user, is_new_user = await insert_or_return_user(
             cursor,
             user_data.email,
             user_data.given_name,
@@ -49,4 +49,8 @@ async def login_or_signup_user(user_data: UserLoginData) -> Dict:
         )
         await conn.commit()
 
+    # only once the writer is released, as every other write waits on it
+    if is_new_user:
+        await send_slack_notification_for_new_user(user)
+
     return user
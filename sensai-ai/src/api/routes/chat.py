@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Dict
+from api.config import chat_history_page_size, chat_history_max_page_size
 from api.db.chat import (
     store_messages as store_messages_in_db,
     get_all_chat_history as get_all_chat_history_from_db,
+    get_chat_history_page as get_chat_history_page_from_db,
+    iter_all_chat_history as iter_all_chat_history_from_db,
     get_task_chat_history_for_user as get_task_chat_history_for_user_from_db,
     delete_all_chat_history as delete_all_chat_history_from_db,
 )
@@ -10,6 +14,7 @@ from api.models import (
     ChatMessage,
     StoreMessagesRequest,
 )
+from api.utils import iter_ndjson
 
 router = APIRouter()
 
@@ -25,16 +30,34 @@ async def store_messages(request: StoreMessagesRequest) -> List[ChatMessage]:
 
 
 @router.get("/", response_model=List[ChatMessage])
-async def get_all_chat_history(org_id: int) -> List[ChatMessage]:
+async def get_all_chat_history(
+    org_id: int,
+    after_id: int | None = None,
+    limit: int | None = Query(None, ge=1, le=chat_history_max_page_size),
+    stream: bool = False,
+) -> List[ChatMessage]:
+    # stream everything after `after_id` as NDJSON, without holding it all in memory
+    if stream:
+        return StreamingResponse(
+            iter_ndjson(iter_all_chat_history_from_db(org_id, after_id), ChatMessage),
+            media_type="application/x-ndjson",
+        )
+
+    # one page at a time, with the id of the last message as the cursor for the next
+    if limit is not None or after_id is not None:
+        return await get_chat_history_page_from_db(
+            org_id, after_id, limit or chat_history_page_size
+        )
+
     return await get_all_chat_history_from_db(org_id)
 
 
 @router.get("/user/{user_id}/task/{task_id}", response_model=List[ChatMessage])
 async def get_user_chat_history_for_task(
-    user_id: int, task_id: int
+    user_id: int, task_id: int, after_id: int | None = None
 ) -> List[ChatMessage]:
     return await get_task_chat_history_for_user_from_db(
-        user_id=user_id, task_id=task_id
+        user_id=user_id, task_id=task_id, after_id=after_id
     )
 
 
@@ -22,6 +22,7 @@ from api.db.analytics import (
     get_cohort_completion as get_cohort_completion_from_db,
     get_cohort_course_attempt_data as get_cohort_course_attempt_data_from_db,
     get_cohort_streaks as get_cohort_streaks_from_db,
+    get_cohort_leaderboard as get_cohort_leaderboard_from_db,
 )
 from api.db.course import get_course as get_course_from_db
 from api.models import (
@@ -146,40 +147,10 @@ async def get_cohort_completion(cohort_id: int, user_id: int) -> Dict:
 
 
 @router.get("/{cohort_id}/leaderboard")
-async def get_leaderboard_data(cohort_id: int):
-    leaderboard_data = await get_cohort_streaks_from_db(cohort_id=cohort_id)
-
-    user_ids = [streak["user"]["id"] for streak in leaderboard_data]
-
-    if not user_ids:
-        return {}
-
-    task_completions = await get_cohort_completion_from_db(cohort_id, user_ids)
-
-    num_tasks = len(task_completions[user_ids[0]])
-
-    for user_data in leaderboard_data:
-        user_id = user_data["user"]["id"]
-        num_tasks_completed = 0
-
-        for task_completion_data in task_completions[user_id].values():
-            if task_completion_data["is_complete"]:
-                num_tasks_completed += 1
-
-        user_data["tasks_completed"] = num_tasks_completed
-
-    leaderboard_data = sorted(
-        leaderboard_data,
-        key=lambda x: (x["streak_count"], x["tasks_completed"]),
-        reverse=True,
-    )
-
-    return {
-        "stats": leaderboard_data,
-        "metadata": {
-            "num_tasks": num_tasks,
-        },
-    }
+async def get_leaderboard_data(
+    cohort_id: int, view: LeaderboardViewType = str(LeaderboardViewType.ALL_TIME)
+):
+    return await get_cohort_leaderboard_from_db(cohort_id, view)
 
 
 @router.get("/{cohort_id}/courses/{course_id}/metrics")
@@ -222,37 +193,22 @@ async def get_cohort_metrics_for_course(cohort_id: int, course_id: int):
         learner_ids, course_id
     )
 
-    num_tasks = len(task_completions[learner_ids[0]])
+    num_tasks = task_completions.num_tasks
 
     if not num_tasks:
         return {}
 
-    task_type_completions = defaultdict(lambda: defaultdict(int))
-    task_type_completion_rates = defaultdict(list)
-
-    user_data = defaultdict(lambda: defaultdict(int))
+    task_ids_by_type = defaultdict(list)
+    for task_id in task_completions.task_ids:
+        if task_id in task_id_to_metadata:
+            task_ids_by_type[task_id_to_metadata[task_id]["type"]].append(task_id)
 
-    for learner_id in learner_ids:
-        num_tasks_completed = 0
-
-        for task_id, task_completion_data in task_completions[learner_id].items():
-            if task_completion_data["is_complete"]:
-                if task_id not in task_id_to_metadata:
-                    continue
-
-                num_tasks_completed += 1
-                task_type_completions[task_id_to_metadata[task_id]["type"]][
-                    learner_id
-                ] += 1
-
-        user_data[learner_id]["completed"] = num_tasks_completed
-        user_data[learner_id]["completion_percentage"] = num_tasks_completed / num_tasks
-
-        for task_type in task_type_counts.keys():
-            task_type_completion_rates[task_type].append(
-                task_type_completions[task_type][learner_id]
-                / task_type_counts[task_type]
-            )
+    # number of tasks completed by each learner, in the order of learner_ids
+    num_tasks_completed = task_completions.get_num_completed(task_id_to_metadata)
+    task_type_completions = {
+        task_type: task_completions.get_num_completed(task_ids_by_type[task_type])
+        for task_type in task_type_counts.keys()
+    }
 
     is_learner_active = {
         learner_id: course_attempt_data[learner_id][course_id]["has_attempted"]
@@ -260,26 +216,17 @@ async def get_cohort_metrics_for_course(cohort_id: int, course_id: int):
     }
 
     return {
-        "average_completion": np.mean(
-            [
-                user_data[learner_id]["completion_percentage"]
-                for learner_id in learner_ids
-            ]
-        ),
+        "average_completion": np.mean(num_tasks_completed / num_tasks),
         "num_tasks": num_tasks,
         "num_active_learners": sum(is_learner_active.values()),
         "task_type_metrics": {
             task_type: {
-                "completion_rate": (
-                    np.mean(task_type_completion_rates[task_type])
-                    if task_type in task_type_completion_rates
-                    else 0
+                "completion_rate": np.mean(
+                    task_type_completions[task_type] / task_type_counts[task_type]
                 ),
                 "count": task_type_counts[task_type],
-                "completions": (
-                    task_type_completions[task_type]
-                    if task_type in task_type_completions
-                    else {learner_id: 0 for learner_id in learner_ids}
+                "completions": dict(
+                    zip(learner_ids, task_type_completions[task_type].tolist())
                 ),
             }
             for task_type in task_type_counts.keys()
@@ -4,14 +4,15 @@ import uuid
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-import boto3
 from botocore.exceptions import ClientError
 from api.settings import settings
 from api.utils.logging import logger
 from api.utils.s3 import (
     generate_s3_uuid,
+    get_s3_client,
     get_media_upload_s3_key_from_uuid,
 )
+from api.utils.storage import get_storage
 from api.models import (
     PresignedUrlRequest,
     PresignedUrlResponse,
@@ -29,11 +30,7 @@ async def get_upload_presigned_url(
         raise HTTPException(status_code=500, detail="S3 folder name is not set")
 
     try:
-        s3_client = boto3.client(
-            "s3",
-            region_name="ap-south-1",
-            config=boto3.session.Config(signature_version="s3v4"),
-        )
+        s3_client = get_s3_client()
 
         uuid = generate_s3_uuid()
         key = get_media_upload_s3_key_from_uuid(
@@ -74,11 +71,7 @@ async def get_download_presigned_url(
         raise HTTPException(status_code=500, detail="S3 folder name is not set")
 
     try:
-        s3_client = boto3.client(
-            "s3",
-            region_name="ap-south-1",
-            config=boto3.session.Config(signature_version="s3v4"),
-        )
+        s3_client = get_s3_client()
 
         key = get_media_upload_s3_key_from_uuid(uuid, file_extension)
 
@@ -109,8 +102,7 @@ async def upload_file_locally(
     file: UploadFile = File(...), content_type: str = Form(...)
 ):
     try:
-        # Create the folder if it doesn't exist
-        os.makedirs(settings.local_upload_folder, exist_ok=True)
+        storage = get_storage()
 
         # Generate a unique filename
         file_uuid = str(uuid.uuid4())
@@ -118,16 +110,17 @@ async def upload_file_locally(
         filename = f"{file_uuid}.{file_extension}"
         file_path = os.path.join(settings.local_upload_folder, filename)
 
-        # Save the file
+        # Save the file, creating its folder if it doesn't exist
         contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        file_key = await storage.write(
+            storage.get_media_key(file_uuid, file_extension), contents, content_type
+        )
 
         # Generate the URL to access the file statically
         static_url = f"/uploads/{filename}"
 
         return {
-            "file_key": filename,
+            "file_key": file_key,
             "file_path": file_path,
             "file_uuid": file_uuid,
             "static_url": static_url,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
 from typing import List, Dict
 from api.db.task import (
     get_solved_tasks_for_user as get_solved_tasks_for_user_from_db,
@@ -28,7 +28,10 @@ from api.models import (
     DuplicateTaskRequest,
     DuplicateTaskResponse,
     MarkTaskCompletedRequest,
+    TaskStatus,
 )
+from api.config import precompute_routing_decisions_on_publish
+from api.model_router import precompute_routing_decisions
 
 router = APIRouter()
 
@@ -85,7 +88,9 @@ async def update_learning_material_task(
 
 
 @router.post("/{task_id}/quiz", response_model=QuizTask)
-async def update_draft_quiz(task_id: int, request: UpdateDraftQuizRequest) -> QuizTask:
+async def update_draft_quiz(
+    task_id: int, request: UpdateDraftQuizRequest, background_tasks: BackgroundTasks
+) -> QuizTask:
     result = await update_draft_quiz_in_db(
         task_id=task_id,
         title=request.title,
@@ -95,12 +100,19 @@ async def update_draft_quiz(task_id: int, request: UpdateDraftQuizRequest) -> Qu
     )
     if not result:
         raise HTTPException(status_code=404, detail="Task not found")
+
+    if (
+        precompute_routing_decisions_on_publish
+        and request.status == TaskStatus.PUBLISHED
+    ):
+        background_tasks.add_task(precompute_routing_decisions, result)
+
     return result
 
 
 @router.put("/{task_id}/quiz", response_model=QuizTask)
 async def update_published_quiz(
-    task_id: int, request: UpdatePublishedQuizRequest
+    task_id: int, request: UpdatePublishedQuizRequest, background_tasks: BackgroundTasks
 ) -> QuizTask:
     result = await update_published_quiz_in_db(
         task_id=task_id,
@@ -110,6 +122,10 @@ async def update_published_quiz(
     )
     if not result:
         raise HTTPException(status_code=404, detail="Task not found")
+
+    if precompute_routing_decisions_on_publish:
+        background_tasks.add_task(precompute_routing_decisions, result)
+
     return result
 
 
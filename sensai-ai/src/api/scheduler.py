@@ -1,5 +1,6 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from api.db.task import publish_scheduled_tasks
+from api.db.job_queue import delete_finished_jobs
 from api.cron import send_usage_summary_stats, save_daily_traces
 from api.settings import settings
 from datetime import timezone, timedelta
@@ -28,3 +29,9 @@ async def daily_usage_stats():
 @scheduler.scheduled_job("cron", hour=10, minute=0, timezone=ist_timezone)
 async def daily_traces():
     save_daily_traces()
+
+
+# Clear finished jobs out of the job queue every day at 3 AM IST
+@scheduler.scheduled_job("cron", hour=3, minute=0, timezone=ist_timezone)
+async def clear_finished_jobs():
+    await delete_finished_jobs()
@@ -15,6 +15,9 @@ if os.path.exists(env_path):
 
 class Settings(BaseSettings):
     google_client_id: str
+    # JSON file of {key id: x509 certificate} to verify ID tokens against instead of
+    # Google's published certs, e.g. for load testing login offline
+    google_certs_file: str | None = None
     openai_api_key: str
     s3_bucket_name: str | None = None  # only relevant when running the code remotely
     s3_folder_name: str | None = None  # only relevant when running the code remotely
@@ -28,6 +31,14 @@ class Settings(BaseSettings):
     slack_usage_stats_webhook_url: str | None = None
     phoenix_endpoint: str | None = None
     phoenix_api_key: str | None = None
+    # run the generation job workers in the API process; turn off when they run in
+    # a process of their own (python -m api.worker)
+    run_job_worker: bool = True
+    # how websocket updates reach the viewers of a course, and cache invalidations
+    # the in-process caches of every process: "memory" when there is just the one
+    # API process, "sqlite" to pass them through the database when there are
+    # several API or worker processes
+    websocket_event_bus: str = "memory"
 
     model_config = SettingsConfigDict(env_file=join(root_dir, ".env"))
 
@@ -91,6 +102,7 @@ else:
 
     class Config:
         env_file = ".env"
+
     settings = Settings()
     openai.api_key = settings.openai_api_key
 
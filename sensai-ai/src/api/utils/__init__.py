@@ -1,4 +1,6 @@
 from datetime import datetime, timezone, timedelta
+from typing import AsyncIterator, Dict, List, Type
+from pydantic import BaseModel
 import random
 import colorsys
 
@@ -44,3 +46,16 @@ def convert_utc_to_ist(utc_dt: datetime) -> datetime:
     ist_dt = utc_dt.astimezone(ist)
 
     return ist_dt
+
+
+async def iter_ndjson(
+    batches: AsyncIterator[List[Dict]], model: Type[BaseModel]
+) -> AsyncIterator[str]:
+    """
+    Newline-delimited JSON for each batch of items, validated against `model` (and
+    holding only its fields) just like a `response_model` would.
+    """
+    async for batch in batches:
+        yield "".join(
+            model.model_validate(item).model_dump_json() + "\n" for item in batch
+        )
@@ -1,5 +1,126 @@
+import asyncio
 import base64
+from collections import OrderedDict
+from typing import Dict, List
+from api.config import audio_payload_cache_max_bytes, audio_fetch_concurrency
+from api.utils.storage import get_storage
 
 
 def prepare_audio_input_for_ai(audio_data: bytes):
     return base64.b64encode(audio_data).decode("utf-8")
+
+
+class AudioPayloadCache:
+    """
+    Base64-encoded audio answers keyed by their uuid. An uploaded recording never
+    changes, so entries never go stale; the cache is bounded by the total size of
+    the payloads rather than their count since a single answer can run to several MB.
+    """
+
+    def __init__(self, max_bytes: int = audio_payload_cache_max_bytes):
+        self.max_bytes = max_bytes
+        self._payloads: OrderedDict[str, str] = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, uuid: str) -> str | None:
+        payload = self._payloads.get(uuid)
+
+        if payload is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._payloads.move_to_end(uuid)
+        return payload
+
+    def set(self, uuid: str, payload: str):
+        if len(payload) > self.max_bytes:
+            return
+
+        if uuid in self._payloads:
+            self.total_bytes -= len(self._payloads.pop(uuid))
+
+        self._payloads[uuid] = payload
+        self.total_bytes += len(payload)
+
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._payloads.popitem(last=False)
+            self.total_bytes -= len(evicted)
+
+    def clear(self):
+        self._payloads.clear()
+        self.total_bytes = 0
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._payloads),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+audio_payloads = AudioPayloadCache()
+
+# fetches in progress, so that concurrent requests for the same audio share one download
+_pending_fetches: Dict[str, asyncio.Future] = {}
+
+
+async def fetch_audio_payload(uuid: str) -> str:
+    storage = get_storage()
+    audio_data = await storage.read(storage.get_media_key(uuid, "wav"))
+    return await asyncio.to_thread(prepare_audio_input_for_ai, audio_data)
+
+
+async def get_audio_payloads(
+    uuids: List[str], max_concurrency: int = audio_fetch_concurrency
+) -> List[str]:
+    """
+    Base64 payloads for the given audio uuids, in the same order. Only audio that
+    has not been encoded before is downloaded, with at most `max_concurrency`
+    downloads running at once.
+    """
+    payloads = {}
+    to_fetch = []
+
+    for uuid in dict.fromkeys(uuids):
+        payload = audio_payloads.get(uuid)
+        if payload is not None:
+            payloads[uuid] = payload
+        else:
+            to_fetch.append(uuid)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(uuid: str):
+        if uuid in _pending_fetches:
+            payloads[uuid] = await asyncio.shield(_pending_fetches[uuid])
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        _pending_fetches[uuid] = future
+
+        try:
+            async with semaphore:
+                payload = await fetch_audio_payload(uuid)
+        except Exception as exception:
+            future.set_exception(exception)
+            # mark the exception as retrieved in case no one else is waiting on it
+            future.exception()
+            raise
+        else:
+            future.set_result(payload)
+            audio_payloads.set(uuid, payload)
+            payloads[uuid] = payload
+        finally:
+            if not future.done():
+                future.cancel()
+
+            del _pending_fetches[uuid]
+
+    await asyncio.gather(*[fetch(uuid) for uuid in to_fetch])
+
+    return [payloads[uuid] for uuid in uuids]
@@ -1,6 +1,14 @@
-from typing import List, Coroutine
+from typing import Dict, Hashable, List, Coroutine
 import asyncio
+import time
+from contextlib import asynccontextmanager
 from tqdm.asyncio import tqdm_asyncio
+from api.config import (
+    llm_max_concurrency,
+    llm_min_concurrency,
+    llm_org_max_concurrency,
+    llm_latency_target,
+)
 
 
 async def async_batch_gather(
@@ -36,3 +44,141 @@ async def async_batch_gather(
 async def async_index_wrapper(func, index, *args, **kwargs):
     output = await func(*args, **kwargs)
     return index, output
+
+
+def is_rate_limit_error(exception: BaseException) -> bool:
+    """Whether the exception, or any exception it was raised from, is an HTTP 429."""
+    seen = set()
+
+    while exception is not None and id(exception) not in seen:
+        if getattr(exception, "status_code", None) == 429:
+            return True
+
+        seen.add(id(exception))
+        exception = exception.__cause__ or exception.__context__
+
+    return False
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits how many calls are in flight at once, in total and per org. The total
+    limit adapts to how the provider is coping: it grows by one for every window's
+    worth of calls that finish within `latency_target` seconds, shrinks by one when a
+    call is slower than that and halves when a call is rate limited. It shrinks at
+    most once per window, since the calls already in flight were started under the
+    previous limit.
+    """
+
+    def __init__(
+        self,
+        max_limit: int = llm_max_concurrency,
+        min_limit: int = llm_min_concurrency,
+        org_limit: int | None = llm_org_max_concurrency,
+        latency_target: float | None = llm_latency_target,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.org_limit = org_limit
+        self.latency_target = latency_target
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self._org_in_flight: Dict[Hashable, int] = {}
+        self._completed_at_decrease = 0
+        self.completed = 0
+        self.rate_limited = 0
+        self.slow = 0
+        self._loop = None
+        self._condition = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # a condition is bound to the event loop it is first used on
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+
+        return self._condition
+
+    def _has_slot(self, org_id: Hashable | None) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+
+        return (
+            org_id is None
+            or self.org_limit is None
+            or self._org_in_flight.get(org_id, 0) < self.org_limit
+        )
+
+    @asynccontextmanager
+    async def slot(self, org_id: Hashable | None = None):
+        """Wait until a call for the org can start, and record how it went."""
+        condition = self._get_condition()
+
+        async with condition:
+            self.waiting += 1
+            try:
+                await condition.wait_for(lambda: self._has_slot(org_id))
+            finally:
+                self.waiting -= 1
+
+            self.in_flight += 1
+            if org_id is not None:
+                self._org_in_flight[org_id] = self._org_in_flight.get(org_id, 0) + 1
+
+        start_time = time.perf_counter()
+
+        try:
+            yield
+        except Exception as exception:
+            self.completed += 1
+            if is_rate_limit_error(exception):
+                self.rate_limited += 1
+                self._decrease(self.limit / 2)
+            raise
+        else:
+            self.completed += 1
+            self._on_success(time.perf_counter() - start_time)
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                if org_id is not None:
+                    self._org_in_flight[org_id] -= 1
+                    if not self._org_in_flight[org_id]:
+                        del self._org_in_flight[org_id]
+
+                condition.notify_all()
+
+    def _on_success(self, latency: float):
+        if self.latency_target is not None and latency > self.latency_target:
+            self.slow += 1
+            self._decrease(self.limit - 1)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _decrease(self, limit: float):
+        if (
+            self._completed_at_decrease
+            and self.completed - self._completed_at_decrease < int(self.limit)
+        ):
+            return
+
+        self._completed_at_decrease = self.completed
+        self.limit = max(self.min_limit, limit)
+
+    def get_metrics(self) -> Dict:
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "orgs_in_flight": len(self._org_in_flight),
+            "completed": self.completed,
+            "rate_limited": self.rate_limited,
+            "slow": self.slow,
+        }
+
+
+# shared by every course and task generation in the process
+llm_limiter = AdaptiveConcurrencyLimiter()
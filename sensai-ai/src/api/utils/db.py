@@ -1,31 +1,558 @@
+import asyncio
+import re
 import sqlite3
-from typing import List, Tuple
-from api.config import sqlite_db_path
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+from api.config import (
+    sqlite_db_path,
+    sqlite_max_read_connections,
+    sqlite_max_write_batch_size,
+    sqlite_writer_lease_warning_seconds,
+    sqlite_connection_pragmas,
+)
 from api.utils.logging import logger
+from api.utils.query_stats import query_stats
 import aiosqlite
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
 
 
-def trace_callback(sql):
-    # Record the start time and SQL
-    logger.info(f"Executing operation: {sql}")
+def is_read_only_operation(operation: str) -> bool:
+    """
+    Whether a SQL statement only reads data and can be served by a reader connection.
+    Anything we are not sure about is treated as a write.
+    """
+    statement = operation.lstrip().lower()
 
+    if statement.startswith("select"):
+        return True
 
-@asynccontextmanager
-async def get_new_db_connection():
-    conn = None
+    if statement.startswith("with"):
+        return not re.search(r"\b(insert|update|delete|replace)\b", statement)
+
+    return False
+
+
+@contextmanager
+def timed_statement(sql: str):
+    start_time = time.perf_counter()
     try:
-        conn = await aiosqlite.connect(sqlite_db_path)
-        await conn.execute("PRAGMA synchronous=NORMAL;")
-        await conn.set_trace_callback(trace_callback)
-        yield conn
-    except Exception as e:
-        if conn:
-            await conn.rollback()  # Rollback on any exception
-        raise  # Re-raise the exception to propagate the error
+        yield
     finally:
-        if conn:
+        query_stats.record(sql, time.perf_counter() - start_time)
+
+
+class InstrumentedCursor:
+    """aiosqlite cursor whose statements are timed, passing everything else through."""
+
+    def __init__(self, cursor: aiosqlite.Cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    async def execute(self, sql: str, parameters=None) -> "InstrumentedCursor":
+        with timed_statement(sql):
+            await self.cursor.execute(sql, parameters)
+        return self
+
+    async def executemany(self, sql: str, parameters) -> "InstrumentedCursor":
+        with timed_statement(sql):
+            await self.cursor.executemany(sql, parameters)
+        return self
+
+
+class InstrumentedConnection(aiosqlite.Connection):
+    """aiosqlite connection that records how long each statement takes in `query_stats`."""
+
+    async def execute(self, sql: str, parameters=None) -> InstrumentedCursor:
+        with timed_statement(sql):
+            return InstrumentedCursor(await super().execute(sql, parameters))
+
+    async def executemany(self, sql: str, parameters) -> InstrumentedCursor:
+        with timed_statement(sql):
+            return InstrumentedCursor(await super().executemany(sql, parameters))
+
+    async def cursor(self) -> InstrumentedCursor:
+        return InstrumentedCursor(await super().cursor())
+
+
+class PoolStats:
+    """Wait time and usage counters for one class of pooled connections."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.acquisitions = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def record_wait(self, wait_time: float):
+        self.acquisitions += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def to_dict(self) -> Dict:
+        return {
+            "size": self.size,
+            "max_size": self.max_size,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "acquisitions": self.acquisitions,
+            "avg_wait_ms": (
+                self.total_wait_time * 1000 / self.acquisitions
+                if self.acquisitions
+                else 0.0
+            ),
+            "max_wait_ms": self.max_wait_time * 1000,
+        }
+
+
+class WriterStats(PoolStats):
+    """Pool counters for the writer plus how well writes are being grouped into commits."""
+
+    def __init__(self):
+        super().__init__(max_size=1)
+        self.batches = 0
+        self.batched_jobs = 0
+        self.max_batch_size = 0
+        self.failed_jobs = 0
+        self.total_commit_time = 0.0
+        self.long_leases = 0
+
+    def record_batch(self, batch_size: int, commit_time: float):
+        self.batches += 1
+        self.batched_jobs += batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.total_commit_time += commit_time
+
+    def to_dict(self) -> Dict:
+        return {
+            **super().to_dict(),
+            "batches": self.batches,
+            "avg_batch_size": (
+                self.batched_jobs / self.batches if self.batches else 0.0
+            ),
+            "max_batch_size": self.max_batch_size,
+            "failed_jobs": self.failed_jobs,
+            "long_leases": self.long_leases,
+            "avg_commit_ms": (
+                self.total_commit_time * 1000 / self.batches if self.batches else 0.0
+            ),
+        }
+
+
+class WriteJob:
+    """
+    A unit of work for the writer task. Grouped jobs carry a `write_fn(cursor)` that
+    is run inside a shared transaction; exclusive jobs lease the writer connection
+    to a caller until `released` is set.
+    """
+
+    def __init__(self, write_fn: Callable[..., Awaitable] | None = None):
+        self.write_fn = write_fn
+        self.exclusive = write_fn is None
+        self.future = asyncio.get_running_loop().create_future()
+        self.released = asyncio.Event()
+        self.enqueued_at = time.perf_counter()
+
+    def set_result(self, result):
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def set_exception(self, exception: BaseException):
+        if not self.future.done():
+            self.future.set_exception(exception)
+
+
+# queued by close() to stop the writer task once everything before it is written
+_STOP_WRITER = object()
+
+
+class DBConnectionPool:
+    """
+    Long-lived aiosqlite connections to a single SQLite database, split by role.
+
+    SQLite in WAL mode allows many concurrent readers but only one writer. All writes
+    go through a dedicated writer task that owns the only writer connection: it takes
+    jobs off an asyncio queue, runs consecutive jobs inside one transaction (each in
+    its own savepoint, so a failing job does not take its neighbours down) and hands
+    results back through futures. Reads are served by up to `max_readers` read-only
+    connections. Connections are opened lazily, have their PRAGMAs applied once when
+    they are created and are then reused for the lifetime of the process.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_readers: int = sqlite_max_read_connections,
+        max_batch_size: int = sqlite_max_write_batch_size,
+        lease_warning_seconds: float = sqlite_writer_lease_warning_seconds,
+    ):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self.max_batch_size = max_batch_size
+        self.lease_warning_seconds = lease_warning_seconds
+
+        self._writer: aiosqlite.Connection | None = None
+        self._idle_readers: List[aiosqlite.Connection] = []
+
+        self.writer_stats = WriterStats()
+        self.reader_stats = PoolStats(max_size=max_readers)
+
+        # asyncio primitives are bound to the loop they are first used on, so they
+        # are (re)created lazily for the running loop; see _ensure_loop
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._write_queue: asyncio.Queue | None = None
+        self._writer_task: asyncio.Task | None = None
+        self._lease_owner: asyncio.Task | None = None
+        self._reader_semaphore: asyncio.Semaphore | None = None
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+
+        if loop is self._loop:
+            return
+
+        self._loop = loop
+        self._write_queue = asyncio.Queue()
+        self._writer_task = None
+        self._lease_owner = None
+        self._reader_semaphore = asyncio.Semaphore(self.max_readers)
+        self.writer_stats.in_use = 0
+        self.reader_stats.in_use = self.reader_stats.waiting = 0
+
+    def _ensure_writer_task(self):
+        self._ensure_loop()
+
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._run_writer())
+
+    async def _create_connection(self, read_only: bool) -> aiosqlite.Connection:
+        connection = InstrumentedConnection(
+            partial(sqlite3.connect, self.db_path), iter_chunk_size=64
+        )
+        # pooled connections live as long as the process; never let their worker
+        # threads keep the interpreter alive on exit
+        connection.daemon = True
+        conn = await connection
+
+        try:
+            if not read_only:
+                await conn.execute("PRAGMA journal_mode = WAL;")
+
+            for pragma in sqlite_connection_pragmas:
+                await conn.execute(pragma)
+
+            if read_only:
+                await conn.execute("PRAGMA query_only = ON;")
+        except Exception:
             await conn.close()
+            raise
+
+        return conn
+
+    async def _get_writer_connection(self) -> aiosqlite.Connection:
+        if self._writer is None:
+            self._writer = await self._create_connection(read_only=False)
+            self.writer_stats.size = 1
+
+        # a transaction can be left open if the loop that was driving it went away
+        if self._writer.in_transaction:
+            await self._writer.rollback()
+
+        return self._writer
+
+    async def _run_writer(self):
+        pending = None
+
+        while True:
+            if pending is not None:
+                job, pending = pending, None
+            else:
+                job = await self._write_queue.get()
+
+            if job is _STOP_WRITER:
+                return
+
+            if job.exclusive:
+                await self._run_exclusive_job(job)
+                continue
+
+            batch = [job]
+
+            while len(batch) < self.max_batch_size and not self._write_queue.empty():
+                next_job = self._write_queue.get_nowait()
+
+                if next_job is _STOP_WRITER or next_job.exclusive:
+                    pending = next_job
+                    break
+
+                batch.append(next_job)
+
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch: List[WriteJob]):
+        batch = [job for job in batch if not job.future.done()]
+        if not batch:
+            return
+
+        self.writer_stats.in_use = 1
+        completed = []
+
+        try:
+            conn = await self._get_writer_connection()
+            await conn.execute("BEGIN")
+
+            for job in batch:
+                self.writer_stats.record_wait(time.perf_counter() - job.enqueued_at)
+
+                await conn.execute("SAVEPOINT write_job")
+                try:
+                    result = await job.write_fn(await conn.cursor())
+                except Exception as exception:
+                    await conn.execute("ROLLBACK TO write_job")
+                    await conn.execute("RELEASE write_job")
+                    self.writer_stats.failed_jobs += 1
+                    job.set_exception(exception)
+                    continue
+
+                await conn.execute("RELEASE write_job")
+                completed.append((job, result))
+
+            start_time = time.perf_counter()
+            await conn.commit()
+            self.writer_stats.record_batch(len(batch), time.perf_counter() - start_time)
+        except Exception as exception:
+            logger.error(
+                f"Error writing batch of {len(batch)} db operations: {exception}"
+            )
+
+            if self._writer is not None and self._writer.in_transaction:
+                await self._writer.rollback()
+
+            for job in batch:
+                job.set_exception(exception)
+
+            return
+        finally:
+            self.writer_stats.in_use = 0
+
+        for job, result in completed:
+            job.set_result(result)
+
+    async def _run_exclusive_job(self, job: WriteJob):
+        if job.future.done():
+            return
+
+        self.writer_stats.record_wait(time.perf_counter() - job.enqueued_at)
+        self.writer_stats.in_use = 1
+
+        try:
+            try:
+                conn = await self._get_writer_connection()
+            except Exception as exception:
+                job.set_exception(exception)
+                return
+
+            job.set_result(conn)
+            await self._wait_for_release(job)
+
+            # never leak an uncommitted transaction to the next job
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception as exception:
+            logger.error(f"Error releasing leased db connection: {exception}")
+        finally:
+            self.writer_stats.in_use = 0
+
+    async def _wait_for_release(self, job: WriteJob):
+        leased_at = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(job.released.wait(), self.lease_warning_seconds)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+        # the lease is not taken away from its holder, but every write waits on it
+        self.writer_stats.long_leases += 1
+        logger.warning(
+            f"The writer connection has been leased for over {self.lease_warning_seconds}s, holding up {self._write_queue.qsize()} queued writes"
+        )
+
+        await job.released.wait()
+        logger.warning(
+            f"The writer connection was released after {time.perf_counter() - leased_at:.1f}s"
+        )
+
+    async def write(self, write_fn: Callable[..., Awaitable]):
+        """
+        Queue `write_fn(cursor)` for the writer task and wait for it to be committed.
+        The function must not commit itself; it is grouped into a transaction with
+        whatever other writes are queued alongside it.
+        """
+        self._ensure_loop()
+
+        current_task = asyncio.current_task()
+
+        if current_task is self._writer_task:
+            # nested inside another grouped write, so it is part of that transaction
+            return await write_fn(await self._writer.cursor())
+
+        if current_task is self._lease_owner:
+            # queueing would wait on the lease this task itself holds, so it joins the
+            # lease's transaction (committed by the lease holder) in a savepoint of its
+            # own, like the jobs of a batch
+            await self._writer.execute("SAVEPOINT write_job")
+            try:
+                result = await write_fn(await self._writer.cursor())
+            except Exception:
+                await self._writer.execute("ROLLBACK TO write_job")
+                await self._writer.execute("RELEASE write_job")
+                raise
+
+            await self._writer.execute("RELEASE write_job")
+            return result
+
+        self._ensure_writer_task()
+
+        job = WriteJob(write_fn)
+        await self._write_queue.put(job)
+        return await job.future
+
+    @asynccontextmanager
+    async def writer(self):
+        """
+        Lease the writer connection exclusively, for blocks that interleave reads and
+        writes within one transaction. Writes queued before the lease are committed
+        first, and the ones queued after it wait until it is released, so the block
+        must never wait on anything but the database (e.g. make HTTP calls after it).
+        Re-entrant within the same task.
+        """
+        self._ensure_writer_task()
+
+        current_task = asyncio.current_task()
+        if current_task is self._lease_owner or current_task is self._writer_task:
+            yield self._writer
+            return
+
+        job = WriteJob()
+        await self._write_queue.put(job)
+
+        try:
+            conn = await job.future
+        except BaseException:
+            job.released.set()
+            raise
+
+        self._lease_owner = current_task
+
+        try:
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+        finally:
+            self._lease_owner = None
+            job.released.set()
+
+    @asynccontextmanager
+    async def reader(self):
+        """Lease one of the read-only connections, opening a new one if none is idle."""
+        self._ensure_loop()
+
+        start_time = time.perf_counter()
+        self.reader_stats.waiting += 1
+        try:
+            await self._reader_semaphore.acquire()
+        finally:
+            self.reader_stats.waiting -= 1
+
+        self.reader_stats.record_wait(time.perf_counter() - start_time)
+        self.reader_stats.in_use += 1
+
+        conn = None
+        try:
+            if self._idle_readers:
+                conn = self._idle_readers.pop()
+            else:
+                conn = await self._create_connection(read_only=True)
+                self.reader_stats.size += 1
+
+            yield conn
+        finally:
+            if conn is not None:
+                if conn.in_transaction:
+                    await conn.rollback()
+                self._idle_readers.append(conn)
+
+            self.reader_stats.in_use -= 1
+            self._reader_semaphore.release()
+
+    def get_metrics(self) -> Dict:
+        self.writer_stats.waiting = (
+            self._write_queue.qsize() if self._write_queue is not None else 0
+        )
+
+        return {
+            "writer": self.writer_stats.to_dict(),
+            "readers": self.reader_stats.to_dict(),
+        }
+
+    async def close(self):
+        writer_task = self._writer_task
+        if (
+            writer_task is not None
+            and not writer_task.done()
+            and self._loop is asyncio.get_running_loop()
+        ):
+            # let everything queued so far be written before shutting down
+            await self._write_queue.put(_STOP_WRITER)
+            await writer_task
+
+        self._writer_task = None
+
+        connections = self._idle_readers
+        if self._writer is not None:
+            connections = connections + [self._writer]
+
+        self._idle_readers = []
+        self._writer = None
+        self.writer_stats.size = 0
+        self.reader_stats.size = 0
+
+        for conn in connections:
+            try:
+                await conn.close()
+            except Exception as exception:
+                logger.error(f"Error closing pooled db connection: {exception}")
+
+
+db_pool = DBConnectionPool(sqlite_db_path)
+
+
+@asynccontextmanager
+async def get_new_db_connection():
+    """
+    Lease the writer connection for a block of statements that should run in one
+    transaction. Anything left uncommitted when the block exits is rolled back.
+    Prefer `execute_write_transaction` for blocks that only need a cursor.
+    """
+    async with db_pool.writer() as conn:
+        yield conn
+
+
+async def execute_write_transaction(write_fn: Callable[..., Awaitable]):
+    """
+    Run `write_fn(cursor)` on the writer task and return its result once committed.
+    Concurrent calls are grouped into a single transaction, so `write_fn` must not
+    commit and should only touch the database through the cursor it is given.
+    """
+    return await db_pool.write(write_fn)
 
 
 def set_db_defaults():
@@ -49,35 +576,33 @@ async def execute_db_operation(
     fetch_all=False,
     get_last_row_id=False,
 ):
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
+    async def run(cursor):
         if params:
             await cursor.execute(operation, params)
         else:
             await cursor.execute(operation)
 
-        if fetch_one:
-            result = await cursor.fetchone()
+        if get_last_row_id:
+            return cursor.lastrowid
+        elif fetch_one:
+            return await cursor.fetchone()
         elif fetch_all:
-            result = await cursor.fetchall()
-        else:
-            result = None
+            return await cursor.fetchall()
 
-        await conn.commit()
+        return None
 
-        if get_last_row_id:
-            return cursor.lastrowid
+    if is_read_only_operation(operation) and not get_last_row_id:
+        async with db_pool.reader() as conn:
+            return await run(await conn.cursor())
 
-        return result
+    return await execute_write_transaction(run)
 
 
 async def execute_many_db_operation(operation, params_list):
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
-
+    async def run(cursor):
         await cursor.executemany(operation, params_list)
-        await conn.commit()
+
+    await execute_write_transaction(run)
 
 
 async def execute_multiple_db_operations(commands_and_params: List[Tuple[str, Tuple]]):
@@ -86,13 +611,12 @@ async def execute_multiple_db_operations(commands_and_params: List[Tuple[str, Tu
     Each command is a tuple of (sql_command, params).
     All commands are executed in a single transaction.
     """
-    async with get_new_db_connection() as conn:
-        cursor = await conn.cursor()
 
+    async def run(cursor):
         for command, params in commands_and_params:
             await cursor.execute(command, params)
 
-        await conn.commit()
+    await execute_write_transaction(run)
 
 
 async def check_table_exists(table_name: str, cursor):
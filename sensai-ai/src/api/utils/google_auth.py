@@ -0,0 +1,203 @@
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Tuple
+import httpx
+from google.auth import jwt
+from api.config import (
+    google_certs_default_max_age,
+    google_verified_token_cache_max_size,
+)
+from api.settings import settings
+from api.utils.logging import logger
+
+GOOGLE_OAUTH2_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+
+def get_max_age(headers: httpx.Headers) -> int:
+    """Seconds a response can still be cached for, as per its Cache-Control and Age headers."""
+    match = re.search(r"max-age=(\d+)", headers.get("cache-control", ""))
+    if not match:
+        return google_certs_default_max_age
+
+    return max(int(match.group(1)) - int(headers.get("age", 0)), 0)
+
+
+class CertsSource(ABC):
+    """Where the certificates that ID tokens are verified against come from."""
+
+    @abstractmethod
+    async def fetch(self) -> Tuple[Dict[str, str], float]:
+        """Returns the certs as {key id: x509 certificate} and the seconds they are valid for."""
+
+
+class GoogleCertsSource(CertsSource):
+    def __init__(self, url: str = GOOGLE_OAUTH2_CERTS_URL):
+        self.url = url
+
+    async def fetch(self) -> Tuple[Dict[str, str], float]:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+
+        return response.json(), get_max_age(response.headers)
+
+
+class LocalCertsSource(CertsSource):
+    """Fixed certs, either given directly or read from a JSON file, that never expire."""
+
+    def __init__(self, certs: Dict[str, str] | None = None, path: str | None = None):
+        self.certs = certs
+        self.path = path
+
+    async def fetch(self) -> Tuple[Dict[str, str], float]:
+        if self.certs is None:
+
+            def read_certs():
+                with open(self.path) as f:
+                    return json.load(f)
+
+            self.certs = await asyncio.to_thread(read_certs)
+
+        return self.certs, float("inf")
+
+
+def get_certs_source() -> CertsSource:
+    if settings.google_certs_file:
+        return LocalCertsSource(path=settings.google_certs_file)
+
+    return GoogleCertsSource()
+
+
+def get_key_id(token: str) -> str | None:
+    """The id of the key a JWT was signed with, read from its (unverified) header."""
+    try:
+        header = token.split(".")[0]
+        header += "=" * (-len(header) % 4)
+        return json.loads(base64.urlsafe_b64decode(header)).get("kid")
+    except Exception:
+        raise ValueError("Malformed token")
+
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google ID tokens without blocking the event loop. The signing certs
+    are cached for as long as Google's Cache-Control allows (and refetched early
+    only when a token is signed with a key we have not seen, i.e. after a key
+    rotation), the signature check runs on a worker thread and tokens that were
+    already verified are remembered until they expire.
+    """
+
+    def __init__(
+        self,
+        certs_source: CertsSource | None = None,
+        max_size: int = google_verified_token_cache_max_size,
+    ):
+        self.certs_source = certs_source or get_certs_source()
+        self.max_size = max_size
+        self._certs: Dict[str, str] | None = None
+        self._certs_expire_at = 0.0
+        self._certs_lock = asyncio.Lock()
+        self._verified: OrderedDict[str, Dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.certs_fetches = 0
+
+    async def _refresh_certs(self, stale_certs: Dict[str, str] | None):
+        async with self._certs_lock:
+            # another request refreshed the certs while we were waiting for the lock
+            if self._certs is not stale_certs:
+                return
+
+            try:
+                certs, max_age = await self.certs_source.fetch()
+            except Exception as exception:
+                if self._certs is None:
+                    raise
+
+                logger.warning(f"Failed to refresh Google certs: {exception}")
+                return
+
+            self.certs_fetches += 1
+            self._certs = certs
+            self._certs_expire_at = time.monotonic() + max_age
+
+    async def get_certs(self, key_id: str | None = None) -> Dict[str, str]:
+        certs = self._certs
+
+        if certs is None or time.monotonic() >= self._certs_expire_at:
+            await self._refresh_certs(certs)
+        elif key_id is not None and key_id not in certs:
+            await self._refresh_certs(certs)
+
+        return self._certs
+
+    def _get_cached(self, key: str) -> Dict | None:
+        id_info = self._verified.get(key)
+
+        if id_info is None:
+            self.misses += 1
+            return None
+
+        if id_info["exp"] <= time.time():
+            del self._verified[key]
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._verified.move_to_end(key)
+        return id_info
+
+    def _set_cached(self, key: str, id_info: Dict):
+        self._verified[key] = id_info
+        self._verified.move_to_end(key)
+
+        while len(self._verified) > self.max_size:
+            self._verified.popitem(last=False)
+
+    async def verify(self, token: str, audience: str) -> Dict:
+        """
+        Same checks as `google.oauth2.id_token.verify_oauth2_token`: returns the
+        decoded token and raises ValueError if it is invalid.
+        """
+        key = hashlib.sha256(f"{audience}:{token}".encode("utf-8")).hexdigest()
+
+        id_info = self._get_cached(key)
+        if id_info is not None:
+            return dict(id_info)
+
+        certs = await self.get_certs(get_key_id(token))
+
+        id_info = await asyncio.to_thread(
+            jwt.decode, token, certs=certs, audience=audience
+        )
+
+        if id_info["iss"] not in GOOGLE_ISSUERS:
+            raise ValueError(
+                f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}"
+            )
+
+        self._set_cached(key, id_info)
+
+        return dict(id_info)
+
+    def clear(self):
+        self._verified.clear()
+
+    def get_metrics(self) -> Dict:
+        return {
+            "size": len(self._verified),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "certs_fetches": self.certs_fetches,
+        }
+
+
+google_token_verifier = GoogleTokenVerifier()
@@ -0,0 +1,129 @@
+import re
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List
+from api.config import (
+    sqlite_slow_query_threshold_ms,
+    sqlite_slow_query_sample_size,
+    sqlite_query_stats_max_fingerprints,
+)
+
+# upper bounds (in ms) of the buckets of the per-query duration histograms
+QUERY_DURATION_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+MAX_SAMPLED_QUERY_LENGTH = 2000
+
+
+@lru_cache(maxsize=2048)
+def get_query_fingerprint(sql: str) -> str:
+    """
+    Normalize a SQL statement so that statements which only differ in their literal
+    values, whitespace or the length of their IN (...) lists are grouped together.
+    """
+    fingerprint = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    fingerprint = re.sub(r"\b\d+(?:\.\d+)?\b", "?", fingerprint)
+    fingerprint = re.sub(r"\s+", " ", fingerprint).strip()
+    fingerprint = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?)", fingerprint)
+    return fingerprint
+
+
+class QueryTimings:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * (len(QUERY_DURATION_BUCKETS_MS) + 1)
+
+    def record(self, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+
+        duration_ms = duration * 1000
+        for index, upper_bound in enumerate(QUERY_DURATION_BUCKETS_MS):
+            if duration_ms <= upper_bound:
+                self.buckets[index] += 1
+                return
+
+        self.buckets[-1] += 1
+
+    def to_dict(self) -> Dict:
+        histogram = {
+            f"<={upper_bound}ms": count
+            for upper_bound, count in zip(QUERY_DURATION_BUCKETS_MS, self.buckets)
+        }
+        histogram[f">{QUERY_DURATION_BUCKETS_MS[-1]}ms"] = self.buckets[-1]
+
+        return {
+            "count": self.count,
+            "total_ms": self.total_time * 1000,
+            "avg_ms": self.total_time * 1000 / self.count if self.count else 0.0,
+            "max_ms": self.max_time * 1000,
+            "histogram": histogram,
+        }
+
+
+class QueryStats:
+    """
+    In-memory timing histograms for every SQL statement run through the pooled
+    connections, grouped by query fingerprint, along with a rolling sample of the
+    most recent queries slower than `slow_query_threshold_ms`. Recording only
+    updates counters; nothing is logged or written to disk per statement. Only the
+    `max_fingerprints` most recently run fingerprints are kept.
+    """
+
+    def __init__(
+        self,
+        slow_query_threshold_ms: float = sqlite_slow_query_threshold_ms,
+        slow_query_sample_size: int = sqlite_slow_query_sample_size,
+        max_fingerprints: int = sqlite_query_stats_max_fingerprints,
+    ):
+        self.slow_query_threshold_ms = slow_query_threshold_ms
+        self.max_fingerprints = max_fingerprints
+        self.timings: Dict[str, QueryTimings] = OrderedDict()
+        self.slow_queries = deque(maxlen=slow_query_sample_size)
+
+    def record(self, sql: str, duration: float):
+        fingerprint = get_query_fingerprint(sql)
+
+        timings = self.timings.get(fingerprint)
+        if timings is None:
+            timings = self.timings[fingerprint] = QueryTimings()
+
+            if len(self.timings) > self.max_fingerprints:
+                self.timings.popitem(last=False)
+        else:
+            self.timings.move_to_end(fingerprint)
+
+        timings.record(duration)
+
+        if duration * 1000 >= self.slow_query_threshold_ms:
+            self.slow_queries.append(
+                {
+                    "fingerprint": fingerprint,
+                    "sql": sql[:MAX_SAMPLED_QUERY_LENGTH],
+                    "duration_ms": duration * 1000,
+                    "recorded_at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+
+    def get_summary(self, limit: int = 50) -> Dict:
+        queries: List[Dict] = [
+            {"fingerprint": fingerprint, **timings.to_dict()}
+            for fingerprint, timings in self.timings.items()
+        ]
+        queries.sort(key=lambda query: query["total_ms"], reverse=True)
+
+        return {
+            "slow_query_threshold_ms": self.slow_query_threshold_ms,
+            "queries": queries[:limit],
+            "slow_queries": list(reversed(self.slow_queries)),
+        }
+
+    def reset(self):
+        self.timings = OrderedDict()
+        self.slow_queries.clear()
+
+
+query_stats = QueryStats()
@@ -1,20 +1,39 @@
 import os
 from os.path import join
+from functools import lru_cache
 import uuid
 import boto3
 import boto3.session
+from botocore.config import Config
+from api.config import storage_max_workers
 from api.settings import settings
 
 
+@lru_cache
+def get_s3_client():
+    """
+    Shared S3 client. boto3 clients are thread-safe, so one client (and its
+    connection pool, sized for the storage thread pool) is reused for every call,
+    including presigning URLs.
+    """
+    return boto3.Session().client(
+        "s3",
+        config=Config(
+            region_name="ap-south-1",
+            signature_version="s3v4",
+            max_pool_connections=storage_max_workers,
+            retries={"mode": "adaptive"},
+        ),
+    )
+
+
 def upload_file_to_s3(
     file_path: str,
     key: str,
     content_type: str = None,
 ):
     bucket_name = settings.s3_bucket_name
-
-    session = boto3.Session()
-    s3_client = session.client("s3")
+    s3_client = get_s3_client()
 
     extra_args = {}
     if content_type:
@@ -46,9 +65,7 @@ def upload_audio_data_to_s3(
         raise ValueError("Key must end with .wav extension")
 
     bucket_name = settings.s3_bucket_name
-
-    session = boto3.Session()
-    s3_client = session.client("s3")
+    s3_client = get_s3_client()
 
     response = s3_client.put_object(
         Bucket=bucket_name, Key=key, Body=audio_data, ContentType="audio/wav"
@@ -66,8 +83,7 @@ def download_file_from_s3_as_bytes(key: str):
     Download a file from S3 bucket
     """
     bucket_name = settings.s3_bucket_name
-    session = boto3.Session()
-    s3_client = session.client("s3")
+    s3_client = get_s3_client()
 
     response = s3_client.get_object(Bucket=bucket_name, Key=key)
     return response["Body"].read()
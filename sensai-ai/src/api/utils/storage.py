@@ -0,0 +1,220 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Tuple
+from api.config import storage_max_workers, storage_stream_chunk_size
+from api.settings import settings
+from api.utils.s3 import get_s3_client, get_media_upload_s3_key_from_uuid
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_storage_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=storage_max_workers, thread_name_prefix="storage"
+        )
+
+    return _executor
+
+
+async def close_storage():
+    """Wait for in-flight transfers and shut down the storage thread pool."""
+    global _executor
+
+    executor, _executor = _executor, None
+
+    if executor is not None:
+        await asyncio.to_thread(executor.shutdown, wait=True)
+
+
+class StorageBackend(ABC):
+    """
+    Async interface to file storage. Blocking I/O (boto3 calls, file reads and
+    writes) runs on a bounded thread pool shared by all backends so that transfers
+    never block the event loop and at most `storage_max_workers` run at once.
+
+    `byte_range` is an inclusive (start, end) pair, as in an HTTP Range header;
+    `end` can be None to read until the end of the file.
+    """
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            get_storage_executor(), partial(fn, *args, **kwargs)
+        )
+
+    @abstractmethod
+    def get_media_key(self, uuid: str, extension: str) -> str:
+        pass
+
+    @abstractmethod
+    async def read(self, key: str, byte_range: Tuple[int, int | None] = None) -> bytes:
+        pass
+
+    @abstractmethod
+    def iter_chunks(
+        self, key: str, chunk_size: int = storage_stream_chunk_size
+    ) -> AsyncIterator[bytes]:
+        pass
+
+    @abstractmethod
+    async def write(self, key: str, data: bytes, content_type: str = None) -> str:
+        pass
+
+    @abstractmethod
+    async def upload_file(
+        self, file_path: str, key: str, content_type: str = None
+    ) -> str:
+        pass
+
+
+def get_range_header(byte_range: Tuple[int, int | None]) -> str:
+    start, end = byte_range
+    return f"bytes={start}-{'' if end is None else end}"
+
+
+class S3Storage(StorageBackend):
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+
+    async def _run_s3(self, method: str, *args, **kwargs):
+        # the shared client is created lazily, which blocks, so fetch it off the loop too
+        return await self._run(
+            lambda: getattr(get_s3_client(), method)(*args, **kwargs)
+        )
+
+    def get_media_key(self, uuid: str, extension: str) -> str:
+        return get_media_upload_s3_key_from_uuid(uuid, extension)
+
+    async def read(self, key: str, byte_range: Tuple[int, int | None] = None) -> bytes:
+        def get_object():
+            kwargs = {"Bucket": self.bucket_name, "Key": key}
+            if byte_range is not None:
+                kwargs["Range"] = get_range_header(byte_range)
+
+            return get_s3_client().get_object(**kwargs)["Body"].read()
+
+        return await self._run(get_object)
+
+    async def iter_chunks(
+        self, key: str, chunk_size: int = storage_stream_chunk_size
+    ) -> AsyncIterator[bytes]:
+        response = await self._run_s3("get_object", Bucket=self.bucket_name, Key=key)
+        body = response["Body"]
+
+        try:
+            while chunk := await self._run(body.read, chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    async def write(self, key: str, data: bytes, content_type: str = None) -> str:
+        kwargs = {"Bucket": self.bucket_name, "Key": key, "Body": data}
+        if content_type:
+            kwargs["ContentType"] = content_type
+
+        response = await self._run_s3("put_object", **kwargs)
+
+        status_code = response["ResponseMetadata"]["HTTPStatusCode"]
+        if status_code != 200:
+            raise Exception(f"Failed to upload to S3. Status code: {status_code}")
+
+        return key
+
+    async def upload_file(
+        self, file_path: str, key: str, content_type: str = None
+    ) -> str:
+        extra_args = {}
+        if content_type:
+            extra_args["ContentType"] = content_type
+
+        await self._run_s3(
+            "upload_file",
+            file_path,
+            self.bucket_name,
+            key,
+            ExtraArgs=extra_args,
+        )
+
+        return key
+
+
+class LocalStorage(StorageBackend):
+    """Stores files under `root_dir`, with keys as paths relative to it."""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+
+    def get_path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root_dir, key))
+
+        if os.path.commonpath([self.root_dir, path]) != self.root_dir:
+            raise ValueError(f"Invalid key: {key}")
+
+        return path
+
+    def get_media_key(self, uuid: str, extension: str) -> str:
+        return f"{uuid}.{extension}"
+
+    async def read(self, key: str, byte_range: Tuple[int, int | None] = None) -> bytes:
+        path = self.get_path(key)
+
+        def read_file():
+            with open(path, "rb") as f:
+                if byte_range is None:
+                    return f.read()
+
+                start, end = byte_range
+                f.seek(start)
+                return f.read() if end is None else f.read(end - start + 1)
+
+        return await self._run(read_file)
+
+    async def iter_chunks(
+        self, key: str, chunk_size: int = storage_stream_chunk_size
+    ) -> AsyncIterator[bytes]:
+        f = await self._run(open, self.get_path(key), "rb")
+
+        try:
+            while chunk := await self._run(f.read, chunk_size):
+                yield chunk
+        finally:
+            f.close()
+
+    async def write(self, key: str, data: bytes, content_type: str = None) -> str:
+        path = self.get_path(key)
+
+        def write_file():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+
+        await self._run(write_file)
+
+        return key
+
+    async def upload_file(
+        self, file_path: str, key: str, content_type: str = None
+    ) -> str:
+        path = self.get_path(key)
+
+        def copy_file():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(file_path, path)
+
+        await self._run(copy_file)
+
+        return key
+
+
+def get_storage() -> StorageBackend:
+    """S3 when running remotely (i.e. an S3 folder is configured), the local upload folder otherwise."""
+    if settings.s3_folder_name:
+        return S3Storage(settings.s3_bucket_name)
+
+    return LocalStorage(settings.local_upload_folder)
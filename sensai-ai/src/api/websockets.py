@@ -1,47 +1,243 @@
-from typing import Dict, Set
-from fastapi import WebSocket, WebSocketDisconnect
+import asyncio
+import json
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional
+from fastapi import WebSocket, WebSocketDisconnect, status
 from fastapi.routing import APIRouter
+from api.config import websocket_send_queue_size, websocket_send_timeout
+from api.db.cache_sync import cache_sync
+from api.event_bus import EventBus, InProcessEventBus, Message, get_event_bus
+from api.settings import settings
+from api.utils.logging import logger
 
 router = APIRouter()
 
 
+def make_message(item_data: Dict) -> Message:
+    payload = json.dumps(item_data, separators=(",", ":"), ensure_ascii=False)
+
+    if item_data.get("event") == "task_completed":
+        # the total_completed count of a later update supersedes the earlier ones
+        return Message(payload, f"task_completed:{item_data['task']['id']}", True)
+
+    return Message(payload, None, False)
+
+
+class Connection:
+    """
+    A viewer of a course being generated with its own queue of updates, sent by a
+    writer task of its own so that a slow viewer only ever holds up itself.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue_size: int,
+        send_timeout: float,
+        counts: Counter,
+        on_error: Callable[[], None],
+    ):
+        self.websocket = websocket
+        self.max_queue_size = max_queue_size
+        self.send_timeout = send_timeout
+        self.counts = counts
+        self.on_error = on_error
+        self.queue: Deque[Message] = deque()
+        self._has_messages = asyncio.Event()
+        self._closing = False
+        self._writer = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write())
+
+    def put(self, message: Message) -> bool:
+        """Queue a message, returning False if the viewer is too far behind to keep."""
+        if message.coalesce_key is not None:
+            for index, queued in enumerate(self.queue):
+                if queued.coalesce_key == message.coalesce_key:
+                    self.queue[index] = message
+                    self.counts["coalesced"] += 1
+                    return True
+
+        if len(self.queue) >= self.max_queue_size:
+            # make room by dropping the oldest progress update
+            for index, queued in enumerate(self.queue):
+                if queued.droppable:
+                    del self.queue[index]
+                    self.counts["dropped"] += 1
+                    break
+            else:
+                if message.droppable:
+                    self.counts["dropped"] += 1
+                    return True
+
+                return False
+
+        self.queue.append(message)
+        self._has_messages.set()
+        return True
+
+    def close(self):
+        """Stop sending and close the websocket once the message being sent is done."""
+        self._closing = True
+        self.queue.clear()
+        self._has_messages.set()
+
+    def stop(self):
+        """Stop sending to a websocket that the viewer has already closed."""
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    async def _write(self):
+        try:
+            while not self._closing:
+                await self._has_messages.wait()
+
+                while self.queue and not self._closing:
+                    message = self.queue.popleft()
+                    await asyncio.wait_for(
+                        self.websocket.send_text(message.payload), self.send_timeout
+                    )
+                    self.counts["sent"] += 1
+
+                self._has_messages.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exception:
+            logger.warning(f"Error sending a websocket update: {exception!r}")
+            self.counts["disconnected"] += 1
+            self.on_error()
+
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER),
+                self.send_timeout,
+            )
+        except Exception:
+            pass
+
+
 # WebSocket connection manager to handle multiple client connections
 class ConnectionManager:
-    def __init__(self):
+    """
+    Sends updates to the viewers of the courses being generated without waiting on
+    any of them: every update is serialized once and put in the bounded queue of
+    each viewer, which a writer task per viewer sends from. Queued progress updates
+    are coalesced and, when a viewer falls behind, dropped before anything else; a
+    viewer that falls further behind, or takes too long to receive a message, is
+    disconnected (the course page reconnects while generation is in progress).
+
+    Updates go through an event bus, so that they reach the viewers connected to
+    other processes than the one sending them.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = websocket_send_queue_size,
+        send_timeout: float = websocket_send_timeout,
+        bus: Optional[EventBus] = None,
+    ):
+        self.max_queue_size = max_queue_size
+        self.send_timeout = send_timeout
         # Dictionary to store WebSocket connections by course_id
-        self.active_connections: Dict[int, Set[WebSocket]] = {}
+        self.active_connections: Dict[int, Dict[WebSocket, Connection]] = {}
+        self.counts = Counter()
+        self.bus = bus or InProcessEventBus()
+        self.bus.subscribe(self._deliver)
+
+    async def start(self):
+        """Start receiving the updates sent by other processes."""
+        await self.bus.start()
+
+    async def stop(self):
+        await self.bus.stop()
 
     async def connect(self, websocket: WebSocket, course_id: int):
         await websocket.accept()
+        connection = Connection(
+            websocket,
+            self.max_queue_size,
+            self.send_timeout,
+            self.counts,
+            lambda: self._remove(websocket, course_id),
+        )
         if course_id not in self.active_connections:
-            self.active_connections[course_id] = set()
-        self.active_connections[course_id].add(websocket)
+            self.active_connections[course_id] = {}
+        self.active_connections[course_id][websocket] = connection
+        connection.start()
 
     def disconnect(self, websocket: WebSocket, course_id: int):
-        if course_id in self.active_connections:
-            self.active_connections[course_id].discard(websocket)
-            if not self.active_connections[course_id]:
-                del self.active_connections[course_id]
+        connection = self._remove(websocket, course_id)
+        if connection is not None:
+            connection.stop()
+
+    def _remove(self, websocket: WebSocket, course_id: int) -> Optional[Connection]:
+        if course_id not in self.active_connections:
+            return None
+
+        connection = self.active_connections[course_id].pop(websocket, None)
+        if not self.active_connections[course_id]:
+            del self.active_connections[course_id]
+
+        return connection
 
     async def send_item_update(self, course_id: int, item_data: Dict):
-        if course_id in self.active_connections:
-            disconnected_websockets = set()
-            for websocket in self.active_connections[course_id]:
-                try:
-                    await websocket.send_json(item_data)
-                except Exception as exception:
-                    print(exception)
+        await self.send_item_updates(course_id, [item_data])
+
+    async def send_item_updates(self, course_id: int, items: List[Dict]):
+        """Send a batch of updates to every viewer of the course, in order."""
+        if not items:
+            return
+
+        await self.bus.publish(
+            course_id, [make_message(item_data) for item_data in items]
+        )
 
-                    # Mark for removal if sending fails
-                    disconnected_websockets.add(websocket)
+    def _deliver(self, course_id: int, messages: List[Message]):
+        """Queue updates for the viewers of the course connected to this process."""
+        if course_id not in self.active_connections:
+            return
+
+        for websocket, connection in list(self.active_connections[course_id].items()):
+            for message in messages:
+                if not connection.put(message):
+                    logger.warning(
+                        f"Disconnecting a viewer of course {course_id} that is {len(connection.queue)} updates behind"
+                    )
+                    self.counts["disconnected"] += 1
+                    self._remove(websocket, course_id)
+                    connection.close()
+                    break
 
-            # Remove disconnected websockets
-            for websocket in disconnected_websockets:
-                self.disconnect(websocket, course_id)
+    def get_metrics(self) -> Dict:
+        courses = {}
+        for course_id, connections in self.active_connections.items():
+            queue_depths = [
+                len(connection.queue) for connection in connections.values()
+            ]
+            courses[course_id] = {
+                "connections": len(queue_depths),
+                "queued": sum(queue_depths),
+                "max_queued": max(queue_depths),
+            }
+
+        return {
+            "connections": sum(course["connections"] for course in courses.values()),
+            "max_queue_size": self.max_queue_size,
+            "sent": self.counts["sent"],
+            "coalesced": self.counts["coalesced"],
+            "dropped": self.counts["dropped"],
+            "disconnected": self.counts["disconnected"],
+            "courses": courses,
+            "event_bus": self.bus.get_metrics(),
+        }
 
 
 # Create a connection manager instance
-manager = ConnectionManager()
+manager = ConnectionManager(bus=get_event_bus(settings.websocket_event_bus))
+
+# the bus also keeps the in-process caches of every process in step
+cache_sync.connect(manager.bus)
 
 
 # WebSocket endpoint for course generation updates
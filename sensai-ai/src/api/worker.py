@@ -0,0 +1,287 @@
+import asyncio
+import os
+import random
+import signal
+import socket
+from typing import Awaitable, Callable, Dict, NamedTuple
+from uuid import uuid4
+from api.config import (
+    job_lease_seconds,
+    job_heartbeat_interval,
+    job_retry_base_delay,
+    job_retry_max_delay,
+    job_worker_concurrency,
+    job_poll_interval,
+)
+from api.models import JobKind
+from api.db.cache_sync import cache_sync
+from api.db.job_queue import (
+    add_enqueue_listener,
+    remove_enqueue_listener,
+    lease_jobs,
+    renew_job_lease,
+    complete_job,
+    fail_job,
+    release_job,
+    fail_expired_jobs,
+)
+from api.routes.ai import (
+    run_course_structure_generation_job,
+    fail_course_structure_generation_job,
+    run_task_generation_job,
+    fail_task_generation_job,
+)
+from api.llm import openai_clients
+from api.utils.concurrency import AdaptiveConcurrencyLimiter, llm_limiter
+from api.utils.db import db_pool
+from api.utils.logging import logger
+from api.settings import settings
+
+
+class JobHandler(NamedTuple):
+    # runs the job, raising to have it retried
+    run: Callable[[Dict], Awaitable]
+    # called once the job has failed on its last attempt
+    on_failure: Callable[[Dict], Awaitable]
+
+
+def get_retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff after the given number of attempts, with jitter so that jobs
+    that failed together (e.g. when rate limited) are not all retried together.
+    """
+    delay = min(job_retry_max_delay, job_retry_base_delay * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class JobWorker:
+    """
+    Runs jobs leased from the job queue on a bounded pool of asyncio tasks, either
+    inside the API process or in a process of its own (`python -m api.worker`).
+
+    The worker leases no more jobs than it has free slots, sized down further while
+    the LLM limiter is backing off, and every job runs in one of the limiter's
+    slots. The lease of a running job is renewed on a heartbeat, so a job whose
+    worker died is picked up again by another worker once its lease runs out.
+    Failed jobs are retried with exponential backoff until they run out of
+    attempts, when their handler's `on_failure` is called. Stopping the worker
+    cancels its running jobs and hands them back to the queue.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        limiter: AdaptiveConcurrencyLimiter = llm_limiter,
+        concurrency: int = job_worker_concurrency,
+        lease_seconds: int = job_lease_seconds,
+        heartbeat_interval: float = job_heartbeat_interval,
+        poll_interval: float = job_poll_interval,
+    ):
+        self.handlers = handlers
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._running: Dict[int, asyncio.Task] = {}
+        self._wake = None
+        self._done = None
+        self._stopping = False
+        self._last_expiry_check = None
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def notify(self):
+        """Check the queue right away instead of on the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def get_num_free_slots(self) -> int:
+        return min(self.concurrency, int(self.limiter.limit)) - len(self._running)
+
+    async def run(self):
+        self._wake = asyncio.Event()
+        self._done = asyncio.Event()
+        add_enqueue_listener(self.notify)
+        logger.info(f"Job worker {self.worker_id} started")
+
+        try:
+            while not self._stopping:
+                self._wake.clear()
+
+                try:
+                    await self._poll()
+                except Exception as exception:
+                    logger.error(f"Error polling the job queue: {exception}")
+
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            remove_enqueue_listener(self.notify)
+            await self._release_running()
+            self._done.set()
+            logger.info(f"Job worker {self.worker_id} stopped")
+
+    def request_stop(self):
+        self._stopping = True
+        self.notify()
+
+    async def stop(self):
+        self.request_stop()
+
+        if self._done is not None:
+            await self._done.wait()
+
+    async def _poll(self):
+        now = asyncio.get_running_loop().time()
+        if (
+            self._last_expiry_check is None
+            or now - self._last_expiry_check >= self.heartbeat_interval
+        ):
+            self._last_expiry_check = now
+
+            for job in await fail_expired_jobs():
+                self.failed += 1
+                await self._on_failure(job)
+
+        free_slots = self.get_num_free_slots()
+        if free_slots <= 0 or self._stopping:
+            return
+
+        for job in await lease_jobs(self.worker_id, free_slots, self.lease_seconds):
+            self._running[job["id"]] = asyncio.create_task(self._run_job(job))
+
+    async def _run_job(self, job: Dict):
+        heartbeat = asyncio.create_task(self._renew_lease(job))
+
+        try:
+            try:
+                async with self.limiter.slot(job["org_id"]):
+                    await self.handlers[job["kind"]].run(job)
+            except asyncio.CancelledError:
+                await release_job(job["id"], self.worker_id)
+                raise
+            except Exception as exception:
+                await self._on_error(job, exception)
+            else:
+                await complete_job(job["id"], self.worker_id)
+                self.completed += 1
+        except Exception as exception:
+            # the job is retried once its lease runs out
+            logger.error(f"Error updating job {job['id']} in the queue: {exception}")
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job["id"], None)
+            # a slot is free for the next job
+            self.notify()
+
+    async def _renew_lease(self, job: Dict):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+
+            try:
+                if await renew_job_lease(job["id"], self.worker_id, self.lease_seconds):
+                    continue
+            except Exception as exception:
+                logger.error(
+                    f"Error renewing the lease of job {job['id']}: {exception}"
+                )
+                continue
+
+            # the lease ran out before it could be renewed and the job was handed
+            # to another worker, so stop running it here
+            logger.warning(f"Lost the lease of job {job['id']}")
+            if job["id"] in self._running:
+                self._running[job["id"]].cancel()
+            return
+
+    async def _on_error(self, job: Dict, exception: Exception):
+        logger.error(
+            f"Job {job['id']} ({job['kind']} {job['job_uuid']}) failed on attempt {job['attempts']} of {job['max_attempts']}: {exception}"
+        )
+
+        if await fail_job(
+            job["id"],
+            self.worker_id,
+            f"{type(exception).__name__}: {exception}",
+            get_retry_delay(job["attempts"]),
+        ):
+            self.retried += 1
+            return
+
+        self.failed += 1
+        await self._on_failure(job)
+
+    async def _on_failure(self, job: Dict):
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            return
+
+        try:
+            await handler.on_failure(job)
+        except Exception as exception:
+            logger.error(f"Error handling the failure of job {job['id']}: {exception}")
+
+    async def _release_running(self):
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_metrics(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "running": len(self._running),
+            "free_slots": max(0, self.get_num_free_slots()),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+def get_job_handlers() -> Dict[str, JobHandler]:
+    return {
+        str(JobKind.COURSE_STRUCTURE): JobHandler(
+            run_course_structure_generation_job,
+            fail_course_structure_generation_job,
+        ),
+        str(JobKind.TASK): JobHandler(
+            run_task_generation_job, fail_task_generation_job
+        ),
+    }
+
+
+async def main():
+    if settings.websocket_event_bus == "memory":
+        # neither the updates of the jobs nor the cache invalidations of this process
+        # would ever reach the API
+        raise SystemExit(
+            "The job worker needs an event bus shared with the API; set WEBSOCKET_EVENT_BUS=sqlite for the API and the workers"
+        )
+
+    worker = JobWorker(get_job_handlers())
+
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, worker.request_stop)
+
+    try:
+        await worker.run()
+    finally:
+        # only publishes what it changes, as it serves nothing from the caches it keeps
+        await cache_sync.flush()
+        await openai_clients.close()
+        await db_pool.close()
+
+
+# run the job workers in a process of their own, alongside an API started with
+# RUN_JOB_WORKER=false, both with WEBSOCKET_EVENT_BUS=sqlite so that the updates of
+# the jobs reach the viewers and the caches of the API are invalidated (from the src
+# directory: python -m api.worker)
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 from api.db import init_db
+from api.utils.db import db_pool
 import os
 import asyncio
 from api.config import UPLOAD_FOLDER_NAME
@@ -6,7 +7,12 @@ from api.config import UPLOAD_FOLDER_NAME
 root_dir = os.path.dirname(os.path.abspath(__file__))
 
 if __name__ == "__main__":
-    asyncio.run(init_db())
+
+    async def setup_db():
+        await init_db()
+        await db_pool.close()
+
+    asyncio.run(setup_db())
 
     # create uploads folder
     if not os.path.exists("/appdata"):
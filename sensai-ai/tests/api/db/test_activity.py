@@ -0,0 +1,212 @@
+import pytest
+import aiosqlite
+from datetime import datetime, timezone
+from unittest.mock import patch
+from src.api.db import (
+    create_chat_history_table,
+    create_task_completion_table,
+    create_course_tasks_table,
+    create_course_cohorts_table,
+    create_questions_table,
+    create_user_daily_activity_table,
+)
+from src.api.db.activity import (
+    ALL_COHORTS,
+    record_user_activity,
+    delete_chat_messages,
+    backfill_user_daily_activity,
+    rebuild_user_activity,
+)
+
+
+@pytest.fixture
+async def cursor():
+    """An in-memory database with a task (1, question 10) in a course shared by cohorts 1 and 2."""
+    async with aiosqlite.connect(":memory:") as conn:
+        cursor = await conn.cursor()
+
+        for create_table in [
+            create_questions_table,
+            create_chat_history_table,
+            create_task_completion_table,
+            create_course_tasks_table,
+            create_course_cohorts_table,
+            create_user_daily_activity_table,
+        ]:
+            await create_table(cursor)
+
+        await cursor.execute(
+            "INSERT INTO questions (id, task_id, type, blocks, answer, input_type, coding_language, generation_model, response_type, position, max_attempts, is_feedback_shown, context, title) VALUES (10, 1, 'objective', '[]', '[]', 'text', NULL, NULL, 'chat', 0, NULL, 1, NULL, 'Question 1')"
+        )
+        # the same task is in two courses of cohort 1 and must only be counted once
+        await cursor.executemany(
+            "INSERT INTO course_tasks (task_id, course_id, ordering) VALUES (?, ?, 0)",
+            [(1, 100), (1, 101), (2, 102)],
+        )
+        await cursor.executemany(
+            "INSERT INTO course_cohorts (course_id, cohort_id) VALUES (?, ?)",
+            [(100, 1), (101, 1), (100, 2)],
+        )
+
+        yield cursor
+
+
+async def get_activity(cursor):
+    await cursor.execute(
+        "SELECT user_id, cohort_id, ist_date, message_count, completion_count FROM user_daily_activity ORDER BY user_id, cohort_id, ist_date"
+    )
+    return await cursor.fetchall()
+
+
+@pytest.mark.asyncio
+class TestRecordUserActivity:
+    async def test_messages_recorded_per_cohort(self, cursor):
+        """Test that messages are counted on their IST date for every cohort of the question."""
+        # 20:00 UTC is already the next day in IST
+        created_at = datetime(2024, 1, 1, 20, 0, tzinfo=timezone.utc)
+
+        await record_user_activity(
+            cursor, 5, question_id=10, created_at=created_at, message_count=1
+        )
+        await record_user_activity(
+            cursor, 5, question_id=10, created_at=created_at, message_count=1
+        )
+
+        assert await get_activity(cursor) == [
+            (5, ALL_COHORTS, "2024-01-02", 2, 0),
+            (5, 1, "2024-01-02", 2, 0),
+            (5, 2, "2024-01-02", 2, 0),
+        ]
+
+    async def test_task_completion_recorded(self, cursor):
+        """Test that completions of a task outside any cohort only count towards the total."""
+        await record_user_activity(cursor, 5, task_id=2, completion_count=1)
+
+        rows = await get_activity(cursor)
+
+        assert [(row[1], row[3], row[4]) for row in rows] == [(ALL_COHORTS, 0, 1)]
+
+
+@pytest.mark.asyncio
+class TestBackfillUserDailyActivity:
+    async def test_backfill(self, cursor):
+        """Test that the rollup is rebuilt from chat history and task completions."""
+        await cursor.executemany(
+            "INSERT INTO chat_history (user_id, question_id, role, content, created_at) VALUES (?, 10, ?, '', ?)",
+            [
+                (5, "user", "2024-01-01 10:00:00"),
+                (5, "assistant", "2024-01-01 10:00:05"),
+                (5, "user", "2024-01-01 20:00:00"),
+            ],
+        )
+        await cursor.execute(
+            "INSERT INTO task_completions (user_id, question_id, created_at) VALUES (5, 10, '2024-01-01 10:00:10')"
+        )
+        await cursor.execute(
+            "INSERT INTO task_completions (user_id, task_id, created_at) VALUES (5, 2, '2024-01-01 10:00:10')"
+        )
+        # stale rows are dropped
+        await record_user_activity(cursor, 6, task_id=1, completion_count=1)
+
+        async def run_write(write_fn):
+            return await write_fn(cursor)
+
+        with patch(
+            "src.api.db.activity.execute_write_transaction", side_effect=run_write
+        ):
+            await backfill_user_daily_activity()
+
+        assert await get_activity(cursor) == [
+            (5, ALL_COHORTS, "2024-01-01", 1, 2),
+            (5, ALL_COHORTS, "2024-01-02", 1, 0),
+            (5, 1, "2024-01-01", 1, 1),
+            (5, 1, "2024-01-02", 1, 0),
+            (5, 2, "2024-01-01", 1, 1),
+            (5, 2, "2024-01-02", 1, 0),
+        ]
+
+
+@pytest.mark.asyncio
+class TestDeleteChatMessages:
+    async def test_activity_of_deleted_messages_removed(self, cursor):
+        """Test that only the days and users of the deleted messages are recomputed."""
+        await cursor.executemany(
+            "INSERT INTO chat_history (id, user_id, question_id, role, content, created_at) VALUES (?, ?, 10, ?, '', ?)",
+            [
+                (1, 5, "user", "2024-01-01 10:00:00"),
+                (2, 5, "assistant", "2024-01-01 10:00:05"),
+                (3, 5, "user", "2024-01-01 20:00:00"),
+                (4, 6, "user", "2024-01-01 10:00:00"),
+            ],
+        )
+        await cursor.execute(
+            "INSERT INTO task_completions (user_id, question_id, created_at) VALUES (5, 10, '2024-01-01 10:00:10')"
+        )
+
+        async def run_write(write_fn):
+            return await write_fn(cursor)
+
+        with patch(
+            "src.api.db.activity.execute_write_transaction", side_effect=run_write
+        ):
+            await backfill_user_daily_activity()
+
+        user_ids = await delete_chat_messages(
+            cursor, "user_id = ? AND role = 'user'", (5,)
+        )
+
+        assert user_ids == [5]
+        assert await get_activity(cursor) == [
+            # the assistant message and the completion are still there that day
+            (5, ALL_COHORTS, "2024-01-01", 0, 1),
+            (5, 1, "2024-01-01", 0, 1),
+            (5, 2, "2024-01-01", 0, 1),
+            (6, ALL_COHORTS, "2024-01-01", 1, 0),
+            (6, 1, "2024-01-01", 1, 0),
+            (6, 2, "2024-01-01", 1, 0),
+        ]
+
+
+@pytest.mark.asyncio
+class TestRebuildCohortActivity:
+    async def test_courses_added_and_removed(self, cursor):
+        """Test that the activity of a cohort follows the courses added to and removed from it."""
+        await cursor.execute(
+            "INSERT INTO chat_history (user_id, question_id, role, content, created_at) VALUES (5, 10, 'user', '', '2024-01-01 10:00:00')"
+        )
+        await cursor.execute(
+            "INSERT INTO task_completions (user_id, task_id, created_at) VALUES (5, 2, '2024-01-01 10:00:10')"
+        )
+
+        async def run_write(write_fn):
+            return await write_fn(cursor)
+
+        with patch(
+            "src.api.db.activity.execute_write_transaction", side_effect=run_write
+        ):
+            await backfill_user_daily_activity()
+
+        # the course of task 2 is added to cohort 3 after it was completed
+        await cursor.execute(
+            "INSERT INTO course_cohorts (course_id, cohort_id) VALUES (102, 3)"
+        )
+        await rebuild_user_activity(cursor, cohort_ids=[3])
+
+        assert await get_activity(cursor) == [
+            (5, ALL_COHORTS, "2024-01-01", 1, 1),
+            (5, 1, "2024-01-01", 1, 0),
+            (5, 2, "2024-01-01", 1, 0),
+            (5, 3, "2024-01-01", 0, 1),
+        ]
+
+        # and the course of task 1 is removed from cohort 2
+        await cursor.execute(
+            "DELETE FROM course_cohorts WHERE course_id = 100 AND cohort_id = 2"
+        )
+        await rebuild_user_activity(cursor, cohort_ids=[2])
+
+        assert await get_activity(cursor) == [
+            (5, ALL_COHORTS, "2024-01-01", 1, 1),
+            (5, 1, "2024-01-01", 1, 0),
+            (5, 3, "2024-01-01", 0, 1),
+        ]
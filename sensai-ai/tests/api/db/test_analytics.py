@@ -1,4 +1,7 @@
+import asyncio
+import numpy as np
 import pytest
+from datetime import timedelta
 from unittest.mock import patch, AsyncMock
 from collections import defaultdict
 from api.db.analytics import (
@@ -6,7 +9,13 @@ from api.db.analytics import (
     get_cohort_completion,
     get_cohort_course_attempt_data,
     get_cohort_streaks,
+    build_cohort_leaderboard,
+    get_cohort_leaderboard,
+    CohortCompletion,
+    get_positions,
 )
+from api.db.leaderboard import CohortLeaderboard, LeaderboardCache, get_ist_today
+from api.db.course_tree_cache import course_tree_cache
 from api.models import LeaderboardViewType, TaskType, TaskStatus
 
 
@@ -118,14 +127,16 @@ class TestGetCohortCompletion:
         """Test basic cohort completion functionality."""
         # Mock database responses in order of calls
         mock_db.side_effect = [
-            # First call: completed tasks
-            [(1, 101), (2, 103)],
-            # Second call: completed questions
-            [(1, 201), (2, 202)],
-            # Third call: learning material tasks
-            [(101,), (103,)],
-            # Fourth call: quiz/exam questions
-            [(104, 301), (104, 302), (105, 303)],
+            # First call: learning material tasks and quiz questions
+            [
+                (101, "learning_material", None, None),
+                (103, "learning_material", None, None),
+                (104, "quiz", 301, 0),
+                (104, "quiz", 302, 1),
+                (105, "quiz", 303, 0),
+            ],
+            # Second call: completed tasks and questions
+            [(1, 101, -1), (2, 103, -1), (1, -1, 201), (2, -1, 202)],
         ]
 
         result = await get_cohort_completion(
@@ -155,10 +166,9 @@ class TestGetCohortCompletion:
     async def test_get_cohort_completion_with_course_id(self, mock_db):
         """Test cohort completion with specific course ID."""
         mock_db.side_effect = [
-            [(1, 101)],  # completed tasks
-            [(1, 201)],  # completed questions
-            [(101,)],  # learning material tasks
-            [(102, 301)],  # quiz questions
+            # learning material tasks and quiz questions
+            [(101, "learning_material", None, None), (102, "quiz", 301, 0)],
+            [(1, 101, -1), (1, -1, 201)],  # completed tasks and questions
         ]
 
         result = await get_cohort_completion(cohort_id=1, user_ids=[1], course_id=5)
@@ -169,23 +179,21 @@ class TestGetCohortCompletion:
         # Verify course_id parameter was passed to queries
         call_args_list = [call[0] for call in mock_db.call_args_list]
 
-        # Third call should include course_id filter
-        assert "AND ct.course_id = ?" in call_args_list[2][0]
-        assert call_args_list[2][1] == (1, 5)
+        # The tasks query should include the course_id filter
+        assert "AND ct.course_id = ?" in call_args_list[0][0]
+        assert call_args_list[0][1] == (1, 5)
 
-        # Fourth call should include course_id filter
-        assert "AND ct.course_id = ?" in call_args_list[3][0]
-        assert call_args_list[3][1] == (1, 5)
+        # The completions query should bind the user ids
+        assert call_args_list[1][1] == (1,)
 
     @pytest.mark.asyncio
     @patch("api.db.analytics.execute_db_operation")
     async def test_get_cohort_completion_quiz_partial_completion(self, mock_db):
         """Test quiz task with partial question completion."""
         mock_db.side_effect = [
-            [],  # no completed tasks
-            [(1, 301)],  # user 1 completed question 301 only
-            [],  # no learning material tasks
-            [(104, 301), (104, 302), (104, 303)],  # quiz with 3 questions
+            # quiz with 3 questions
+            [(104, "quiz", 301, 0), (104, "quiz", 302, 1), (104, "quiz", 303, 2)],
+            [(1, -1, 301)],  # user 1 completed question 301 only
         ]
 
         result = await get_cohort_completion(cohort_id=1, user_ids=[1], course_id=None)
@@ -205,10 +213,8 @@ class TestGetCohortCompletion:
     async def test_get_cohort_completion_quiz_full_completion(self, mock_db):
         """Test quiz task with full question completion."""
         mock_db.side_effect = [
-            [],  # no completed tasks
-            [(1, 301), (1, 302)],  # user 1 completed all questions
-            [],  # no learning material tasks
-            [(104, 301), (104, 302)],  # quiz with 2 questions
+            [(104, "quiz", 301, 0), (104, "quiz", 302, 1)],  # quiz with 2 questions
+            [(1, -1, 301), (1, -1, 302)],  # user 1 completed all questions
         ]
 
         result = await get_cohort_completion(cohort_id=1, user_ids=[1], course_id=None)
@@ -225,24 +231,33 @@ class TestGetCohortCompletion:
     @patch("api.db.analytics.execute_db_operation")
     async def test_get_cohort_completion_empty_results(self, mock_db):
         """Test cohort completion with no data."""
-        mock_db.side_effect = [[], [], [], []]
+        mock_db.side_effect = [[]]
 
         result = await get_cohort_completion(
             cohort_id=1, user_ids=[1, 2], course_id=None
         )
 
-        # Should return empty defaultdict when no tasks exist
+        # Should be empty when no tasks exist
         assert len(result) == 0
+        assert result[1] == {}
+        assert result.num_tasks == 0
+        # completions are not read when there are no tasks
+        assert mock_db.call_count == 1
 
     @pytest.mark.asyncio
     @patch("api.db.analytics.execute_db_operation")
     async def test_get_cohort_completion_multiple_users(self, mock_db):
         """Test cohort completion with multiple users having different completions."""
         mock_db.side_effect = [
-            [(1, 101), (2, 102), (3, 101)],  # completed tasks
-            [(1, 301), (2, 302)],  # completed questions
-            [(101,), (102,)],  # learning material tasks
-            [(103, 301), (103, 302)],  # quiz questions
+            # learning material tasks and quiz questions
+            [
+                (101, "learning_material", None, None),
+                (102, "learning_material", None, None),
+                (103, "quiz", 301, 0),
+                (103, "quiz", 302, 1),
+            ],
+            # completed tasks and questions
+            [(1, 101, -1), (2, 102, -1), (3, 101, -1), (1, -1, 301), (2, -1, 302)],
         ]
 
         result = await get_cohort_completion(
@@ -269,10 +284,12 @@ class TestGetCohortCompletion:
     async def test_get_cohort_completion_only_learning_material(self, mock_db):
         """Test cohort completion with only learning material tasks."""
         mock_db.side_effect = [
-            [(1, 101)],  # completed tasks
-            [],  # no completed questions
-            [(101,), (102,)],  # learning material tasks
-            [],  # no quiz questions
+            # learning material tasks
+            [
+                (101, "learning_material", None, None),
+                (102, "learning_material", None, None),
+            ],
+            [(1, 101, -1)],  # completed tasks
         ]
 
         result = await get_cohort_completion(cohort_id=1, user_ids=[1], course_id=None)
@@ -282,6 +299,89 @@ class TestGetCohortCompletion:
         assert result[1][101]["is_complete"] is True
         assert result[1][102]["is_complete"] is False
 
+    @pytest.mark.asyncio
+    @patch("api.db.analytics.execute_db_operation")
+    async def test_get_cohort_completion_legacy_shape(self, mock_db):
+        """Test that the result matches the nested dicts returned before."""
+        mock_db.side_effect = [
+            [
+                (101, "learning_material", None, None),
+                (104, "quiz", 302, 0),
+                (104, "quiz", 301, 1),
+                (105, "quiz", None, None),
+            ],
+            [(1, 101, -1), (1, -1, 301), (1, -1, 302), (2, -1, 301), (9, 101, -1)],
+        ]
+
+        result = await get_cohort_completion(cohort_id=1, user_ids=[2, 1])
+
+        assert dict(result) == {
+            2: {
+                101: {"is_complete": False},
+                104: {
+                    "is_complete": False,
+                    "questions": [
+                        {"question_id": 302, "is_complete": False},
+                        {"question_id": 301, "is_complete": True},
+                    ],
+                },
+                # quizzes without questions can never be completed
+                105: {
+                    "is_complete": False,
+                    "questions": [{"question_id": None, "is_complete": False}],
+                },
+            },
+            1: {
+                101: {"is_complete": True},
+                104: {
+                    "is_complete": True,
+                    "questions": [
+                        {"question_id": 302, "is_complete": True},
+                        {"question_id": 301, "is_complete": True},
+                    ],
+                },
+                105: {
+                    "is_complete": False,
+                    "questions": [{"question_id": None, "is_complete": False}],
+                },
+            },
+        }
+        assert result.task_ids == [101, 104, 105]
+        assert result.get_num_completed().tolist() == [0, 2]
+        assert result.get_num_completed([104, 105]).tolist() == [0, 1]
+
+
+class TestCohortCompletion:
+    """Test suite for the CohortCompletion matrices."""
+
+    def test_legacy_dicts_built_lazily(self):
+        """Test that the per-user dicts are only built for users who are asked for."""
+        completion = CohortCompletion(
+            [1, 2], [(101, "learning_material", None)], [(1, 101, -1)]
+        )
+
+        assert completion._user_completions == {}
+        assert completion[1] == {101: {"is_complete": True}}
+        assert list(completion._user_completions) == [1]
+        assert completion[1] is completion[1]
+
+    def test_unknown_users(self):
+        """Test that users who were not asked for have no completion data."""
+        completion = CohortCompletion(
+            [1], [(101, "learning_material", None)], [(5, 101, -1)]
+        )
+
+        assert 5 not in completion
+        assert completion[5] == {}
+        assert completion.task_matrix.tolist() == [[False]]
+
+    def test_get_positions(self):
+        """Test looking up the positions of ids in an unsorted array."""
+        positions = get_positions(np.array([30, 10, 20]), np.array([10, 20, 40, 30]))
+
+        assert positions.tolist() == [1, 2, -1, 0]
+        assert get_positions(np.array([]), np.array([1])).tolist() == [-1]
+
 
 class TestGetCohortCourseAttemptData:
     """Test suite for get_cohort_course_attempt_data function."""
@@ -431,7 +531,8 @@ class TestGetCohortStreaks:
 
         # Verify no date filter was applied for ALL_TIME
         call_args = mock_db.call_args[0][0]
-        assert "AND DATE(datetime(timestamp" not in call_args
+        assert "AND a.ist_date" not in call_args
+        assert "AND strftime" not in call_args
 
     @pytest.mark.asyncio
     @patch("api.db.analytics.get_user_streak_from_usage_dates")
@@ -451,10 +552,7 @@ class TestGetCohortStreaks:
 
         # Verify weekly date filter was applied
         call_args = mock_db.call_args[0][0]
-        assert (
-            "AND DATE(datetime(timestamp, '+5 hours', '+30 minutes')) > DATE('now', 'weekday 0', '-7 days')"
-            in call_args
-        )
+        assert "AND a.ist_date > DATE('now', 'weekday 0', '-7 days')" in call_args
 
     @pytest.mark.asyncio
     @patch("api.db.analytics.get_user_streak_from_usage_dates")
@@ -475,8 +573,7 @@ class TestGetCohortStreaks:
         # Verify monthly date filter was applied
         call_args = mock_db.call_args[0][0]
         assert (
-            "AND strftime('%Y-%m', datetime(timestamp, '+5 hours', '+30 minutes')) = strftime('%Y-%m', 'now')"
-            in call_args
+            "AND strftime('%Y-%m', a.ist_date) = strftime('%Y-%m', 'now')" in call_args
         )
 
     @pytest.mark.asyncio
@@ -539,3 +636,151 @@ class TestGetCohortStreaks:
         # Verify usage dates were sorted in reverse order before being passed to streak function
         mock_streak.assert_called_once_with(["2023-01-03", "2023-01-02", "2023-01-01"])
         assert result[0]["streak_count"] == 3
+
+
+def make_course_tree(course_id: int):
+    return {
+        "id": course_id,
+        "milestones": [
+            {
+                "id": 100,
+                "tasks": [
+                    {"id": 10, "type": str(TaskType.LEARNING_MATERIAL)},
+                    {"id": 20, "type": str(TaskType.QUIZ)},
+                ],
+            }
+        ],
+    }
+
+
+def make_leaderboard_db_results():
+    today = get_ist_today()
+    return [
+        # learners
+        [
+            (1, "user1@example.com", "John", None, "Doe"),
+            (2, "user2@example.com", "Jane", None, "Smith"),
+        ],
+        # courses
+        [(5,)],
+        # quiz questions
+        [(20, 200), (20, 201)],
+        # completions
+        [(1, 10, None), (2, None, 200), (2, None, 201), (2, 10, None)],
+        # active days
+        [
+            (1, str(today - timedelta(days=1))),
+            (1, str(today)),
+            (2, str(today - timedelta(days=3))),
+        ],
+    ]
+
+
+class TestCohortLeaderboard:
+    """Test suite for building and serving cohort leaderboards."""
+
+    @pytest.mark.asyncio
+    @patch("api.db.analytics.leaderboards", new_callable=LeaderboardCache)
+    @patch("api.db.analytics.get_published_course_tree")
+    @patch("api.db.analytics.execute_db_operation")
+    async def test_build_cohort_leaderboard(self, mock_db, mock_get_tree, _):
+        """Test that completions and active days are replayed into the board."""
+        mock_db.side_effect = make_leaderboard_db_results()
+        mock_get_tree.return_value = make_course_tree(5)
+
+        board = await build_cohort_leaderboard(1)
+
+        assert list(board.learners) == [1, 2]
+        assert board.num_tasks == 2
+        assert board.completed_task_ids == {1: {10}, 2: {10, 20}}
+        assert board.get_rankings(LeaderboardViewType.ALL_TIME) == [
+            {
+                "user": board.learners[1],
+                "streak_count": 2,
+                "tasks_completed": 1,
+            },
+            {
+                "user": board.learners[2],
+                "streak_count": 0,
+                "tasks_completed": 2,
+            },
+        ]
+        mock_get_tree.assert_called_once_with(5)
+
+    @pytest.mark.asyncio
+    @patch("api.db.analytics.leaderboards", new_callable=LeaderboardCache)
+    @patch("api.db.analytics.get_published_course_tree")
+    @patch("api.db.analytics.execute_db_operation")
+    async def test_build_reuses_restored_board(
+        self, mock_db, mock_get_tree, mock_leaderboards
+    ):
+        """Test that a board restored from a snapshot is used if the cohort is unchanged."""
+        restored = CohortLeaderboard(
+            {1: {"id": 1}, 2: {"id": 2}}, [10], {20: [201, 200]}, {}
+        )
+        mock_leaderboards._restored[1] = restored
+        mock_db.side_effect = make_leaderboard_db_results()
+        mock_get_tree.return_value = make_course_tree(5)
+
+        board = await build_cohort_leaderboard(1)
+
+        assert board is restored
+        assert board.learners[1]["email"] == "user1@example.com"
+        assert list(board.course_versions) == [5]
+        # completions and activity are not read again
+        assert mock_db.call_count == 3
+
+    @pytest.mark.asyncio
+    @patch("api.db.analytics.leaderboards", new_callable=LeaderboardCache)
+    @patch("api.db.analytics.get_published_course_tree")
+    @patch("api.db.analytics.execute_db_operation")
+    async def test_build_ignores_outdated_restored_board(
+        self, mock_db, mock_get_tree, mock_leaderboards
+    ):
+        """Test that a restored board is rebuilt if the cohort's tasks have changed."""
+        restored = CohortLeaderboard({1: {"id": 1}, 2: {"id": 2}}, [10], {}, {})
+        mock_leaderboards._restored[1] = restored
+        mock_db.side_effect = make_leaderboard_db_results()
+        mock_get_tree.return_value = make_course_tree(5)
+
+        board = await build_cohort_leaderboard(1)
+
+        assert board is not restored
+        assert mock_db.call_count == 5
+
+    @pytest.mark.asyncio
+    @patch("api.db.analytics.leaderboards", new_callable=LeaderboardCache)
+    @patch("api.db.analytics.build_cohort_leaderboard")
+    async def test_get_cohort_leaderboard(self, mock_build, mock_leaderboards):
+        """Test that the board is built once, even for concurrent requests."""
+
+        async def build(cohort_id):
+            await asyncio.sleep(0)
+            return CohortLeaderboard(
+                {1: {"id": 1}}, [10], {}, {5: course_tree_cache.get_version(5)}
+            )
+
+        mock_build.side_effect = build
+
+        results = await asyncio.gather(
+            get_cohort_leaderboard(1), get_cohort_leaderboard(1)
+        )
+        result = await get_cohort_leaderboard(1, LeaderboardViewType.WEEKLY)
+
+        expected = {
+            "stats": [{"user": {"id": 1}, "streak_count": 0, "tasks_completed": 0}],
+            "metadata": {"num_tasks": 1},
+        }
+        assert results == [expected, expected]
+        assert result == expected
+        mock_build.assert_called_once_with(1)
+        assert mock_leaderboards.get_metrics()["hits"] == 1
+
+    @pytest.mark.asyncio
+    @patch("api.db.analytics.leaderboards", new_callable=LeaderboardCache)
+    @patch("api.db.analytics.build_cohort_leaderboard")
+    async def test_get_cohort_leaderboard_no_learners(self, mock_build, _):
+        """Test that cohorts without learners have no leaderboard."""
+        mock_build.return_value = CohortLeaderboard({}, [], {}, {})
+
+        assert await get_cohort_leaderboard(1) == {}
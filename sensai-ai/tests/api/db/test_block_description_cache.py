@@ -0,0 +1,77 @@
+import json
+from unittest.mock import patch
+from src.api.db.block_description_cache import BlockDescriptionCache
+
+
+def make_blocks(text: str):
+    return [{"type": "paragraph", "content": [{"text": text}]}]
+
+
+class TestBlockDescriptionCache:
+    def test_get_description(self):
+        """Test that blocks are rendered once and then served from the cache."""
+        cache = BlockDescriptionCache()
+
+        assert cache.get_description(make_blocks("hello"), "task_1") == "hello\n"
+        assert cache.get_description(make_blocks("hello"), "task_1") == "hello\n"
+
+        assert cache.get_metrics()["hits"] == 1
+        assert cache.get_metrics()["misses"] == 1
+
+    def test_changed_blocks(self):
+        """Test that a description rendered from an older version of the blocks is not used."""
+        cache = BlockDescriptionCache()
+
+        cache.get_description(make_blocks("old"), "task_1")
+
+        assert cache.get_description(make_blocks("new"), "task_1") == "new\n"
+        assert cache.get_metrics()["misses"] == 2
+        assert cache.get_metrics()["size"] == 1
+
+    def test_without_key(self):
+        """Test that blocks without an owner are cached by their content."""
+        cache = BlockDescriptionCache()
+
+        cache.get_description(make_blocks("preview"))
+        cache.get_description(make_blocks("preview"))
+
+        assert cache.get_metrics()["hits"] == 1
+
+    def test_get_description_from_json(self):
+        """Test that stored blocks are only parsed and rendered when they change."""
+        cache = BlockDescriptionCache()
+        blocks_json = json.dumps(make_blocks("stored"))
+
+        assert cache.get_description_from_json(blocks_json, "task_1") == "stored\n"
+        with patch("src.api.db.block_description_cache.json.loads") as mock_loads:
+            assert cache.get_description_from_json(blocks_json, "task_1") == "stored\n"
+            mock_loads.assert_not_called()
+
+        new_blocks_json = json.dumps(make_blocks("edited"))
+        assert cache.get_description_from_json(new_blocks_json, "task_1") == "edited\n"
+        assert cache.get_description_from_json(None, "task_2") == ""
+
+        assert cache.get_metrics()["hits"] == 1
+        assert cache.get_metrics()["misses"] == 2
+
+    def test_empty_blocks(self):
+        """Test that empty blocks are not cached."""
+        cache = BlockDescriptionCache()
+
+        assert cache.get_description([], "task_1") == ""
+        assert cache.get_metrics()["size"] == 0
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used descriptions are evicted beyond max_size."""
+        cache = BlockDescriptionCache(max_size=2)
+
+        cache.get_description(make_blocks("1"), "task_1")
+        cache.get_description(make_blocks("2"), "task_2")
+        cache.get_description(make_blocks("1"), "task_1")
+        cache.get_description(make_blocks("3"), "task_3")
+
+        cache.get_description(make_blocks("1"), "task_1")
+        cache.get_description(make_blocks("2"), "task_2")
+
+        assert cache.get_metrics()["hits"] == 2
+        assert cache.get_metrics()["misses"] == 4
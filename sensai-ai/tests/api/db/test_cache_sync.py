@@ -0,0 +1,149 @@
+import json
+import pytest
+from unittest.mock import patch
+from api.db.cache_sync import CacheSync
+from api.db.course_tree_cache import CourseTreeCache
+from api.db.leaderboard import CohortLeaderboard, LeaderboardCache
+from api.event_bus import InProcessEventBus
+
+
+class FakeBus:
+    """Stands in for an event bus reaching other processes."""
+
+    between_processes = True
+
+    def __init__(self):
+        self.published = []
+        self.replay = None
+
+    def subscribe_cache_events(self, replay):
+        self.replay = replay
+
+    async def publish_cache_events(self, events):
+        self.published += events
+
+
+@pytest.fixture
+def sync():
+    """A fresh cache sync that the shared methods of every cache go through."""
+    sync = CacheSync()
+
+    with patch("api.db.cache_sync.cache_sync", sync):
+        yield sync
+
+
+def make_tree_cache(task_ids=(1,)):
+    cache = CourseTreeCache()
+    cache.set(
+        1,
+        cache.get_version(1),
+        {"id": 1, "milestones": []},
+        task_ids,
+        [100],
+    )
+    return cache
+
+
+@pytest.mark.asyncio
+class TestCacheSync:
+    async def test_calls_published_once(self, sync):
+        """Test that only the calls made outside other shared methods are published."""
+        bus = FakeBus()
+        cache = make_tree_cache()
+        sync.register("course_tree", cache)
+        sync.connect(bus)
+
+        # resolves to invalidate_tasks and then invalidate_courses
+        cache.invalidate_task(1)
+        cache.invalidate_courses(course_id for course_id in (2,))
+        await sync.flush()
+
+        assert cache.get(1) is None
+        assert [json.loads(event) for event in bus.published] == [
+            ["course_tree", "invalidate_task", [1], {}],
+            ["course_tree", "invalidate_courses", [[2]], {}],
+        ]
+        assert sync.get_metrics()["pending"] == 0
+
+    async def test_replayed_calls_not_published_again(self, sync):
+        """Test that a call from another process is applied without being sent back."""
+        bus = FakeBus()
+        cache = make_tree_cache(task_ids=[1, 2])
+        sync.register("course_tree", cache)
+        sync.connect(bus)
+
+        # resolved against the tasks cached in this process
+        bus.replay([json.dumps(["course_tree", "invalidate_task", [2], {}])])
+        await sync.flush()
+
+        assert cache.get(1) is None
+        assert bus.published == []
+        assert sync.get_metrics() == {"pending": 0, "replayed": 1, "errors": 0}
+
+    async def test_leaderboard_events_replayed(self, sync):
+        """Test that activity recorded by another process reaches the boards of this one."""
+        bus = FakeBus()
+        leaderboards = LeaderboardCache()
+        sync.register("leaderboards", leaderboards)
+        sync.connect(bus)
+        board = CohortLeaderboard(
+            learners={1: {"id": 1}},
+            learning_material_task_ids={10},
+            quiz_question_ids={},
+            course_versions={},
+        )
+        leaderboards.set(1, leaderboards.start_build(1), board)
+
+        bus.replay(
+            [
+                json.dumps(
+                    ["leaderboards", "record_activity", [1, [[1, "2024-01-01"]]], {}]
+                ),
+                json.dumps(
+                    ["leaderboards", "record_completion", [1, [1]], {"task_id": 10}]
+                ),
+            ]
+        )
+
+        assert board.completed_task_ids[1] == {10}
+        assert board.streaks[1][1].isoformat() == "2024-01-01"
+        assert bus.published == []
+
+    async def test_not_published_within_a_single_process(self, sync):
+        """Test that nothing is queued when there are no other processes."""
+        cache = make_tree_cache()
+        sync.register("course_tree", cache)
+        sync.connect(InProcessEventBus())
+
+        cache.invalidate_all()
+
+        assert cache.get(1) is None
+        assert sync.get_metrics()["pending"] == 0
+
+    async def test_unregistered_cache_not_published(self, sync):
+        """Test that calls on caches of their own (e.g. in tests) stay local."""
+        bus = FakeBus()
+        sync.connect(bus)
+
+        make_tree_cache().invalidate_course(1)
+        await sync.flush()
+
+        assert bus.published == []
+
+    async def test_replay_errors_counted(self, sync):
+        """Test that a call that cannot be replayed does not stop the ones after it."""
+        bus = FakeBus()
+        cache = make_tree_cache()
+        sync.register("course_tree", cache)
+        sync.connect(bus)
+
+        bus.replay(
+            [
+                json.dumps(["course_tree", "invalidate_everything", [], {}]),
+                json.dumps(["unknown", "invalidate_all", [], {}]),
+                json.dumps(["course_tree", "invalidate_course", [1], {}]),
+            ]
+        )
+
+        assert cache.get(1) is None
+        assert sync.get_metrics() == {"pending": 0, "replayed": 1, "errors": 1}
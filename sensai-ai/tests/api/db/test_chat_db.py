@@ -4,6 +4,8 @@ from unittest.mock import patch, AsyncMock, MagicMock
 from src.api.db.chat import (
     store_messages,
     get_all_chat_history,
+    get_chat_history_page,
+    iter_all_chat_history,
     convert_chat_message_to_dict,
     get_question_chat_history_for_user,
     get_task_chat_history_for_user,
@@ -19,16 +21,17 @@ from src.api.models import StoreMessageRequest, TaskType
 class TestStoreMessages:
     """Test message storage functionality."""
 
-    @patch("src.api.db.chat.get_new_db_connection")
+    @patch("src.api.db.chat.execute_write_transaction")
     @patch("src.api.db.chat.execute_db_operation")
-    async def test_store_messages_success(self, mock_execute, mock_get_conn):
+    async def test_store_messages_success(self, mock_execute, mock_write):
         """Test successful message storage."""
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 123
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_conn.__aenter__.return_value = mock_conn
-        mock_get_conn.return_value = mock_conn
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         # Mock the fetch result
         mock_execute.return_value = [
@@ -50,18 +53,24 @@ class TestStoreMessages:
         assert result[0]["id"] == 123
         assert result[0]["content"] == "Hello"
         mock_cursor.execute.assert_called()
-        mock_conn.commit.assert_called_once()
+        mock_write.assert_called_once()
 
-    @patch("src.api.db.chat.get_new_db_connection")
+    @patch("src.api.db.chat.leaderboards")
+    @patch("src.api.db.chat.execute_write_transaction")
     @patch("src.api.db.chat.execute_db_operation")
-    async def test_store_messages_with_completion(self, mock_execute, mock_get_conn):
+    async def test_store_messages_with_completion(
+        self, mock_execute, mock_write, mock_leaderboards
+    ):
         """Test message storage with task completion."""
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 123
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_conn.__aenter__.return_value = mock_conn
-        mock_get_conn.return_value = mock_conn
+        mock_cursor.rowcount = 1
+        mock_cursor.fetchall.return_value = [(0, "2024-01-01"), (7, "2024-01-01")]
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         mock_execute.return_value = [
             (123, "2024-01-01 12:00:00", 1, 1, "user", "Hello", "text")
@@ -80,21 +89,60 @@ class TestStoreMessages:
 
         # Should insert completion record
         assert (
-            mock_cursor.execute.call_count == 2
-        )  # One for message, one for completion
+            mock_cursor.execute.call_count == 4
+        )  # Message and completion, each with its daily activity
         calls = [call[0][0] for call in mock_cursor.execute.call_args_list]
         assert any("task_completions" in call for call in calls)
+        assert mock_cursor.execute.call_args_list[-1][0][1][3] == 1
 
-    @patch("src.api.db.chat.get_new_db_connection")
+        # the leaderboards are updated with the activity of both writes
+        activity = mock_leaderboards.record_activity.call_args[0][1]
+        assert len(activity) == 4
+        mock_leaderboards.record_completion.assert_called_once_with(
+            1, [0, 7], question_id=1
+        )
+
+    @patch("src.api.db.chat.execute_write_transaction")
     @patch("src.api.db.chat.execute_db_operation")
-    async def test_store_multiple_messages(self, mock_execute, mock_get_conn):
+    async def test_store_messages_already_completed(self, mock_execute, mock_write):
+        """Test that completing an already completed question is not counted again."""
+        mock_cursor = AsyncMock()
+        mock_cursor.lastrowid = 123
+        mock_cursor.rowcount = 0
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+
+        mock_execute.return_value = [
+            (123, "2024-01-01 12:00:00", 1, 1, "user", "Hello", "text")
+        ]
+
+        messages = [
+            StoreMessageRequest(
+                role="user",
+                content="Hello",
+                response_type="text",
+                created_at=datetime.now(),
+            )
+        ]
+
+        await store_messages(messages, 1, 1, True)
+
+        assert mock_cursor.execute.call_count == 3
+
+    @patch("src.api.db.chat.execute_write_transaction")
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_store_multiple_messages(self, mock_execute, mock_write):
         """Test storing multiple messages."""
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 123
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_conn.__aenter__.return_value = mock_conn
-        mock_get_conn.return_value = mock_conn
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         mock_execute.return_value = [
             (123, "2024-01-01 12:00:00", 1, 1, "user", "Hello", "text"),
@@ -119,7 +167,11 @@ class TestStoreMessages:
         result = await store_messages(messages, 1, 1, False)
 
         assert len(result) == 2
-        assert mock_cursor.execute.call_count == 2  # One for each message
+        # One for each message and one for each message's daily activity
+        assert mock_cursor.execute.call_count == 4
+        # only messages from the learner are counted
+        activity_calls = mock_cursor.execute.call_args_list[1::2]
+        assert [call[0][1][2] for call in activity_calls] == [1, 0]
 
 
 @pytest.mark.asyncio
@@ -163,6 +215,57 @@ class TestGetChatHistory:
         assert result[1]["content"] == "Hi"
 
         mock_execute.assert_called_once()
+        assert mock_execute.call_args[0][1][:2] == (1, 0)
+
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_iter_all_chat_history_batches(self, mock_execute):
+        """Test that messages are read a page at a time, each after the last one read."""
+
+        def row(message_id):
+            return (message_id, "2024-01-01", 1, "a@b.com", 1, 1, "user", "Hi", "text")
+
+        mock_execute.side_effect = [[row(3), row(4)], [row(5), row(6)], []]
+
+        batches = [
+            batch async for batch in iter_all_chat_history(1, after_id=2, batch_size=2)
+        ]
+
+        assert [[message["id"] for message in batch] for batch in batches] == [
+            [3, 4],
+            [5, 6],
+        ]
+        assert [call_args[0][1] for call_args in mock_execute.call_args_list] == [
+            (1, 2, 2),
+            (1, 4, 2),
+            (1, 6, 2),
+        ]
+
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_iter_all_chat_history_stops_after_short_page(self, mock_execute):
+        """Test that no more pages are read once one comes back short."""
+        mock_execute.return_value = [
+            (3, "2024-01-01", 1, "a@b.com", 1, 1, "user", "Hi", "text")
+        ]
+
+        batches = [batch async for batch in iter_all_chat_history(1, batch_size=2)]
+
+        assert len(batches) == 1
+        mock_execute.assert_called_once()
+
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_get_chat_history_page(self, mock_execute):
+        """Test that pages are read by keyset, after the given message id."""
+        mock_execute.return_value = [
+            (5, "2024-01-01", 1, "user@example.com", 1, 1, "user", "Hi", "text")
+        ]
+
+        result = await get_chat_history_page(1, after_id=4, limit=10)
+
+        assert [message["id"] for message in result] == [5]
+        query, params = mock_execute.call_args[0]
+        assert "message.id > ?" in query
+        assert "ORDER BY message.id ASC LIMIT ?" in query
+        assert params == (1, 4, 10)
 
     @patch("src.api.db.chat.execute_db_operation")
     async def test_get_question_chat_history_for_user_success(self, mock_execute):
@@ -181,12 +284,21 @@ class TestGetChatHistory:
 
         mock_execute.assert_called_once_with(
             """
-    SELECT id, created_at, user_id, question_id, role, content, response_type FROM chat_history WHERE question_id = ? AND user_id = ?
+    SELECT id, created_at, user_id, question_id, role, content, response_type FROM chat_history WHERE question_id = ? AND user_id = ? AND id > ? ORDER BY id ASC
     """,
-            (1, 1),
+            (1, 1, 0),
             fetch_all=True,
         )
 
+    @patch("src.api.db.chat.execute_db_operation")
+    async def test_get_question_chat_history_for_user_after_id(self, mock_execute):
+        """Test that only the messages after the given id are fetched."""
+        mock_execute.return_value = []
+
+        await get_question_chat_history_for_user(1, 2, after_id=10)
+
+        assert mock_execute.call_args[0][1] == (1, 2, 10)
+
     @patch("src.api.db.chat.get_basic_task_details")
     @patch("src.api.db.chat.execute_db_operation")
     async def test_get_task_chat_history_for_user_success(
@@ -203,6 +315,7 @@ class TestGetChatHistory:
         assert len(result) == 1
         assert result[0]["id"] == 1
         mock_get_task.assert_called_once_with(1)
+        assert mock_execute.call_args[0][1] == (1, 1, 0)
 
     @patch("src.api.db.chat.get_basic_task_details")
     async def test_get_task_chat_history_for_user_task_not_exist(self, mock_get_task):
@@ -257,14 +370,25 @@ class TestChatMessageConversion:
 class TestChatMessageOperations:
     """Test chat message CRUD operations."""
 
-    @patch("src.api.db.chat.execute_db_operation")
-    async def test_delete_message_success(self, mock_execute):
+    @patch("src.api.db.chat.leaderboards")
+    @patch("src.api.db.chat.delete_chat_messages")
+    @patch("src.api.db.chat.execute_write_transaction")
+    async def test_delete_message_success(
+        self, mock_write, mock_delete_messages, mock_leaderboards
+    ):
         """Test successful message deletion."""
+        mock_cursor = AsyncMock()
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+        mock_delete_messages.return_value = [5]
+
         await delete_message(1)
 
-        mock_execute.assert_called_once_with(
-            "DELETE FROM chat_history WHERE id = ?", (1,)
-        )
+        mock_delete_messages.assert_called_once_with(mock_cursor, "id = ?", (1,))
+        mock_leaderboards.invalidate_user.assert_called_once_with(5)
 
     @patch("src.api.db.chat.execute_db_operation")
     async def test_update_message_timestamp_success(self, mock_execute):
@@ -277,18 +401,46 @@ class TestChatMessageOperations:
             "UPDATE chat_history SET timestamp = ? WHERE id = ?", (new_timestamp, 1)
         )
 
-    @patch("src.api.db.chat.execute_db_operation")
-    async def test_delete_user_chat_history_for_task_success(self, mock_execute):
+    @patch("src.api.db.chat.leaderboards")
+    @patch("src.api.db.chat.conversations")
+    @patch("src.api.db.chat.delete_chat_messages")
+    @patch("src.api.db.chat.execute_write_transaction")
+    async def test_delete_user_chat_history_for_task_success(
+        self, mock_write, mock_delete_messages, mock_conversations, mock_leaderboards
+    ):
         """Test successful deletion of user chat history for a task."""
-        await delete_user_chat_history_for_task(1, 1)
+        mock_cursor = AsyncMock()
 
-        mock_execute.assert_called_once_with(
-            "DELETE FROM chat_history WHERE question_id = ? AND user_id = ?", (1, 1)
-        )
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
 
-    @patch("src.api.db.chat.execute_db_operation")
-    async def test_delete_all_chat_history_success(self, mock_execute):
+        mock_write.side_effect = run_write
+
+        await delete_user_chat_history_for_task(1, 2)
+
+        mock_delete_messages.assert_called_once_with(
+            mock_cursor, "question_id = ? AND user_id = ?", (1, 2)
+        )
+        mock_conversations.invalidate.assert_called_once_with(2, 1)
+        mock_leaderboards.invalidate_user.assert_called_once_with(2)
+
+    @patch("src.api.db.chat.leaderboards")
+    @patch("src.api.db.chat.rebuild_user_activity")
+    @patch("src.api.db.chat.execute_write_transaction")
+    async def test_delete_all_chat_history_success(
+        self, mock_write, mock_rebuild_activity, mock_leaderboards
+    ):
         """Test successful deletion of all chat history."""
+        mock_cursor = AsyncMock()
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+
         await delete_all_chat_history()
 
-        mock_execute.assert_called_once_with("DELETE FROM chat_history")
+        mock_cursor.execute.assert_called_once_with("DELETE FROM chat_history")
+        # the rollup is rebuilt in the same transaction
+        mock_rebuild_activity.assert_called_once_with(mock_cursor)
+        mock_leaderboards.invalidate_all.assert_called_once()
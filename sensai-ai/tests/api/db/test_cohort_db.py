@@ -3,6 +3,7 @@ import json
 from unittest.mock import patch, AsyncMock, MagicMock, ANY, call
 from datetime import datetime, timezone
 from collections import defaultdict
+from types import SimpleNamespace
 from src.api.db.cohort import (
     create_cohort,
     get_cohort_by_id,
@@ -27,6 +28,22 @@ from src.api.db.cohort import (
 )
 
 
+@pytest.fixture
+def course_cohorts_write():
+    """Runs the writes of the course-cohort changes on a mock cursor."""
+    cursor = AsyncMock()
+
+    async def run_write(write_fn):
+        return await write_fn(cursor)
+
+    with patch(
+        "src.api.db.cohort.execute_write_transaction", side_effect=run_write
+    ) as write, patch(
+        "src.api.db.cohort.rebuild_user_activity", new_callable=AsyncMock
+    ) as rebuild:
+        yield SimpleNamespace(cursor=cursor, write=write, rebuild=rebuild)
+
+
 @pytest.mark.asyncio
 class TestCohortBasicOperations:
     """Test basic cohort database operations."""
@@ -139,8 +156,7 @@ class TestCohortBasicOperations:
 class TestCohortCourseOperations:
     """Test cohort-course relationship operations."""
 
-    @patch("src.api.db.cohort.execute_many_db_operation")
-    async def test_add_courses_to_cohort(self, mock_execute_many):
+    async def test_add_courses_to_cohort(self, course_cohorts_write):
         """Test adding courses to cohort."""
         course_ids = [1, 2, 3]
         publish_at = datetime.now(timezone.utc)
@@ -160,10 +176,15 @@ class TestCohortCourseOperations:
             (3, 1, True, 7, "days", publish_at),
         ]
 
-        mock_execute_many.assert_called_once_with(ANY, expected_values)
+        course_cohorts_write.cursor.executemany.assert_called_once_with(
+            ANY, expected_values
+        )
+        # rebuilt in the same transaction
+        course_cohorts_write.rebuild.assert_called_once_with(
+            course_cohorts_write.cursor, cohort_ids=[1]
+        )
 
-    @patch("src.api.db.cohort.execute_many_db_operation")
-    async def test_add_courses_to_cohort_no_drip(self, mock_execute_many):
+    async def test_add_courses_to_cohort_no_drip(self, course_cohorts_write):
         """Test adding courses to cohort without drip configuration."""
         course_ids = [1, 2]
 
@@ -174,10 +195,11 @@ class TestCohortCourseOperations:
             (2, 1, False, None, None, None),
         ]
 
-        mock_execute_many.assert_called_once_with(ANY, expected_values)
+        course_cohorts_write.cursor.executemany.assert_called_once_with(
+            ANY, expected_values
+        )
 
-    @patch("src.api.db.cohort.execute_many_db_operation")
-    async def test_add_course_to_cohorts(self, mock_execute_many):
+    async def test_add_course_to_cohorts(self, course_cohorts_write):
         """Test adding course to multiple cohorts."""
         cohort_ids = [1, 2, 3]
 
@@ -195,27 +217,40 @@ class TestCohortCourseOperations:
             (1, 3, True, 14, "days", None),
         ]
 
-        mock_execute_many.assert_called_once_with(ANY, expected_values)
+        course_cohorts_write.cursor.executemany.assert_called_once_with(
+            ANY, expected_values
+        )
+        course_cohorts_write.rebuild.assert_called_once_with(
+            course_cohorts_write.cursor, cohort_ids=cohort_ids
+        )
 
-    @patch("src.api.db.cohort.execute_many_db_operation")
-    async def test_remove_course_from_cohorts(self, mock_execute_many):
+    async def test_remove_course_from_cohorts(self, course_cohorts_write):
         """Test removing course from multiple cohorts."""
         cohort_ids = [1, 2, 3]
 
         await remove_course_from_cohorts(1, cohort_ids)
 
         expected_params = [(1, 1), (1, 2), (1, 3)]
-        mock_execute_many.assert_called_once_with(ANY, expected_params)
+        course_cohorts_write.cursor.executemany.assert_called_once_with(
+            ANY, expected_params
+        )
+        course_cohorts_write.rebuild.assert_called_once_with(
+            course_cohorts_write.cursor, cohort_ids=cohort_ids
+        )
 
-    @patch("src.api.db.cohort.execute_many_db_operation")
-    async def test_remove_courses_from_cohort(self, mock_execute_many):
+    async def test_remove_courses_from_cohort(self, course_cohorts_write):
         """Test removing multiple courses from cohort."""
         course_ids = [1, 2, 3]
 
         await remove_courses_from_cohort(1, course_ids)
 
         expected_params = [(1, 1), (1, 2), (1, 3)]
-        mock_execute_many.assert_called_once_with(ANY, expected_params)
+        course_cohorts_write.cursor.executemany.assert_called_once_with(
+            ANY, expected_params
+        )
+        course_cohorts_write.rebuild.assert_called_once_with(
+            course_cohorts_write.cursor, cohort_ids=[1]
+        )
 
 
 @pytest.mark.asyncio
@@ -226,8 +261,14 @@ class TestCohortMemberOperations:
     @patch("src.api.db.cohort.get_new_db_connection")
     @patch("src.api.db.cohort.insert_or_return_user")
     @patch("src.api.db.cohort.send_slack_notification_for_learner_added_to_cohort")
+    @patch("src.api.db.cohort.send_slack_notification_for_new_user")
     async def test_add_members_to_cohort_success(
-        self, mock_slack, mock_insert_user, mock_connection, mock_execute
+        self,
+        mock_new_user_slack,
+        mock_slack,
+        mock_insert_user,
+        mock_connection,
+        mock_execute,
     ):
         """Test successfully adding members to cohort."""
         # Mock database setup
@@ -249,7 +290,7 @@ class TestCohortMemberOperations:
             {"id": 1, "email": "user1@example.com"},
             {"id": 2, "email": "user2@example.com"},
         ]
-        mock_insert_user.side_effect = mock_users
+        mock_insert_user.side_effect = [(mock_users[0], True), (mock_users[1], False)]
 
         emails = ["user1@example.com", "user2@example.com"]
         roles = ["learner", "mentor"]
@@ -258,8 +299,10 @@ class TestCohortMemberOperations:
 
         # Verify user creation calls
         assert mock_insert_user.call_count == 2
-        # Verify Slack notifications
+        # Verify Slack notifications, sent once the writer is released
         assert mock_slack.call_count == 2
+        mock_new_user_slack.assert_called_once_with(mock_users[0])
+        mock_conn.commit.assert_called_once()
 
     @patch("src.api.db.cohort.execute_db_operation")
     async def test_add_members_to_cohort_org_not_found_by_slug(self, mock_execute):
@@ -307,8 +350,9 @@ class TestCohortMemberOperations:
     @patch("src.api.db.cohort.execute_db_operation")
     @patch("src.api.db.cohort.get_new_db_connection")
     @patch("src.api.db.cohort.insert_or_return_user")
+    @patch("src.api.db.cohort.send_slack_notification_for_learner_added_to_cohort")
     async def test_add_members_to_cohort_user_already_exists(
-        self, mock_insert_user, mock_connection, mock_execute
+        self, mock_slack, mock_insert_user, mock_connection, mock_execute
     ):
         """Test adding user that already exists in cohort."""
         # Mock database setup
@@ -324,11 +368,13 @@ class TestCohortMemberOperations:
             [],  # No admin emails
         ]
 
-        mock_insert_user.return_value = {"id": 1, "email": "user@example.com"}
+        mock_insert_user.return_value = ({"id": 1, "email": "user@example.com"}, False)
 
         with pytest.raises(Exception, match="User already exists in cohort"):
             await add_members_to_cohort(1, None, 1, ["user@example.com"], ["learner"])
 
+        mock_slack.assert_not_called()
+
     async def test_add_members_to_cohort_both_org_params_none(self):
         """Test adding members when both org_slug and org_id are None."""
         with pytest.raises(
@@ -652,19 +698,17 @@ class TestCohortEdgeCases:
 
         assert result == expected
 
-    @patch("src.api.db.cohort.execute_many_db_operation")
-    async def test_add_courses_to_cohort_empty_list(self, mock_execute_many):
+    async def test_add_courses_to_cohort_empty_list(self, course_cohorts_write):
         """Test adding empty list of courses to cohort."""
         await add_courses_to_cohort(1, [])
 
-        mock_execute_many.assert_called_once_with(ANY, [])
+        course_cohorts_write.write.assert_not_called()
 
-    @patch("src.api.db.cohort.execute_many_db_operation")
-    async def test_remove_courses_from_cohort_empty_list(self, mock_execute_many):
+    async def test_remove_courses_from_cohort_empty_list(self, course_cohorts_write):
         """Test removing empty list of courses from cohort."""
         await remove_courses_from_cohort(1, [])
 
-        mock_execute_many.assert_called_once_with(ANY, [])
+        course_cohorts_write.write.assert_not_called()
 
     @patch("src.api.db.cohort.execute_db_operation")
     @patch("src.api.db.cohort.execute_multiple_db_operations")
@@ -0,0 +1,97 @@
+from src.api.db.conversation_cache import ConversationCache
+
+
+def make_messages(*ids):
+    return [{"id": id, "role": "user", "prompt": f"message {id}"} for id in ids]
+
+
+def get_ids(messages):
+    return [message["id"] for message in messages]
+
+
+class TestConversationCache:
+    def test_get_missing(self):
+        """Test that an uncached conversation is a miss with nothing to start after."""
+        cache = ConversationCache()
+
+        assert cache.get(1, 10) == (0, [])
+        assert cache.get_metrics()["misses"] == 1
+
+    def test_extend_and_get(self):
+        """Test that conversations are extended with the messages after the last id."""
+        cache = ConversationCache()
+
+        cache.extend(1, 10, cache.get_version(), 0, make_messages(1, 3))
+        after_id, messages = cache.get(1, 10)
+        assert after_id == 3
+        assert get_ids(messages) == [1, 3]
+
+        cache.extend(1, 10, cache.get_version(), after_id, make_messages(5))
+        after_id, messages = cache.get(1, 10)
+        assert after_id == 5
+        assert get_ids(messages) == [1, 3, 5]
+
+        assert cache.get(2, 10) == (0, [])
+        assert cache.get_metrics()["hits"] == 2
+
+    def test_empty_conversation_cached(self):
+        """Test that a conversation without messages yet is still cached."""
+        cache = ConversationCache()
+
+        cache.extend(1, 10, cache.get_version(), 0, [])
+
+        assert cache.get(1, 10) == (0, [])
+        assert cache.get_metrics()["hits"] == 1
+
+    def test_concurrent_extend_skips_duplicates(self):
+        """Test that messages already added by a concurrent request are skipped."""
+        cache = ConversationCache()
+        cache.extend(1, 10, cache.get_version(), 0, make_messages(1))
+
+        # both requests read after message 1
+        cache.extend(1, 10, cache.get_version(), 1, make_messages(2, 3))
+        cache.extend(1, 10, cache.get_version(), 1, make_messages(2, 3, 4))
+
+        assert get_ids(cache.get(1, 10)[1]) == [1, 2, 3, 4]
+
+    def test_not_extended_once_evicted(self):
+        """Test that new messages are not cached without the start of the conversation."""
+        cache = ConversationCache(max_size=1)
+        cache.extend(1, 10, cache.get_version(), 0, make_messages(1))
+        after_id, _ = cache.get(1, 10)
+
+        cache.extend(2, 10, cache.get_version(), 0, make_messages(2))
+        cache.extend(1, 10, cache.get_version(), after_id, make_messages(3))
+
+        assert cache.get(1, 10) == (0, [])
+        assert cache.get(2, 10)[0] == 2
+
+    def test_invalidated_while_reading(self):
+        """Test that messages read before an invalidation are not cached."""
+        cache = ConversationCache()
+        cache.extend(1, 10, cache.get_version(), 0, make_messages(1, 2))
+
+        version = cache.get_version()
+        cache.invalidate(1, 10)
+        cache.extend(1, 10, version, 0, make_messages(1, 2))
+
+        assert cache.get(1, 10) == (0, [])
+
+    def test_invalidate_all(self):
+        """Test that every conversation is dropped."""
+        cache = ConversationCache()
+        cache.extend(1, 10, cache.get_version(), 0, make_messages(1))
+        cache.extend(2, 10, cache.get_version(), 0, make_messages(2))
+
+        cache.invalidate_all()
+
+        assert cache.get_metrics()["size"] == 0
+
+    def test_cached_messages_not_modified(self):
+        """Test that callers get their own list of the cached messages."""
+        cache = ConversationCache()
+        cache.extend(1, 10, cache.get_version(), 0, make_messages(1))
+
+        cache.get(1, 10)[1].append({"id": 2})
+
+        assert get_ids(cache.get(1, 10)[1]) == [1]
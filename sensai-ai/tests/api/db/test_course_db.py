@@ -1,5 +1,6 @@
 import pytest
 import json
+import aiosqlite
 from unittest.mock import patch, AsyncMock, MagicMock, ANY, call
 from datetime import datetime, timezone, timedelta
 from collections import defaultdict
@@ -8,12 +9,15 @@ from src.api.db.course import (
     get_all_courses_for_org,
     convert_course_db_to_dict,
     get_course,
+    get_course_with_task_details,
     get_course_org_id,
     update_course_name,
     delete_course,
     get_tasks_for_course,
     get_milestones_for_course,
     add_milestone_to_course,
+    add_generated_course_items,
+    remove_generated_course_items,
     update_milestone_orders,
     swap_milestone_ordering_for_course,
     swap_task_ordering_for_course,
@@ -22,21 +26,29 @@ from src.api.db.course import (
     update_task_orders,
     check_and_insert_missing_course_milestones,
     store_course_generation_request,
+    get_course_generation_job,
     get_course_generation_job_details,
     update_course_generation_job_status,
     update_course_generation_job_status_and_details,
-    get_all_pending_course_structure_generation_jobs,
     add_course_modules,
     transfer_course_to_org,
     duplicate_course_to_org,
     get_cohorts_for_course,
     calculate_milestone_unlock_dates,
     get_courses_for_cohort,
+    get_published_course_tree,
     get_user_courses,
     drop_course_cohorts_table,
     drop_courses_table,
     delete_all_courses_for_org,
 )
+from src.api.db import (
+    create_milestones_table,
+    create_course_milestones_table,
+    create_tasks_table,
+    create_course_tasks_table,
+    create_course_generation_jobs_table,
+)
 from src.api.models import (
     GenerateCourseJobStatus,
     TaskType,
@@ -122,15 +134,28 @@ class TestCourseOperations:
 
         mock_execute.assert_called_once_with(ANY, ("New Course Name", 123))
 
-    @patch("src.api.db.course.execute_multiple_db_operations")
-    async def test_delete_course(self, mock_execute_multiple):
+    @patch("src.api.db.course.rebuild_user_activity", new_callable=AsyncMock)
+    @patch("src.api.db.course.execute_write_transaction")
+    async def test_delete_course(self, mock_write, mock_rebuild):
         """Test deleting a course."""
+        mock_cursor = AsyncMock()
+        mock_cursor.fetchall.return_value = [(1,), (2,)]
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+
         await delete_course(123)
 
-        mock_execute_multiple.assert_called_once()
-        # Check that multiple operations are called
-        operations = mock_execute_multiple.call_args[0][0]
-        assert len(operations) == 6  # Should have 6 delete operations
+        # the cohorts of the course are read before the 7 delete operations
+        operations = [args[0] for args in mock_cursor.execute.call_args_list[1:]]
+        assert len(operations) == 7
+        # the queued jobs are removed before the jobs they point to
+        assert "DELETE FROM job_queue" in operations[3][0]
+        assert operations[3][1] == (123, 123)
+        # the activity of the cohorts is rebuilt without the course
+        mock_rebuild.assert_called_once_with(mock_cursor, cohort_ids=[1, 2])
 
     @patch("src.api.db.course.execute_multiple_db_operations")
     def test_delete_all_courses_for_org(self, mock_execute_multiple):
@@ -279,6 +304,153 @@ class TestCourseDetails:
 
         assert result["course_generation_status"] == GenerateCourseJobStatus.STARTED
 
+    @patch("src.api.db.course.get_course")
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_course_with_task_details(self, mock_execute, mock_get_course):
+        """Test that task details for the whole course are loaded in bulk."""
+        mock_get_course.return_value = {
+            "id": 1,
+            "name": "Test Course",
+            "course_generation_status": None,
+            "milestones": [
+                {
+                    "id": 1,
+                    "name": "Module 1",
+                    "tasks": [
+                        {"id": 1, "type": str(TaskType.LEARNING_MATERIAL)},
+                        {"id": 2, "type": str(TaskType.QUIZ)},
+                        {"id": 3, "type": str(TaskType.QUIZ)},
+                    ],
+                }
+            ],
+        }
+
+        learning_materials = [(1, json.dumps([{"type": "paragraph"}]))]
+        questions = [
+            (
+                2,
+                10,
+                "objective",
+                "[]",
+                None,
+                "text",
+                "chat",
+                5,
+                None,
+                None,
+                1,
+                True,
+                "Q1",
+            ),
+            (
+                2,
+                11,
+                "subjective",
+                "[]",
+                None,
+                "text",
+                "chat",
+                None,
+                None,
+                None,
+                1,
+                True,
+                "Q2",
+            ),
+        ]
+
+        mock_execute.side_effect = [learning_materials, questions]
+
+        result = await get_course_with_task_details(1)
+
+        # one query for the blocks and one for the questions of all the tasks
+        assert mock_execute.call_count == 2
+        mock_get_course.assert_called_once_with(1, True)
+
+        tasks = result["milestones"][0]["tasks"]
+        assert tasks[0]["blocks"] == [{"type": "paragraph"}]
+        assert [question["id"] for question in tasks[1]["questions"]] == [10, 11]
+        assert tasks[1]["questions"][0]["scorecard_id"] == 5
+        assert "scorecard" not in tasks[1]["questions"][0]
+        assert tasks[2]["questions"] == []
+
+    @patch("src.api.db.course.get_course")
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_course_with_task_details_include_scorecards(
+        self, mock_execute, mock_get_course
+    ):
+        """Test that scorecards linked to questions are attached when requested."""
+        mock_get_course.return_value = {
+            "id": 1,
+            "name": "Test Course",
+            "course_generation_status": None,
+            "milestones": [
+                {"id": 1, "name": "Module 1", "tasks": [{"id": 2, "type": "quiz"}]}
+            ],
+        }
+
+        questions = [
+            (
+                2,
+                10,
+                "objective",
+                "[]",
+                None,
+                "text",
+                "chat",
+                5,
+                None,
+                None,
+                1,
+                True,
+                "Q1",
+            ),
+            (
+                2,
+                11,
+                "objective",
+                "[]",
+                None,
+                "text",
+                "chat",
+                None,
+                None,
+                None,
+                1,
+                True,
+                "Q2",
+            ),
+        ]
+        scorecards = [(5, "Scorecard", json.dumps([{"name": "Clarity"}]), "published")]
+
+        mock_execute.side_effect = [[], questions, scorecards]
+
+        result = await get_course_with_task_details(1, include_scorecards=True)
+
+        assert mock_execute.call_count == 3
+
+        task_questions = result["milestones"][0]["tasks"][0]["questions"]
+        assert task_questions[0]["scorecard"] == {
+            "id": 5,
+            "title": "Scorecard",
+            "criteria": [{"name": "Clarity"}],
+            "status": "published",
+        }
+        assert "scorecard" not in task_questions[1]
+
+    @patch("src.api.db.course.get_course")
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_course_with_task_details_not_found(
+        self, mock_execute, mock_get_course
+    ):
+        """Test loading task details for a course that doesn't exist."""
+        mock_get_course.return_value = None
+
+        result = await get_course_with_task_details(999)
+
+        assert result is None
+        mock_execute.assert_not_called()
+
     @patch("src.api.db.course.execute_db_operation")
     async def test_get_tasks_for_course_with_milestone(self, mock_execute):
         """Test getting tasks for course filtered by milestone."""
@@ -370,16 +542,18 @@ class TestMilestoneOperations:
     """Test milestone-related operations."""
 
     @patch("src.api.db.course.get_org_id_for_course")
-    @patch("src.api.db.course.get_new_db_connection")
-    async def test_add_milestone_to_course(self, mock_connection, mock_get_org):
+    @patch("src.api.db.course.execute_write_transaction")
+    async def test_add_milestone_to_course(self, mock_write, mock_get_org):
         """Test adding milestone to course."""
         mock_get_org.return_value = 1
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 123
         mock_cursor.fetchone.return_value = (5,)  # max ordering
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connection.return_value.__aenter__.return_value = mock_conn
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         milestone_id, ordering = await add_milestone_to_course(
             1, "New Module", "#123456"
@@ -530,6 +704,138 @@ class TestTaskOperations:
         mock_execute.assert_not_called()
 
 
+@pytest.mark.asyncio
+class TestAddGeneratedCourseItems:
+    """Test adding the streamed structure of a course being generated."""
+
+    @pytest.fixture
+    async def cursor(self):
+        """An in-memory database where course 1 has one module with one task."""
+        async with aiosqlite.connect(":memory:") as conn:
+            cursor = await conn.cursor()
+
+            for create_table in [
+                create_milestones_table,
+                create_course_milestones_table,
+                create_tasks_table,
+                create_course_tasks_table,
+                create_course_generation_jobs_table,
+            ]:
+                await create_table(cursor)
+
+            await cursor.execute(
+                "INSERT INTO milestones (id, name, color, org_id) VALUES (1, 'Existing', '#000', 10)"
+            )
+            await cursor.execute(
+                "INSERT INTO course_milestones (course_id, milestone_id, ordering) VALUES (1, 1, 0)"
+            )
+            await cursor.execute(
+                "INSERT INTO tasks (id, org_id, type, title, status) VALUES (1, 10, 'quiz', 'Existing', 'draft')"
+            )
+            await cursor.execute(
+                "INSERT INTO course_tasks (course_id, task_id, milestone_id, ordering) VALUES (1, 1, 1, 0)"
+            )
+
+            async def run_write(write_fn):
+                return await write_fn(cursor)
+
+            with patch(
+                "src.api.db.course.execute_write_transaction", side_effect=run_write
+            ), patch(
+                "src.api.db.course.get_org_id_for_course", new_callable=AsyncMock
+            ) as mock_get_org_id:
+                mock_get_org_id.return_value = 10
+                yield cursor
+
+    @patch("src.api.db.course.course_tree_cache")
+    async def test_modules_and_tasks_added_in_order(self, mock_cache, cursor):
+        """Test that modules and tasks are added at the end of the course and their modules."""
+        module_rows, task_rows = await add_generated_course_items(
+            1,
+            [
+                {"name": "Module 2", "color": "#111"},
+                {"name": "Module 3", "color": "#222"},
+            ],
+            [
+                {"name": "Task 2", "type": TaskType.QUIZ, "milestone_id": 1},
+                {
+                    "name": "Task 3",
+                    "type": TaskType.LEARNING_MATERIAL,
+                    "module_index": 1,
+                },
+                {"name": "Task 4", "type": TaskType.QUIZ, "module_index": 1},
+            ],
+        )
+
+        assert [ordering for _, ordering in module_rows] == [1, 2]
+        assert [ordering for _, ordering in task_rows] == [1, 0, 1]
+
+        await cursor.execute(
+            """SELECT t.title, t.type, t.status, t.org_id, m.name, ct.ordering
+            FROM course_tasks ct
+            JOIN tasks t ON t.id = ct.task_id
+            JOIN milestones m ON m.id = ct.milestone_id
+            WHERE ct.course_id = 1
+            ORDER BY m.id, ct.ordering"""
+        )
+        assert await cursor.fetchall() == [
+            ("Existing", "quiz", "draft", 10, "Existing", 0),
+            ("Task 2", "quiz", "draft", 10, "Existing", 1),
+            ("Task 3", "learning_material", "draft", 10, "Module 3", 0),
+            ("Task 4", "quiz", "draft", 10, "Module 3", 1),
+        ]
+        assert [task_id for task_id, _ in task_rows] == [2, 3, 4]
+        mock_cache.invalidate_course.assert_called_once_with(1)
+
+    @patch("src.api.db.course.course_tree_cache")
+    async def test_ordering_skips_deleted_tasks(self, mock_cache, cursor):
+        """Test that the ordering sent to the UI only counts tasks that are not deleted."""
+        await cursor.execute("UPDATE tasks SET deleted_at = CURRENT_TIMESTAMP")
+
+        _, task_rows = await add_generated_course_items(
+            1, [], [{"name": "Task 2", "type": TaskType.QUIZ, "milestone_id": 1}]
+        )
+
+        assert task_rows == [(2, 0)]
+
+    @patch("src.api.db.course.course_tree_cache")
+    async def test_items_of_failed_attempt_removed(self, mock_cache, cursor):
+        """Test that a retried job can remove everything its earlier attempt added."""
+        await cursor.execute(
+            """INSERT INTO course_generation_jobs (uuid, course_id, status, job_details) VALUES ('job', 1, 'started', '{"course_description": "Course"}')"""
+        )
+
+        module_rows, _ = await add_generated_course_items(
+            1,
+            [{"name": "Module 2", "color": "#111"}],
+            [{"name": "Task 2", "type": TaskType.QUIZ, "module_index": 0}],
+            "job",
+        )
+        await add_generated_course_items(
+            1,
+            [],
+            [{"name": "Task 3", "type": TaskType.QUIZ, "milestone_id": 1}],
+            "job",
+        )
+
+        job_details = await remove_generated_course_items("job")
+
+        assert job_details == {"course_description": "Course"}
+        await cursor.execute("SELECT job_details FROM course_generation_jobs")
+        assert json.loads((await cursor.fetchone())[0]) == job_details
+
+        # only the existing module and task are left in the course
+        await cursor.execute("SELECT milestone_id FROM course_milestones")
+        assert await cursor.fetchall() == [(1,)]
+        await cursor.execute("SELECT task_id FROM course_tasks")
+        assert await cursor.fetchall() == [(1,)]
+        await cursor.execute("SELECT id FROM milestones")
+        assert await cursor.fetchall() == [(1,)]
+        await cursor.execute("SELECT id FROM tasks WHERE deleted_at IS NULL")
+        assert await cursor.fetchall() == [(1,)]
+        mock_cache.invalidate_course.assert_called_with(1)
+
+
 @pytest.mark.asyncio
 class TestCourseGeneration:
     """Test course generation job operations."""
@@ -546,29 +852,45 @@ class TestCourseGeneration:
         result = await store_course_generation_request(1, job_details)
 
         assert isinstance(result, str)
-        mock_cursor.execute.assert_called_once()
+        # the job and its entry in the job queue
+        assert mock_cursor.execute.call_count == 2
+        assert "INSERT INTO job_queue" in mock_cursor.execute.call_args_list[1][0][0]
+        assert mock_cursor.execute.call_args_list[1][0][1][:2] == (
+            "course_structure",
+            result,
+        )
+        mock_conn.commit.assert_called_once()
 
-    @patch("src.api.db.course.get_new_db_connection")
-    async def test_get_course_generation_job_details_success(self, mock_connection):
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_course_generation_job(self, mock_execute):
+        """Test getting a course generation job with its status."""
+        mock_execute.return_value = ("uuid1", 1, "started", '{"prompt": "Course"}')
+
+        result = await get_course_generation_job("uuid1")
+
+        assert result == {
+            "uuid": "uuid1",
+            "course_id": 1,
+            "status": "started",
+            "job_details": {"prompt": "Course"},
+        }
+
+        mock_execute.return_value = None
+        assert await get_course_generation_job("missing") is None
+
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_course_generation_job_details_success(self, mock_execute):
         """Test getting course generation job details successfully."""
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchone.return_value = ('{"prompt": "Generate course"}',)
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connection.return_value.__aenter__.return_value = mock_conn
+        mock_execute.return_value = ('{"prompt": "Generate course"}',)
 
         result = await get_course_generation_job_details("test-uuid")
 
         assert result == {"prompt": "Generate course"}
 
-    @patch("src.api.db.course.get_new_db_connection")
-    async def test_get_course_generation_job_details_not_found(self, mock_connection):
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_course_generation_job_details_not_found(self, mock_execute):
         """Test getting course generation job details when not found."""
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchone.return_value = None
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connection.return_value.__aenter__.return_value = mock_conn
+        mock_execute.return_value = None
 
         with pytest.raises(ValueError, match="Job not found"):
             await get_course_generation_job_details("invalid-uuid")
@@ -604,29 +926,6 @@ class TestCourseGeneration:
 
         mock_cursor.execute.assert_called_once()
 
-    @patch("src.api.db.course.get_new_db_connection")
-    async def test_get_all_pending_course_structure_generation_jobs(
-        self, mock_connection
-    ):
-        """Test getting all pending course generation jobs."""
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchall.return_value = [
-            ("uuid1", 1, '{"prompt": "Course 1"}'),
-            ("uuid2", 2, '{"prompt": "Course 2"}'),
-        ]
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connection.return_value.__aenter__.return_value = mock_conn
-
-        result = await get_all_pending_course_structure_generation_jobs()
-
-        expected = [
-            {"uuid": "uuid1", "course_id": 1, "job_details": {"prompt": "Course 1"}},
-            {"uuid": "uuid2", "course_id": 2, "job_details": {"prompt": "Course 2"}},
-        ]
-
-        assert result == expected
-
 
 @pytest.mark.asyncio
 class TestCourseModules:
@@ -677,43 +976,29 @@ class TestCourseTransfer:
         # Should call execute_db_operation multiple times
         assert mock_execute.call_count == 9
 
-    @patch("src.api.db.course.get_course")
+    @patch("src.api.db.course.get_course_with_task_details")
     @patch("src.api.db.course.create_course")
     @patch("src.api.db.course.add_milestone_to_course")
     @patch("src.api.db.course.create_draft_task_for_course")
-    @patch("src.api.db.course.get_task")
     @patch("src.api.db.course.update_learning_material_task")
     @patch("src.api.db.course.update_draft_quiz")
-    @patch("src.api.db.course.get_scorecard")
     @patch("src.api.db.course.create_scorecard")
-    @patch("src.api.db.utils.execute_db_operation")
     async def test_duplicate_course_to_org(
         self,
-        mock_execute_db_operation,
         mock_create_scorecard,
-        mock_get_scorecard,
         mock_update_quiz,
         mock_update_learning,
-        mock_get_task,
         mock_create_task,
         mock_add_milestone,
         mock_create_course,
         mock_get_course,
     ):
         """Test duplicating course to organization."""
-        # Mock course structure
-        course_data = {
-            "name": "Test Course",
-            "milestones": [
-                {
-                    "name": "Module 1",
-                    "color": "#123456",
-                    "tasks": [
-                        {"id": 1, "type": "learning_material"},
-                        {"id": 2, "type": "quiz"},
-                    ],
-                }
-            ],
+        original_scorecard = {
+            "id": 1,
+            "title": "Original Scorecard",
+            "criteria": [],
+            "status": "published",
         }
 
         learning_task = {
@@ -721,7 +1006,6 @@ class TestCourseTransfer:
             "title": "Learning Task",
             "type": "learning_material",
             "status": "published",
-            "org_id": 999,
             "scheduled_publish_at": None,
             "blocks": [],
         }
@@ -731,7 +1015,6 @@ class TestCourseTransfer:
             "title": "Quiz Task",
             "type": "quiz",
             "status": "published",
-            "org_id": 999,
             "scheduled_publish_at": None,
             "questions": [
                 {
@@ -742,6 +1025,7 @@ class TestCourseTransfer:
                     "input_type": "multiple_choice",
                     "response_type": "single",
                     "scorecard_id": 1,
+                    "scorecard": original_scorecard,
                     "context": None,
                     "coding_languages": None,
                     "max_attempts": 3,
@@ -756,6 +1040,7 @@ class TestCourseTransfer:
                     "input_type": "multiple_choice",
                     "response_type": "single",
                     "scorecard_id": 1,
+                    "scorecard": original_scorecard,
                     "context": None,
                     "coding_languages": None,
                     "max_attempts": 3,
@@ -765,32 +1050,41 @@ class TestCourseTransfer:
             ],
         }
 
-        original_scorecard = {
-            "title": "Original Scorecard",
-            "criteria": [],
+        # Mock course structure
+        course_data = {
+            "name": "Test Course",
+            "milestones": [
+                {
+                    "name": "Module 1",
+                    "color": "#123456",
+                    "tasks": [learning_task, quiz_task],
+                }
+            ],
         }
 
         new_scorecard = {"id": 123}
 
-        # Mock the database call for getting org_id for the new course (ID 456)
-        # The get_org_id_for_course function expects a tuple with the org_id value
-        mock_execute_db_operation.return_value = (999,)
-
         mock_get_course.return_value = course_data
         mock_create_course.return_value = 456
         mock_add_milestone.return_value = (789, 0)
         mock_create_task.side_effect = [(10, None), (11, None)]
-        mock_get_task.side_effect = [learning_task, quiz_task]
-        mock_get_scorecard.return_value = original_scorecard
         mock_create_scorecard.return_value = new_scorecard
 
         await duplicate_course_to_org(1, 999)
 
-        mock_get_course.assert_called_once_with(1)
+        mock_get_course.assert_called_once_with(1, include_scorecards=True)
         mock_create_course.assert_called_once_with("Test Course", 999)
         mock_update_learning.assert_called_once()
         mock_update_quiz.assert_called_once()
 
+        # the shared scorecard is only duplicated once
+        mock_create_scorecard.assert_called_once()
+        updated_questions = mock_update_quiz.call_args[0][2]
+        assert [question["scorecard_id"] for question in updated_questions] == [
+            123,
+            123,
+        ]
+
 
 @pytest.mark.asyncio
 class TestCohortCourseRelations:
@@ -889,9 +1183,78 @@ class TestCohortCourseRelations:
         result = await get_courses_for_cohort(1, include_tree=True, joined_at=joined_at)
 
         assert len(result) == 1
-        mock_get_course.assert_called_once_with(1)
+        mock_get_course.assert_called_once_with(1, only_published=False)
         mock_calculate_unlock.assert_called_once()
 
+    @patch("src.api.db.course.get_course")
+    async def test_get_published_course_tree(self, mock_get_course):
+        """Test that only published tasks are kept and the tree is served from cache."""
+        mock_get_course.return_value = {
+            "id": 1,
+            "name": "Course 1",
+            "milestones": [
+                {
+                    "id": 10,
+                    "name": "Module 1",
+                    "tasks": [
+                        {"id": 1, "status": "published", "scheduled_publish_at": None},
+                        {"id": 2, "status": "draft", "scheduled_publish_at": None},
+                        {
+                            "id": 3,
+                            "status": "published",
+                            "scheduled_publish_at": "2030-01-01",
+                        },
+                    ],
+                }
+            ],
+        }
+
+        result = await get_published_course_tree(1)
+
+        assert [task["id"] for task in result["milestones"][0]["tasks"]] == [1]
+        mock_get_course.assert_called_once_with(1, only_published=False)
+
+        # served from the cache on subsequent calls
+        assert await get_published_course_tree(1) == result
+        mock_get_course.assert_called_once()
+
+    @patch("src.api.db.course.get_course")
+    async def test_get_published_course_tree_invalidated_by_unpublished_task(
+        self, mock_get_course
+    ):
+        """Test that changes to an unpublished task invalidate the cached tree."""
+        from api.db.course_tree_cache import course_tree_cache
+
+        mock_get_course.return_value = {
+            "id": 1,
+            "name": "Course 1",
+            "milestones": [
+                {
+                    "id": 10,
+                    "name": "Module 1",
+                    "tasks": [
+                        {"id": 2, "status": "draft", "scheduled_publish_at": None}
+                    ],
+                }
+            ],
+        }
+
+        await get_published_course_tree(1)
+        course_tree_cache.invalidate_task(2)
+        await get_published_course_tree(1)
+
+        assert mock_get_course.call_count == 2
+
+    @patch("src.api.db.course.get_course")
+    async def test_get_published_course_tree_not_found(self, mock_get_course):
+        """Test that missing courses are not cached."""
+        mock_get_course.return_value = None
+
+        assert await get_published_course_tree(1) is None
+        assert await get_published_course_tree(1) is None
+
+        assert mock_get_course.call_count == 2
+
 
 class TestMilestoneUnlockDates:
     """Test milestone unlock date calculations."""
@@ -1067,74 +1430,64 @@ class TestMilestoneUnlockDates:
 class TestUserCourses:
     """Test user course operations."""
 
-    @patch("src.api.db.course.get_new_db_connection")
-    @patch("src.api.db.course.get_user_cohorts")
-    @patch("src.api.db.course.get_courses_for_cohort")
-    @patch("src.api.db.course.get_user_organizations")
-    @patch("src.api.db.course.get_all_courses_for_org")
-    async def test_get_user_courses_comprehensive(
-        self,
-        mock_get_org_courses,
-        mock_get_user_orgs,
-        mock_get_cohort_courses,
-        mock_get_user_cohorts,
-        mock_connection,
-    ):
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_user_courses_comprehensive(self, mock_execute):
         """Test getting user courses with multiple roles."""
-        # Mock database connection
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchone.side_effect = [
-            (1, "Course 1", 1, "Org 1", "org-1"),
-            (2, "Course 2", 1, "Org 1", "org-1"),
-            (3, "Course 3", 2, "Org 2", "org-2"),
+        mock_execute.return_value = [
+            (1, "Course 1", 1, "Org 1", "org-1", "learner", 1),
+            (2, "Course 2", 1, "Org 1", "org-1", "mentor", 2),
+            (3, "Course 3", 2, "Org 2", "org-2", "admin", None),
         ]
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connection.return_value.__aenter__.return_value = mock_conn
 
-        # Mock user cohorts
-        mock_get_user_cohorts.return_value = [
-            {"id": 1, "role": "learner"},
-            {"id": 2, "role": "mentor"},
-        ]
+        result = await get_user_courses(123)
 
-        # Mock cohort courses
-        mock_get_cohort_courses.side_effect = [
-            [{"id": 1, "name": "Course 1"}],
-            [{"id": 2, "name": "Course 2"}],
-        ]
+        # everything is resolved in a single query
+        mock_execute.assert_called_once()
+        assert mock_execute.call_args[0][1] == (123, 123)
 
-        # Mock user organizations
-        mock_get_user_orgs.return_value = [
-            {"id": 2, "role": "admin"},
-        ]
+        assert len(result) == 3
+        assert result[0] == {
+            "id": 1,
+            "name": "Course 1",
+            "org": {"id": 1, "name": "Org 1", "slug": "org-1"},
+            "role": "learner",
+            "cohort_id": 1,
+        }
+        assert result[1]["role"] == "mentor"
+        assert "cohort_id" not in result[1]
+        assert result[2]["role"] == "admin"
 
-        # Mock organization courses
-        mock_get_org_courses.return_value = [
-            {"id": 3, "name": "Course 3"},
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_user_courses_role_precedence(self, mock_execute):
+        """Test that admin access wins and later cohorts override earlier ones."""
+        mock_execute.return_value = [
+            # learner in two cohorts of the same course
+            (1, "Course 1", 1, "Org 1", "org-1", "learner", 10),
+            (1, "Course 1", 1, "Org 1", "org-1", "learner", 11),
+            # mentor in a cohort of a course in an org the user administers
+            (2, "Course 2", 1, "Org 1", "org-1", "mentor", 12),
+            # learner then mentor for the same course
+            (3, "Course 3", 2, "Org 2", "org-2", "learner", 13),
+            (3, "Course 3", 2, "Org 2", "org-2", "mentor", 14),
+            (2, "Course 2", 1, "Org 1", "org-1", "admin", None),
+            (4, "Course 4", 1, "Org 1", "org-1", "admin", None),
         ]
 
         result = await get_user_courses(123)
 
-        assert len(result) == 3
+        assert [course["id"] for course in result] == [1, 2, 3, 4]
         assert result[0]["role"] == "learner"
-        assert result[1]["role"] == "mentor"
-        assert result[2]["role"] == "admin"
+        assert result[0]["cohort_id"] == 11
+        assert result[1]["role"] == "admin"
+        assert "cohort_id" not in result[1]
+        assert result[2]["role"] == "mentor"
+        assert "cohort_id" not in result[2]
+        assert result[3]["role"] == "admin"
 
-    @patch("src.api.db.course.get_new_db_connection")
-    @patch("src.api.db.course.get_user_cohorts")
-    @patch("src.api.db.course.get_user_organizations")
-    async def test_get_user_courses_no_courses(
-        self, mock_get_user_orgs, mock_get_user_cohorts, mock_connection
-    ):
+    @patch("src.api.db.course.execute_db_operation")
+    async def test_get_user_courses_no_courses(self, mock_execute):
         """Test getting user courses when user has no courses."""
-        mock_cursor = AsyncMock()
-        mock_conn = AsyncMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_connection.return_value.__aenter__.return_value = mock_conn
-
-        mock_get_user_cohorts.return_value = []
-        mock_get_user_orgs.return_value = []
+        mock_execute.return_value = []
 
         result = await get_user_courses(123)
 
@@ -0,0 +1,129 @@
+from src.api.db.course_tree_cache import CourseTreeCache
+
+
+def make_tree(course_id: int, task_ids=(1,)):
+    return {
+        "id": course_id,
+        "name": f"Course {course_id}",
+        "milestones": [
+            {"id": 100, "name": "Module", "tasks": [{"id": id} for id in task_ids]}
+        ],
+    }
+
+
+class TestCourseTreeCache:
+    def test_get_missing(self):
+        """Test that an uncached course is a miss."""
+        cache = CourseTreeCache()
+
+        assert cache.get(1) is None
+        assert cache.get_metrics()["misses"] == 1
+
+    def test_set_and_get(self):
+        """Test that a cached tree is returned as a copy."""
+        cache = CourseTreeCache()
+
+        cache.set(1, cache.get_version(1), make_tree(1), [1, 2], [100])
+
+        result = cache.get(1)
+        assert result == make_tree(1)
+
+        # mutating the returned tree must not change the cached one
+        result["milestones"][0]["unlock_at"] = "2024-01-01"
+        assert "unlock_at" not in cache.get(1)["milestones"][0]
+
+        assert cache.get_metrics()["hits"] == 2
+
+    def test_set_stale_version_ignored(self):
+        """Test that a tree built before an invalidation is not cached."""
+        cache = CourseTreeCache()
+
+        version = cache.get_version(1)
+        cache.invalidate_course(1)
+        cache.set(1, version, make_tree(1), [1], [100])
+
+        assert cache.get(1) is None
+
+    def test_is_current(self):
+        """Test that a version stops being current once the course changes."""
+        cache = CourseTreeCache()
+
+        version = cache.get_version(1)
+        assert cache.is_current(1, version)
+
+        cache.invalidate_course(2)
+        assert cache.is_current(1, version)
+
+        cache.invalidate_course(1)
+        assert not cache.is_current(1, version)
+
+        version = cache.get_version(1)
+        cache.invalidate_all()
+        assert not cache.is_current(1, version)
+
+    def test_invalidate_task(self):
+        """Test that invalidating a task drops every course containing it."""
+        cache = CourseTreeCache()
+
+        cache.set(1, cache.get_version(1), make_tree(1), [1, 2], [100])
+        cache.set(2, cache.get_version(2), make_tree(2), [2], [200])
+        cache.set(3, cache.get_version(3), make_tree(3), [3], [300])
+
+        cache.invalidate_task(2)
+
+        assert cache.get(1) is None
+        assert cache.get(2) is None
+        assert cache.get(3) is not None
+
+    def test_invalidate_unpublished_task(self):
+        """Test that tasks recorded for a course but not in its tree still invalidate it."""
+        cache = CourseTreeCache()
+
+        cache.set(1, cache.get_version(1), make_tree(1, task_ids=[]), [5], [100])
+
+        cache.invalidate_tasks([5])
+
+        assert cache.get(1) is None
+
+    def test_invalidate_milestone(self):
+        """Test that invalidating a milestone drops the courses it belongs to."""
+        cache = CourseTreeCache()
+
+        cache.set(1, cache.get_version(1), make_tree(1), [1], [100])
+        cache.set(2, cache.get_version(2), make_tree(2), [2], [200])
+
+        cache.invalidate_milestone(100)
+
+        assert cache.get(1) is None
+        assert cache.get(2) is not None
+
+    def test_invalidate_all(self):
+        """Test that invalidate_all drops every tree, including ones being built."""
+        cache = CourseTreeCache()
+
+        cache.set(1, cache.get_version(1), make_tree(1), [1], [100])
+        version = cache.get_version(2)
+
+        cache.invalidate_all()
+        cache.set(2, version, make_tree(2), [2], [200])
+
+        assert cache.get(1) is None
+        assert cache.get(2) is None
+        assert cache.get_metrics()["size"] == 0
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used tree is evicted beyond max_size."""
+        cache = CourseTreeCache(max_size=2)
+
+        cache.set(1, cache.get_version(1), make_tree(1), [1], [100])
+        cache.set(2, cache.get_version(2), make_tree(2), [2], [200])
+        cache.get(1)
+        cache.set(3, cache.get_version(3), make_tree(3), [3], [300])
+
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert cache.get(3) is not None
+
+        # evicted courses are also dropped from the task index
+        cache.invalidate_task(2)
+        assert cache.get(1) is not None
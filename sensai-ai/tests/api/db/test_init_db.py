@@ -20,6 +20,7 @@ from src.api.db import (
     create_course_generation_jobs_table,
     create_task_generation_jobs_table,
     create_code_drafts_table,
+    create_user_daily_activity_table,
     init_db,
     delete_useless_tables,
 )
@@ -207,8 +208,11 @@ class TestTableCreationFunctions:
 
         await create_chat_history_table(mock_cursor)
 
-        # Should execute CREATE TABLE and 2 CREATE INDEX statements
-        assert mock_cursor.execute.call_count == 3
+        # Should execute CREATE TABLE and 3 CREATE INDEX statements
+        assert mock_cursor.execute.call_count == 4
+        assert "(question_id, user_id, id)" in (
+            mock_cursor.execute.call_args_list[3][0][0]
+        )
 
     async def test_create_task_completion_table(self):
         """Test creating task completion table."""
@@ -260,6 +264,20 @@ class TestTableCreationFunctions:
 
         assert any("CREATE TABLE IF NOT EXISTS code_drafts" in call for call in calls)
 
+    async def test_create_user_daily_activity_table(self):
+        """Test creating user daily activity table."""
+        mock_cursor = AsyncMock()
+
+        await create_user_daily_activity_table(mock_cursor)
+
+        # Should execute CREATE TABLE and CREATE INDEX
+        assert mock_cursor.execute.call_count == 2
+        calls = [call[0][0] for call in mock_cursor.execute.call_args_list]
+
+        assert any(
+            "CREATE TABLE IF NOT EXISTS user_daily_activity" in call for call in calls
+        )
+
 
 @pytest.mark.asyncio
 class TestDatabaseInitialization:
@@ -429,7 +447,7 @@ class TestDatabaseInitialization:
         mock_path_exists,
         mock_exists,
     ):
-        """Test that init_db does nothing when database and all tables exist."""
+        """Test that init_db only adds missing indexes when database and all tables exist."""
         mock_exists.return_value = True  # Database exists
         mock_path_exists.return_value = True  # Directory exists
         mock_check_table.return_value = True  # code_drafts table exists
@@ -441,12 +459,113 @@ class TestDatabaseInitialization:
 
         await init_db()
 
-        # Should only commit, no table creation
-        mock_cursor.execute.assert_not_called()
+        # Should only create the conversation index if missing, no table creation
+        mock_cursor.execute.assert_called_once()
+        assert (
+            "CREATE INDEX IF NOT EXISTS idx_chat_history_question_id_user_id_id"
+            in mock_cursor.execute.call_args[0][0]
+        )
         mock_conn.commit.assert_called_once()
         # Should not set defaults when database already exists
         mock_set_defaults.assert_not_called()
 
+    @patch("src.api.db.sqlite_db_path", "/test/path/test.db")
+    @patch("src.api.db.exists")
+    @patch("src.api.db.os.path.exists")
+    @patch("src.api.db.get_new_db_connection")
+    @patch("src.api.db.check_table_exists")
+    @patch("src.api.db.backfill_user_daily_activity")
+    async def test_init_db_existing_db_creates_and_backfills_user_daily_activity(
+        self,
+        mock_backfill,
+        mock_check_table,
+        mock_get_conn,
+        mock_path_exists,
+        mock_exists,
+    ):
+        """Test that the activity rollup is created and backfilled for existing databases."""
+        mock_exists.return_value = True
+        mock_path_exists.return_value = True
+        # organizations and code_drafts exist, user_daily_activity does not
+        mock_check_table.side_effect = [True, True, False, True, True]
+        mock_cursor = AsyncMock()
+        mock_conn = AsyncMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_conn.__aenter__.return_value = mock_conn
+        mock_get_conn.return_value = mock_conn
+
+        await init_db()
+
+        calls = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert any(
+            "CREATE TABLE IF NOT EXISTS user_daily_activity" in call for call in calls
+        )
+        mock_conn.commit.assert_called_once()
+        mock_backfill.assert_called_once()
+
+    @patch("src.api.db.sqlite_db_path", "/test/path/test.db")
+    @patch("src.api.db.exists")
+    @patch("src.api.db.os.path.exists")
+    @patch("src.api.db.get_new_db_connection")
+    @patch("src.api.db.check_table_exists")
+    @patch("src.api.db.enqueue_started_generation_jobs")
+    async def test_init_db_existing_db_creates_job_queue(
+        self,
+        mock_enqueue_started,
+        mock_check_table,
+        mock_get_conn,
+        mock_path_exists,
+        mock_exists,
+    ):
+        """Test that the job queue is created for existing databases with their running jobs queued."""
+        mock_exists.return_value = True
+        mock_path_exists.return_value = True
+        # every table but the job queue exists
+        mock_check_table.side_effect = [True, True, True, False, True]
+        mock_cursor = AsyncMock()
+        mock_conn = AsyncMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_conn.__aenter__.return_value = mock_conn
+        mock_get_conn.return_value = mock_conn
+
+        await init_db()
+
+        calls = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert any("CREATE TABLE IF NOT EXISTS job_queue" in call for call in calls)
+        mock_enqueue_started.assert_called_once_with(mock_cursor)
+        mock_conn.commit.assert_called_once()
+
+    @patch("src.api.db.sqlite_db_path", "/test/path/test.db")
+    @patch("src.api.db.exists")
+    @patch("src.api.db.os.path.exists")
+    @patch("src.api.db.get_new_db_connection")
+    @patch("src.api.db.check_table_exists")
+    async def test_init_db_existing_db_creates_websocket_events(
+        self,
+        mock_check_table,
+        mock_get_conn,
+        mock_path_exists,
+        mock_exists,
+    ):
+        """Test that the websocket events table is created for existing databases."""
+        mock_exists.return_value = True
+        mock_path_exists.return_value = True
+        # every table but the websocket events exists
+        mock_check_table.side_effect = [True, True, True, True, False]
+        mock_cursor = AsyncMock()
+        mock_conn = AsyncMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_conn.__aenter__.return_value = mock_conn
+        mock_get_conn.return_value = mock_conn
+
+        await init_db()
+
+        calls = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert any(
+            "CREATE TABLE IF NOT EXISTS websocket_events" in call for call in calls
+        )
+        mock_conn.commit.assert_called_once()
+
     @patch("src.api.db.sqlite_db_path", "/test/path/test.db")
     @patch("src.api.db.exists")
     @patch("src.api.db.os.path.exists")
@@ -0,0 +1,264 @@
+import pytest
+import aiosqlite
+from unittest.mock import patch
+from src.api.db import (
+    create_courses_table,
+    create_course_generation_jobs_table,
+    create_task_generation_jobs_table,
+    create_job_queue_table,
+)
+from src.api.db.job_queue import (
+    enqueue_job,
+    enqueue_started_generation_jobs,
+    lease_jobs,
+    renew_job_lease,
+    complete_job,
+    fail_job,
+    release_job,
+    fail_expired_jobs,
+    delete_finished_jobs,
+    get_job_queue_metrics,
+    add_enqueue_listener,
+    remove_enqueue_listener,
+    notify_job_enqueued,
+)
+from src.api.models import JobKind
+
+
+@pytest.fixture
+async def cursor():
+    """An in-memory database with courses 1 and 2 of org 10 and course 3 of org 20."""
+    async with aiosqlite.connect(":memory:") as conn:
+        cursor = await conn.cursor()
+
+        for create_table in [
+            create_courses_table,
+            create_course_generation_jobs_table,
+            create_task_generation_jobs_table,
+            create_job_queue_table,
+        ]:
+            await create_table(cursor)
+
+        await cursor.executemany(
+            "INSERT INTO courses (id, org_id, name) VALUES (?, ?, 'Course')",
+            [(1, 10), (2, 10), (3, 20)],
+        )
+
+        async def execute(operation, params=None, fetch_one=False, fetch_all=False):
+            await cursor.execute(operation, params or ())
+
+            if fetch_one:
+                return await cursor.fetchone()
+            elif fetch_all:
+                return await cursor.fetchall()
+
+        with patch("src.api.db.job_queue.execute_db_operation", side_effect=execute):
+            yield cursor
+
+
+async def enqueue(cursor, job_uuid: str, course_id: int = 1, priority: int = 0):
+    await enqueue_job(cursor, JobKind.TASK, job_uuid, course_id, priority)
+
+
+async def get_job(cursor, job_uuid: str):
+    await cursor.execute(
+        "SELECT status, attempts, lease_owner FROM job_queue WHERE job_uuid = ?",
+        (job_uuid,),
+    )
+    return await cursor.fetchone()
+
+
+async def expire_leases(cursor):
+    await cursor.execute(
+        "UPDATE job_queue SET lease_expires_at = datetime('now', '-1 seconds') WHERE status = 'leased'"
+    )
+
+
+@pytest.mark.asyncio
+class TestJobQueue:
+    async def test_enqueue_and_lease(self, cursor):
+        """Test that a queued job is leased once with the org of its course."""
+        await enqueue(cursor, "job-1", course_id=3)
+
+        jobs = await lease_jobs("worker-1", 10)
+
+        assert [(job["job_uuid"], job["org_id"], job["attempts"]) for job in jobs] == [
+            ("job-1", 20, 1)
+        ]
+        assert jobs[0]["kind"] == "task"
+        assert await get_job(cursor, "job-1") == ("leased", 1, "worker-1")
+        assert await lease_jobs("worker-2", 10) == []
+
+    async def test_job_for_missing_course_not_queued(self, cursor):
+        """Test that nothing is queued for a course that does not exist."""
+        await enqueue(cursor, "job-1", course_id=99)
+
+        assert await lease_jobs("worker-1", 10) == []
+
+    async def test_priority_and_org_fairness(self, cursor):
+        """Test that higher priority jobs go first and then orgs take turns."""
+        for index in range(3):
+            await enqueue(cursor, f"org-10-{index}", course_id=1)
+        await enqueue(cursor, "org-20-0", course_id=3)
+        await enqueue(cursor, "structure", course_id=2, priority=1)
+
+        jobs = await lease_jobs("worker-1", 3)
+
+        assert [job["job_uuid"] for job in jobs] == [
+            "structure",
+            "org-10-0",
+            "org-20-0",
+        ]
+
+    async def test_org_limit(self, cursor):
+        """Test that an org never runs more than its share of jobs at once."""
+        for index in range(3):
+            await enqueue(cursor, f"job-{index}")
+
+        jobs = await lease_jobs("worker-1", 10, org_max_running=2)
+        assert [job["job_uuid"] for job in jobs] == ["job-0", "job-1"]
+        assert await lease_jobs("worker-1", 10, org_max_running=2) == []
+
+        await complete_job(jobs[0]["id"], "worker-1")
+
+        jobs = await lease_jobs("worker-1", 10, org_max_running=2)
+        assert [job["job_uuid"] for job in jobs] == ["job-2"]
+        assert await get_job(cursor, "job-0") == ("completed", 1, None)
+
+    async def test_expired_lease_taken_over(self, cursor):
+        """Test that a job whose lease ran out is leased again by another worker."""
+        await enqueue(cursor, "job-1")
+        (job,) = await lease_jobs("worker-1", 10)
+        assert await renew_job_lease(job["id"], "worker-1")
+
+        await expire_leases(cursor)
+        (job,) = await lease_jobs("worker-2", 10)
+
+        assert job["attempts"] == 2
+        assert not await renew_job_lease(job["id"], "worker-1")
+        # the previous worker can no longer finish the job
+        await complete_job(job["id"], "worker-1")
+        assert await get_job(cursor, "job-1") == ("leased", 2, "worker-2")
+
+    async def test_failed_job_retried_after_backoff(self, cursor):
+        """Test that a failed job waits out its backoff and fails for good on its last attempt."""
+        await enqueue(cursor, "job-1")
+
+        (job,) = await lease_jobs("worker-1", 10)
+        assert await fail_job(job["id"], "worker-1", "error", retry_delay=60)
+        assert await get_job(cursor, "job-1") == ("queued", 1, None)
+        assert await lease_jobs("worker-1", 10) == []
+
+        for attempt in [2, 3]:
+            await cursor.execute("UPDATE job_queue SET available_at = datetime('now')")
+            (job,) = await lease_jobs("worker-1", 10)
+            assert job["attempts"] == attempt
+
+            will_retry = await fail_job(job["id"], "worker-1", "error", retry_delay=0)
+            assert will_retry == (attempt < 3)
+
+        assert await get_job(cursor, "job-1") == ("failed", 3, None)
+        assert await lease_jobs("worker-1", 10) == []
+
+    async def test_release_job(self, cursor):
+        """Test that a released job is queued again without using up an attempt."""
+        await enqueue(cursor, "job-1")
+        (job,) = await lease_jobs("worker-1", 10)
+
+        await release_job(job["id"], "worker-1")
+
+        assert await get_job(cursor, "job-1") == ("queued", 0, None)
+        assert len(await lease_jobs("worker-1", 10)) == 1
+
+    async def test_fail_expired_jobs(self, cursor):
+        """Test that only expired jobs on their last attempt are failed."""
+        await enqueue(cursor, "job-1")
+        await enqueue(cursor, "job-2")
+        await lease_jobs("worker-1", 10)
+        await cursor.execute(
+            "UPDATE job_queue SET attempts = max_attempts WHERE job_uuid = 'job-1'"
+        )
+
+        assert await fail_expired_jobs() == []
+
+        await expire_leases(cursor)
+        jobs = await fail_expired_jobs()
+
+        assert [job["job_uuid"] for job in jobs] == ["job-1"]
+        assert (await get_job(cursor, "job-1"))[0] == "failed"
+        assert (await get_job(cursor, "job-2"))[0] == "leased"
+
+    async def test_delete_finished_jobs(self, cursor):
+        """Test that only jobs that finished before the retention period are deleted."""
+        for job_uuid in ["old", "recent", "queued"]:
+            await enqueue(cursor, job_uuid)
+        await cursor.execute(
+            "UPDATE job_queue SET status = 'completed' WHERE job_uuid != 'queued'"
+        )
+        await cursor.execute(
+            "UPDATE job_queue SET updated_at = datetime('now', '-8 days') WHERE job_uuid IN ('old', 'queued')"
+        )
+
+        await delete_finished_jobs(retention_days=7)
+
+        await cursor.execute("SELECT job_uuid FROM job_queue ORDER BY id")
+        assert [row[0] for row in await cursor.fetchall()] == ["recent", "queued"]
+
+    async def test_enqueue_started_generation_jobs(self, cursor):
+        """Test that the generation jobs still running are queued with their kind and org."""
+        await cursor.executemany(
+            "INSERT INTO course_generation_jobs (uuid, course_id, status) VALUES (?, ?, ?)",
+            [("course-1", 3, "started"), ("course-2", 1, "pending")],
+        )
+        await cursor.executemany(
+            "INSERT INTO task_generation_jobs (uuid, task_id, course_id, status) VALUES (?, 1, ?, ?)",
+            [("task-1", 1, "started"), ("task-2", 1, "completed")],
+        )
+
+        await enqueue_started_generation_jobs(cursor)
+
+        jobs = await lease_jobs("worker-1", 10)
+        assert [(job["kind"], job["job_uuid"], job["org_id"]) for job in jobs] == [
+            ("course_structure", "course-1", 20),
+            ("task", "task-1", 10),
+        ]
+
+    async def test_get_job_queue_metrics(self, cursor):
+        """Test that jobs are counted by kind and status."""
+        await enqueue(cursor, "job-1")
+        await enqueue(cursor, "job-2")
+        await lease_jobs("worker-1", 1)
+
+        metrics = await get_job_queue_metrics()
+
+        assert metrics["task"] == {
+            "queued": 1,
+            "leased": 1,
+            "completed": 0,
+            "failed": 0,
+        }
+        assert metrics["course_structure"]["queued"] == 0
+
+
+def test_enqueue_listeners():
+    """Test that listeners are notified of new jobs until they are removed."""
+    calls = []
+
+    def failing_listener():
+        raise RuntimeError("listener error")
+
+    def listener():
+        calls.append(1)
+
+    add_enqueue_listener(failing_listener)
+    add_enqueue_listener(listener)
+
+    # a failing listener does not keep the others from being notified
+    notify_job_enqueued()
+    assert calls == [1]
+
+    remove_enqueue_listener(failing_listener)
+    remove_enqueue_listener(listener)
+
+    notify_job_enqueued()
+    assert calls == [1]
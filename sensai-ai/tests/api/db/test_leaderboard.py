@@ -0,0 +1,307 @@
+import json
+from datetime import date
+from api.db.leaderboard import (
+    CohortLeaderboard,
+    LeaderboardCache,
+    get_window_start,
+)
+from api.models import LeaderboardViewType
+
+# a Wednesday
+TODAY = date(2024, 5, 15)
+
+
+def make_learner(user_id: int):
+    return {
+        "id": user_id,
+        "email": f"user{user_id}@example.com",
+        "first_name": f"User {user_id}",
+        "middle_name": None,
+        "last_name": None,
+    }
+
+
+def make_board(user_ids=(1, 2, 3)):
+    return CohortLeaderboard(
+        {user_id: make_learner(user_id) for user_id in user_ids},
+        learning_material_task_ids=[10, 11],
+        quiz_question_ids={20: [200, 201]},
+        course_versions={},
+    )
+
+
+def make_board_from(board: CohortLeaderboard) -> CohortLeaderboard:
+    # round trip through JSON as when saved to a snapshot
+    return CohortLeaderboard.load(json.loads(json.dumps(board.dump())))
+
+
+def get_ranking(board: CohortLeaderboard, view=LeaderboardViewType.ALL_TIME):
+    return [
+        (row["user"]["id"], row["streak_count"], row["tasks_completed"])
+        for row in board.get_rankings(view, TODAY)
+    ]
+
+
+def test_get_window_start():
+    """Test that weeks start on Monday and months on the first."""
+    assert get_window_start(LeaderboardViewType.WEEKLY, TODAY) == date(2024, 5, 13)
+    assert get_window_start(LeaderboardViewType.MONTHLY, TODAY) == date(2024, 5, 1)
+    assert get_window_start(LeaderboardViewType.ALL_TIME, TODAY) is None
+
+
+class TestCohortLeaderboard:
+    def test_streak_from_activity(self):
+        """Test that consecutive active days make up a streak, extended at either end."""
+        board = make_board()
+
+        for day in [13, 14, 15, 12]:
+            board.record_activity(1, date(2024, 5, day))
+        # already part of the streak
+        board.record_activity(1, date(2024, 5, 13))
+
+        assert board.streaks[1] == (date(2024, 5, 12), date(2024, 5, 15))
+        assert board.get_streak_count(1, LeaderboardViewType.ALL_TIME, TODAY) == 4
+
+    def test_streak_resets_after_gap(self):
+        """Test that a day without activity starts a new streak."""
+        board = make_board()
+
+        board.record_activity(1, date(2024, 5, 10))
+        board.record_activity(1, date(2024, 5, 11))
+        board.record_activity(1, date(2024, 5, 14))
+
+        assert board.get_streak_count(1, LeaderboardViewType.ALL_TIME, TODAY) == 1
+
+    def test_streak_lapses(self):
+        """Test that the streak is broken if the learner was not active yesterday or today."""
+        board = make_board()
+
+        board.record_activity(1, date(2024, 5, 12))
+        board.record_activity(1, date(2024, 5, 13))
+
+        assert board.get_streak_count(1, LeaderboardViewType.ALL_TIME, TODAY) == 0
+        assert board.get_streak_count(2, LeaderboardViewType.ALL_TIME, TODAY) == 0
+
+    def test_streak_clipped_to_window(self):
+        """Test that only the days inside the view's window are counted."""
+        board = make_board()
+
+        for day in range(25, 31):
+            board.record_activity(1, date(2024, 4, day))
+        for day in range(1, 16):
+            board.record_activity(1, date(2024, 5, day))
+
+        assert board.get_streak_count(1, LeaderboardViewType.ALL_TIME, TODAY) == 21
+        assert board.get_streak_count(1, LeaderboardViewType.MONTHLY, TODAY) == 15
+        assert board.get_streak_count(1, LeaderboardViewType.WEEKLY, TODAY) == 3
+
+    def test_completions(self):
+        """Test that quizzes count once all of their questions are completed."""
+        board = make_board()
+
+        board.record_completion(1, task_id=10)
+        board.record_completion(1, task_id=10)
+        board.record_completion(1, question_id=200)
+        assert board.completed_task_ids[1] == {10}
+
+        board.record_completion(1, question_id=201)
+        assert board.completed_task_ids[1] == {10, 20}
+
+        # tasks and learners outside of the cohort are ignored
+        board.record_completion(1, task_id=99)
+        board.record_completion(99, task_id=10)
+        assert board.completed_task_ids[1] == {10, 20}
+        assert 99 not in board.completed_task_ids
+
+        assert board.num_tasks == 3
+
+    def test_rankings(self):
+        """Test that learners are ranked by streak, then tasks completed, then id."""
+        board = make_board()
+
+        board.record_activity(2, TODAY)
+        board.record_completion(3, task_id=10)
+
+        assert get_ranking(board) == [(2, 1, 0), (3, 0, 1), (1, 0, 0)]
+
+    def test_rankings_updated_by_events(self):
+        """Test that events after the rankings were built move learners in place."""
+        board = make_board()
+        assert get_ranking(board) == [(1, 0, 0), (2, 0, 0), (3, 0, 0)]
+        assert get_ranking(board, LeaderboardViewType.WEEKLY) == get_ranking(board)
+
+        board.record_completion(3, task_id=11)
+        board.record_activity(2, date(2024, 5, 14))
+        board.record_activity(2, TODAY)
+
+        assert get_ranking(board) == [(2, 2, 0), (3, 0, 1), (1, 0, 0)]
+        assert get_ranking(board, LeaderboardViewType.WEEKLY) == get_ranking(board)
+        assert get_ranking(board) == [
+            (row["user"]["id"], row["streak_count"], row["tasks_completed"])
+            for row in make_board_from(board).get_rankings(
+                LeaderboardViewType.ALL_TIME, TODAY
+            )
+        ]
+
+    def test_rankings_rebuilt_on_new_day(self):
+        """Test that streaks lapse once a new day starts."""
+        board = make_board()
+        board.record_activity(1, date(2024, 5, 14))
+
+        assert (
+            board.get_rankings(LeaderboardViewType.ALL_TIME, TODAY)[0]["streak_count"]
+            == 1
+        )
+        assert (
+            board.get_rankings(LeaderboardViewType.ALL_TIME, date(2024, 5, 16))[0][
+                "streak_count"
+            ]
+            == 0
+        )
+
+    def test_dump_and_load(self):
+        """Test that a dumped board is restored with the same state."""
+        board = make_board()
+        board.record_activity(1, date(2024, 5, 14))
+        board.record_activity(1, TODAY)
+        board.record_completion(2, task_id=10)
+        board.record_completion(2, question_id=200)
+
+        restored = make_board_from(board)
+
+        assert restored.learners == board.learners
+        assert restored.streaks == board.streaks
+        assert restored.completed_task_ids == board.completed_task_ids
+        assert restored.completed_question_ids == board.completed_question_ids
+        assert restored.quiz_question_ids == board.quiz_question_ids
+        # only current once checked against the courses
+        assert restored.course_versions == {}
+
+
+class TestLeaderboardCache:
+    def test_get_and_set(self):
+        """Test that boards are returned once set."""
+        cache = LeaderboardCache()
+        board = make_board()
+
+        assert cache.get(1) is None
+
+        cache.set(1, cache.start_build(1), board)
+        cache.finish_build(1)
+
+        assert cache.get(1) is board
+        assert cache.get_metrics()["hits"] == 1
+        assert cache.get_metrics()["misses"] == 1
+
+    def test_events_applied_to_boards(self):
+        """Test that events are only applied to the boards of their cohorts."""
+        cache = LeaderboardCache()
+        board_1, board_2 = make_board(), make_board()
+        cache.set(1, cache.get_version(1), board_1)
+        cache.set(2, cache.get_version(2), board_2)
+
+        cache.record_activity(1, [(0, "2024-05-15"), (1, "2024-05-15")])
+        cache.record_completion(1, [0, 1, 1], task_id=10)
+
+        assert board_1.streaks[1] == (TODAY, TODAY)
+        assert board_1.completed_task_ids[1] == {10}
+        assert board_2.streaks == {}
+        assert board_2.completed_task_ids[1] == set()
+
+    def test_events_during_build_replayed(self):
+        """Test that events that arrive while a board is built are not lost."""
+        cache = LeaderboardCache()
+
+        version = cache.start_build(1)
+        cache.record_activity(2, [(1, "2024-05-15")])
+        cache.record_completion(2, [1], question_id=200)
+
+        board = make_board()
+        cache.set(1, version, board)
+        cache.finish_build(1)
+
+        assert board.streaks[2] == (TODAY, TODAY)
+        assert board.completed_question_ids[2] == {200}
+
+    def test_invalidated_during_build(self):
+        """Test that a board invalidated while it was being built is not stored."""
+        cache = LeaderboardCache()
+
+        version = cache.start_build(1)
+        cache.invalidate_cohort(1)
+        cache.set(1, version, make_board())
+        cache.finish_build(1)
+
+        assert cache.get(1) is None
+
+    def test_invalidate_user(self):
+        """Test that only the boards the user is a learner in are dropped."""
+        cache = LeaderboardCache()
+        cache.set(1, cache.get_version(1), make_board([1, 2]))
+        cache.set(2, cache.get_version(2), make_board([3]))
+
+        cache.invalidate_user(1)
+
+        assert cache.get(1) is None
+        assert cache.get(2) is not None
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used boards are evicted beyond max_size."""
+        cache = LeaderboardCache(max_size=2)
+
+        for cohort_id in [1, 2]:
+            cache.set(cohort_id, cache.get_version(cohort_id), make_board())
+        cache.get(1)
+        cache.set(3, cache.get_version(3), make_board())
+
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert cache.get(3) is not None
+
+    def test_snapshot(self, tmp_path):
+        """Test that saved boards are restored once and the snapshot is removed."""
+        path = str(tmp_path / "leaderboards.json")
+        cache = LeaderboardCache()
+        board = make_board()
+        board.record_activity(1, TODAY)
+        cache.set(5, cache.get_version(5), board)
+
+        cache.save_snapshot(path)
+
+        restored_cache = LeaderboardCache()
+        restored_cache.load_snapshot(path)
+
+        assert list(tmp_path.iterdir()) == []
+        assert restored_cache.get_metrics()["restored"] == 1
+
+        # a process starting at the same time finds it already taken
+        other_cache = LeaderboardCache()
+        other_cache.load_snapshot(path)
+        assert other_cache.get_metrics()["restored"] == 0
+
+        # events that arrive before the board is checked are applied to it
+        restored_cache.record_completion(1, [5], task_id=10)
+
+        restored = restored_cache.pop_restored(5)
+        assert restored.streaks == board.streaks
+        assert restored.completed_task_ids[1] == {10}
+        assert restored_cache.pop_restored(5) is None
+
+    def test_invalid_snapshot(self, tmp_path):
+        """Test that an unreadable snapshot is ignored and removed."""
+        path = tmp_path / "leaderboards.json"
+        path.write_text("not json")
+        cache = LeaderboardCache()
+
+        cache.load_snapshot(str(path))
+
+        assert cache.get_metrics()["restored"] == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_missing_snapshot(self, tmp_path):
+        """Test that there is nothing to restore without a snapshot."""
+        cache = LeaderboardCache()
+
+        cache.load_snapshot(str(tmp_path / "leaderboards.json"))
+
+        assert cache.get_metrics()["restored"] == 0
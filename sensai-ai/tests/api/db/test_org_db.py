@@ -96,19 +96,14 @@ class TestOrganizationOperations:
         ):
             await create_organization_with_user("Test Org", "test-org", 1)
 
-    @patch("src.api.db.org.get_new_db_connection")
-    async def test_get_all_orgs(self, mock_db_conn):
+    @patch("src.api.db.org.execute_db_operation")
+    async def test_get_all_orgs(self, mock_execute):
         """Test retrieving all organizations."""
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchall.return_value = [
+        mock_execute.return_value = [
             (1, "Org One", "org-one"),
             (2, "Org Two", "org-two"),
             (3, "Org Three", "org-three"),
         ]
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
 
         result = await get_all_orgs()
 
@@ -353,8 +348,14 @@ class TestOrganizationOperations:
     @patch("src.api.db.org.get_new_db_connection")
     @patch("src.api.db.org.insert_or_return_user")
     @patch("src.api.db.org.send_slack_notification_for_member_added_to_org")
+    @patch("src.api.db.org.send_slack_notification_for_new_user")
     async def test_add_users_to_org_by_email_success(
-        self, mock_slack, mock_insert_user, mock_db_conn, mock_get_org
+        self,
+        mock_new_user_slack,
+        mock_slack,
+        mock_insert_user,
+        mock_db_conn,
+        mock_get_org,
     ):
         """Test successful addition of users to org by email."""
         mock_get_org.return_value = {"id": 1, "slug": "test-org", "name": "Test Org"}
@@ -368,13 +369,19 @@ class TestOrganizationOperations:
 
         mock_user1 = {"id": 1, "email": "user1@example.com"}
         mock_user2 = {"id": 2, "email": "user2@example.com"}
-        mock_insert_user.side_effect = [mock_user1, mock_user2]
+        mock_insert_user.side_effect = [(mock_user1, False), (mock_user2, True)]
 
         await add_users_to_org_by_email(1, ["user1@example.com", "user2@example.com"])
 
         assert mock_insert_user.call_count == 2
         mock_cursor.executemany.assert_called_once()
         mock_conn_instance.commit.assert_called_once()
+        # announced once the writer is released
+        mock_new_user_slack.assert_called_once_with(mock_user2)
+        assert mock_slack.call_args_list == [
+            call(mock_user1, "test-org", 1),
+            call(mock_user2, "test-org", 1),
+        ]
 
     @patch("src.api.db.org.get_org_by_id")
     async def test_add_users_to_org_by_email_org_not_found(self, mock_get_org):
@@ -387,8 +394,9 @@ class TestOrganizationOperations:
     @patch("src.api.db.org.get_org_by_id")
     @patch("src.api.db.org.get_new_db_connection")
     @patch("src.api.db.org.insert_or_return_user")
+    @patch("src.api.db.org.send_slack_notification_for_member_added_to_org")
     async def test_add_users_to_org_by_email_existing_users(
-        self, mock_insert_user, mock_db_conn, mock_get_org
+        self, mock_slack, mock_insert_user, mock_db_conn, mock_get_org
     ):
         """Test adding users that already exist in org."""
         mock_get_org.return_value = {"id": 1, "slug": "test-org", "name": "Test Org"}
@@ -401,11 +409,13 @@ class TestOrganizationOperations:
         mock_db_conn.return_value = mock_conn_instance
 
         mock_user = {"id": 1, "email": "user@example.com"}
-        mock_insert_user.return_value = mock_user
+        mock_insert_user.return_value = (mock_user, False)
 
         with pytest.raises(Exception, match="Some users already exist in organization"):
             await add_users_to_org_by_email(1, ["user@example.com"])
 
+        mock_slack.assert_not_called()
+
     @patch("src.api.db.org.execute_db_operation")
     async def test_remove_members_from_org(self, mock_execute):
         """Test removing members from org."""
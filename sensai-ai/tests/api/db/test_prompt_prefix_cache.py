@@ -0,0 +1,70 @@
+from src.api.db.prompt_prefix_cache import PromptPrefixCache
+
+
+def make_prefix(content: str):
+    return [
+        {"role": "system", "content": "system prompt"},
+        {"role": "user", "content": content},
+    ]
+
+
+class TestPromptPrefixCache:
+    def test_get_and_set(self):
+        """Test that the same prefix is returned while the content hash matches."""
+        cache = PromptPrefixCache()
+        prefix = make_prefix("question")
+
+        assert cache.get("question_1", "hash") is None
+
+        cache.set("question_1", "hash", prefix)
+
+        assert cache.get("question_1", "hash") is prefix
+        assert cache.get_metrics()["hits"] == 1
+        assert cache.get_metrics()["misses"] == 1
+
+    def test_stale_hash(self):
+        """Test that a prefix built from an older version of the question is not used."""
+        cache = PromptPrefixCache()
+        cache.set("question_1", "old", make_prefix("old question"))
+
+        assert cache.get("question_1", "new") is None
+
+        prefix = make_prefix("new question")
+        cache.set("question_1", "new", prefix)
+
+        assert cache.get("question_1", "new") is prefix
+
+    def test_invalidate_task(self):
+        """Test that prefixes that include an updated learning material are dropped."""
+        cache = PromptPrefixCache()
+        cache.set("question_1", "hash", make_prefix("1"), linked_task_ids=[10, 11])
+        cache.set("question_2", "hash", make_prefix("2"), linked_task_ids=[11])
+        cache.set("question_3", "hash", make_prefix("3"))
+
+        cache.invalidate_task(10)
+
+        assert cache.get("question_1", "hash") is None
+        assert cache.get("question_2", "hash") is not None
+        assert cache.get("question_3", "hash") is not None
+
+        cache.invalidate_task(11)
+
+        assert cache.get("question_2", "hash") is None
+        assert cache.get_metrics()["size"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used prefixes are evicted beyond max_size."""
+        cache = PromptPrefixCache(max_size=2)
+
+        cache.set("question_1", "hash", make_prefix("1"), linked_task_ids=[10])
+        cache.set("question_2", "hash", make_prefix("2"))
+        cache.get("question_1", "hash")
+        cache.set("question_3", "hash", make_prefix("3"))
+
+        assert cache.get("question_2", "hash") is None
+        assert cache.get("question_1", "hash") is not None
+        assert cache.get("question_3", "hash") is not None
+
+        cache.invalidate_all()
+
+        assert cache.get_metrics()["size"] == 0
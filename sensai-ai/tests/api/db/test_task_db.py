@@ -11,6 +11,7 @@ from src.api.db.task import (
     get_basic_task_details,
     get_task,
     get_task_metadata,
+    get_learning_material_descriptions,
     does_task_exist,
     prepare_blocks_for_publish,
     update_learning_material_task,
@@ -25,9 +26,9 @@ from src.api.db.task import (
     schedule_module_tasks,
     drop_task_generation_jobs_table,
     store_task_generation_request,
+    get_task_generation_job,
     update_task_generation_job_status,
     get_course_task_generation_jobs_status,
-    get_all_pending_task_generation_jobs,
     drop_task_completions_table,
     get_all_scorecards_for_org,
     create_scorecard,
@@ -53,10 +54,10 @@ class TestTaskOperations:
     """Test task-related database operations."""
 
     @patch("src.api.db.task.get_org_id_for_course")
-    @patch("src.api.db.task.get_new_db_connection")
+    @patch("src.api.db.task.execute_write_transaction")
     @patch("src.api.db.task.execute_db_operation")
     async def test_create_draft_task_for_course_success(
-        self, mock_execute, mock_db_conn, mock_get_org
+        self, mock_execute, mock_write, mock_get_org
     ):
         """Test successful task creation."""
         mock_get_org.return_value = 123
@@ -64,10 +65,11 @@ class TestTaskOperations:
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 456
         mock_cursor.fetchone.return_value = (5,)  # max ordering
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         # Mock visible ordering calculation
         mock_execute.return_value = (2,)
@@ -80,20 +82,21 @@ class TestTaskOperations:
         mock_get_org.assert_called_once_with(1)
 
     @patch("src.api.db.task.get_org_id_for_course")
-    @patch("src.api.db.task.get_new_db_connection")
+    @patch("src.api.db.task.execute_write_transaction")
     @patch("src.api.db.task.execute_db_operation")
     async def test_create_draft_task_for_course_with_ordering(
-        self, mock_execute, mock_db_conn, mock_get_org
+        self, mock_execute, mock_write, mock_get_org
     ):
         """Test task creation with specific ordering."""
         mock_get_org.return_value = 123
 
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 456
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         mock_execute.return_value = (1,)
 
@@ -356,6 +359,35 @@ class TestTaskOperations:
 
         assert result is None
 
+    @patch("src.api.db.task.block_descriptions")
+    @patch("src.api.db.task.execute_db_operation")
+    async def test_get_learning_material_descriptions(
+        self, mock_execute, mock_block_descriptions
+    ):
+        """Test that linked learning materials are read in a single query."""
+        mock_execute.return_value = [(3, '[{"type": "paragraph"}]'), (1, None)]
+        mock_block_descriptions.get_description_from_json.side_effect = (
+            lambda blocks, key: f"{key}: {blocks}"
+        )
+
+        result = await get_learning_material_descriptions([1, 2, 3])
+
+        assert result == {
+            3: 'learning_material_3: [{"type": "paragraph"}]',
+            1: "learning_material_1: None",
+        }
+        mock_execute.assert_called_once_with(
+            ANY, (1, 2, 3, "learning_material"), fetch_all=True
+        )
+        assert "IN (?, ?, ?)" in mock_execute.call_args[0][0]
+
+    @patch("src.api.db.task.execute_db_operation")
+    async def test_get_learning_material_descriptions_no_ids(self, mock_execute):
+        """Test that nothing is queried without linked learning materials."""
+        assert await get_learning_material_descriptions([]) == {}
+
+        mock_execute.assert_not_called()
+
     @patch("src.api.db.task.execute_db_operation")
     async def test_get_task_metadata_success(self, mock_execute):
         """Test successful task metadata retrieval."""
@@ -445,10 +477,10 @@ class TestTaskOperations:
 
     @patch("src.api.db.task.does_task_exist")
     @patch("src.api.db.task.get_basic_task_details")
-    @patch("src.api.db.task.get_new_db_connection")
+    @patch("src.api.db.task.execute_write_transaction")
     @patch("src.api.db.task.get_task")
     async def test_update_draft_quiz_success(
-        self, mock_get_task, mock_db_conn, mock_get_basic, mock_task_exists
+        self, mock_get_task, mock_write, mock_get_basic, mock_task_exists
     ):
         """Test successful draft quiz update."""
         mock_task_exists.return_value = True
@@ -456,10 +488,11 @@ class TestTaskOperations:
 
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 456
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         questions = [
             {
@@ -583,34 +616,97 @@ class TestTaskOperations:
         assert "UPDATE tasks" in args[0]
         assert "deleted_at" in args[0]
 
-    @patch("src.api.db.task.execute_db_operation")
-    async def test_mark_task_completed(self, mock_execute):
+    @patch("src.api.db.task.leaderboards")
+    @patch("src.api.db.task.record_user_activity")
+    @patch("src.api.db.task.execute_write_transaction")
+    async def test_mark_task_completed(
+        self, mock_write, mock_record_activity, mock_leaderboards
+    ):
         """Test marking task as completed."""
+        mock_cursor = AsyncMock()
+        mock_cursor.rowcount = 1
+        mock_record_activity.return_value = [(0, "2024-01-01"), (5, "2024-01-01")]
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+
         await mark_task_completed(1, 123)
 
-        mock_execute.assert_called_once_with(
+        mock_cursor.execute.assert_called_once_with(
             """
-        INSERT OR IGNORE INTO task_completions (user_id, task_id)
-        VALUES (?, ?)
-        """,
+            INSERT OR IGNORE INTO task_completions (user_id, task_id)
+            VALUES (?, ?)
+            """,
             (123, 1),
         )
+        mock_record_activity.assert_called_once_with(
+            mock_cursor, 123, task_id=1, completion_count=1
+        )
+        mock_leaderboards.record_activity.assert_called_once_with(
+            123, [(0, "2024-01-01"), (5, "2024-01-01")]
+        )
+        mock_leaderboards.record_completion.assert_called_once_with(
+            123, [0, 5], task_id=1
+        )
 
-    @patch("src.api.db.task.execute_db_operation")
-    async def test_delete_completion_history_for_task_with_task_id(self, mock_execute):
+    @patch("src.api.db.task.record_user_activity")
+    @patch("src.api.db.task.execute_write_transaction")
+    async def test_mark_task_completed_already_completed(
+        self, mock_write, mock_record_activity
+    ):
+        """Test that completing a task again does not count towards activity."""
+        mock_cursor = AsyncMock()
+        mock_cursor.rowcount = 0
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+
+        await mark_task_completed(1, 123)
+
+        mock_record_activity.assert_not_called()
+
+    @patch("src.api.db.task.leaderboards")
+    @patch("src.api.db.task.delete_chat_messages")
+    @patch("src.api.db.task.execute_write_transaction")
+    async def test_delete_completion_history_for_task_with_task_id(
+        self, mock_write, mock_delete_messages, mock_leaderboards
+    ):
         """Test deleting completion history with task ID."""
+        mock_cursor = AsyncMock()
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+
         await delete_completion_history_for_task(1, 123, 456)
 
-        assert mock_execute.call_count == 2
+        assert mock_delete_messages.call_count == 2
+        mock_leaderboards.invalidate_user.assert_called_once_with(456)
 
-    @patch("src.api.db.task.execute_db_operation")
+    @patch("src.api.db.task.leaderboards")
+    @patch("src.api.db.task.delete_chat_messages")
+    @patch("src.api.db.task.execute_write_transaction")
     async def test_delete_completion_history_for_task_without_task_id(
-        self, mock_execute
+        self, mock_write, mock_delete_messages, mock_leaderboards
     ):
         """Test deleting completion history without task ID."""
+        mock_cursor = AsyncMock()
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
+
         await delete_completion_history_for_task(None, 123, 456)
 
-        assert mock_execute.call_count == 1
+        mock_delete_messages.assert_called_once_with(
+            mock_cursor, "question_id = ? AND user_id = ?", (123, 456)
+        )
 
     @patch("src.api.db.task.get_new_db_connection")
     async def test_schedule_module_tasks(self, mock_db_conn):
@@ -654,9 +750,30 @@ class TestTaskOperations:
         result = await store_task_generation_request(1, 2, job_details)
 
         assert isinstance(result, str)  # Should return UUID
-        mock_cursor.execute.assert_called_once()
+        # the job and its entry in the job queue
+        assert mock_cursor.execute.call_count == 2
+        assert "INSERT INTO job_queue" in mock_cursor.execute.call_args_list[1][0][0]
+        assert mock_cursor.execute.call_args_list[1][0][1][:2] == ("task", result)
         mock_conn_instance.commit.assert_called_once()
 
+    @patch("src.api.db.task.execute_db_operation")
+    async def test_get_task_generation_job(self, mock_execute):
+        """Test getting a task generation job with its status."""
+        mock_execute.return_value = ("uuid1", 1, 2, "started", '{"type": "quiz"}')
+
+        result = await get_task_generation_job("uuid1")
+
+        assert result == {
+            "uuid": "uuid1",
+            "task_id": 1,
+            "course_id": 2,
+            "status": "started",
+            "job_details": {"type": "quiz"},
+        }
+
+        mock_execute.return_value = None
+        assert await get_task_generation_job("missing") is None
+
     @patch("src.api.db.task.get_new_db_connection")
     async def test_update_task_generation_job_status(self, mock_db_conn):
         """Test updating task generation job status."""
@@ -673,19 +790,14 @@ class TestTaskOperations:
         mock_cursor.execute.assert_called_once()
         mock_conn_instance.commit.assert_called_once()
 
-    @patch("src.api.db.task.get_new_db_connection")
-    async def test_get_course_task_generation_jobs_status(self, mock_db_conn):
+    @patch("src.api.db.task.execute_db_operation")
+    async def test_get_course_task_generation_jobs_status(self, mock_execute):
         """Test getting course task generation jobs status."""
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchall.return_value = [
+        mock_execute.return_value = [
             (str(GenerateTaskJobStatus.COMPLETED),),
             (str(GenerateTaskJobStatus.STARTED),),
             (str(GenerateTaskJobStatus.COMPLETED),),
         ]
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
 
         result = await get_course_task_generation_jobs_status(1)
 
@@ -696,28 +808,6 @@ class TestTaskOperations:
 
         assert result == expected
 
-    @patch("src.api.db.task.get_new_db_connection")
-    async def test_get_all_pending_task_generation_jobs(self, mock_db_conn):
-        """Test getting all pending task generation jobs."""
-        mock_cursor = AsyncMock()
-        mock_cursor.fetchall.return_value = [
-            ("uuid1", '{"type": "quiz"}'),
-            ("uuid2", '{"type": "learning_material"}'),
-        ]
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
-
-        result = await get_all_pending_task_generation_jobs()
-
-        expected = [
-            {"uuid": "uuid1", "job_details": {"type": "quiz"}},
-            {"uuid": "uuid2", "job_details": {"type": "learning_material"}},
-        ]
-
-        assert result == expected
-
     @patch("src.api.db.task.get_new_db_connection")
     async def test_drop_task_completions_table(self, mock_db_conn):
         """Test dropping task completions table."""
@@ -732,19 +822,24 @@ class TestTaskOperations:
         mock_cursor.execute.assert_called_once()
         mock_conn_instance.commit.assert_called_once()
 
+    @patch("src.api.db.task.course_tree_cache")
+    @patch("src.api.db.task.execute_db_operation")
     @patch("src.api.db.task.get_new_db_connection")
-    async def test_undo_task_delete(self, mock_db_conn):
+    async def test_undo_task_delete(self, mock_db_conn, mock_execute, mock_cache):
         """Test undoing task deletion."""
         mock_cursor = AsyncMock()
         mock_conn_instance = AsyncMock()
         mock_conn_instance.cursor.return_value = mock_cursor
         mock_conn_instance.__aenter__.return_value = mock_conn_instance
         mock_db_conn.return_value = mock_conn_instance
+        mock_execute.return_value = [(10,), (11,)]
 
         await undo_task_delete(1)
 
         mock_cursor.execute.assert_called_once()
         mock_conn_instance.commit.assert_called_once()
+        # the restored task is not in any cached tree, so its courses are invalidated
+        assert list(mock_cache.invalidate_courses.call_args[0][0]) == [10, 11]
 
     @patch("src.api.db.task.execute_db_operation")
     async def test_publish_scheduled_tasks(self, mock_execute):
@@ -945,7 +1040,11 @@ class TestTaskOperations:
         question_with_new_scorecard = MockQuestion(id=1, scorecard_id=456)
         questions = [question_with_new_scorecard]
 
-        mock_task = {"id": 1, "title": "Test Quiz", "questions": [question_with_new_scorecard.model_dump()]}
+        mock_task = {
+            "id": 1,
+            "title": "Test Quiz",
+            "questions": [question_with_new_scorecard.model_dump()],
+        }
         mock_get_task.return_value = mock_task
 
         result = await update_published_quiz(1, "Test Quiz", questions, datetime.now())
@@ -1447,10 +1546,10 @@ class TestTaskDuplication:
 
     @patch("src.api.db.task.does_task_exist")
     @patch("src.api.db.task.get_basic_task_details")
-    @patch("src.api.db.task.get_new_db_connection")
+    @patch("src.api.db.task.execute_write_transaction")
     @patch("src.api.db.task.get_task")
     async def test_update_draft_quiz_with_scorecard_publishing(
-        self, mock_get_task, mock_db_conn, mock_get_basic, mock_task_exists
+        self, mock_get_task, mock_write, mock_get_basic, mock_task_exists
     ):
         """Test draft quiz update that triggers scorecard publishing."""
         mock_task_exists.return_value = True
@@ -1459,10 +1558,11 @@ class TestTaskDuplication:
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 456
         mock_cursor.fetchone.return_value = (789,)  # Draft scorecard to be published
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         questions = [
             {
@@ -1487,7 +1587,6 @@ class TestTaskDuplication:
 
         assert result == mock_task
 
-
     @patch("src.api.db.task.execute_db_operation")
     async def test_publish_scheduled_tasks_empty(self, mock_execute):
         """Test publishing scheduled tasks when none exist."""
@@ -1554,10 +1653,10 @@ class TestTaskDuplication:
 
     @patch("src.api.db.task.does_task_exist")
     @patch("src.api.db.task.get_basic_task_details")
-    @patch("src.api.db.task.get_new_db_connection")
+    @patch("src.api.db.task.execute_write_transaction")
     @patch("src.api.db.task.get_task")
     async def test_update_draft_quiz_with_pydantic_question(
-        self, mock_get_task, mock_db_conn, mock_get_basic, mock_task_exists
+        self, mock_get_task, mock_write, mock_get_basic, mock_task_exists
     ):
         """Test update_draft_quiz when question is not a dict - covers line 372."""
         mock_task_exists.return_value = True
@@ -1571,10 +1670,11 @@ class TestTaskDuplication:
 
         mock_cursor = AsyncMock()
         mock_cursor.lastrowid = 1
-        mock_conn_instance = AsyncMock()
-        mock_conn_instance.cursor.return_value = mock_cursor
-        mock_conn_instance.__aenter__.return_value = mock_conn_instance
-        mock_db_conn.return_value = mock_conn_instance
+
+        async def run_write(write_fn):
+            return await write_fn(mock_cursor)
+
+        mock_write.side_effect = run_write
 
         mock_get_task.return_value = {
             "id": 1,
@@ -1617,8 +1717,12 @@ class TestTaskDuplication:
 
         pydantic_question = MockQuestion()
         questions = [pydantic_question]  # This will trigger the model_dump() call
-        
-        mock_task = {"id": 1, "title": "Test Quiz", "questions": [pydantic_question.model_dump()]}
+
+        mock_task = {
+            "id": 1,
+            "title": "Test Quiz",
+            "questions": [pydantic_question.model_dump()],
+        }
         mock_get_task.return_value = mock_task
 
         result = await update_draft_quiz(
@@ -1707,4 +1811,3 @@ class TestTaskDuplication:
 
         assert result is not None
         assert result["questions"][0]["title"] == "question"
-
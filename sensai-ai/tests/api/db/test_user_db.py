@@ -292,19 +292,18 @@ class TestUserDatabaseOperations:
     async def test_get_user_active_in_last_n_days_success(self, mock_execute):
         """Test successful retrieval of user activity."""
         mock_execute.return_value = [
-            ("2023-01-01", 3),
-            ("2023-01-02", 5),
-            ("2023-01-03", 2),
-        ]  # (date, count) tuples
+            ("2023-01-01",),
+            ("2023-01-02",),
+            ("2023-01-03",),
+        ]  # active IST dates
 
         result = await get_user_active_in_last_n_days(1, 7, 1)
 
-        # Function returns a list but order isn't guaranteed since it uses a set internally
-        assert isinstance(result, list)
-        assert len(result) == 3
-        assert "2023-01-01" in result
-        assert "2023-01-02" in result
-        assert "2023-01-03" in result
+        assert result == ["2023-01-01", "2023-01-02", "2023-01-03"]
+        query = mock_execute.call_args[0][0]
+        assert "user_daily_activity" in query
+        assert "'-7 days'" in query
+        assert mock_execute.call_args[0][1] == (1, 1)
 
     @patch("src.api.db.user.execute_db_operation")
     async def test_get_user_activity_for_year_success(self, mock_execute):
@@ -324,19 +323,24 @@ class TestUserDatabaseOperations:
         assert result[1] == 3  # Day 2 (index 1)
         assert result[2] == 7  # Day 3 (index 2)
 
+        # read from the user's activity across all cohorts
+        assert mock_execute.call_args[0][1] == (1, 0, "2023-01-01", "2023-12-31")
+
     @patch("src.api.db.user.execute_db_operation")
     async def test_get_user_streak_success(self, mock_execute):
         """Test successful calculation of user streak."""
+        today = datetime.now(timezone(timedelta(hours=5, minutes=30))).date()
         mock_execute.return_value = [
-            ("2023-01-01 12:00:00",),  # Single tuple elements with timestamp strings
-            ("2023-01-02 12:00:00",),
-            ("2023-01-03 12:00:00",),
+            (str(today),),  # active IST dates, latest first
+            (str(today - timedelta(days=1)),),
+            (str(today - timedelta(days=3)),),
         ]
 
         result = await get_user_streak(1, 1)
 
         # get_user_streak_from_usage_dates returns a list of date strings
-        assert isinstance(result, list)
+        assert result == [str(today), str(today - timedelta(days=1))]
+        assert "user_daily_activity" in mock_execute.call_args[0][0]
 
 
 class TestUserInsertOperations:
@@ -344,10 +348,7 @@ class TestUserInsertOperations:
 
     @patch("src.api.db.user.get_new_db_connection")
     @patch("src.api.db.user.generate_random_color")
-    @patch("src.api.db.user.send_slack_notification_for_new_user")
-    async def test_insert_or_return_user_new_user(
-        self, mock_slack, mock_color, mock_db_conn
-    ):
+    async def test_insert_or_return_user_new_user(self, mock_color, mock_db_conn):
         """Test inserting a new user."""
         mock_color.return_value = "#FF5733"
 
@@ -370,7 +371,7 @@ class TestUserInsertOperations:
         mock_conn_instance.__aenter__.return_value = mock_conn_instance
         mock_db_conn.return_value = mock_conn_instance
 
-        result = await insert_or_return_user(
+        result, is_new_user = await insert_or_return_user(
             mock_cursor, "new@example.com", "New User", "User"
         )
 
@@ -385,7 +386,7 @@ class TestUserInsertOperations:
         }
 
         assert result == expected
-        mock_slack.assert_called_once()
+        assert is_new_user
 
     @patch("src.api.db.user.get_new_db_connection")
     async def test_insert_or_return_user_existing_user(self, mock_db_conn):
@@ -402,7 +403,7 @@ class TestUserInsertOperations:
             "2023-01-01 12:00:00",
         )
 
-        result = await insert_or_return_user(
+        result, is_new_user = await insert_or_return_user(
             mock_cursor, "existing@example.com", "Existing User", "User"
         )
 
@@ -417,6 +418,7 @@ class TestUserInsertOperations:
         }
 
         assert result == expected
+        assert not is_new_user
 
     @patch("src.api.db.user.update_user")
     async def test_insert_or_return_user_existing_user_update_name(
@@ -444,7 +446,7 @@ class TestUserInsertOperations:
             "created_at": "2023-01-01 12:00:00",
         }
 
-        result = await insert_or_return_user(
+        result, _ = await insert_or_return_user(
             mock_cursor, "existing@example.com", "Updated Name", "User"
         )
 
@@ -477,9 +479,7 @@ class TestUserInsertOperations:
         mock_cursor = AsyncMock()
         mock_cursor.fetchone.return_value = None
 
-        with patch(
-            "src.api.db.user.generate_random_color", return_value="#FF5733"
-        ), patch("src.api.db.user.send_slack_notification_for_new_user"):
+        with patch("src.api.db.user.generate_random_color", return_value="#FF5733"):
 
             # Second fetchone call for the newly created user
             mock_cursor.fetchone.side_effect = [
@@ -495,7 +495,7 @@ class TestUserInsertOperations:
                 ),  # Second call - new user
             ]
 
-            result = await insert_or_return_user(mock_cursor, "test@example.com")
+            result, _ = await insert_or_return_user(mock_cursor, "test@example.com")
 
             assert result["first_name"] is None
             assert result["middle_name"] is None
@@ -505,9 +505,7 @@ class TestUserInsertOperations:
         mock_cursor = AsyncMock()
         mock_cursor.fetchone.return_value = None
 
-        with patch(
-            "src.api.db.user.generate_random_color", return_value="#FF5733"
-        ), patch("src.api.db.user.send_slack_notification_for_new_user"):
+        with patch("src.api.db.user.generate_random_color", return_value="#FF5733"):
 
             mock_cursor.fetchone.side_effect = [
                 None,  # First call - user doesn't exist
@@ -522,7 +520,7 @@ class TestUserInsertOperations:
                 ),  # Second call - new user
             ]
 
-            result = await insert_or_return_user(
+            result, _ = await insert_or_return_user(
                 mock_cursor, "test@example.com", "John", "Doe"
             )
 
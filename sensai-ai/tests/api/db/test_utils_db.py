@@ -194,3 +194,28 @@ class TestDescriptionConstruction:
         result = construct_description_from_blocks(blocks)
         expected = "## Introduction\nThis is some text.\n```\ncode here\n```\n"
         assert result == expected
+
+    def test_construct_description_deeply_nested_list(self):
+        """Test constructing description with list items nested inside each other."""
+        blocks = [
+            {
+                "type": "bulletListItem",
+                "content": [{"text": "Level 0"}],
+                "children": [
+                    {
+                        "type": "numberedListItem",
+                        "content": [{"text": "Level 1"}],
+                        "children": [
+                            {"type": "checkListItem", "content": [{"text": "Level 2"}]},
+                            {"type": "paragraph", "content": []},
+                        ],
+                    }
+                ],
+            },
+            {"type": "image", "content": [], "props": {"url": "image.png"}},
+            {"type": "paragraph", "content": [{"text": "Last "}, {"text": "line"}]},
+        ]
+
+        result = construct_description_from_blocks(blocks)
+        expected = "- Level 0\n    1. Level 1\n        - [ ] Level 2\nLast line\n"
+        assert result == expected
@@ -0,0 +1,71 @@
+import pytest
+import aiosqlite
+from unittest.mock import patch
+from src.api.db import create_websocket_events_table
+from src.api.db.websocket_events import (
+    add_cache_events,
+    add_websocket_events,
+    get_last_websocket_event_id,
+    get_websocket_events,
+    delete_websocket_events,
+)
+
+
+@pytest.fixture
+async def cursor():
+    async with aiosqlite.connect(":memory:") as conn:
+        cursor = await conn.cursor()
+        await create_websocket_events_table(cursor)
+
+        async def execute(operation, params=None, fetch_one=False, fetch_all=False):
+            await cursor.execute(operation, params or ())
+
+            if fetch_one:
+                return await cursor.fetchone()
+            elif fetch_all:
+                return await cursor.fetchall()
+
+        async def execute_many(operation, params_list):
+            await cursor.executemany(operation, params_list)
+
+        with patch(
+            "src.api.db.websocket_events.execute_db_operation", side_effect=execute
+        ), patch(
+            "src.api.db.websocket_events.execute_many_db_operation",
+            side_effect=execute_many,
+        ):
+            yield cursor
+
+
+@pytest.mark.asyncio
+class TestWebsocketEvents:
+    async def test_events_read_in_order_after_an_id(self, cursor):
+        """Test that events are read oldest first after the given one, up to the limit."""
+        assert await get_last_websocket_event_id() == 0
+
+        await add_websocket_events(1, [("a", None, False), ("b", "key", True)])
+        await add_cache_events(["d", "e"], "origin")
+        await add_websocket_events(2, [("c", None, False)])
+
+        assert await get_websocket_events(0) == [
+            (1, 1, "a", None, False, None),
+            (2, 1, "b", "key", True, None),
+            (3, None, "d", None, False, "origin"),
+            (4, None, "e", None, False, "origin"),
+            (5, 2, "c", None, False, None),
+        ]
+        assert [event[0] for event in await get_websocket_events(1, limit=1)] == [2]
+        assert await get_last_websocket_event_id() == 5
+
+    async def test_delete_websocket_events(self, cursor):
+        """Test that only the events older than the retention period are deleted."""
+        await add_websocket_events(1, [("old", None, False), ("recent", None, False)])
+        await cursor.execute(
+            "UPDATE websocket_events SET created_at = datetime('now', '-20 minutes') WHERE payload = 'old'"
+        )
+
+        await delete_websocket_events(retention_seconds=600)
+
+        assert [event[2] for event in await get_websocket_events(0)] == ["recent"]
+        # ids are not reused once the events before them are deleted
+        assert await get_last_websocket_event_id() == 2
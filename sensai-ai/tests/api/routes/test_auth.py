@@ -9,11 +9,15 @@ async def test_login_or_signup_user_success(client, mock_db):
     Test successful login or signup
     """
     # Mock Google token verification
-    with patch("api.routes.auth.id_token.verify_oauth2_token") as mock_verify, patch(
+    with patch(
+        "api.routes.auth.google_token_verifier.verify", new_callable=AsyncMock
+    ) as mock_verify, patch(
         "api.routes.auth.insert_or_return_user"
     ) as mock_insert_user, patch(
         "api.routes.auth.get_new_db_connection"
     ) as mock_db_conn, patch(
+        "api.routes.auth.send_slack_notification_for_new_user", new_callable=AsyncMock
+    ) as mock_slack, patch(
         "api.routes.auth.settings.google_client_id", "mock-google-client-id"
     ):
         # Setup connection mock to use our test cursor
@@ -44,7 +48,7 @@ async def test_login_or_signup_user_success(client, mock_db):
             "first_name": "Test",
             "last_name": "User",
         }
-        mock_insert_user.return_value = expected_user
+        mock_insert_user.return_value = (expected_user, True)
 
         # Make request
         response = client.post("/auth/login", json=request_data)
@@ -61,6 +65,9 @@ async def test_login_or_signup_user_success(client, mock_db):
             request_data["given_name"],
             request_data["family_name"],
         )
+        # announced once the writer is released
+        conn_mock.commit.assert_called_once()
+        mock_slack.assert_called_once_with(expected_user)
 
 
 @pytest.mark.asyncio
@@ -68,7 +75,9 @@ async def test_login_or_signup_invalid_token(client, mock_db):
     """
     Test login with invalid token
     """
-    with patch("api.routes.auth.id_token.verify_oauth2_token") as mock_verify, patch(
+    with patch(
+        "api.routes.auth.google_token_verifier.verify", new_callable=AsyncMock
+    ) as mock_verify, patch(
         "api.routes.auth.settings.google_client_id", "mock-google-client-id"
     ):
 
@@ -99,7 +108,9 @@ async def test_login_or_signup_email_mismatch(client, mock_db):
     """
     Test login with email mismatch
     """
-    with patch("api.routes.auth.id_token.verify_oauth2_token") as mock_verify, patch(
+    with patch(
+        "api.routes.auth.google_token_verifier.verify", new_callable=AsyncMock
+    ) as mock_verify, patch(
         "api.routes.auth.settings.google_client_id", "mock-google-client-id"
     ):
 
@@ -1,3 +1,4 @@
+import json
 import pytest
 from unittest.mock import patch
 from fastapi.testclient import TestClient
@@ -74,6 +75,49 @@ class TestChatRoutes:
         assert response.status_code == 200
         assert response.json() == mock_chat_data
 
+    @patch("src.api.routes.chat.get_chat_history_page_from_db")
+    def test_get_chat_history_page(self, mock_get_page):
+        """Test that passing a cursor or limit returns a single page."""
+        mock_get_page.return_value = []
+
+        response = client.get("/chat/?org_id=123&after_id=10&limit=50")
+
+        assert response.status_code == 200
+        assert response.json() == []
+        mock_get_page.assert_called_once_with(123, 10, 50)
+
+        response = client.get("/chat/?org_id=123&limit=100000")
+        assert response.status_code == 422
+
+    @patch("src.api.routes.chat.iter_all_chat_history_from_db")
+    def test_stream_chat_history(self, mock_iter_chat_history):
+        """Test streaming the chat history as NDJSON with only the model's fields."""
+        message = {
+            "id": 1,
+            "created_at": "2023-01-01T00:00:00Z",
+            "user_id": 123,
+            "question_id": 456,
+            "role": "user",
+            "content": "Hello",
+            "response_type": "text",
+        }
+
+        async def iter_batches(*args):
+            yield [{**message, "user_email": "a@b.com", "task_id": 1}]
+            yield [{**message, "id": 2}]
+
+        mock_iter_chat_history.side_effect = iter_batches
+
+        response = client.get("/chat/?org_id=123&stream=true&after_id=0")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            message,
+            {**message, "id": 2},
+        ]
+        mock_iter_chat_history.assert_called_once_with(123, 0)
+
     @patch("src.api.routes.chat.get_task_chat_history_for_user_from_db")
     def test_get_user_chat_history_for_task_success(self, mock_get_task_chat_history):
         """Test successful user chat history retrieval for a specific task."""
@@ -97,7 +141,9 @@ class TestChatRoutes:
         # Assertions
         assert response.status_code == 200
         assert response.json() == mock_chat_data
-        mock_get_task_chat_history.assert_called_once_with(user_id=123, task_id=456)
+        mock_get_task_chat_history.assert_called_once_with(
+            user_id=123, task_id=456, after_id=None
+        )
 
     @patch("src.api.routes.chat.delete_all_chat_history_from_db")
     def test_delete_all_chat_history_success(self, mock_delete_chat_history):
@@ -1,6 +1,7 @@
 import pytest
 from fastapi import status
 from unittest.mock import patch, MagicMock
+from api.db.analytics import CohortCompletion
 
 
 @pytest.mark.asyncio
@@ -342,54 +343,45 @@ async def test_get_leaderboard_data(client, mock_db):
     Test getting leaderboard data for a cohort
     """
     with patch(
-        "api.routes.cohort.get_cohort_streaks_from_db"
-    ) as mock_get_streaks, patch(
-        "api.routes.cohort.get_cohort_completion_from_db"
-    ) as mock_get_completion:
+        "api.routes.cohort.get_cohort_leaderboard_from_db"
+    ) as mock_get_leaderboard:
 
         cohort_id = 1
 
-        # Mock streak data - correct format with user object having all required fields
-        streak_data = [
-            {
-                "user": {
-                    "id": 1,
-                    "email": "user1@example.com",
-                    "first_name": "John",
-                    "middle_name": None,
-                    "last_name": "Doe",
+        leaderboard_data = {
+            "stats": [
+                {
+                    "user": {
+                        "id": 1,
+                        "email": "user1@example.com",
+                        "first_name": "John",
+                        "middle_name": None,
+                        "last_name": "Doe",
+                    },
+                    "streak_count": 5,
+                    "tasks_completed": 1,
                 },
-                "streak_count": 5,
-            },
-            {
-                "user": {
-                    "id": 2,
-                    "email": "user2@example.com",
-                    "first_name": "Jane",
-                    "middle_name": None,
-                    "last_name": "Smith",
+                {
+                    "user": {
+                        "id": 2,
+                        "email": "user2@example.com",
+                        "first_name": "Jane",
+                        "middle_name": None,
+                        "last_name": "Smith",
+                    },
+                    "streak_count": 3,
+                    "tasks_completed": 2,
                 },
-                "streak_count": 3,
-            },
-        ]
-        mock_get_streaks.return_value = streak_data
-
-        # Mock completion data
-        completion_data = {
-            1: {"task_1": {"is_complete": True}, "task_2": {"is_complete": False}},
-            2: {"task_1": {"is_complete": True}, "task_2": {"is_complete": True}},
+            ],
+            "metadata": {"num_tasks": 2},
         }
-        mock_get_completion.return_value = completion_data
+        mock_get_leaderboard.return_value = leaderboard_data
 
-        response = client.get(f"/cohorts/{cohort_id}/leaderboard")
+        response = client.get(f"/cohorts/{cohort_id}/leaderboard?view=This week")
 
         assert response.status_code == status.HTTP_200_OK
-        result = response.json()
-        assert "stats" in result
-        assert "metadata" in result
-        assert "num_tasks" in result["metadata"]
-        mock_get_streaks.assert_called_with(cohort_id=cohort_id)
-        mock_get_completion.assert_called_with(cohort_id, [1, 2])
+        assert response.json() == leaderboard_data
+        mock_get_leaderboard.assert_called_with(cohort_id, "This week")
 
 
 @pytest.mark.asyncio
@@ -429,12 +421,12 @@ async def test_get_cohort_metrics_for_course(client, mock_db):
         }
         mock_get_cohort.return_value = cohort_data
 
-        # Mock completion data with integer task IDs to match course data
-        completion_data = {
-            1: {1: {"is_complete": True}, 2: {"is_complete": False}},
-            2: {1: {"is_complete": False}, 2: {"is_complete": True}},
-        }
-        mock_get_completion.return_value = completion_data
+        # Learner 1 completed the quiz (task 1) and learner 2 the learning material (task 2)
+        mock_get_completion.return_value = CohortCompletion(
+            [1, 2],
+            [(2, "learning_material", None), (1, "quiz", 11)],
+            [(1, -1, 11), (2, 2, -1)],
+        )
 
         # Mock attempt data
         attempt_data = {
@@ -613,19 +605,20 @@ async def test_get_cohort_metrics_for_course_cohort_not_found(client, mock_db):
 @pytest.mark.asyncio
 async def test_get_leaderboard_data_empty_users(client, mock_db):
     """
-    Test getting leaderboard data when there are no users with streaks
+    Test getting leaderboard data when the cohort has no learners
     """
-    with patch("api.routes.cohort.get_cohort_streaks_from_db") as mock_get_streaks:
+    with patch(
+        "api.routes.cohort.get_cohort_leaderboard_from_db"
+    ) as mock_get_leaderboard:
 
         cohort_id = 1
-        # Mock empty streaks data (no users)
-        mock_get_streaks.return_value = []
+        mock_get_leaderboard.return_value = {}
 
         response = client.get(f"/cohorts/{cohort_id}/leaderboard")
 
         assert response.status_code == status.HTTP_200_OK
         assert response.json() == {}
-        mock_get_streaks.assert_called_with(cohort_id=cohort_id)
+        mock_get_leaderboard.assert_called_with(cohort_id, "All time")
 
 
 @pytest.mark.asyncio
@@ -690,9 +683,8 @@ async def test_get_cohort_metrics_for_course_no_tasks(client, mock_db):
         }
         mock_get_cohort.return_value = cohort_data
 
-        # Mock completion data with no tasks (empty for the first learner)
-        completion_data = {1: {}, 2: {}}
-        mock_get_completion.return_value = completion_data
+        # Mock completion data with no tasks
+        mock_get_completion.return_value = CohortCompletion([1, 2], [], [])
 
         # Mock attempt data
         attempt_data = {
@@ -713,7 +705,6 @@ async def test_get_cohort_metrics_for_course_completed_task_not_in_metadata(
 ):
     """
     Test getting cohort metrics when a learner has completed a task that doesn't exist in the course metadata
-    This covers the continue statement on line 241 of cohort.py
     """
     with patch("api.routes.cohort.get_course_from_db") as mock_get_course, patch(
         "api.routes.cohort.get_cohort_by_id_from_db"
@@ -747,16 +738,19 @@ async def test_get_cohort_metrics_for_course_completed_task_not_in_metadata(
 
         # Mock completion data where learner completed task 3 (which doesn't exist in course metadata)
         # and task 1 (which does exist)
-        completion_data = {
-            1: {
-                1: {"is_complete": True},  # Task 1 exists in course metadata
-                2: {"is_complete": False},  # Task 2 exists in course metadata
-                3: {
-                    "is_complete": True
-                },  # Task 3 does NOT exist in course metadata - triggers continue
-            }
-        }
-        mock_get_completion.return_value = completion_data
+        mock_get_completion.return_value = CohortCompletion(
+            [1],
+            [
+                (2, "learning_material", None),  # Task 2 exists in course metadata
+                (
+                    3,
+                    "learning_material",
+                    None,
+                ),  # Task 3 does NOT exist in course metadata
+                (1, "quiz", 11),  # Task 1 exists in course metadata
+            ],
+            [(1, -1, 11), (1, 3, -1)],
+        )
 
         # Mock attempt data
         attempt_data = {
@@ -770,7 +764,7 @@ async def test_get_cohort_metrics_for_course_completed_task_not_in_metadata(
         result = response.json()
 
         # Verify the metrics are calculated correctly
-        # Only task 1 should be counted (task 3 is skipped due to continue statement)
+        # Only task 1 should be counted (task 3 is not part of the course metadata)
         assert result["num_tasks"] == 3  # Total tasks in completion data
         assert result["average_completion"] == 1 / 3  # 1 completed task out of 3 total
         assert result["num_active_learners"] == 1
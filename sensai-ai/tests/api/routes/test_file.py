@@ -1,7 +1,6 @@
 import pytest
 from fastapi import status
-from unittest.mock import patch, MagicMock, mock_open, ANY
-import boto3
+from unittest.mock import patch, AsyncMock, MagicMock
 from botocore.exceptions import ClientError
 import os
 
@@ -11,7 +10,7 @@ async def test_get_upload_presigned_url_success(client, mock_db):
     """
     Test getting a presigned URL for uploading a file successfully
     """
-    with patch("api.routes.file.boto3.client") as mock_boto3_client, patch(
+    with patch("api.routes.file.get_s3_client") as mock_get_s3_client, patch(
         "api.routes.file.generate_s3_uuid"
     ) as mock_generate_uuid, patch(
         "api.routes.file.settings.s3_folder_name", "test-folder"
@@ -21,7 +20,7 @@ async def test_get_upload_presigned_url_success(client, mock_db):
 
         # Setup mocks
         mock_s3 = MagicMock()
-        mock_boto3_client.return_value = mock_s3
+        mock_get_s3_client.return_value = mock_s3
         mock_generate_uuid.return_value = "test-uuid"
         mock_s3.generate_presigned_url.return_value = (
             "https://presigned-url.example.com/upload"
@@ -42,11 +41,7 @@ async def test_get_upload_presigned_url_success(client, mock_db):
         assert response_json["file_uuid"] == "test-uuid"
 
         # Assert mocks called correctly
-        mock_boto3_client.assert_called_with(
-            "s3",
-            region_name="ap-south-1",
-            config=ANY,
-        )
+        mock_get_s3_client.assert_called_once()
         mock_s3.generate_presigned_url.assert_called_with(
             "put_object",
             Params={
@@ -79,13 +74,13 @@ async def test_get_upload_presigned_url_client_error(client, mock_db):
     """
     Test getting a presigned URL when boto3 client raises an error
     """
-    with patch("api.routes.file.boto3.client") as mock_boto3_client, patch(
+    with patch("api.routes.file.get_s3_client") as mock_get_s3_client, patch(
         "api.routes.file.settings.s3_folder_name", "test-folder"
     ), patch("api.routes.file.settings.s3_bucket_name", "test-bucket"):
 
         # Setup mocks to raise error
         mock_s3 = MagicMock()
-        mock_boto3_client.return_value = mock_s3
+        mock_get_s3_client.return_value = mock_s3
         mock_s3.generate_presigned_url.side_effect = ClientError(
             {"Error": {"Code": "SomeError", "Message": "Some error message"}},
             "generate_presigned_url",
@@ -106,14 +101,14 @@ async def test_get_upload_presigned_url_unexpected_error(client, mock_db):
     """
     Test getting a presigned URL when an unexpected error occurs
     """
-    with patch("api.routes.file.boto3.client") as mock_boto3_client, patch(
+    with patch("api.routes.file.get_s3_client") as mock_get_s3_client, patch(
         "api.routes.file.settings.s3_folder_name", "test-folder"
     ), patch("api.routes.file.settings.s3_bucket_name", "test-bucket"), patch(
         "api.routes.file.traceback.print_exc"
     ) as mock_traceback:
 
         # Setup mocks to raise unexpected error
-        mock_boto3_client.side_effect = ValueError("Unexpected error")
+        mock_get_s3_client.side_effect = ValueError("Unexpected error")
 
         request_body = {"content_type": "image/jpeg"}
 
@@ -131,13 +126,13 @@ async def test_get_download_presigned_url_success(client, mock_db):
     """
     Test getting a presigned URL for downloading a file successfully
     """
-    with patch("api.routes.file.boto3.client") as mock_boto3_client, patch(
+    with patch("api.routes.file.get_s3_client") as mock_get_s3_client, patch(
         "api.routes.file.settings.s3_folder_name", "test-folder"
     ), patch("api.routes.file.settings.s3_bucket_name", "test-bucket"):
 
         # Setup mocks
         mock_s3 = MagicMock()
-        mock_boto3_client.return_value = mock_s3
+        mock_get_s3_client.return_value = mock_s3
         mock_s3.generate_presigned_url.return_value = (
             "https://presigned-url.example.com/download"
         )
@@ -155,11 +150,7 @@ async def test_get_download_presigned_url_success(client, mock_db):
         assert response.json() == {"url": "https://presigned-url.example.com/download"}
 
         # Assert mocks called correctly
-        mock_boto3_client.assert_called_with(
-            "s3",
-            region_name="ap-south-1",
-            config=ANY,
-        )
+        mock_get_s3_client.assert_called_once()
         mock_s3.generate_presigned_url.assert_called_with(
             "get_object",
             Params={
@@ -194,13 +185,13 @@ async def test_get_download_presigned_url_client_error(client, mock_db):
     """
     Test getting a download presigned URL when boto3 client raises an error
     """
-    with patch("api.routes.file.boto3.client") as mock_boto3_client, patch(
+    with patch("api.routes.file.get_s3_client") as mock_get_s3_client, patch(
         "api.routes.file.settings.s3_folder_name", "test-folder"
     ), patch("api.routes.file.settings.s3_bucket_name", "test-bucket"):
 
         # Setup mocks to raise error
         mock_s3 = MagicMock()
-        mock_boto3_client.return_value = mock_s3
+        mock_get_s3_client.return_value = mock_s3
         mock_s3.generate_presigned_url.side_effect = ClientError(
             {"Error": {"Code": "SomeError", "Message": "Some error message"}},
             "generate_presigned_url",
@@ -226,14 +217,14 @@ async def test_get_download_presigned_url_unexpected_error(client, mock_db):
     """
     Test getting a download presigned URL when an unexpected error occurs
     """
-    with patch("api.routes.file.boto3.client") as mock_boto3_client, patch(
+    with patch("api.routes.file.get_s3_client") as mock_get_s3_client, patch(
         "api.routes.file.settings.s3_folder_name", "test-folder"
     ), patch("api.routes.file.settings.s3_bucket_name", "test-bucket"), patch(
         "api.routes.file.traceback.print_exc"
     ) as mock_traceback:
 
         # Setup mocks to raise unexpected error
-        mock_boto3_client.side_effect = RuntimeError("Unexpected runtime error")
+        mock_get_s3_client.side_effect = RuntimeError("Unexpected runtime error")
 
         uuid = "test-uuid"
         file_extension = "jpeg"
@@ -250,15 +241,15 @@ async def test_get_download_presigned_url_unexpected_error(client, mock_db):
 
 
 @pytest.mark.asyncio
-async def test_upload_file_locally_success(client, mock_db):
+async def test_upload_file_locally_success(client, mock_db, tmp_path):
     """
     Test uploading a file locally successfully
     """
-    with patch("api.routes.file.os.makedirs") as mock_makedirs, patch(
-        "api.routes.file.open", mock_open()
-    ) as mock_file, patch("api.routes.file.uuid.uuid4") as mock_uuid, patch(
-        "api.routes.file.settings.local_upload_folder", "/tmp/uploads"
-    ):
+    upload_folder = str(tmp_path / "uploads")
+
+    with patch("api.routes.file.uuid.uuid4") as mock_uuid, patch(
+        "api.routes.file.settings.local_upload_folder", upload_folder
+    ), patch("api.routes.file.settings.s3_folder_name", None):
 
         # Setup mocks
         mock_uuid.return_value = "test-uuid"
@@ -274,14 +265,13 @@ async def test_upload_file_locally_success(client, mock_db):
         assert response.status_code == status.HTTP_200_OK
         result = response.json()
         assert result["file_key"] == "test-uuid.jpeg"
-        assert result["file_path"] == "/tmp/uploads/test-uuid.jpeg"
+        assert result["file_path"] == os.path.join(upload_folder, "test-uuid.jpeg")
         assert result["file_uuid"] == "test-uuid"
         assert result["static_url"] == "/uploads/test-uuid.jpeg"
 
-        # Assert mocks called correctly
-        mock_makedirs.assert_called_with("/tmp/uploads", exist_ok=True)
-        mock_file.assert_called_with("/tmp/uploads/test-uuid.jpeg", "wb")
-        mock_file().write.assert_called_once()
+        # Assert the file was written to the upload folder
+        with open(os.path.join(upload_folder, "test-uuid.jpeg"), "rb") as f:
+            assert f.read() == b"test content"
 
 
 @pytest.mark.asyncio
@@ -289,11 +279,13 @@ async def test_upload_file_locally_error(client, mock_db):
     """
     Test uploading a file locally with an error
     """
-    with patch("api.routes.file.os.makedirs") as mock_makedirs, patch(
+    with patch("api.routes.file.get_storage") as mock_get_storage, patch(
         "api.routes.file.traceback.print_exc"
     ) as mock_traceback:
         # Setup mocks to raise error
-        mock_makedirs.side_effect = Exception("File system error")
+        mock_get_storage.return_value.write = AsyncMock(
+            side_effect=Exception("File system error")
+        )
 
         # Make request with multipart form data
         response = client.post(
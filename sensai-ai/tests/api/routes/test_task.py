@@ -199,7 +199,9 @@ async def test_update_draft_quiz(client, mock_db):
     """
     Test updating a draft quiz
     """
-    with patch("api.routes.task.update_draft_quiz_in_db") as mock_update:
+    with patch("api.routes.task.update_draft_quiz_in_db") as mock_update, patch(
+        "api.routes.task.precompute_routing_decisions"
+    ) as mock_precompute:
         task_id = 1
         # Use the correct structure that matches CreateQuestionRequest
         request_body = {
@@ -280,7 +282,10 @@ async def test_update_draft_quiz(client, mock_db):
         assert result["title"] == expected_response["title"]
         assert result["type"] == expected_response["type"]
         assert result["status"] == expected_response["status"]
-        assert result["questions"][0]["title"] == expected_response["questions"][0]["title"]
+        assert (
+            result["questions"][0]["title"]
+            == expected_response["questions"][0]["title"]
+        )
 
         # The request is processed by Pydantic models, so we need to check with ANY
         mock_update.assert_called_with(
@@ -291,6 +296,9 @@ async def test_update_draft_quiz(client, mock_db):
             status=ANY,
         )
 
+        # routing decisions are only precomputed for published quizzes
+        mock_precompute.assert_not_called()
+
         # Test task not found
         mock_update.reset_mock()
         mock_update.return_value = None
@@ -306,7 +314,9 @@ async def test_update_published_quiz(client, mock_db):
     """
     Test updating a published quiz
     """
-    with patch("api.routes.task.update_published_quiz_in_db") as mock_update:
+    with patch("api.routes.task.update_published_quiz_in_db") as mock_update, patch(
+        "api.routes.task.precompute_routing_decisions"
+    ) as mock_precompute:
         task_id = 1
         request_body = {
             "title": "Updated Quiz Task",
@@ -355,7 +365,10 @@ async def test_update_published_quiz(client, mock_db):
         assert result["id"] == expected_response["id"]
         assert result["title"] == expected_response["title"]
         assert result["type"] == expected_response["type"]
-        assert result["questions"][0]["title"] == expected_response["questions"][0]["title"]
+        assert (
+            result["questions"][0]["title"]
+            == expected_response["questions"][0]["title"]
+        )
 
         # The request is processed by Pydantic models, so we need to check with ANY
         mock_update.assert_called_with(
@@ -365,12 +378,17 @@ async def test_update_published_quiz(client, mock_db):
             scheduled_publish_at=ANY,
         )
 
+        mock_precompute.assert_called_once_with(expected_response)
+
         # Test task not found
         mock_update.reset_mock()
+        mock_precompute.reset_mock()
         mock_update.return_value = None
 
         response = client.put(f"/tasks/{task_id}/quiz", json=request_body)
 
+        mock_precompute.assert_not_called()
+
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert response.json() == {"detail": "Task not found"}
 
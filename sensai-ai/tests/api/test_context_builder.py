@@ -0,0 +1,177 @@
+import pytest
+from unittest.mock import patch
+from src.api.context_builder import (
+    ConversationSummaryCache,
+    build_chat_context,
+    count_message_tokens,
+    get_text_content,
+    get_prompt_cache_metadata,
+    AUDIO_RESPONSE_PLACEHOLDER,
+)
+
+
+def make_chat_history(num_turns: int, length: int = 40):
+    chat_history = []
+    for turn in range(num_turns):
+        chat_history.append({"role": "user", "content": f"answer {turn} " * length})
+        chat_history.append(
+            {"role": "assistant", "content": f"feedback {turn} " * length}
+        )
+
+    return chat_history
+
+
+@pytest.fixture(autouse=True)
+def summaries():
+    cache = ConversationSummaryCache()
+    with patch("src.api.context_builder.conversation_summaries", cache):
+        yield cache
+
+
+def test_count_message_tokens():
+    """Test that audio is counted by its duration rather than its base64 length."""
+    text_tokens = count_message_tokens({"role": "user", "content": "hello"})
+    audio_tokens = count_message_tokens(
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "hello"},
+                {"type": "input_audio", "input_audio": {"data": "A" * 42668}},
+            ],
+        }
+    )
+
+    assert text_tokens > 0
+    # 32000 bytes of audio
+    assert audio_tokens == text_tokens + 10
+
+
+def test_get_text_content():
+    """Test that audio is left out of the text of a message."""
+    message = {
+        "role": "user",
+        "content": [
+            {"type": "text", "text": "Student's Response:"},
+            {"type": "input_audio", "input_audio": {"data": "abc"}},
+        ],
+    }
+
+    assert (
+        get_text_content(message)
+        == f"Student's Response:\n{AUDIO_RESPONSE_PLACEHOLDER}"
+    )
+
+
+@pytest.mark.asyncio
+class TestBuildChatContext:
+    @patch("src.api.context_builder.summarize_messages")
+    async def test_within_budget(self, mock_summarize):
+        """Test that a history within the budget is sent as it is."""
+        chat_history = make_chat_history(3)
+
+        context, metadata = await build_chat_context(
+            chat_history, "session", token_budget=100000
+        )
+
+        assert context == chat_history
+        assert metadata["context_tokens_before"] == metadata["context_tokens_after"]
+        assert metadata["context_summarized_messages"] == 0
+        mock_summarize.assert_not_called()
+
+    @patch("src.api.context_builder.chat_context_verbatim_turns", 2)
+    @patch("src.api.context_builder.summarize_messages")
+    async def test_older_turns_summarized(self, mock_summarize):
+        """Test that all but the last turns are replaced by a summary."""
+        mock_summarize.return_value = "summary"
+        chat_history = make_chat_history(10)
+
+        context, metadata = await build_chat_context(
+            chat_history, "session", token_budget=500
+        )
+
+        mock_summarize.assert_called_once_with("", chat_history[:16])
+        assert context[0]["content"].endswith("```\nsummary\n```")
+        assert context[1:] == chat_history[16:]
+        assert metadata["context_tokens_after"] < metadata["context_tokens_before"]
+        assert metadata["context_summarized_messages"] == 16
+
+    @patch("src.api.context_builder.chat_context_verbatim_turns", 2)
+    @patch("src.api.context_builder.chat_context_summary_batch_turns", 2)
+    @patch("src.api.context_builder.summarize_messages")
+    async def test_summary_extended_incrementally(self, mock_summarize):
+        """Test that the summary is only extended once enough turns have piled up."""
+        mock_summarize.return_value = "summary"
+        chat_history = make_chat_history(10)
+        await build_chat_context(chat_history, "session", token_budget=1000)
+
+        # one more turn is kept as it is
+        chat_history += make_chat_history(1)
+        context, _ = await build_chat_context(
+            chat_history, "session", token_budget=1000
+        )
+
+        mock_summarize.assert_called_once()
+        assert context[1:] == chat_history[16:]
+
+        # the next one summarizes the turns since the last summary
+        mock_summarize.return_value = "new summary"
+        chat_history += make_chat_history(1)
+        context, _ = await build_chat_context(
+            chat_history, "session", token_budget=1000
+        )
+
+        mock_summarize.assert_called_with("summary", chat_history[16:20])
+        assert context[0]["content"].endswith("```\nnew summary\n```")
+        assert context[1:] == chat_history[20:]
+
+    @patch("src.api.context_builder.chat_context_verbatim_turns", 4)
+    @patch("src.api.context_builder.summarize_messages")
+    async def test_recent_turns_reduced_to_fit(self, mock_summarize):
+        """Test that fewer turns are kept as they are if they do not fit the budget."""
+        mock_summarize.return_value = "summary"
+        chat_history = make_chat_history(6)
+
+        context, _ = await build_chat_context(chat_history, "session", token_budget=250)
+
+        assert context[1:] == chat_history[-2:]
+
+    @patch("src.api.context_builder.chat_context_verbatim_turns", 2)
+    @patch("src.api.context_builder.summarize_messages")
+    async def test_summary_rebuilt_when_history_changes(
+        self, mock_summarize, summaries
+    ):
+        """Test that a summary of messages that have since changed is not used."""
+        mock_summarize.return_value = "summary"
+        await build_chat_context(make_chat_history(10), "session", token_budget=500)
+
+        chat_history = make_chat_history(10, length=41)
+        await build_chat_context(chat_history, "session", token_budget=500)
+
+        mock_summarize.assert_called_with("", chat_history[:16])
+        assert summaries.get_metrics()["misses"] == 2
+
+    @patch("src.api.context_builder.chat_context_verbatim_turns", 2)
+    @patch("src.api.context_builder.summarize_messages")
+    async def test_summary_failure(self, mock_summarize):
+        """Test that only the recent turns are sent if summarizing fails."""
+        mock_summarize.side_effect = Exception("API error")
+        chat_history = make_chat_history(10)
+
+        context, metadata = await build_chat_context(
+            chat_history, "session", token_budget=500
+        )
+
+        assert context == chat_history[16:]
+        assert metadata["context_summarized_messages"] == 0
+
+
+def test_get_prompt_cache_metadata():
+    """Test the share of the prompt's tokens that were cached, if usage was reported."""
+    assert get_prompt_cache_metadata(
+        {"prompt_tokens": 300, "cached_tokens": 256, "completion_tokens": 20}
+    ) == {
+        "prompt_tokens": 300,
+        "cached_prompt_tokens": 256,
+        "cached_token_ratio": 0.8533,
+    }
+    assert get_prompt_cache_metadata({}) == {}
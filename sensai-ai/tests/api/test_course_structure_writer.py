@@ -0,0 +1,195 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.api.course_structure_writer import CourseStructureWriter
+
+
+def make_task(name, type="quiz"):
+    return SimpleNamespace(name=name, description="", type=type)
+
+
+def make_concept(*tasks):
+    return SimpleNamespace(name="Concept", description="", tasks=list(tasks))
+
+
+def make_module(name, *concepts):
+    return SimpleNamespace(name=name, concepts=list(concepts))
+
+
+class FakeCourseItems:
+    """Adds items with increasing ids, optionally waiting to be released first."""
+
+    def __init__(self):
+        self.batches = []
+        self.next_id = 100
+        self.release = None
+
+    async def add(self, course_id, modules, tasks, job_uuid=None):
+        self.batches.append((modules, tasks))
+        self.job_uuid = job_uuid
+
+        if self.release is not None:
+            await self.release.wait()
+
+        module_rows = []
+        for ordering, _ in enumerate(modules):
+            module_rows.append((self.next_id, ordering))
+            self.next_id += 1
+
+        task_rows = []
+        for ordering, _ in enumerate(tasks):
+            task_rows.append((self.next_id, ordering))
+            self.next_id += 1
+
+        return module_rows, task_rows
+
+
+@pytest.fixture
+def course_items():
+    fake = FakeCourseItems()
+
+    with patch(
+        "src.api.course_structure_writer.add_generated_course_items",
+        side_effect=fake.add,
+    ):
+        yield fake
+
+
+@pytest.fixture
+def manager():
+    manager = MagicMock()
+    manager.send_item_updates = AsyncMock()
+
+    with patch("src.api.course_structure_writer.get_manager", return_value=manager):
+        yield manager
+
+
+def get_events(manager):
+    return [
+        (event["event"], event.get("module", event.get("task"))["name"])
+        for call in manager.send_item_updates.call_args_list
+        for event in call[0][1]
+    ]
+
+
+@pytest.mark.asyncio
+class TestCourseStructureWriter:
+    async def test_items_added_once_as_they_stream_in(self, course_items, manager):
+        """Test that every module and task is added once, in the order it streams in."""
+        partials = [
+            [make_module("Module 1")],
+            [make_module("Module 1", make_concept())],
+            [make_module("Module 1", make_concept(make_task("Task 1", "")))],
+            [make_module("Module 1", make_concept(make_task("Task 1")))],
+            [
+                make_module(
+                    "Module 1",
+                    make_concept(make_task("Task 1"), make_task("Task 2")),
+                ),
+                make_module("Module 2", make_concept(make_task("Task 3"))),
+            ],
+        ]
+
+        async with CourseStructureWriter(1, "job") as writer:
+            for modules in partials:
+                writer.update(modules)
+                # let the writer catch up after every chunk
+                await asyncio.sleep(0)
+
+        # what is added is recorded in the job for a retry to remove
+        assert course_items.job_uuid == "job"
+        # the modules of a batch are sent before its tasks
+        assert get_events(manager) == [
+            ("module_created", "Module 1"),
+            ("task_created", "Task 1"),
+            ("module_created", "Module 2"),
+            ("task_created", "Task 2"),
+            ("task_created", "Task 3"),
+        ]
+        assert len(writer.module_ids) == 2
+        assert len(writer.task_ids) == 3
+
+    async def test_stream_does_not_wait_on_writes(self, course_items, manager):
+        """Test that items seen during a write are added together in the next batch."""
+        course_items.release = asyncio.Event()
+
+        async with CourseStructureWriter(1) as writer:
+            writer.update([make_module("Module 1", make_concept())])
+            await asyncio.sleep(0)
+
+            # the first write is still in progress
+            writer.update(
+                [
+                    make_module(
+                        "Module 1",
+                        make_concept(make_task("Task 1"), make_task("Task 2")),
+                    ),
+                    make_module("Module 2", make_concept(make_task("Task 3"))),
+                ]
+            )
+            assert len(course_items.batches) == 1
+
+            course_items.release.set()
+
+        assert len(course_items.batches) == 2
+        modules, tasks = course_items.batches[1]
+        assert [module["name"] for module in modules] == ["Module 2"]
+        # tasks of a module added earlier point to it, the rest to the batch
+        assert tasks == [
+            {"name": "Task 1", "type": "quiz", "milestone_id": 100},
+            {"name": "Task 2", "type": "quiz", "milestone_id": 100},
+            {"name": "Task 3", "type": "quiz", "module_index": 0},
+        ]
+        assert writer.num_batches == 2
+        assert manager.send_item_updates.call_count == 2
+
+    async def test_add_ids(self, course_items, manager):
+        """Test that the final structure gets the ids and loses the items never added."""
+        async with CourseStructureWriter(1) as writer:
+            writer.update(
+                [
+                    make_module(
+                        "Module 1",
+                        make_concept(make_task("Task 1"), make_task("Exam", "exam")),
+                    ),
+                    make_module("Module 2", make_concept()),
+                ]
+            )
+
+        structure = writer.add_ids(
+            {
+                "modules": [
+                    {
+                        "name": "Module 1",
+                        "concepts": [{"tasks": [{"name": "Task 1"}, {"name": "Exam"}]}],
+                    },
+                    {"name": "Module 2", "concepts": [{"tasks": []}]},
+                    {"name": "Module 3", "concepts": []},
+                ]
+            }
+        )
+
+        assert [module["name"] for module in structure["modules"]] == [
+            "Module 1",
+            "Module 2",
+        ]
+        assert structure["modules"][0]["concepts"][0]["tasks"] == [
+            {"name": "Task 1", "id": writer.task_ids[(0, 0, 0)]}
+        ]
+        assert structure["modules"][1]["id"] == writer.module_ids[1]
+
+    async def test_write_error(self, manager):
+        """Test that a failed write stops the stream and is raised."""
+        with patch(
+            "src.api.course_structure_writer.add_generated_course_items",
+            side_effect=Exception("database is locked"),
+        ):
+            with pytest.raises(Exception, match="database is locked"):
+                async with CourseStructureWriter(1) as writer:
+                    writer.update([make_module("Module 1", make_concept())])
+                    await asyncio.sleep(0)
+
+                    writer.update([make_module("Module 1", make_concept())])
+
+        manager.send_item_updates.assert_not_called()
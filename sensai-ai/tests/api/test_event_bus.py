@@ -0,0 +1,213 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.api.event_bus import (
+    EventBus,
+    InProcessEventBus,
+    SQLiteEventBus,
+    Message,
+    get_event_bus,
+)
+
+
+def make_messages(*payloads):
+    return [Message(payload, None, False) for payload in payloads]
+
+
+class FakeEventsTable:
+    """Stands in for the websocket events table shared by the processes."""
+
+    def __init__(self):
+        self.events = []
+
+    async def add(self, course_id, events):
+        for payload, coalesce_key, droppable in events:
+            self.events.append(
+                (
+                    len(self.events) + 1,
+                    course_id,
+                    payload,
+                    coalesce_key,
+                    droppable,
+                    None,
+                )
+            )
+
+    async def add_cache_events(self, events, origin):
+        for payload in events:
+            self.events.append(
+                (len(self.events) + 1, None, payload, None, False, origin)
+            )
+
+    async def get_last_id(self):
+        return len(self.events)
+
+    async def get(self, after_id, limit):
+        return [event for event in self.events if event[0] > after_id][:limit]
+
+
+@pytest.fixture
+def events_table():
+    table = FakeEventsTable()
+
+    with patch("src.api.event_bus.add_websocket_events", side_effect=table.add), patch(
+        "src.api.event_bus.add_cache_events", side_effect=table.add_cache_events
+    ), patch(
+        "src.api.event_bus.get_last_websocket_event_id", side_effect=table.get_last_id
+    ), patch(
+        "src.api.event_bus.get_websocket_events", side_effect=table.get
+    ), patch(
+        "src.api.event_bus.delete_websocket_events", new_callable=AsyncMock
+    ):
+        yield table
+
+
+def test_get_event_bus():
+    """Test that event buses are picked by name."""
+    assert isinstance(get_event_bus("memory"), InProcessEventBus)
+    assert isinstance(get_event_bus("sqlite"), SQLiteEventBus)
+
+    with pytest.raises(ValueError, match="Unknown websocket event bus"):
+        get_event_bus("redis")
+
+
+def test_event_bus_is_abstract():
+    """Test that an event bus has to say how it publishes."""
+    with pytest.raises(TypeError):
+        EventBus()
+
+
+@pytest.mark.asyncio
+class TestEventBus:
+    async def test_in_process(self):
+        """Test that updates are handed straight to the subscriber."""
+        delivered = []
+        bus = InProcessEventBus()
+
+        # nothing to hand them to yet
+        await bus.publish(1, make_messages("a"))
+
+        bus.subscribe(
+            lambda course_id, messages: delivered.append((course_id, messages))
+        )
+        await bus.publish(1, make_messages("b"))
+
+        assert delivered == [(1, make_messages("b"))]
+
+        # there is no other process to replay cache invalidations in
+        replayed = []
+        bus.subscribe_cache_events(replayed.append)
+        await bus.publish_cache_events(["event"])
+
+        assert not bus.between_processes
+        assert replayed == []
+
+    async def test_sqlite_across_processes(self, events_table):
+        """Test that updates published by one process reach the subscriber of another."""
+        delivered = []
+        await events_table.add(1, make_messages("sent before the start"))
+
+        publisher = SQLiteEventBus()
+        subscriber = SQLiteEventBus(poll_interval=0.01, batch_size=2)
+        subscriber.subscribe(
+            lambda course_id, messages: delivered.append((course_id, messages))
+        )
+        await subscriber.start()
+
+        try:
+            await publisher.publish(1, make_messages("a", "b"))
+            await publisher.publish(2, make_messages("c"))
+            await publisher.publish(1, [Message("d", "key", True)])
+
+            async def wait():
+                while subscriber.received < 4:
+                    await asyncio.sleep(0.01)
+
+            await asyncio.wait_for(wait(), 1)
+        finally:
+            await subscriber.stop()
+
+        # the consecutive updates of a course are handed over together, in order
+        assert delivered == [
+            (1, make_messages("a", "b")),
+            (2, make_messages("c")),
+            (1, [Message("d", "key", True)]),
+        ]
+        assert publisher.get_metrics()["published"] == 4
+        assert subscriber.get_metrics() == {
+            "type": "sqlite",
+            "running": False,
+            "last_event_id": 5,
+            "published": 0,
+            "received": 4,
+            "errors": 0,
+        }
+
+    async def test_sqlite_cache_events(self, events_table):
+        """Test that cache invalidations are replayed by every other process, in order."""
+        updates, replayed = [], []
+        publisher = SQLiteEventBus()
+        publisher.subscribe(lambda course_id, messages: None)
+        publisher.subscribe_cache_events(
+            lambda events: replayed.append(("self", events))
+        )
+        subscriber = SQLiteEventBus(poll_interval=0.01)
+        subscriber.subscribe(
+            lambda course_id, messages: updates.append((course_id, messages))
+        )
+        subscriber.subscribe_cache_events(lambda events: replayed.append(events))
+        await publisher.start()
+        await subscriber.start()
+
+        try:
+            await publisher.publish_cache_events(["a", "b"])
+            await publisher.publish(1, make_messages("c"))
+            await publisher.publish_cache_events(["d"])
+
+            async def wait():
+                while subscriber.received < 4 or publisher.received < 4:
+                    await asyncio.sleep(0.01)
+
+            await asyncio.wait_for(wait(), 1)
+        finally:
+            await publisher.stop()
+            await subscriber.stop()
+
+        # the publisher has already applied its own
+        assert replayed == [["a", "b"], ["d"]]
+        assert updates == [(1, make_messages("c"))]
+        assert publisher.get_metrics()["published"] == 4
+
+    async def test_sqlite_publish_error(self, events_table):
+        """Test that an update that cannot be published does not fail the sender."""
+        bus = SQLiteEventBus()
+
+        with patch(
+            "src.api.event_bus.add_websocket_events",
+            side_effect=Exception("database is locked"),
+        ):
+            await bus.publish(1, make_messages("a"))
+
+        with patch(
+            "src.api.event_bus.add_cache_events",
+            side_effect=Exception("database is locked"),
+        ):
+            await bus.publish_cache_events(["a"])
+
+        assert bus.errors == 2
+
+    async def test_sqlite_poll_errors_logged(self, events_table):
+        """Test that the bus keeps polling after the table could not be read."""
+        bus = SQLiteEventBus(poll_interval=0.01)
+        bus.subscribe(lambda course_id, messages: None)
+
+        with patch(
+            "src.api.event_bus.get_websocket_events",
+            side_effect=[Exception("database is locked")] + [[]] * 100,
+        ) as mock_get_events:
+            await bus.start()
+            await asyncio.sleep(0.05)
+            await bus.stop()
+
+        assert bus.errors == 1
+        assert mock_get_events.call_count >= 2
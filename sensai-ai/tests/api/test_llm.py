@@ -1,12 +1,14 @@
 import pytest
-from unittest.mock import patch, MagicMock, AsyncMock
+from unittest.mock import patch, MagicMock, AsyncMock, ANY
 from pydantic import BaseModel
+from openai.types.chat import ChatCompletionChunk
 from src.api.llm import (
     is_reasoning_model,
     validate_openai_api_key,
     run_llm_with_instructor,
     stream_llm_with_instructor,
     stream_llm_with_openai,
+    OpenAIClientRegistry,
 )
 
 
@@ -119,11 +121,12 @@ class TestRunLlmWithInstructor:
     class MockResponseModel(BaseModel):
         response: str
 
+    @patch("src.api.llm.openai_clients", new_callable=OpenAIClientRegistry)
     @patch("src.api.llm.instructor.from_openai")
     @patch("src.api.llm.openai.AsyncOpenAI")
     @patch("src.api.llm.is_reasoning_model")
     async def test_run_llm_with_instructor_non_reasoning(
-        self, mock_is_reasoning, mock_async_openai, mock_instructor
+        self, mock_is_reasoning, mock_async_openai, mock_instructor, _
     ):
         """Test run_llm_with_instructor with non-reasoning model."""
         # Setup mocks
@@ -144,7 +147,7 @@ class TestRunLlmWithInstructor:
 
         # Assertions
         assert result == mock_response
-        mock_async_openai.assert_called_once_with(api_key="test_key")
+        mock_async_openai.assert_called_once_with(api_key="test_key", http_client=ANY)
         mock_instructor.assert_called_once()
         mock_client.chat.completions.create.assert_called_once()
 
@@ -152,11 +155,12 @@ class TestRunLlmWithInstructor:
         call_kwargs = mock_client.chat.completions.create.call_args[1]
         assert call_kwargs["temperature"] == 0
 
+    @patch("src.api.llm.openai_clients", new_callable=OpenAIClientRegistry)
     @patch("src.api.llm.instructor.from_openai")
     @patch("src.api.llm.openai.AsyncOpenAI")
     @patch("src.api.llm.is_reasoning_model")
     async def test_run_llm_with_instructor_reasoning(
-        self, mock_is_reasoning, mock_async_openai, mock_instructor
+        self, mock_is_reasoning, mock_async_openai, mock_instructor, _
     ):
         """Test run_llm_with_instructor with reasoning model."""
         # Setup mocks
@@ -177,7 +181,7 @@ class TestRunLlmWithInstructor:
 
         # Assertions
         assert result == mock_response
-        mock_async_openai.assert_called_once_with(api_key="test_key")
+        mock_async_openai.assert_called_once_with(api_key="test_key", http_client=ANY)
         mock_instructor.assert_called_once()
         mock_client.chat.completions.create.assert_called_once()
 
@@ -193,11 +197,12 @@ class TestStreamLlmWithInstructor:
     class MockResponseModel(BaseModel):
         response: str
 
+    @patch("src.api.llm.openai_clients", new_callable=OpenAIClientRegistry)
     @patch("src.api.llm.instructor.from_openai")
     @patch("src.api.llm.openai.AsyncOpenAI")
     @patch("src.api.llm.is_reasoning_model")
     async def test_stream_llm_with_instructor_success(
-        self, mock_is_reasoning, mock_async_openai, mock_instructor
+        self, mock_is_reasoning, mock_async_openai, mock_instructor, _
     ):
         """Test stream_llm_with_instructor function."""
         # Setup mocks
@@ -219,7 +224,7 @@ class TestStreamLlmWithInstructor:
 
         # Assertions
         assert result == mock_stream
-        mock_async_openai.assert_called_once_with(api_key="test_key")
+        mock_async_openai.assert_called_once_with(api_key="test_key", http_client=ANY)
         mock_instructor.assert_called_once()
         mock_client.chat.completions.create_partial.assert_called_once()
 
@@ -228,6 +233,69 @@ class TestStreamLlmWithInstructor:
         assert call_kwargs["extra_param"] == "test"
         assert call_kwargs["stream"] is True
 
+    @patch("src.api.llm.openai_clients", new_callable=OpenAIClientRegistry)
+    @patch("src.api.llm.is_reasoning_model")
+    async def test_stream_llm_with_instructor_records_usage(self, mock_is_reasoning, _):
+        """Test that the token usage reported at the end of the stream is recorded."""
+        mock_is_reasoning.return_value = False
+
+        def make_chunk(arguments=None, usage=None):
+            chunk = {
+                "id": "chunk",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "gpt-4.1",
+                "choices": [],
+                "usage": usage,
+            }
+            if arguments is not None:
+                chunk["choices"] = [
+                    {
+                        "index": 0,
+                        "delta": {
+                            "tool_calls": [
+                                {"index": 0, "function": {"arguments": arguments}}
+                            ]
+                        },
+                    }
+                ]
+            return ChatCompletionChunk(**chunk)
+
+        async def mock_stream():
+            yield make_chunk('{"response": "hel')
+            yield make_chunk('lo"}')
+            yield make_chunk(
+                usage={
+                    "prompt_tokens": 100,
+                    "completion_tokens": 5,
+                    "total_tokens": 105,
+                    "prompt_tokens_details": {"cached_tokens": 64},
+                }
+            )
+
+        usage = {}
+        with patch(
+            "openai.resources.chat.completions.AsyncCompletions.create",
+            new=AsyncMock(return_value=mock_stream()),
+        ) as mock_create:
+            stream = await stream_llm_with_instructor(
+                api_key="test_key",
+                model="gpt-4.1",
+                messages=[{"role": "user", "content": "hello"}],
+                response_model=self.MockResponseModel,
+                max_completion_tokens=100,
+                usage=usage,
+            )
+            outputs = [output async for output in stream]
+
+        assert outputs[-1].response == "hello"
+        assert usage == {
+            "prompt_tokens": 100,
+            "cached_tokens": 64,
+            "completion_tokens": 5,
+        }
+        assert mock_create.call_args[1]["stream_options"] == {"include_usage": True}
+
 
 class TestStreamLlmWithOpenai:
     """Test the stream_llm_with_openai function."""
@@ -289,3 +357,71 @@ class TestStreamLlmWithOpenai:
         call_kwargs = mock_client.chat.completions.create.call_args[1]
         assert "temperature" not in call_kwargs
         assert call_kwargs["stream"] is True
+
+
+@pytest.mark.asyncio
+class TestOpenAIClientRegistry:
+    """Test the OpenAIClientRegistry class."""
+
+    async def test_clients_reused_per_api_key(self):
+        """Test that the same clients are returned for the same API key."""
+        registry = OpenAIClientRegistry()
+
+        client = registry.get_openai_client("key-1")
+
+        assert registry.get_openai_client("key-1") is client
+        assert registry.get_instructor_client(
+            "key-1"
+        ) is registry.get_instructor_client("key-1")
+        assert registry.get_openai_client("key-2") is not client
+
+        await registry.close()
+
+    async def test_connection_pool_shared(self):
+        """Test that clients for different API keys share one connection pool."""
+        registry = OpenAIClientRegistry()
+
+        client_1 = registry.get_openai_client("key-1")
+        client_2 = registry.get_openai_client("key-2")
+
+        assert client_1._client is client_2._client
+        assert client_1.api_key == "key-1"
+        assert client_2.api_key == "key-2"
+
+        await registry.close()
+
+    async def test_least_recently_used_evicted(self):
+        """Test that the least recently used client is dropped beyond max_clients."""
+        registry = OpenAIClientRegistry(max_clients=2)
+
+        client_1 = registry.get_openai_client("key-1")
+        registry.get_openai_client("key-2")
+        registry.get_openai_client("key-1")
+        registry.get_openai_client("key-3")
+
+        assert registry.get_metrics() == {"clients": 2, "max_clients": 2}
+        assert registry.get_openai_client("key-1") is client_1
+
+        # evicting a client must not close the shared pool
+        assert not client_1._client.is_closed
+
+        await registry.close()
+
+    async def test_close(self):
+        """Test that close shuts the shared connection pool and drops all clients."""
+        registry = OpenAIClientRegistry()
+
+        client = registry.get_openai_client("key-1")
+        http_client = client._client
+
+        await registry.close()
+
+        assert http_client.is_closed
+        assert registry.get_metrics()["clients"] == 0
+        assert registry.get_openai_client("key-1") is not client
+
+        await registry.close()
+
+    async def test_close_without_clients(self):
+        """Test that closing an unused registry is a no-op."""
+        await OpenAIClientRegistry().close()
@@ -8,18 +8,28 @@ import os
 class TestLifespan:
     """Test the lifespan context manager."""
 
+    @patch("src.api.main.leaderboards")
     @patch("src.api.main.scheduler")
     @patch("src.api.main.os.makedirs")
     @patch("src.api.main.asyncio.create_task")
+    @patch("src.api.main.JobWorker")
     @patch("src.api.main.settings")
     async def test_lifespan_startup_and_shutdown(
-        self, mock_settings, mock_create_task, mock_makedirs, mock_scheduler
+        self,
+        mock_settings,
+        mock_job_worker,
+        mock_create_task,
+        mock_makedirs,
+        mock_scheduler,
+        mock_leaderboards,
     ):
         """Test the lifespan context manager startup and shutdown."""
         from src.api.main import lifespan
 
         # Setup mocks
         mock_settings.local_upload_folder = "/test/uploads"
+        mock_settings.run_job_worker = True
+        mock_job_worker.return_value.stop = AsyncMock()
         mock_app = MagicMock()
 
         # Test the lifespan context manager
@@ -27,10 +37,42 @@ class TestLifespan:
             # Verify startup actions
             mock_scheduler.start.assert_called_once()
             mock_makedirs.assert_called_once_with("/test/uploads", exist_ok=True)
-            assert mock_create_task.call_count == 2  # Two async tasks created
+            # the job worker runs in the background
+            mock_create_task.assert_called_once()
+            mock_job_worker.return_value.run.assert_called_once()
+            mock_leaderboards.load_snapshot.assert_called_once()
+            mock_leaderboards.save_snapshot.assert_not_called()
+            mock_job_worker.return_value.stop.assert_not_called()
 
         # Verify shutdown actions
         mock_scheduler.shutdown.assert_called_once()
+        mock_leaderboards.save_snapshot.assert_called_once()
+        mock_job_worker.return_value.stop.assert_awaited_once()
+
+    @patch("src.api.main.leaderboards")
+    @patch("src.api.main.scheduler")
+    @patch("src.api.main.os.makedirs")
+    @patch("src.api.main.asyncio.create_task")
+    @patch("src.api.main.JobWorker")
+    @patch("src.api.main.settings")
+    async def test_lifespan_without_job_worker(
+        self,
+        mock_settings,
+        mock_job_worker,
+        mock_create_task,
+        mock_makedirs,
+        mock_scheduler,
+        mock_leaderboards,
+    ):
+        """Test that no job worker is started when the workers run on their own."""
+        from src.api.main import lifespan
+
+        mock_settings.local_upload_folder = "/test/uploads"
+        mock_settings.run_job_worker = False
+
+        async with lifespan(MagicMock()):
+            mock_job_worker.assert_not_called()
+            mock_create_task.assert_not_called()
 
 
 class TestAppConfiguration:
@@ -78,6 +120,86 @@ class TestHealthEndpoint:
         assert response.status_code == 200
         assert response.json() == {"status": "ok"}
 
+    def test_db_health_check_endpoint(self):
+        """Test the db health endpoint returns the connection pool metrics."""
+        from src.api.main import app
+
+        client = TestClient(app)
+        response = client.get("/health/db")
+
+        assert response.status_code == 200
+        assert set(response.json().keys()) == {"writer", "readers"}
+
+    def test_cache_health_check_endpoint(self):
+        """Test the cache health endpoint returns the metrics of the in-memory caches."""
+        from src.api.main import app
+
+        client = TestClient(app)
+        response = client.get("/health/caches")
+
+        assert response.status_code == 200
+        assert set(response.json()["course_tree"].keys()) == {
+            "size",
+            "max_size",
+            "hits",
+            "misses",
+        }
+
+    def test_llm_concurrency_check_endpoint(self):
+        """Test the LLM endpoint returns the metrics of the concurrency limiter."""
+        from src.api.main import app
+
+        client = TestClient(app)
+        response = client.get("/health/llm")
+
+        assert response.status_code == 200
+        assert {"limit", "in_flight", "waiting", "rate_limited"} <= set(
+            response.json().keys()
+        )
+
+    @patch("src.api.main.get_job_queue_metrics")
+    def test_job_queue_check_endpoint(self, mock_get_metrics):
+        """Test the jobs endpoint returns the number of jobs of each kind and status."""
+        from src.api.main import app
+
+        mock_get_metrics.return_value = {"task": {"queued": 3, "leased": 1}}
+
+        client = TestClient(app)
+        response = client.get("/health/jobs")
+
+        assert response.status_code == 200
+        assert response.json() == {"task": {"queued": 3, "leased": 1}}
+
+    def test_websocket_check_endpoint(self):
+        """Test the websockets endpoint returns the queue depths of each course."""
+        from src.api.main import app
+
+        client = TestClient(app)
+        response = client.get("/health/websockets")
+
+        assert response.status_code == 200
+        assert {"connections", "sent", "dropped", "courses"} <= set(
+            response.json().keys()
+        )
+
+    @patch("src.api.main.query_stats")
+    def test_db_query_stats_endpoint(self, mock_query_stats):
+        """Test the query stats endpoint returns the query timing summary."""
+        from src.api.main import app
+
+        mock_query_stats.get_summary.return_value = {
+            "slow_query_threshold_ms": 200,
+            "queries": [],
+            "slow_queries": [],
+        }
+
+        client = TestClient(app)
+        response = client.get("/health/db/queries?limit=10")
+
+        assert response.status_code == 200
+        assert response.json()["queries"] == []
+        mock_query_stats.get_summary.assert_called_once_with(10)
+
 
 class TestRouterInclusion:
     """Test that all routers are properly included."""
@@ -0,0 +1,223 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from src.api.model_router import (
+    RoutingDecisionCache,
+    construct_question_details,
+    get_content_hash,
+    should_use_reasoning_model,
+    precompute_routing_decisions,
+)
+
+
+def make_block(text: str):
+    return {"type": "paragraph", "content": [{"type": "text", "text": text}]}
+
+
+class TestConstructQuestionDetails:
+    def test_objective_question(self):
+        """Test that objective questions include the reference solution."""
+        question = {
+            "type": "objective",
+            "blocks": [make_block("What is 2 + 2?")],
+            "answer": [make_block("4")],
+        }
+
+        result = construct_question_details(question)
+
+        assert result.startswith("Task:\n```\nWhat is 2 + 2?")
+        assert "Reference Solution (never to be shared with the learner)" in result
+        assert result.endswith("```\n4\n\n```")
+
+    def test_subjective_question(self):
+        """Test that subjective questions include the scoring criteria."""
+        question = {
+            "type": "subjective",
+            "blocks": [make_block("Write an essay")],
+            "scorecard": {
+                "criteria": [
+                    {
+                        "name": "Clarity",
+                        "description": "Is it clear?",
+                        "min_score": 1,
+                        "max_score": 5,
+                    }
+                ]
+            },
+        }
+
+        result = construct_question_details(question)
+
+        assert "Scoring Criteria" in result
+        assert "- **Clarity** [min: 1, max: 5, pass: 5]: Is it clear?" in result
+
+
+class TestRoutingDecisionCache:
+    def test_get_and_set(self):
+        """Test that decisions are returned for the content they were made on."""
+        cache = RoutingDecisionCache()
+
+        assert cache.get("question_1", "hash") is None
+
+        cache.set("question_1", "hash", True)
+
+        assert cache.get("question_1", "hash") is True
+        assert cache.get_metrics()["hits"] == 1
+        assert cache.get_metrics()["misses"] == 1
+
+    def test_stale_content(self):
+        """Test that editing a question makes its cached decision stale."""
+        cache = RoutingDecisionCache()
+
+        cache.set("question_1", "old-hash", False)
+
+        assert cache.get("question_1", "new-hash") is None
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used decisions are evicted beyond max_size."""
+        cache = RoutingDecisionCache(max_size=2)
+
+        cache.set("question_1", "hash", False)
+        cache.set("question_2", "hash", False)
+        cache.get("question_1", "hash")
+        cache.set("question_3", "hash", True)
+
+        assert cache.get("question_2", "hash") is None
+        assert cache.get("question_1", "hash") is False
+        assert cache.get("question_3", "hash") is True
+
+
+@pytest.mark.asyncio
+class TestShouldUseReasoningModel:
+    @patch("src.api.model_router.routing_decisions", new_callable=RoutingDecisionCache)
+    @patch("src.api.model_router.run_llm_with_instructor")
+    async def test_router_called_once_per_question(self, mock_run_llm, _):
+        """Test that the router is only called the first time for a question."""
+        mock_run_llm.return_value = MagicMock(use_reasoning_model=True)
+
+        assert await should_use_reasoning_model("Task details", "question_1") is True
+        assert await should_use_reasoning_model("Task details", "question_1") is True
+
+        mock_run_llm.assert_called_once()
+        messages = mock_run_llm.call_args[1]["messages"]
+        assert messages[-1] == {"role": "user", "content": "Task details"}
+
+    @patch("src.api.model_router.routing_decisions", new_callable=RoutingDecisionCache)
+    @patch("src.api.model_router.run_llm_with_instructor")
+    async def test_router_called_again_after_edit(self, mock_run_llm, _):
+        """Test that the router is called again once the question changes."""
+        mock_run_llm.side_effect = [
+            MagicMock(use_reasoning_model=False),
+            MagicMock(use_reasoning_model=True),
+        ]
+
+        assert await should_use_reasoning_model("Old details", "question_1") is False
+        assert await should_use_reasoning_model("New details", "question_1") is True
+
+        assert mock_run_llm.call_count == 2
+
+    @patch("src.api.model_router.routing_decisions", new_callable=RoutingDecisionCache)
+    @patch("src.api.model_router.run_llm_with_instructor")
+    async def test_preview_cached_by_content(self, mock_run_llm, mock_cache):
+        """Test that previews without an id are cached by content hash."""
+        mock_run_llm.return_value = MagicMock(use_reasoning_model=False)
+
+        await should_use_reasoning_model("Preview details")
+        await should_use_reasoning_model("Preview details")
+
+        mock_run_llm.assert_called_once()
+        assert (
+            mock_cache.get(
+                f"preview_{get_content_hash('Preview details')}",
+                get_content_hash("Preview details"),
+            )
+            is False
+        )
+
+
+@pytest.mark.asyncio
+class TestPrecomputeRoutingDecisions:
+    @patch("src.api.model_router.should_use_reasoning_model")
+    @patch("src.api.model_router.get_scorecard")
+    async def test_precompute(self, mock_get_scorecard, mock_should_use_reasoning):
+        """Test that a decision is made for every question of a quiz."""
+        mock_get_scorecard.return_value = {
+            "criteria": [
+                {
+                    "name": "Clarity",
+                    "description": "Is it clear?",
+                    "min_score": 1,
+                    "max_score": 5,
+                }
+            ]
+        }
+        task = {
+            "questions": [
+                {
+                    "id": 1,
+                    "type": "objective",
+                    "blocks": [make_block("Q1")],
+                    "answer": [make_block("A1")],
+                    "scorecard_id": None,
+                },
+                {
+                    "id": 2,
+                    "type": "subjective",
+                    "blocks": [make_block("Q2")],
+                    "answer": None,
+                    "scorecard_id": 10,
+                },
+            ]
+        }
+
+        await precompute_routing_decisions(task)
+
+        mock_get_scorecard.assert_called_once_with(10)
+        keys = sorted(call[0][1] for call in mock_should_use_reasoning.call_args_list)
+        assert keys == ["question_1", "question_2"]
+        # the task passed in is left untouched
+        assert "scorecard" not in task["questions"][1]
+
+    @patch("src.api.model_router.logger")
+    @patch("src.api.model_router.should_use_reasoning_model")
+    async def test_precompute_errors_logged(
+        self, mock_should_use_reasoning, mock_logger
+    ):
+        """Test that a failing question does not stop the others."""
+        mock_should_use_reasoning.side_effect = [Exception("API Error"), True]
+        task = {
+            "questions": [
+                {
+                    "id": id,
+                    "type": "objective",
+                    "blocks": [make_block("Q")],
+                    "answer": [make_block("A")],
+                }
+                for id in [1, 2]
+            ]
+        }
+
+        await precompute_routing_decisions(task)
+
+        assert mock_should_use_reasoning.call_count == 2
+        mock_logger.error.assert_called_once()
+
+    @patch("src.api.model_router.should_use_reasoning_model")
+    async def test_precompute_skips_questions_without_scorecard(
+        self, mock_should_use_reasoning
+    ):
+        """Test that subjective questions without a scorecard are skipped."""
+        task = {
+            "questions": [
+                {
+                    "id": 1,
+                    "type": "subjective",
+                    "blocks": [],
+                    "answer": None,
+                    "scorecard_id": None,
+                }
+            ]
+        }
+
+        await precompute_routing_decisions(task)
+
+        mock_should_use_reasoning.assert_not_called()
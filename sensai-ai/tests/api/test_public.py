@@ -88,6 +88,52 @@ class TestGetAllChatHistory:
         assert response.status_code == 200
         assert response.json() == mock_chat_data
 
+    @patch("src.api.public.validate_api_key")
+    @patch("src.api.public.iter_all_chat_history_from_db")
+    @patch("src.api.public.get_chat_history_page_from_db")
+    def test_get_chat_history_page_and_stream(
+        self, mock_get_page, mock_iter_chat_history, mock_validate
+    ):
+        """Test paging with a cursor and streaming the chat history as NDJSON."""
+        mock_validate.return_value = None
+        message = {
+            "id": 1,
+            "created_at": "2023-01-01T00:00:00Z",
+            "user_id": 123,
+            "question_id": 456,
+            "role": "user",
+            "content": "Hello",
+            "response_type": "text",
+            "task_id": 789,
+            "user_email": "test@example.com",
+        }
+        mock_get_page.return_value = [message]
+
+        async def iter_batches(*args):
+            yield [message, {**message, "id": 2}]
+
+        mock_iter_chat_history.side_effect = iter_batches
+
+        response = client.get(
+            "/chat_history?org_id=123&after_id=0&limit=10",
+            headers={"api-key": "valid_key"},
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [message]
+        mock_get_page.assert_called_once_with(123, 0, 10)
+
+        response = client.get(
+            "/chat_history?org_id=123&stream=true", headers={"api-key": "valid_key"}
+        )
+
+        assert response.status_code == 200
+        assert response.text.splitlines() == [
+            PublicAPIChatMessage(**message).model_dump_json(),
+            PublicAPIChatMessage(**{**message, "id": 2}).model_dump_json(),
+        ]
+        mock_iter_chat_history.assert_called_once_with(123, None)
+
     @patch("src.api.public.validate_api_key")
     def test_get_all_chat_history_invalid_api_key(self, mock_validate):
         """Test chat history retrieval with invalid API key."""
@@ -112,11 +158,9 @@ class TestGetTasksForCourse:
     @patch("src.api.public.get_org_id_from_api_key")
     @patch("src.api.public.get_course_org_id")
     @patch("src.api.public.validate_api_key")
-    @patch("src.api.public.get_course_from_db")
-    @patch("src.api.public.get_task_from_db")
+    @patch("src.api.public.get_course_with_task_details_from_db")
     def test_get_tasks_for_course_success_learning_material(
         self,
-        mock_get_task,
         mock_get_course,
         mock_validate,
         mock_get_course_org_id,
@@ -148,6 +192,14 @@ class TestGetTasksForCourse:
                             "ordering": 0,
                             "num_questions": None,
                             "is_generating": False,
+                            "blocks": [
+                                {
+                                    "type": "paragraph",
+                                    "content": [
+                                        {"type": "text", "text": "block1", "styles": {}}
+                                    ],
+                                }
+                            ],
                         },
                         {
                             "id": 2,
@@ -158,6 +210,22 @@ class TestGetTasksForCourse:
                             "ordering": 1,
                             "num_questions": 1,
                             "is_generating": False,
+                            "questions": [
+                                {
+                                    "id": 1,
+                                    "type": "objective",
+                                    "blocks": [],
+                                    "answer": [],
+                                    "input_type": "text",
+                                    "response_type": "chat",
+                                    "scorecard_id": None,
+                                    "context": None,
+                                    "coding_languages": None,
+                                    "max_attempts": None,
+                                    "is_feedback_shown": True,
+                                    "title": "question",
+                                }
+                            ],
                         },
                     ],
                 }
@@ -165,38 +233,6 @@ class TestGetTasksForCourse:
         }
         mock_get_course.return_value = mock_course_data
 
-        # Mock task details
-        mock_get_task.side_effect = [
-            {
-                "id": 1,
-                "blocks": [
-                    {
-                        "type": "paragraph",
-                        "content": [{"type": "text", "text": "block1", "styles": {}}],
-                    }
-                ],
-            },  # Learning material
-            {
-                "id": 2,
-                "questions": [
-                    {
-                        "id": 1,
-                        "type": "objective",
-                        "blocks": [],
-                        "answer": [],
-                        "input_type": "text",
-                        "response_type": "chat",
-                        "scorecard_id": None,
-                        "context": None,
-                        "coding_languages": None,
-                        "max_attempts": None,
-                        "is_feedback_shown": True,
-                        "title": "question",
-                    }
-                ],
-            },  # Quiz
-        ]
-
         # Make request
         response = client.get("/course/1", headers={"api-key": "valid_key"})
 
@@ -208,7 +244,10 @@ class TestGetTasksForCourse:
         assert len(result["milestones"][0]["tasks"]) == 2
         assert "blocks" in result["milestones"][0]["tasks"][0]
         assert "questions" in result["milestones"][0]["tasks"][1]
-        assert result["milestones"][0]["tasks"][1]["questions"][0]["title"] == "question"
+        assert (
+            result["milestones"][0]["tasks"][1]["questions"][0]["title"] == "question"
+        )
+        mock_get_course.assert_called_once_with(1)
 
     @patch("src.api.public.get_org_id_from_api_key")
     def test_get_tasks_for_course_invalid_api_key(self, mock_get_org_id):
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock
+from src.api.websockets import ConnectionManager, make_message
+
+
+class FakeWebSocket:
+    """Records what is sent to it, optionally waiting to be released before each send."""
+
+    def __init__(self):
+        self.sent = []
+        self.release = None
+        self.accept = AsyncMock()
+        self.close = AsyncMock()
+
+    async def send_text(self, payload):
+        if self.release is not None:
+            await self.release.wait()
+
+        self.sent.append(payload)
+
+
+def task_created(task_id):
+    return {"event": "task_created", "task": {"id": task_id, "name": "Task"}}
+
+
+def task_completed(task_id, total_completed):
+    return {
+        "event": "task_completed",
+        "task": {"id": task_id},
+        "total_completed": total_completed,
+    }
+
+
+def get_events(websocket):
+    return [json.loads(payload) for payload in websocket.sent]
+
+
+async def settle():
+    # let the writers send what they can
+    await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+async def managers():
+    """Creates connection managers, stopping their writers at the end of the test."""
+    created = []
+
+    def make_manager(**kwargs):
+        manager = ConnectionManager(**kwargs)
+        created.append(manager)
+        return manager
+
+    yield make_manager
+
+    for manager in created:
+        for course_id, connections in list(manager.active_connections.items()):
+            for websocket in list(connections):
+                manager.disconnect(websocket, course_id)
+
+    await settle()
+
+
+def test_make_message():
+    """Test that only task completions are progress updates."""
+    message = make_message(task_completed(1, 3))
+    assert json.loads(message.payload) == task_completed(1, 3)
+    assert message.coalesce_key == "task_completed:1"
+    assert message.droppable
+
+    message = make_message(task_created(1))
+    assert message.coalesce_key is None
+    assert not message.droppable
+
+
+@pytest.mark.asyncio
+class TestConnectionManager:
+    async def test_updates_sent_in_order_to_every_viewer(self, managers):
+        """Test that every viewer of the course gets the same payloads in order."""
+        manager = managers()
+        websockets = [FakeWebSocket(), FakeWebSocket()]
+        other_course = FakeWebSocket()
+        for websocket in websockets:
+            await manager.connect(websocket, 1)
+        await manager.connect(other_course, 2)
+
+        await manager.send_item_updates(1, [task_created(1), task_created(2)])
+        await manager.send_item_update(1, task_completed(1, 1))
+        await settle()
+
+        for websocket in websockets:
+            websocket.accept.assert_called_once()
+            assert get_events(websocket) == [
+                task_created(1),
+                task_created(2),
+                task_completed(1, 1),
+            ]
+        # the payloads are serialized once for all the viewers
+        assert websockets[0].sent[0] is websockets[1].sent[0]
+        assert other_course.sent == []
+        assert manager.get_metrics()["sent"] == 6
+
+    async def test_slow_viewer_holds_up_no_one(self, managers):
+        """Test that a viewer that is slow to receive does not delay the others."""
+        manager = managers()
+        slow, fast = FakeWebSocket(), FakeWebSocket()
+        slow.release = asyncio.Event()
+        await manager.connect(slow, 1)
+        await manager.connect(fast, 1)
+
+        await asyncio.wait_for(
+            manager.send_item_updates(1, [task_created(1), task_created(2)]), 1
+        )
+        await settle()
+
+        assert len(fast.sent) == 2
+        assert slow.sent == []
+        assert manager.get_metrics()["courses"][1] == {
+            "connections": 2,
+            "queued": 1,
+            "max_queued": 1,
+        }
+
+        slow.release.set()
+        await settle()
+
+        assert get_events(slow) == [task_created(1), task_created(2)]
+
+    async def test_progress_updates_coalesced(self, managers):
+        """Test that a queued progress update is replaced by a newer one of the same task."""
+        manager = managers()
+        websocket = FakeWebSocket()
+        websocket.release = asyncio.Event()
+        await manager.connect(websocket, 1)
+
+        await manager.send_item_update(1, task_created(1))
+        await settle()
+        await manager.send_item_updates(
+            1, [task_completed(2, 1), task_created(3), task_completed(2, 2)]
+        )
+
+        websocket.release.set()
+        await settle()
+
+        assert get_events(websocket) == [
+            task_created(1),
+            task_completed(2, 2),
+            task_created(3),
+        ]
+        assert manager.get_metrics()["coalesced"] == 1
+
+    async def test_progress_updates_dropped_for_viewer_behind(self, managers):
+        """Test that progress updates make room for the rest when a viewer falls behind."""
+        manager = managers(max_queue_size=2)
+        websocket = FakeWebSocket()
+        websocket.release = asyncio.Event()
+        await manager.connect(websocket, 1)
+
+        await manager.send_item_update(1, task_created(1))
+        await settle()
+        await manager.send_item_updates(
+            1,
+            [
+                task_completed(2, 1),
+                task_created(3),
+                task_created(4),
+                task_completed(5, 2),
+            ],
+        )
+
+        websocket.release.set()
+        await settle()
+
+        assert get_events(websocket) == [
+            task_created(1),
+            task_created(3),
+            task_created(4),
+        ]
+        assert manager.get_metrics()["dropped"] == 2
+        websocket.close.assert_not_called()
+
+    async def test_viewer_too_far_behind_disconnected(self, managers):
+        """Test that a viewer is disconnected once it is too far behind to keep."""
+        manager = managers(max_queue_size=2)
+        slow, fast = FakeWebSocket(), FakeWebSocket()
+        slow.release = asyncio.Event()
+        await manager.connect(slow, 1)
+        await manager.connect(fast, 1)
+
+        for index in range(4):
+            await manager.send_item_update(1, task_created(index))
+            await settle()
+
+        slow.release.set()
+        await settle()
+
+        assert len(fast.sent) == 4
+        # the update being sent when it fell behind is the last one it gets
+        assert get_events(slow) == [task_created(0)]
+        slow.close.assert_called_once_with(code=1013)
+
+        metrics = manager.get_metrics()
+        assert metrics["disconnected"] == 1
+        assert metrics["courses"][1]["connections"] == 1
+
+    async def test_viewer_disconnected_on_send_timeout(self, managers):
+        """Test that a viewer that takes too long to receive a message is disconnected."""
+        manager = managers(send_timeout=0.01)
+        websocket = FakeWebSocket()
+        websocket.release = asyncio.Event()
+        await manager.connect(websocket, 1)
+
+        await manager.send_item_update(1, task_created(1))
+        await asyncio.sleep(0.05)
+
+        websocket.close.assert_called_once()
+        assert manager.active_connections == {}
+        assert manager.get_metrics()["disconnected"] == 1
+
+    async def test_disconnect(self, managers):
+        """Test that nothing more is sent to a viewer that has left."""
+        manager = managers()
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, 1)
+
+        manager.disconnect(websocket, 1)
+        await manager.send_item_update(1, task_created(1))
+        await settle()
+
+        assert websocket.sent == []
+        assert manager.get_metrics() == {
+            "connections": 0,
+            "max_queue_size": manager.max_queue_size,
+            "sent": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "disconnected": 0,
+            "courses": {},
+            "event_bus": {"type": "memory"},
+        }
+        # disconnecting twice is harmless
+        manager.disconnect(websocket, 1)
@@ -0,0 +1,233 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.api.worker import (
+    JobWorker,
+    JobHandler,
+    get_retry_delay,
+    get_job_handlers,
+    main,
+)
+from src.api.utils.concurrency import AdaptiveConcurrencyLimiter
+
+
+def make_job(job_id: int = 1, kind: str = "task", attempts: int = 1):
+    return {
+        "id": job_id,
+        "kind": kind,
+        "job_uuid": f"job-{job_id}",
+        "org_id": 10,
+        "priority": 0,
+        "attempts": attempts,
+        "max_attempts": 3,
+    }
+
+
+@pytest.fixture
+def queue():
+    """The job queue functions the worker calls, with nothing to lease by default."""
+    with patch(
+        "src.api.worker.lease_jobs", new_callable=AsyncMock
+    ) as lease_jobs, patch(
+        "src.api.worker.renew_job_lease", new_callable=AsyncMock
+    ) as renew_job_lease, patch(
+        "src.api.worker.complete_job", new_callable=AsyncMock
+    ) as complete_job, patch(
+        "src.api.worker.fail_job", new_callable=AsyncMock
+    ) as fail_job, patch(
+        "src.api.worker.release_job", new_callable=AsyncMock
+    ) as release_job, patch(
+        "src.api.worker.fail_expired_jobs", new_callable=AsyncMock
+    ) as fail_expired_jobs:
+        lease_jobs.return_value = []
+        renew_job_lease.return_value = True
+        fail_expired_jobs.return_value = []
+
+        yield {
+            "lease_jobs": lease_jobs,
+            "renew_job_lease": renew_job_lease,
+            "complete_job": complete_job,
+            "fail_job": fail_job,
+            "release_job": release_job,
+            "fail_expired_jobs": fail_expired_jobs,
+        }
+
+
+def make_worker(run, on_failure=None, **kwargs):
+    return JobWorker(
+        {"task": JobHandler(run, on_failure or AsyncMock())},
+        limiter=AdaptiveConcurrencyLimiter(max_limit=10, min_limit=1, org_limit=10),
+        poll_interval=0.01,
+        **kwargs,
+    )
+
+
+async def run_until(worker: JobWorker, condition, timeout: float = 2):
+    task = asyncio.create_task(worker.run())
+
+    async def wait():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    try:
+        await asyncio.wait_for(wait(), timeout)
+    finally:
+        await worker.stop()
+        await task
+
+
+def test_get_retry_delay():
+    """Test that the backoff doubles with every attempt up to the maximum."""
+    with patch("src.api.worker.job_retry_base_delay", 30), patch(
+        "src.api.worker.job_retry_max_delay", 100
+    ):
+        assert 15 <= get_retry_delay(1) <= 30
+        assert 30 <= get_retry_delay(2) <= 60
+        assert 50 <= get_retry_delay(5) <= 100
+
+
+def test_get_job_handlers():
+    """Test that there is a handler for every kind of job."""
+    assert set(get_job_handlers()) == {"course_structure", "task"}
+
+
+@pytest.mark.asyncio
+async def test_main_requires_shared_event_bus():
+    """Test that a worker of its own refuses to run when nothing it sends reaches the API."""
+    with patch("src.api.worker.settings.websocket_event_bus", "memory"), patch(
+        "src.api.worker.JobWorker"
+    ) as mock_worker:
+        with pytest.raises(SystemExit, match="WEBSOCKET_EVENT_BUS=sqlite"):
+            await main()
+
+    mock_worker.assert_not_called()
+
+
+@pytest.mark.asyncio
+class TestJobWorker:
+    async def test_runs_and_completes_jobs(self, queue):
+        """Test that leased jobs are run and completed."""
+        run = AsyncMock()
+        queue["lease_jobs"].side_effect = [[make_job(1), make_job(2)], [], [], []]
+        worker = make_worker(run)
+
+        await run_until(worker, lambda: worker.completed == 2)
+
+        assert run.call_count == 2
+        assert [call[0][0] for call in queue["complete_job"].call_args_list] == [1, 2]
+        assert worker.get_metrics()["running"] == 0
+
+    async def test_leases_only_free_slots(self, queue):
+        """Test that no more jobs are leased than the worker and the limiter allow."""
+        worker = make_worker(AsyncMock(), concurrency=8)
+        worker.limiter.limit = 5.0
+
+        await run_until(worker, lambda: queue["lease_jobs"].called)
+
+        assert queue["lease_jobs"].call_args[0][1] == 5
+
+    async def test_failed_job_retried(self, queue):
+        """Test that a failed job with attempts left is handed back for a retry."""
+        on_failure = AsyncMock()
+        queue["lease_jobs"].side_effect = [[make_job(1, attempts=1)], [], [], []]
+        queue["fail_job"].return_value = True
+        worker = make_worker(
+            AsyncMock(side_effect=ValueError("bad output")), on_failure
+        )
+
+        await run_until(worker, lambda: worker.retried == 1)
+
+        job_id, _, error, retry_delay = queue["fail_job"].call_args[0]
+        assert job_id == 1
+        assert error == "ValueError: bad output"
+        assert retry_delay > 0
+        on_failure.assert_not_called()
+        queue["complete_job"].assert_not_called()
+
+    async def test_job_failed_for_good(self, queue):
+        """Test that the failure handler runs once the job is out of attempts."""
+        on_failure = AsyncMock()
+        job = make_job(1, attempts=3)
+        queue["lease_jobs"].side_effect = [[job], [], [], []]
+        queue["fail_job"].return_value = False
+        worker = make_worker(
+            AsyncMock(side_effect=ValueError("bad output")), on_failure
+        )
+
+        await run_until(worker, lambda: worker.failed == 1)
+
+        on_failure.assert_called_once_with(job)
+
+    async def test_expired_jobs_failed(self, queue):
+        """Test that the failure handler runs for jobs whose lease ran out for good."""
+        on_failure = AsyncMock()
+        job = make_job(1, attempts=3)
+        queue["fail_expired_jobs"].side_effect = [[job], [], [], []]
+        worker = make_worker(AsyncMock(), on_failure)
+
+        await run_until(worker, lambda: on_failure.called)
+
+        on_failure.assert_called_once_with(job)
+        assert worker.failed == 1
+
+    async def test_lease_renewed_while_running(self, queue):
+        """Test that the lease of a long running job is renewed on a heartbeat."""
+        finished = asyncio.Event()
+
+        async def run(job):
+            await finished.wait()
+
+        queue["lease_jobs"].side_effect = [[make_job(1)], [], [], []]
+        worker = make_worker(run, heartbeat_interval=0.01)
+
+        await run_until(worker, lambda: queue["renew_job_lease"].call_count >= 2)
+
+    async def test_job_cancelled_when_lease_lost(self, queue):
+        """Test that a job is stopped once another worker has taken over its lease."""
+        cancelled = asyncio.Event()
+
+        async def run(job):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        queue["lease_jobs"].side_effect = [[make_job(1)], [], [], []]
+        queue["renew_job_lease"].return_value = False
+        worker = make_worker(run, heartbeat_interval=0.01)
+
+        await run_until(worker, cancelled.is_set)
+
+        queue["complete_job"].assert_not_called()
+
+    async def test_stop_releases_running_jobs(self, queue):
+        """Test that stopping the worker hands its running jobs back to the queue."""
+        started = asyncio.Event()
+
+        async def run(job):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue["lease_jobs"].side_effect = [[make_job(1)], [], [], []]
+        worker = make_worker(run)
+
+        await run_until(worker, started.is_set)
+
+        queue["release_job"].assert_called_once_with(1, worker.worker_id)
+        queue["complete_job"].assert_not_called()
+        assert worker.get_metrics()["running"] == 0
+
+    async def test_poll_errors_logged(self, queue):
+        """Test that the worker keeps polling after the queue could not be read."""
+        queue["lease_jobs"].side_effect = [Exception("database is locked"), [], [], []]
+        worker = make_worker(AsyncMock())
+
+        with patch("src.api.worker.logger") as mock_logger:
+            await run_until(worker, lambda: queue["lease_jobs"].call_count >= 2)
+
+        mock_logger.error.assert_called()
+
+    async def test_stop_before_run(self):
+        """Test that a worker that never ran can be stopped."""
+        await make_worker(AsyncMock()).stop()
@@ -1,6 +1,12 @@
+import asyncio
 import pytest
 import base64
-from src.api.utils.audio import prepare_audio_input_for_ai
+from unittest.mock import patch, AsyncMock
+from src.api.utils.audio import (
+    AudioPayloadCache,
+    get_audio_payloads,
+    prepare_audio_input_for_ai,
+)
 
 
 class TestAudioUtils:
@@ -30,3 +36,132 @@ class TestAudioUtils:
         # Check the result
         assert result == ""
         assert isinstance(result, str)
+
+
+class TestAudioPayloadCache:
+    def test_get_and_set(self):
+        """Test that cached payloads are returned and counted."""
+        cache = AudioPayloadCache()
+
+        assert cache.get("uuid-1") is None
+
+        cache.set("uuid-1", "payload")
+
+        assert cache.get("uuid-1") == "payload"
+        assert cache.get_metrics() == {
+            "size": 1,
+            "bytes": 7,
+            "max_bytes": cache.max_bytes,
+            "hits": 1,
+            "misses": 1,
+        }
+
+    def test_evicts_by_size(self):
+        """Test that least recently used payloads are evicted beyond max_bytes."""
+        cache = AudioPayloadCache(max_bytes=10)
+
+        cache.set("uuid-1", "aaaa")
+        cache.set("uuid-2", "bbbb")
+        cache.get("uuid-1")
+        cache.set("uuid-3", "cccc")
+
+        assert cache.get("uuid-2") is None
+        assert cache.get("uuid-1") == "aaaa"
+        assert cache.get("uuid-3") == "cccc"
+        assert cache.total_bytes == 8
+
+    def test_oversized_payload_not_cached(self):
+        """Test that a payload larger than the whole cache is not stored."""
+        cache = AudioPayloadCache(max_bytes=4)
+
+        cache.set("uuid-1", "abc")
+        cache.set("uuid-2", "too large")
+
+        assert cache.get("uuid-2") is None
+        assert cache.get("uuid-1") == "abc"
+
+    def test_replace(self):
+        """Test that setting an existing uuid does not double count its size."""
+        cache = AudioPayloadCache()
+
+        cache.set("uuid-1", "aaaa")
+        cache.set("uuid-1", "bb")
+
+        assert cache.total_bytes == 2
+
+
+@pytest.mark.asyncio
+class TestGetAudioPayloads:
+    @patch("src.api.utils.audio.audio_payloads", new_callable=AudioPayloadCache)
+    @patch("src.api.utils.audio.get_storage")
+    async def test_only_uncached_audio_fetched(self, mock_get_storage, mock_cache):
+        """Test that payloads are returned in order and cached audio is not fetched again."""
+        storage = mock_get_storage.return_value
+        storage.get_media_key.side_effect = (
+            lambda uuid, extension: f"{uuid}.{extension}"
+        )
+        storage.read = AsyncMock(side_effect=lambda key: key.encode())
+        mock_cache.set("uuid-1", "cached")
+
+        result = await get_audio_payloads(["uuid-1", "uuid-2", "uuid-3", "uuid-2"])
+
+        expected_2 = base64.b64encode(b"uuid-2.wav").decode("utf-8")
+        expected_3 = base64.b64encode(b"uuid-3.wav").decode("utf-8")
+        assert result == ["cached", expected_2, expected_3, expected_2]
+        assert sorted(call[0][0] for call in storage.read.call_args_list) == [
+            "uuid-2.wav",
+            "uuid-3.wav",
+        ]
+        assert mock_cache.get("uuid-3") == expected_3
+
+    @patch("src.api.utils.audio.audio_payloads", new_callable=AudioPayloadCache)
+    @patch("src.api.utils.audio.get_storage")
+    async def test_bounded_concurrency(self, mock_get_storage, _):
+        """Test that no more than max_concurrency downloads run at once."""
+        running = 0
+        max_running = 0
+
+        async def read(key):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return b"audio"
+
+        mock_get_storage.return_value.read = read
+
+        await get_audio_payloads([f"uuid-{i}" for i in range(10)], max_concurrency=3)
+
+        assert max_running == 3
+
+    @patch("src.api.utils.audio.audio_payloads", new_callable=AudioPayloadCache)
+    @patch("src.api.utils.audio.get_storage")
+    async def test_concurrent_requests_share_fetch(self, mock_get_storage, _):
+        """Test that concurrent requests for the same audio download it once."""
+
+        async def read(key):
+            await asyncio.sleep(0.01)
+            return b"audio"
+
+        mock_get_storage.return_value.read = AsyncMock(side_effect=read)
+
+        first, second = await asyncio.gather(
+            get_audio_payloads(["uuid-1"]), get_audio_payloads(["uuid-1"])
+        )
+
+        assert first == second
+        mock_get_storage.return_value.read.assert_called_once()
+
+    @patch("src.api.utils.audio.audio_payloads", new_callable=AudioPayloadCache)
+    @patch("src.api.utils.audio.get_storage")
+    async def test_fetch_error(self, mock_get_storage, mock_cache):
+        """Test that failed downloads raise and are not cached."""
+        mock_get_storage.return_value.read = AsyncMock(
+            side_effect=FileNotFoundError("missing")
+        )
+
+        with pytest.raises(FileNotFoundError):
+            await get_audio_payloads(["uuid-1"])
+
+        assert mock_cache.get_metrics()["size"] == 0
@@ -1,7 +1,16 @@
 import pytest
 import asyncio
 from unittest.mock import patch, AsyncMock
-from src.api.utils.concurrency import async_batch_gather, async_index_wrapper
+from src.api.utils.concurrency import (
+    async_batch_gather,
+    async_index_wrapper,
+    is_rate_limit_error,
+    AdaptiveConcurrencyLimiter,
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
 
 
 @pytest.mark.asyncio
@@ -95,3 +104,89 @@ class TestAsyncIndexWrapper:
 
         # Check the results
         assert result == (42, "test-value")
+
+
+def test_is_rate_limit_error():
+    """Test that rate limit errors are found anywhere in the exception chain."""
+    assert is_rate_limit_error(RateLimitError())
+    assert not is_rate_limit_error(ValueError())
+
+    try:
+        try:
+            raise RateLimitError()
+        except RateLimitError as exception:
+            raise ValueError("retries exhausted") from exception
+    except ValueError as exception:
+        assert is_rate_limit_error(exception)
+
+
+@pytest.mark.asyncio
+class TestAdaptiveConcurrencyLimiter:
+    async def test_limits_calls_in_flight(self):
+        """Test that no more calls than the limit, or the org's limit, run at once."""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=3, org_limit=2)
+        in_flight = {"total": 0, 1: 0, 2: 0}
+        max_in_flight = {"total": 0, 1: 0, 2: 0}
+
+        async def call(org_id):
+            async with limiter.slot(org_id):
+                for key in ["total", org_id]:
+                    in_flight[key] += 1
+                    max_in_flight[key] = max(max_in_flight[key], in_flight[key])
+                await asyncio.sleep(0.01)
+                for key in ["total", org_id]:
+                    in_flight[key] -= 1
+
+        await asyncio.gather(*[call(1) for _ in range(6)], *[call(2) for _ in range(2)])
+
+        assert max_in_flight["total"] == 3
+        assert max_in_flight[1] == 2
+        assert limiter.get_metrics()["in_flight"] == 0
+        assert limiter.get_metrics()["orgs_in_flight"] == 0
+
+    async def test_halves_on_rate_limit(self):
+        """Test that the limit halves once per window of rate limited calls."""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8, min_limit=1)
+
+        async def call():
+            async with limiter.slot():
+                raise RateLimitError()
+
+        for _ in range(3):
+            with pytest.raises(RateLimitError):
+                await call()
+
+        assert limiter.get_metrics()["limit"] == 4
+        assert limiter.get_metrics()["rate_limited"] == 3
+
+        # the calls of the next window were started under the old limit
+        with pytest.raises(RateLimitError):
+            await call()
+        assert limiter.get_metrics()["limit"] == 4
+
+        with pytest.raises(RateLimitError):
+            await call()
+        assert limiter.get_metrics()["limit"] == 2
+
+    async def test_grows_after_successes(self):
+        """Test that the limit grows back by one for every window of successful calls."""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8)
+        limiter.limit = 2
+
+        for _ in range(7):
+            async with limiter.slot():
+                pass
+
+        assert limiter.get_metrics()["limit"] == 4
+
+    @patch("src.api.utils.concurrency.time.perf_counter")
+    async def test_shrinks_on_slow_calls(self, mock_perf_counter):
+        """Test that a call slower than the latency target shrinks the limit."""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8, latency_target=10)
+        mock_perf_counter.side_effect = [0, 11]
+
+        async with limiter.slot():
+            pass
+
+        assert limiter.get_metrics()["limit"] == 7
+        assert limiter.get_metrics()["slow"] == 1
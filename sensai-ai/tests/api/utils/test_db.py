@@ -1,6 +1,8 @@
+import asyncio
 import pytest
 import sqlite3
 import aiosqlite
+from contextlib import asynccontextmanager
 from unittest.mock import patch, AsyncMock, MagicMock, call
 from src.api.utils.db import (
     get_new_db_connection,
@@ -10,8 +12,9 @@ from src.api.utils.db import (
     execute_multiple_db_operations,
     serialise_list_to_str,
     deserialise_list_from_str,
-    trace_callback,
     check_table_exists,
+    is_read_only_operation,
+    DBConnectionPool,
 )
 
 
@@ -49,15 +52,6 @@ class TestSerialiseDeserialise:
         assert result == []
 
 
-class TestTraceCallback:
-    @patch("src.api.utils.db.logger")
-    def test_trace_callback(self, mock_logger):
-        """Test that trace_callback logs SQL operations."""
-        sql = "SELECT * FROM test"
-        trace_callback(sql)
-        mock_logger.info.assert_called_once_with(f"Executing operation: {sql}")
-
-
 @pytest.mark.asyncio
 class TestCheckTableExists:
     async def test_check_table_exists_true(self):
@@ -134,23 +128,41 @@ class TestDbConnections:
         mock_conn.close.assert_called_once()
 
 
+def make_mock_pool(mock_conn):
+    """
+    Build a mock connection pool whose writer and readers lease mock_conn and whose
+    queued writes run straight away against mock_conn's cursor.
+    """
+
+    @asynccontextmanager
+    async def lease():
+        yield mock_conn
+
+    async def write(write_fn):
+        return await write_fn(await mock_conn.cursor())
+
+    mock_pool = MagicMock()
+    mock_pool.writer.side_effect = lease
+    mock_pool.reader.side_effect = lease
+    mock_pool.write = AsyncMock(side_effect=write)
+    return mock_pool
+
+
 @pytest.mark.asyncio
 class TestDbOperations:
-    @patch("src.api.utils.db.get_new_db_connection")
-    async def test_execute_db_operation_fetch_one(self, mock_get_conn):
+    async def test_execute_db_operation_fetch_one(self):
         """Test execute_db_operation with fetch_one=True."""
         # Setup mocks
         mock_conn = AsyncMock()
         mock_cursor = AsyncMock()
-        mock_conn.__aenter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
         mock_cursor.fetchone.return_value = {"id": 1, "name": "Test"}
-        mock_get_conn.return_value = mock_conn
 
-        # Call the function
-        result = await execute_db_operation(
-            "SELECT * FROM test WHERE id = ?", params=(1,), fetch_one=True
-        )
+        with patch("src.api.utils.db.db_pool", make_mock_pool(mock_conn)) as mock_pool:
+            # Call the function
+            result = await execute_db_operation(
+                "SELECT * FROM test WHERE id = ?", params=(1,), fetch_one=True
+            )
 
         # Check results
         assert result == {"id": 1, "name": "Test"}
@@ -158,110 +170,125 @@ class TestDbOperations:
             "SELECT * FROM test WHERE id = ?", (1,)
         )
         mock_cursor.fetchone.assert_called_once()
-        mock_conn.commit.assert_called_once()
+        # reads are served by a reader connection and never queued for the writer
+        mock_pool.reader.assert_called_once()
+        mock_pool.write.assert_not_called()
+        mock_conn.commit.assert_not_called()
 
-    @patch("src.api.utils.db.get_new_db_connection")
-    async def test_execute_db_operation_fetch_all(self, mock_get_conn):
+    async def test_execute_db_operation_fetch_all(self):
         """Test execute_db_operation with fetch_all=True."""
         # Setup mocks
         mock_conn = AsyncMock()
         mock_cursor = AsyncMock()
-        mock_conn.__aenter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
         mock_cursor.fetchall.return_value = [
             {"id": 1, "name": "Test1"},
             {"id": 2, "name": "Test2"},
         ]
-        mock_get_conn.return_value = mock_conn
 
-        # Call the function
-        result = await execute_db_operation("SELECT * FROM test", fetch_all=True)
+        with patch("src.api.utils.db.db_pool", make_mock_pool(mock_conn)) as mock_pool:
+            # Call the function
+            result = await execute_db_operation("SELECT * FROM test", fetch_all=True)
 
         # Check results
         assert result == [{"id": 1, "name": "Test1"}, {"id": 2, "name": "Test2"}]
         mock_cursor.execute.assert_called_once_with("SELECT * FROM test")
         mock_cursor.fetchall.assert_called_once()
-        mock_conn.commit.assert_called_once()
+        mock_pool.reader.assert_called_once()
+        mock_pool.write.assert_not_called()
 
-    @patch("src.api.utils.db.get_new_db_connection")
-    async def test_execute_db_operation_no_params(self, mock_get_conn):
+    async def test_execute_db_operation_no_params(self):
         """Test execute_db_operation without params."""
         # Setup mocks
         mock_conn = AsyncMock()
         mock_cursor = AsyncMock()
-        mock_conn.__aenter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
-        mock_get_conn.return_value = mock_conn
 
-        # Call the function
-        result = await execute_db_operation("SELECT COUNT(*) FROM test")
+        with patch("src.api.utils.db.db_pool", make_mock_pool(mock_conn)) as mock_pool:
+            # Call the function
+            result = await execute_db_operation("DELETE FROM test")
 
         # Check results
         assert result is None
-        mock_cursor.execute.assert_called_once_with("SELECT COUNT(*) FROM test")
-        mock_conn.commit.assert_called_once()
+        mock_cursor.execute.assert_called_once_with("DELETE FROM test")
+        mock_pool.write.assert_called_once()
+        mock_pool.reader.assert_not_called()
+
+    async def test_execute_db_operation_returning_uses_writer(self):
+        """Test that writes which return rows still go through the writer."""
+        mock_conn = AsyncMock()
+        mock_cursor = AsyncMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [(1,), (2,)]
 
-    @patch("src.api.utils.db.get_new_db_connection")
-    async def test_execute_db_operation_get_last_row_id(self, mock_get_conn):
+        with patch("src.api.utils.db.db_pool", make_mock_pool(mock_conn)) as mock_pool:
+            result = await execute_db_operation(
+                "UPDATE test SET name = ? RETURNING id",
+                params=("Test",),
+                fetch_all=True,
+            )
+
+        assert result == [(1,), (2,)]
+        mock_pool.write.assert_called_once()
+        mock_pool.reader.assert_not_called()
+
+    async def test_execute_db_operation_get_last_row_id(self):
         """Test execute_db_operation with get_last_row_id=True."""
         # Setup mocks
         mock_conn = AsyncMock()
         mock_cursor = AsyncMock()
-        mock_conn.__aenter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
         mock_cursor.lastrowid = 42
-        mock_get_conn.return_value = mock_conn
 
-        # Call the function
-        result = await execute_db_operation(
-            "INSERT INTO test (name) VALUES (?)", params=("Test",), get_last_row_id=True
-        )
+        with patch("src.api.utils.db.db_pool", make_mock_pool(mock_conn)) as mock_pool:
+            # Call the function
+            result = await execute_db_operation(
+                "INSERT INTO test (name) VALUES (?)",
+                params=("Test",),
+                get_last_row_id=True,
+            )
 
         # Check results
         assert result == 42
         mock_cursor.execute.assert_called_once_with(
             "INSERT INTO test (name) VALUES (?)", ("Test",)
         )
-        mock_conn.commit.assert_called_once()
+        mock_pool.write.assert_called_once()
 
-    @patch("src.api.utils.db.get_new_db_connection")
-    async def test_execute_many_db_operation(self, mock_get_conn):
+    async def test_execute_many_db_operation(self):
         """Test execute_many_db_operation."""
         # Setup mocks
         mock_conn = AsyncMock()
         mock_cursor = AsyncMock()
-        mock_conn.__aenter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
-        mock_get_conn.return_value = mock_conn
 
-        # Call the function
-        params_list = [("Test1",), ("Test2",), ("Test3",)]
-        await execute_many_db_operation(
-            "INSERT INTO test (name) VALUES (?)", params_list
-        )
+        with patch("src.api.utils.db.db_pool", make_mock_pool(mock_conn)) as mock_pool:
+            # Call the function
+            params_list = [("Test1",), ("Test2",), ("Test3",)]
+            await execute_many_db_operation(
+                "INSERT INTO test (name) VALUES (?)", params_list
+            )
 
         # Check results
         mock_cursor.executemany.assert_called_once_with(
             "INSERT INTO test (name) VALUES (?)", params_list
         )
-        mock_conn.commit.assert_called_once()
+        mock_pool.write.assert_called_once()
 
-    @patch("src.api.utils.db.get_new_db_connection")
-    async def test_execute_multiple_db_operations(self, mock_get_conn):
+    async def test_execute_multiple_db_operations(self):
         """Test execute_multiple_db_operations."""
         # Setup mocks
         mock_conn = AsyncMock()
         mock_cursor = AsyncMock()
-        mock_conn.__aenter__.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
-        mock_get_conn.return_value = mock_conn
 
-        # Call the function
-        commands_and_params = [
-            ("INSERT INTO test (name) VALUES (?)", ("Test1",)),
-            ("UPDATE test SET name = ? WHERE id = ?", ("Updated", 1)),
-        ]
-        await execute_multiple_db_operations(commands_and_params)
+        with patch("src.api.utils.db.db_pool", make_mock_pool(mock_conn)) as mock_pool:
+            # Call the function
+            commands_and_params = [
+                ("INSERT INTO test (name) VALUES (?)", ("Test1",)),
+                ("UPDATE test SET name = ? WHERE id = ?", ("Updated", 1)),
+            ]
+            await execute_multiple_db_operations(commands_and_params)
 
         # Check results
         assert mock_cursor.execute.call_count == 2
@@ -271,54 +298,372 @@ class TestDbOperations:
                 call("UPDATE test SET name = ? WHERE id = ?", ("Updated", 1)),
             ]
         )
-        mock_conn.commit.assert_called_once()
+        # all commands are queued together as a single write job
+        mock_pool.write.assert_called_once()
+
+
+class TestIsReadOnlyOperation:
+    def test_select_is_read_only(self):
+        assert is_read_only_operation("  SELECT * FROM test") is True
+
+    def test_cte_select_is_read_only(self):
+        assert is_read_only_operation("WITH t AS (SELECT 1) SELECT * FROM t") is True
+
+    def test_cte_write_is_not_read_only(self):
+        assert (
+            is_read_only_operation(
+                "WITH t AS (SELECT 1) DELETE FROM test WHERE id IN t"
+            )
+            is False
+        )
+
+    def test_writes_are_not_read_only(self):
+        assert is_read_only_operation("INSERT INTO test VALUES (1)") is False
+        assert is_read_only_operation("UPDATE test SET a = 1") is False
+        assert is_read_only_operation("PRAGMA journal_mode") is False
+
+
+@pytest.mark.asyncio
+class TestDBConnectionPool:
+    @pytest.fixture
+    async def pool(self, tmp_path):
+        pool = DBConnectionPool(str(tmp_path / "test.db"), max_readers=2)
+        yield pool
+        await pool.close()
+
+    async def test_connections_are_reused(self, pool):
+        """Test that the writer and readers are opened once and then reused."""
+        async with pool.writer() as first_writer:
+            await first_writer.execute("CREATE TABLE test (id INTEGER)")
+            await first_writer.commit()
+
+        async with pool.writer() as second_writer:
+            assert second_writer is first_writer
+
+        async with pool.reader() as first_reader:
+            pass
+
+        async with pool.reader() as second_reader:
+            assert second_reader is first_reader
+
+        metrics = pool.get_metrics()
+        assert metrics["writer"]["size"] == 1
+        assert metrics["writer"]["acquisitions"] == 2
+        assert metrics["readers"]["size"] == 1
+        assert metrics["readers"]["acquisitions"] == 2
+        assert metrics["readers"]["in_use"] == 0
+
+    async def test_pragmas_applied(self, pool):
+        """Test that the connection PRAGMAs are set on new connections."""
+        async with pool.writer() as conn:
+            cursor = await conn.execute("PRAGMA journal_mode")
+            assert (await cursor.fetchone())[0] == "wal"
+            cursor = await conn.execute("PRAGMA synchronous")
+            assert (await cursor.fetchone())[0] == 1  # NORMAL
+
+        async with pool.reader() as conn:
+            cursor = await conn.execute("PRAGMA query_only")
+            assert (await cursor.fetchone())[0] == 1
+
+    async def test_readers_are_read_only(self, pool):
+        """Test that reader connections refuse writes."""
+        async with pool.writer() as conn:
+            await conn.execute("CREATE TABLE test (id INTEGER)")
+            await conn.commit()
+
+        with pytest.raises(sqlite3.OperationalError):
+            async with pool.reader() as conn:
+                await conn.execute("INSERT INTO test VALUES (1)")
+
+    async def test_writer_is_reentrant(self, pool):
+        """Test that a task holding the writer can lease it and queue writes again."""
+        async with pool.writer() as outer:
+            await outer.execute("CREATE TABLE test (id INTEGER)")
+
+            async with pool.writer() as inner:
+                assert inner is outer
+
+            async def insert(cursor):
+                await cursor.execute("INSERT INTO test VALUES (1)")
+
+            await pool.write(insert)
+            await outer.commit()
+
+        async with pool.reader() as conn:
+            cursor = await conn.execute("SELECT COUNT(*) FROM test")
+            assert (await cursor.fetchone())[0] == 1
+
+    async def test_write_while_leased_joins_the_lease_transaction(self, pool):
+        """Test that a write queued by the lease holder is only committed with the lease."""
+        async with pool.writer() as conn:
+            await conn.execute("CREATE TABLE test (id INTEGER)")
+            await conn.commit()
+
+        async def insert(cursor):
+            await cursor.execute("INSERT INTO test VALUES (1)")
+
+        async def fail(cursor):
+            await cursor.execute("INSERT INTO test VALUES (2)")
+            raise ValueError("bad write")
+
+        async with pool.writer() as conn:
+            await conn.execute("INSERT INTO test VALUES (0)")
+            await pool.write(insert)
+
+            # a failed write only rolls back its own changes
+            with pytest.raises(ValueError):
+                await pool.write(fail)
+
+            assert conn.in_transaction
+            # the lease is released without committing
+
+        async with pool.reader() as conn:
+            cursor = await conn.execute("SELECT COUNT(*) FROM test")
+            assert (await cursor.fetchone())[0] == 0
+
+        async with pool.writer() as conn:
+            await conn.execute("INSERT INTO test VALUES (0)")
+            await pool.write(insert)
+            with pytest.raises(ValueError):
+                await pool.write(fail)
+            await conn.commit()
+
+        async with pool.reader() as conn:
+            cursor = await conn.execute("SELECT id FROM test ORDER BY id")
+            assert [row[0] for row in await cursor.fetchall()] == [0, 1]
+
+    async def test_concurrent_writes_grouped(self, pool):
+        """Test that writes queued together are committed in one transaction."""
+        async with pool.writer() as conn:
+            await conn.execute("CREATE TABLE test (id INTEGER)")
+            await conn.commit()
+
+        def insert(value):
+            async def run(cursor):
+                await cursor.execute("INSERT INTO test VALUES (?)", (value,))
+                return cursor.lastrowid
+
+            return run
+
+        results = await asyncio.gather(*[pool.write(insert(i)) for i in range(10)])
+
+        assert results == list(range(1, 11))
+
+        metrics = pool.get_metrics()["writer"]
+        assert metrics["batches"] == 1
+        assert metrics["max_batch_size"] == 10
+
+    async def test_failed_write_does_not_affect_batch(self, pool):
+        """Test that one failing job is rolled back without failing its batch."""
+        async with pool.writer() as conn:
+            await conn.execute("CREATE TABLE test (id INTEGER PRIMARY KEY)")
+            await conn.commit()
+
+        async def insert(cursor):
+            await cursor.execute("INSERT INTO test VALUES (1)")
+
+        async def insert_then_fail(cursor):
+            await cursor.execute("INSERT INTO test VALUES (2)")
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            pool.write(insert), pool.write(insert_then_fail), return_exceptions=True
+        )
+
+        assert results[0] is None
+        assert isinstance(results[1], ValueError)
+        assert pool.get_metrics()["writer"]["failed_jobs"] == 1
+
+        async with pool.reader() as conn:
+            cursor = await conn.execute("SELECT id FROM test")
+            assert await cursor.fetchall() == [(1,)]
+
+    async def test_writer_lease_waits_for_queued_writes(self, pool):
+        """Test that leasing the writer commits writes queued before it first."""
+        async with pool.writer() as conn:
+            await conn.execute("CREATE TABLE test (id INTEGER)")
+            await conn.commit()
+
+        async def insert(cursor):
+            await cursor.execute("INSERT INTO test VALUES (1)")
+
+        write = asyncio.create_task(pool.write(insert))
+        await asyncio.sleep(0)
+
+        async with pool.writer() as conn:
+            assert write.done()
+            cursor = await conn.execute("SELECT COUNT(*) FROM test")
+            assert (await cursor.fetchone())[0] == 1
+
+    async def test_long_writer_lease_logged(self, tmp_path):
+        """Test that a lease holding up the queued writes for too long is reported."""
+        pool = DBConnectionPool(str(tmp_path / "test.db"), lease_warning_seconds=0.01)
+
+        try:
+            with patch("src.api.utils.db.logger") as mock_logger:
+                async with pool.writer():
+                    await asyncio.sleep(0.05)
+
+                # released on its own time, without failing the holder
+                async with pool.writer():
+                    pass
+
+            assert pool.get_metrics()["writer"]["long_leases"] == 1
+            assert mock_logger.warning.call_count == 2
+        finally:
+            await pool.close()
+
+    async def test_writer_is_exclusive(self, pool):
+        """Test that a second task waits for the writer to be released."""
+        events = []
+
+        async def write(name):
+            async with pool.writer():
+                events.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} end")
+
+        await asyncio.gather(write("a"), write("b"))
+
+        assert events == ["a start", "a end", "b start", "b end"]
+
+    async def test_readers_bounded(self, pool):
+        """Test that no more than max_readers reader connections are opened."""
+
+        async def read():
+            async with pool.reader() as conn:
+                await conn.execute("SELECT 1")
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[read() for _ in range(5)])
+
+        metrics = pool.get_metrics()
+        assert metrics["readers"]["size"] == 2
+        assert metrics["readers"]["acquisitions"] == 5
+
+    async def test_uncommitted_writes_rolled_back(self, pool):
+        """Test that an exception or a missing commit rolls the transaction back."""
+        async with pool.writer() as conn:
+            await conn.execute("CREATE TABLE test (id INTEGER)")
+            await conn.commit()
+
+        with pytest.raises(ValueError):
+            async with pool.writer() as conn:
+                await conn.execute("INSERT INTO test VALUES (1)")
+                raise ValueError("boom")
+
+        async with pool.writer() as conn:
+            await conn.execute("INSERT INTO test VALUES (2)")
+
+        async with pool.reader() as conn:
+            cursor = await conn.execute("SELECT COUNT(*) FROM test")
+            assert (await cursor.fetchone())[0] == 0
+
+    async def test_statements_are_timed(self, pool):
+        """Test that statements run on pooled connections are recorded by fingerprint."""
+        with patch("src.api.utils.db.query_stats") as mock_query_stats:
+            async with pool.reader() as conn:
+                await conn.execute("SELECT 1")
+
+                cursor = await conn.cursor()
+                await cursor.execute("SELECT ?", (2,))
+                assert (await cursor.fetchone())[0] == 2
+
+            async with pool.writer() as conn:
+                await conn.execute("CREATE TABLE timed (id INTEGER)")
+                await conn.executemany("INSERT INTO timed VALUES (?)", [(1,), (2,)])
+
+        recorded_sql = [
+            call_args[0][0]
+            for call_args in mock_query_stats.record.call_args_list
+            if not call_args[0][0].startswith("PRAGMA")
+        ]
+        assert recorded_sql[-4:] == [
+            "SELECT 1",
+            "SELECT ?",
+            "CREATE TABLE timed (id INTEGER)",
+            "INSERT INTO timed VALUES (?)",
+        ]
+
+    async def test_close(self, pool):
+        """Test that close releases all pooled connections."""
+        async with pool.writer():
+            pass
+
+        async with pool.reader():
+            pass
+
+        await pool.close()
+
+        metrics = pool.get_metrics()
+        assert metrics["writer"]["size"] == 0
+        assert metrics["readers"]["size"] == 0
 
 
 @pytest.mark.asyncio
 class TestDbConnectionExceptions:
-    @patch("src.api.utils.db.aiosqlite.connect")
+    @patch("src.api.utils.db.InstrumentedConnection")
     async def test_get_new_db_connection_exception_handling(self, mock_connect):
-        """Test exception handling in get_new_db_connection when conn exists."""
+        """Test exception handling when setting up a new pooled connection fails."""
         # Setup mock connection
         mock_conn = AsyncMock()
 
-        # Create an async coroutine function that returns the mock connection
-        async def mock_connect_coroutine(*args, **kwargs):
-            return mock_conn
+        # aiosqlite connections are awaited to start their worker thread
+        class MockConnection:
+            def __await__(self):
+                async def connect():
+                    return mock_conn
 
-        # Make connect return the coroutine
-        mock_connect.return_value = mock_connect_coroutine()
+                return connect().__await__()
 
-        # Make execute work normally but set_trace_callback raise an exception
-        mock_conn.execute.return_value = AsyncMock()
-        mock_conn.set_trace_callback.side_effect = Exception("Trace callback error")
+        mock_connect.return_value = MockConnection()
 
-        # Test that exception is re-raised and rollback is called
-        with pytest.raises(Exception, match="Trace callback error"):
-            async with get_new_db_connection() as conn:
+        # Make applying the connection PRAGMAs fail
+        mock_conn.execute.side_effect = Exception("PRAGMA error")
+
+        pool = DBConnectionPool("test.db")
+
+        # Test that exception is re-raised and the writer is released
+        with pytest.raises(Exception, match="PRAGMA error"):
+            async with pool.writer() as conn:
                 pass
 
-        # Verify connect was called
         mock_connect.assert_called_once()
-        # Verify rollback was called since conn was not None
-        mock_conn.rollback.assert_called_once()
-        # Verify close was called in finally block
+        # the half set up connection is closed and not kept in the pool
         mock_conn.close.assert_called_once()
+        assert pool.get_metrics()["writer"]["size"] == 0
+
+        await pool.close()
 
-    @patch("src.api.utils.db.aiosqlite.connect")
+    @patch("src.api.utils.db.InstrumentedConnection")
     async def test_get_new_db_connection_exception_no_conn(self, mock_connect):
         """Test exception handling when connection is None."""
         # Make connect itself raise an exception
         mock_connect.side_effect = Exception("Connection failed")
 
+        pool = DBConnectionPool("test.db")
+
         # Test that exception is re-raised
         with pytest.raises(Exception, match="Connection failed"):
-            async with get_new_db_connection() as conn:
+            async with pool.writer() as conn:
                 pass
 
-        # Should not try to rollback or close None connection
         mock_connect.assert_called_once()
 
+        await pool.close()
+
+    @patch("src.api.utils.db.db_pool")
+    async def test_get_new_db_connection_leases_writer(self, mock_pool):
+        """Test that get_new_db_connection hands out the pooled writer."""
+        mock_conn = AsyncMock()
+        pool = make_mock_pool(mock_conn)
+        mock_pool.writer = pool.writer
+
+        async with get_new_db_connection() as conn:
+            assert conn is mock_conn
+
+        mock_pool.writer.assert_called_once()
+
 
 # Test for set_db_defaults would require mocking sqlite3.connect and executescript
 # which is more complex as it's not an async function
@@ -0,0 +1,231 @@
+import datetime
+import json
+import time
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+from src.api.utils.google_auth import (
+    CertsSource,
+    GoogleTokenVerifier,
+    LocalCertsSource,
+    get_certs_source,
+    get_key_id,
+    get_max_age,
+)
+
+
+def make_key(key_id: str):
+    """An RSA signer and the matching self-signed certificate."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(private_key.public_key())
+        .serial_number(1)
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    private_key_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+    return (
+        crypt.RSASigner.from_string(private_key_pem, key_id),
+        cert.public_bytes(serialization.Encoding.PEM).decode(),
+    )
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {key_id: make_key(key_id) for key_id in ["key-1", "key-2"]}
+
+
+def make_token(signer, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": "client-id",
+        "email": "test@example.com",
+        "iat": now,
+        "exp": now + 3600,
+        **claims,
+    }
+    return jwt.encode(signer, payload).decode()
+
+
+def test_get_max_age():
+    """Test reading how long a response can be cached for."""
+    assert (
+        get_max_age(httpx.Headers({"cache-control": "public, max-age=21000"})) == 21000
+    )
+    assert (
+        get_max_age(httpx.Headers({"cache-control": "max-age=100", "age": "40"})) == 60
+    )
+    assert get_max_age(httpx.Headers({"cache-control": "no-cache"})) == 300
+
+
+def test_get_key_id(keys):
+    """Test reading the key id from a token header."""
+    assert get_key_id(make_token(keys["key-1"][0])) == "key-1"
+
+    with pytest.raises(ValueError, match="Malformed token"):
+        get_key_id("not a token")
+
+
+@patch("src.api.utils.google_auth.settings")
+def test_get_certs_source(mock_settings, tmp_path):
+    """Test that a local certs file replaces Google's certs when configured."""
+    mock_settings.google_certs_file = str(tmp_path / "certs.json")
+    source = get_certs_source()
+    assert isinstance(source, LocalCertsSource)
+    assert source.path == str(tmp_path / "certs.json")
+
+    mock_settings.google_certs_file = None
+    assert not isinstance(get_certs_source(), LocalCertsSource)
+
+
+def test_certs_source_is_abstract():
+    """Test that a certs source has to say how it fetches the certs."""
+    with pytest.raises(TypeError):
+        CertsSource()
+
+
+@pytest.mark.asyncio
+class TestGoogleTokenVerifier:
+    async def test_verify(self, keys):
+        """Test that a valid token is decoded."""
+        signer, cert = keys["key-1"]
+        verifier = GoogleTokenVerifier(LocalCertsSource({"key-1": cert}))
+
+        id_info = await verifier.verify(make_token(signer), "client-id")
+
+        assert id_info["email"] == "test@example.com"
+
+    async def test_verify_cached(self, keys):
+        """Test that a token is only verified once until it expires."""
+        signer, cert = keys["key-1"]
+        verifier = GoogleTokenVerifier(LocalCertsSource({"key-1": cert}))
+        token = make_token(signer)
+
+        with patch(
+            "src.api.utils.google_auth.jwt.decode", wraps=jwt.decode
+        ) as mock_decode:
+            await verifier.verify(token, "client-id")
+            id_info = await verifier.verify(token, "client-id")
+
+        mock_decode.assert_called_once()
+        assert id_info["email"] == "test@example.com"
+        assert verifier.get_metrics()["hits"] == 1
+
+        # a different audience is verified separately
+        with pytest.raises(ValueError):
+            await verifier.verify(token, "other-client-id")
+
+    async def test_expired_cache_entry(self, keys):
+        """Test that cached tokens are dropped once they expire."""
+        signer, cert = keys["key-1"]
+        verifier = GoogleTokenVerifier(LocalCertsSource({"key-1": cert}))
+        token = make_token(signer)
+
+        id_info = await verifier.verify(token, "client-id")
+
+        with patch("src.api.utils.google_auth.time.time") as mock_time:
+            mock_time.return_value = id_info["exp"] + 1
+            assert verifier._get_cached(next(iter(verifier._verified))) is None
+
+        assert verifier.get_metrics()["size"] == 0
+
+    async def test_invalid_signature(self, keys):
+        """Test that a token signed with another key is rejected."""
+        verifier = GoogleTokenVerifier(LocalCertsSource({"key-1": keys["key-1"][1]}))
+        # a different private key that claims to be key-1
+        signer, _ = make_key("key-1")
+
+        with pytest.raises(ValueError):
+            await verifier.verify(make_token(signer), "client-id")
+
+        assert verifier.get_metrics()["size"] == 0
+
+    async def test_wrong_issuer(self, keys):
+        """Test that tokens not issued by Google are rejected."""
+        signer, cert = keys["key-1"]
+        verifier = GoogleTokenVerifier(LocalCertsSource({"key-1": cert}))
+
+        with pytest.raises(ValueError, match="Wrong issuer"):
+            await verifier.verify(make_token(signer, iss="evil.com"), "client-id")
+
+    async def test_certs_cached_until_expiry(self, keys):
+        """Test that certs are only fetched again once their max-age runs out."""
+        source = AsyncMock()
+        source.fetch.return_value = ({"key-1": keys["key-1"][1]}, 100)
+        verifier = GoogleTokenVerifier(source)
+
+        with patch("src.api.utils.google_auth.time.monotonic") as mock_monotonic:
+            mock_monotonic.return_value = 1000
+            await verifier.get_certs()
+            await verifier.get_certs("key-1")
+            assert source.fetch.call_count == 1
+
+            mock_monotonic.return_value = 1100
+            await verifier.get_certs()
+            assert source.fetch.call_count == 2
+
+    async def test_certs_refetched_for_unknown_key(self, keys):
+        """Test that a token signed with a new key triggers a refetch (key rotation)."""
+        source = AsyncMock()
+        source.fetch.side_effect = [
+            ({"key-1": keys["key-1"][1]}, 3600),
+            ({"key-1": keys["key-1"][1], "key-2": keys["key-2"][1]}, 3600),
+        ]
+        verifier = GoogleTokenVerifier(source)
+
+        await verifier.verify(make_token(keys["key-1"][0]), "client-id")
+        id_info = await verifier.verify(make_token(keys["key-2"][0]), "client-id")
+
+        assert id_info["email"] == "test@example.com"
+        assert verifier.get_metrics()["certs_fetches"] == 2
+
+    async def test_stale_certs_used_when_refresh_fails(self, keys):
+        """Test that the last known certs keep being used if Google cannot be reached."""
+        source = AsyncMock()
+        source.fetch.side_effect = [
+            ({"key-1": keys["key-1"][1]}, 0),
+            httpx.ConnectError("offline"),
+        ]
+        verifier = GoogleTokenVerifier(source)
+
+        await verifier.get_certs()
+        certs = await verifier.get_certs()
+
+        assert certs == {"key-1": keys["key-1"][1]}
+
+    async def test_first_certs_fetch_fails(self):
+        """Test that errors are raised when there are no certs to fall back to."""
+        source = AsyncMock()
+        source.fetch.side_effect = httpx.ConnectError("offline")
+        verifier = GoogleTokenVerifier(source)
+
+        with pytest.raises(httpx.ConnectError):
+            await verifier.get_certs()
+
+    async def test_local_certs_file(self, keys, tmp_path):
+        """Test verifying against certs read from a local file."""
+        signer, cert = keys["key-1"]
+        certs_file = tmp_path / "certs.json"
+        certs_file.write_text(json.dumps({"key-1": cert}))
+        verifier = GoogleTokenVerifier(LocalCertsSource(path=str(certs_file)))
+
+        id_info = await verifier.verify(make_token(signer), "client-id")
+
+        assert id_info["aud"] == "client-id"
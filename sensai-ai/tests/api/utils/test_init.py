@@ -1,6 +1,12 @@
 import pytest
 import datetime
-from src.api.utils import generate_random_color, get_date_from_str, convert_utc_to_ist
+from pydantic import BaseModel
+from src.api.utils import (
+    generate_random_color,
+    get_date_from_str,
+    convert_utc_to_ist,
+    iter_ndjson,
+)
 
 
 class TestGenerateRandomColor:
@@ -74,3 +80,20 @@ class TestDateUtils:
         # Check that the time is correctly converted (9 AM UTC = 2:30 PM IST)
         assert ist_dt.hour == 14
         assert ist_dt.minute == 30
+
+
+class Item(BaseModel):
+    id: int
+
+
+@pytest.mark.asyncio
+async def test_iter_ndjson():
+    """Test that each batch is validated and serialized as one chunk of NDJSON lines."""
+
+    async def batches():
+        yield [{"id": 1, "extra": "x"}, {"id": 2}]
+        yield [{"id": 3}]
+
+    chunks = [chunk async for chunk in iter_ndjson(batches(), Item)]
+
+    assert chunks == ['{"id":1}\n{"id":2}\n', '{"id":3}\n']
@@ -0,0 +1,131 @@
+import pytest
+from src.api.utils.query_stats import (
+    QueryStats,
+    QueryTimings,
+    get_query_fingerprint,
+)
+
+
+class TestGetQueryFingerprint:
+    def test_literals_replaced(self):
+        """Test that string and numeric literals are replaced with placeholders."""
+        assert (
+            get_query_fingerprint(
+                "SELECT * FROM users WHERE email = 'a@b.com' AND id = 5"
+            )
+            == "SELECT * FROM users WHERE email = ? AND id = ?"
+        )
+
+    def test_whitespace_collapsed(self):
+        """Test that formatting differences do not change the fingerprint."""
+        assert (
+            get_query_fingerprint("\n    SELECT id\n    FROM   tasks\n    ")
+            == "SELECT id FROM tasks"
+        )
+
+    def test_in_lists_collapsed(self):
+        """Test that IN lists of any length share a fingerprint."""
+        assert get_query_fingerprint(
+            "SELECT * FROM tasks WHERE id IN (1, 2, 3)"
+        ) == get_query_fingerprint("SELECT * FROM tasks WHERE id IN (?)")
+
+    def test_identifiers_with_digits_kept(self):
+        """Test that digits inside identifiers are not treated as literals."""
+        assert get_query_fingerprint("SELECT col1 FROM table2") == (
+            "SELECT col1 FROM table2"
+        )
+
+
+class TestQueryTimings:
+    def test_record_buckets(self):
+        """Test that durations land in the right histogram buckets."""
+        timings = QueryTimings()
+
+        timings.record(0.0005)  # 0.5ms
+        timings.record(0.003)  # 3ms
+        timings.record(10)  # 10s
+
+        result = timings.to_dict()
+
+        assert result["count"] == 3
+        assert result["max_ms"] == 10000
+        assert result["histogram"]["<=1ms"] == 1
+        assert result["histogram"]["<=5ms"] == 1
+        assert result["histogram"][">5000ms"] == 1
+
+    def test_empty(self):
+        """Test the summary of timings with nothing recorded."""
+        result = QueryTimings().to_dict()
+
+        assert result["count"] == 0
+        assert result["avg_ms"] == 0.0
+
+
+class TestQueryStats:
+    def test_record_groups_by_fingerprint(self):
+        """Test that statements differing only in literals are grouped."""
+        stats = QueryStats(slow_query_threshold_ms=1000)
+
+        stats.record("SELECT * FROM tasks WHERE id = 1", 0.001)
+        stats.record("SELECT * FROM tasks WHERE id = 2", 0.003)
+        stats.record("DELETE FROM tasks", 0.01)
+
+        summary = stats.get_summary()
+
+        assert len(summary["queries"]) == 2
+        # sorted by total time spent
+        assert summary["queries"][0]["fingerprint"] == "DELETE FROM tasks"
+        assert summary["queries"][1]["count"] == 2
+        assert summary["queries"][1]["avg_ms"] == pytest.approx(2)
+        assert summary["slow_queries"] == []
+
+    def test_slow_queries_sampled(self):
+        """Test that only queries above the threshold are sampled, newest first."""
+        stats = QueryStats(slow_query_threshold_ms=100, slow_query_sample_size=2)
+
+        stats.record("SELECT 1", 0.05)
+        stats.record("SELECT 2", 0.2)
+        stats.record("SELECT 3", 0.3)
+        stats.record("SELECT 4", 0.4)
+
+        slow_queries = stats.get_summary()["slow_queries"]
+
+        assert [query["sql"] for query in slow_queries] == ["SELECT 4", "SELECT 3"]
+        assert slow_queries[0]["fingerprint"] == "SELECT ?"
+        assert slow_queries[0]["duration_ms"] == pytest.approx(400)
+
+    def test_summary_limit(self):
+        """Test that the summary is limited to the most expensive queries."""
+        stats = QueryStats()
+
+        stats.record("SELECT * FROM a", 0.001)
+        stats.record("SELECT * FROM b", 0.002)
+
+        summary = stats.get_summary(limit=1)
+
+        assert [query["fingerprint"] for query in summary["queries"]] == [
+            "SELECT * FROM b"
+        ]
+
+    def test_least_recently_run_fingerprints_evicted(self):
+        """Test that only the most recently run fingerprints are kept."""
+        stats = QueryStats(max_fingerprints=2)
+
+        stats.record("SELECT * FROM a", 0.001)
+        stats.record("SELECT * FROM b", 0.001)
+        stats.record("SELECT * FROM a", 0.001)
+        stats.record("SELECT * FROM c", 0.001)
+
+        assert list(stats.timings) == ["SELECT * FROM a", "SELECT * FROM c"]
+        assert stats.timings["SELECT * FROM a"].count == 2
+
+    def test_reset(self):
+        """Test that reset clears all recorded stats."""
+        stats = QueryStats(slow_query_threshold_ms=0)
+
+        stats.record("SELECT 1", 0.001)
+        stats.reset()
+
+        summary = stats.get_summary()
+        assert summary["queries"] == []
+        assert summary["slow_queries"] == []
@@ -1,8 +1,9 @@
 import pytest
 import os
 import uuid
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 from src.api.utils.s3 import (
+    get_s3_client,
     upload_file_to_s3,
     upload_audio_data_to_s3,
     download_file_from_s3_as_bytes,
@@ -13,6 +14,13 @@ from src.api.utils.s3 import (
 
 
 class TestS3Utils:
+    @pytest.fixture(autouse=True)
+    def clear_s3_client(self):
+        # the client is shared, so every test needs to create it afresh
+        get_s3_client.cache_clear()
+        yield
+        get_s3_client.cache_clear()
+
     @patch("src.api.utils.s3.boto3.Session")
     def test_upload_file_to_s3_success(self, mock_session):
         """Test successful file upload to S3."""
@@ -26,7 +34,7 @@ class TestS3Utils:
 
         # Check results
         assert result == "test/file.txt"
-        mock_session.return_value.client.assert_called_once_with("s3")
+        mock_session.return_value.client.assert_called_once_with("s3", config=ANY)
         mock_s3_client.upload_file.assert_called_once()
 
     @patch("src.api.utils.s3.boto3.Session")
@@ -44,7 +52,7 @@ class TestS3Utils:
 
         # Check results
         assert result == "test/file.json"
-        mock_session.return_value.client.assert_called_once_with("s3")
+        mock_session.return_value.client.assert_called_once_with("s3", config=ANY)
 
         # Verify upload_file was called with ExtraArgs containing ContentType
         call_args = mock_s3_client.upload_file.call_args
@@ -81,7 +89,7 @@ class TestS3Utils:
 
         # Check results
         assert result == "test/audio.wav"
-        mock_session.return_value.client.assert_called_once_with("s3")
+        mock_session.return_value.client.assert_called_once_with("s3", config=ANY)
         mock_s3_client.put_object.assert_called_once()
 
     @patch("src.api.utils.s3.boto3.Session")
@@ -127,9 +135,22 @@ class TestS3Utils:
 
         # Check results
         assert result == b"file content"
-        mock_session.return_value.client.assert_called_once_with("s3")
+        mock_session.return_value.client.assert_called_once_with("s3", config=ANY)
         mock_s3_client.get_object.assert_called_once()
 
+    @patch("src.api.utils.s3.boto3.Session")
+    def test_s3_client_shared(self, mock_session):
+        """Test that a single S3 client is created and reused across calls."""
+        mock_s3_client = MagicMock()
+        mock_session.return_value.client.return_value = mock_s3_client
+        mock_s3_client.upload_file.return_value = None
+        mock_s3_client.get_object.return_value = {"Body": MagicMock()}
+
+        upload_file_to_s3("/path/to/file.txt", "test/file.txt")
+        download_file_from_s3_as_bytes("test/file.txt")
+
+        mock_session.return_value.client.assert_called_once()
+
     @patch("src.api.utils.s3.uuid.uuid4")
     def test_generate_s3_uuid(self, mock_uuid4):
         """Test generating a UUID for S3 keys."""
@@ -0,0 +1,191 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from src.api.utils.storage import (
+    StorageBackend,
+    LocalStorage,
+    S3Storage,
+    get_range_header,
+    get_storage,
+    close_storage,
+)
+
+
+@pytest.mark.asyncio
+class TestLocalStorage:
+    async def test_write_and_read(self, tmp_path):
+        """Test that written data can be read back."""
+        storage = LocalStorage(str(tmp_path))
+
+        key = await storage.write("media/file.wav", b"audio data")
+
+        assert key == "media/file.wav"
+        assert (tmp_path / "media" / "file.wav").read_bytes() == b"audio data"
+        assert await storage.read(key) == b"audio data"
+
+    async def test_ranged_read(self, tmp_path):
+        """Test reading an inclusive byte range, open-ended or not."""
+        storage = LocalStorage(str(tmp_path))
+        await storage.write("file.txt", b"0123456789")
+
+        assert await storage.read("file.txt", (2, 5)) == b"2345"
+        assert await storage.read("file.txt", (7, None)) == b"789"
+
+    async def test_iter_chunks(self, tmp_path):
+        """Test streaming a file in chunks."""
+        storage = LocalStorage(str(tmp_path))
+        await storage.write("file.txt", b"0123456789")
+
+        chunks = [chunk async for chunk in storage.iter_chunks("file.txt", 4)]
+
+        assert chunks == [b"0123", b"4567", b"89"]
+
+    async def test_upload_file(self, tmp_path):
+        """Test copying a local file into the storage."""
+        source = tmp_path / "source.json"
+        source.write_bytes(b"{}")
+        storage = LocalStorage(str(tmp_path / "uploads"))
+
+        await storage.upload_file(str(source), "data/target.json")
+
+        assert await storage.read("data/target.json") == b"{}"
+
+    async def test_read_missing_file(self, tmp_path):
+        """Test that reading a missing key raises."""
+        storage = LocalStorage(str(tmp_path))
+
+        with pytest.raises(FileNotFoundError):
+            await storage.read("missing.wav")
+
+    async def test_key_outside_root(self, tmp_path):
+        """Test that keys cannot escape the storage root."""
+        storage = LocalStorage(str(tmp_path / "uploads"))
+
+        with pytest.raises(ValueError, match="Invalid key"):
+            await storage.read("../secret.txt")
+
+    def test_get_media_key(self, tmp_path):
+        """Test that media files are stored at the root of the folder."""
+        assert LocalStorage(str(tmp_path)).get_media_key("abc", "wav") == "abc.wav"
+
+
+@pytest.mark.asyncio
+class TestS3Storage:
+    @patch("src.api.utils.storage.get_s3_client")
+    async def test_read(self, mock_get_client):
+        """Test reading an object."""
+        mock_body = MagicMock()
+        mock_body.read.return_value = b"content"
+        mock_get_client.return_value.get_object.return_value = {"Body": mock_body}
+
+        result = await S3Storage("bucket").read("folder/file.wav")
+
+        assert result == b"content"
+        mock_get_client.return_value.get_object.assert_called_once_with(
+            Bucket="bucket", Key="folder/file.wav"
+        )
+
+    @patch("src.api.utils.storage.get_s3_client")
+    async def test_ranged_read(self, mock_get_client):
+        """Test that ranged reads are sent as a Range header."""
+        mock_get_client.return_value.get_object.return_value = {"Body": MagicMock()}
+
+        await S3Storage("bucket").read("file.wav", (0, 43))
+
+        mock_get_client.return_value.get_object.assert_called_once_with(
+            Bucket="bucket", Key="file.wav", Range="bytes=0-43"
+        )
+
+    @patch("src.api.utils.storage.get_s3_client")
+    async def test_iter_chunks(self, mock_get_client):
+        """Test streaming an object in chunks."""
+        mock_body = MagicMock()
+        mock_body.read.side_effect = [b"abc", b"de", b""]
+        mock_get_client.return_value.get_object.return_value = {"Body": mock_body}
+
+        chunks = [
+            chunk async for chunk in S3Storage("bucket").iter_chunks("file.wav", 3)
+        ]
+
+        assert chunks == [b"abc", b"de"]
+        mock_body.read.assert_called_with(3)
+        mock_body.close.assert_called_once()
+
+    @patch("src.api.utils.storage.get_s3_client")
+    async def test_write(self, mock_get_client):
+        """Test writing an object with a content type."""
+        mock_get_client.return_value.put_object.return_value = {
+            "ResponseMetadata": {"HTTPStatusCode": 200}
+        }
+
+        key = await S3Storage("bucket").write("file.wav", b"data", "audio/wav")
+
+        assert key == "file.wav"
+        mock_get_client.return_value.put_object.assert_called_once_with(
+            Bucket="bucket", Key="file.wav", Body=b"data", ContentType="audio/wav"
+        )
+
+    @patch("src.api.utils.storage.get_s3_client")
+    async def test_write_failure(self, mock_get_client):
+        """Test that failed writes raise."""
+        mock_get_client.return_value.put_object.return_value = {
+            "ResponseMetadata": {"HTTPStatusCode": 500}
+        }
+
+        with pytest.raises(Exception, match="Failed to upload to S3"):
+            await S3Storage("bucket").write("file.wav", b"data")
+
+    @patch("src.api.utils.storage.get_s3_client")
+    async def test_upload_file(self, mock_get_client):
+        """Test uploading a local file."""
+        await S3Storage("bucket").upload_file(
+            "/tmp/file.json", "file.json", "application/json"
+        )
+
+        mock_get_client.return_value.upload_file.assert_called_once_with(
+            "/tmp/file.json",
+            "bucket",
+            "file.json",
+            ExtraArgs={"ContentType": "application/json"},
+        )
+
+
+def test_storage_backend_is_abstract():
+    """Test that a backend has to implement every storage operation."""
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_get_range_header():
+    """Test formatting byte ranges as HTTP Range headers."""
+    assert get_range_header((0, 99)) == "bytes=0-99"
+    assert get_range_header((100, None)) == "bytes=100-"
+
+
+@patch("src.api.utils.storage.settings")
+def test_get_storage(mock_settings):
+    """Test that S3 is used when an S3 folder is configured."""
+    mock_settings.s3_folder_name = "folder"
+    mock_settings.s3_bucket_name = "bucket"
+
+    storage = get_storage()
+    assert isinstance(storage, S3Storage)
+    assert storage.bucket_name == "bucket"
+
+    mock_settings.s3_folder_name = None
+    mock_settings.local_upload_folder = "/tmp/uploads"
+
+    storage = get_storage()
+    assert isinstance(storage, LocalStorage)
+    assert storage.root_dir == "/tmp/uploads"
+
+
+@pytest.mark.asyncio
+async def test_close_storage(tmp_path):
+    """Test that the thread pool can be closed and is recreated on next use."""
+    storage = LocalStorage(str(tmp_path))
+    await storage.write("file.txt", b"data")
+
+    await close_storage()
+    await close_storage()
+
+    assert await storage.read("file.txt") == b"data"
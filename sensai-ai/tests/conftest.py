@@ -11,6 +11,7 @@ if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
 from api.main import app
+from api.db.course_tree_cache import course_tree_cache
 
 
 @pytest.fixture(autouse=True)
@@ -18,6 +19,9 @@ def mock_database_operations():
     """
     Auto-use fixture to mock all database operations to prevent real database access.
     """
+    # cached course trees would otherwise leak between tests
+    course_tree_cache.invalidate_all()
+
     with patch("src.api.utils.db.get_new_db_connection") as mock_conn, patch(
         "src.api.utils.db.execute_db_operation"
     ) as mock_execute, patch(